@@ -0,0 +1,77 @@
+"""account_balances
+
+Revision ID: 3f1d6a8c2b47
+Revises: b092f14cece0
+Create Date: 2024-03-12 10:12:41.518305
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# Polar Custom Imports
+from polar.kit.extensions.sqlalchemy import PostgresUUID
+
+# revision identifiers, used by Alembic.
+revision = "3f1d6a8c2b47"
+down_revision = "b092f14cece0"
+branch_labels: tuple[str] | None = None
+depends_on: tuple[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "account_balances",
+        sa.Column("account_id", PostgresUUID(), nullable=False),
+        sa.Column("amount", sa.BigInteger(), nullable=False),
+        sa.Column("account_amount", sa.BigInteger(), nullable=False),
+        sa.Column("balance_amount", sa.BigInteger(), nullable=False),
+        sa.Column("payout_amount", sa.BigInteger(), nullable=False),
+        sa.Column("account_payout_amount", sa.BigInteger(), nullable=False),
+        sa.Column("id", PostgresUUID(), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("modified_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("deleted_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["account_id"],
+            ["accounts.id"],
+            name=op.f("account_balances_account_id_fkey"),
+            ondelete="cascade",
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("account_balances_pkey")),
+        sa.UniqueConstraint("account_id", name=op.f("account_balances_account_id_key")),
+    )
+
+    op.execute(
+        """
+INSERT INTO
+    account_balances (
+        id,
+        created_at,
+        account_id,
+        amount,
+        account_amount,
+        balance_amount,
+        payout_amount,
+        account_payout_amount
+    )
+SELECT
+    uuid_generate_v4(),
+    NOW(),
+    account_id,
+    SUM(amount),
+    SUM(account_amount),
+    COALESCE(SUM(amount) FILTER (WHERE type = 'balance'), 0),
+    COALESCE(SUM(amount) FILTER (WHERE type = 'payout'), 0),
+    COALESCE(SUM(account_amount) FILTER (WHERE type = 'payout'), 0)
+FROM
+    transactions
+WHERE
+    account_id IS NOT NULL
+GROUP BY
+    account_id
+"""
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("account_balances")
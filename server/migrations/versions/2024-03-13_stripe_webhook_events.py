@@ -0,0 +1,56 @@
+"""stripe_webhook_events
+
+Revision ID: 8c4e2f1a9d35
+Revises: 3f1d6a8c2b47
+Create Date: 2024-03-13 09:41:18.204672
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# Polar Custom Imports
+from polar.kit.extensions.sqlalchemy import PostgresUUID
+
+# revision identifiers, used by Alembic.
+revision = "8c4e2f1a9d35"
+down_revision = "3f1d6a8c2b47"
+branch_labels: tuple[str] | None = None
+depends_on: tuple[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stripe_webhook_events",
+        sa.Column("stripe_id", sa.String(length=100), nullable=False),
+        sa.Column("type", sa.String(length=100), nullable=False),
+        sa.Column("account", sa.String(length=100), nullable=True),
+        sa.Column("object_id", sa.String(length=100), nullable=False),
+        sa.Column("stripe_created", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("payload", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("processed_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("failed_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("id", PostgresUUID(), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("modified_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("deleted_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id", name=op.f("stripe_webhook_events_pkey")),
+        sa.UniqueConstraint(
+            "stripe_id", name=op.f("stripe_webhook_events_stripe_id_key")
+        ),
+    )
+    op.create_index(
+        "ix_stripe_webhook_events_object_id_stripe_created",
+        "stripe_webhook_events",
+        ["object_id", "stripe_created"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_stripe_webhook_events_object_id_stripe_created",
+        table_name="stripe_webhook_events",
+    )
+    op.drop_table("stripe_webhook_events")
@@ -0,0 +1,48 @@
+"""subscriptions_imports
+
+Revision ID: 5a7c9e3b1d24
+Revises: 8c4e2f1a9d35
+Create Date: 2024-03-14 10:12:43.518290
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# Polar Custom Imports
+from polar.kit.extensions.sqlalchemy import PostgresUUID
+
+# revision identifiers, used by Alembic.
+revision = "5a7c9e3b1d24"
+down_revision = "8c4e2f1a9d35"
+branch_labels: tuple[str] | None = None
+depends_on: tuple[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "subscriptions_imports",
+        sa.Column("subscription_tier_id", PostgresUUID(), nullable=False),
+        sa.Column("user_id", PostgresUUID(), nullable=False),
+        sa.Column("file", sa.LargeBinary(), nullable=False),
+        sa.Column("id", PostgresUUID(), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("modified_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("deleted_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["subscription_tier_id"],
+            ["subscription_tiers.id"],
+            name=op.f("subscriptions_imports_subscription_tier_id_fkey"),
+            ondelete="cascade",
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+            name=op.f("subscriptions_imports_user_id_fkey"),
+            ondelete="cascade",
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("subscriptions_imports_pkey")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("subscriptions_imports")
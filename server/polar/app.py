@@ -12,6 +12,7 @@ from starlette.routing import BaseRoute
 from polar import receivers, worker  # noqa
 from polar.api import router
 from polar.config import settings
+from polar.eventstream.multiplexer import close_multiplexer
 from polar.exception_handlers import (
     polar_exception_handler,
     polar_redirection_exception_handler,
@@ -79,6 +80,7 @@ async def lifespan(app: FastAPI) -> AsyncIterator[State]:
 
         yield {"engine": engine, "sessionmaker": sessionmaker, "arq_pool": arq_pool}
 
+        await close_multiplexer()
         await engine.dispose()
 
         log.info("Polar API stopped")
@@ -35,6 +35,8 @@ from .schemas import ArticleCreate, ArticleUpdate, Visibility
 
 log = structlog.get_logger()
 
+SEND_TO_SUBSCRIBERS_CHUNK_SIZE = 500
+
 
 def polar_slugify(input: str) -> str:
     return slugify(
@@ -372,6 +374,34 @@ class ArticleService:
         result = await session.execute(statement)
         return result.tuples().all()
 
+    async def get_receivers(
+        self, session: AsyncSession, organization_id: UUID, user_ids: Sequence[UUID]
+    ) -> Sequence[tuple[User, ArticlesSubscription | None, bool]]:
+        """
+        Load receivers users in a single query, alongside their subscription
+        to the organization, if any, and whether they are member of it.
+        """
+        statement = (
+            select(User, ArticlesSubscription, UserOrganization.user_id.is_not(None))
+            .join(
+                UserOrganization,
+                onclause=(UserOrganization.user_id == User.id)
+                & (UserOrganization.organization_id == organization_id),
+                isouter=True,
+            )
+            .join(
+                ArticlesSubscription,
+                onclause=(ArticlesSubscription.user_id == User.id)
+                & (ArticlesSubscription.organization_id == organization_id)
+                & (ArticlesSubscription.emails_unsubscribed_at.is_(None)),
+                isouter=True,
+            )
+            .where(User.id.in_(user_ids), User.deleted_at.is_(None))
+        )
+
+        result = await session.execute(statement)
+        return result.unique().tuples().all()
+
     async def count_receivers(
         self, session: AsyncSession, organization_id: UUID, paid_subscribers_only: bool
     ) -> tuple[int, int, int]:
@@ -414,12 +444,18 @@ class ArticleService:
             session, article.organization_id, article.paid_subscribers_only
         )
 
-        for receiver_user_id, _, _ in receivers:
+        # Fan-out by chunks of receivers, so the article is rendered
+        # once per audience variant instead of once per receiver
+        for i in range(0, len(receivers), SEND_TO_SUBSCRIBERS_CHUNK_SIZE):
             enqueue_job(
-                "articles.send_to_user",
+                "articles.send_to_subscribers_chunk",
                 article_id=article.id,
-                user_id=receiver_user_id,
-                is_test=False,
+                user_ids=[
+                    receiver_user_id
+                    for receiver_user_id, _, _ in receivers[
+                        i : i + SEND_TO_SUBSCRIBERS_CHUNK_SIZE
+                    ]
+                ],
             )
 
         # after scheduling is complete
@@ -1,3 +1,6 @@
+import time
+from collections import defaultdict
+from typing import Any
 from uuid import UUID
 
 import httpx
@@ -5,14 +8,17 @@ import structlog
 
 from polar.auth.service import AuthService
 from polar.config import settings
-from polar.email.sender import get_email_sender
+from polar.email.sender import Email, EmailBatchSenderError, get_email_sender
 from polar.logging import Logger
+from polar.models import ArticlesSubscription
 from polar.models.article import Article
+from polar.models.user import User
 from polar.user.service import user as user_service
 from polar.worker import (
     AsyncSessionMaker,
     JobContext,
     PolarWorkerContext,
+    enqueue_job,
     interval,
     task,
 )
@@ -21,6 +27,56 @@ from .service import article_service
 
 log: Logger = structlog.get_logger()
 
+# Number of times the failed emails of a chunk are sent again, and first delay
+SEND_MAX_RETRIES = 3
+SEND_RETRY_DELAY = 60
+
+# Stand-in subscriber ID used when rendering an article once for many receivers.
+# It's replaced by the actual subscriber ID in each email.
+UNSUBSCRIBE_PLACEHOLDER_ID = UUID(int=0)
+
+
+def _get_unsubscribe_link(article: Article, subscriber_id: UUID) -> str:
+    return f"https://polar.sh/unsubscribe?org={article.organization.name}&id={subscriber_id}"
+
+
+def _get_sender(article: Article) -> tuple[str, dict[str, str]]:
+    email_headers: dict[str, str] = {}
+    from_name = ""
+    if article.byline == Article.Byline.organization:
+        from_name = article.organization.pretty_name or article.organization.name
+        if article.organization.email:
+            email_headers["Reply-To"] = f"{from_name} <{article.organization.email}>"
+    else:
+        from_name = article.created_by_user.public_name
+        if article.created_by_user.email:
+            email_headers["Reply-To"] = f"{from_name} <{article.created_by_user.email}>"
+    return from_name, email_headers
+
+
+async def _render(
+    client: httpx.AsyncClient,
+    article: Article,
+    user: User,
+    render_data: dict[str, Any],
+) -> str | None:
+    (jwt, _) = AuthService.generate_token(user)
+
+    response = await client.post(
+        f"{settings.FRONTEND_BASE_URL}/email/article/{article.id}",
+        json=render_data,
+        # Authenticating to the renderer as the user we're sending the email to
+        headers={"Cookie": f"polar_session={jwt};"},
+        # Increase the default timeout because it can be slow to render
+        timeout=60,
+    )
+
+    if not response.is_success:
+        log.error(f"failed to get rendered article: code={response.status_code}")
+        return None
+
+    return response.text
+
 
 @task("articles.send_to_user")
 async def articles_send_to_user(
@@ -43,8 +99,6 @@ async def articles_send_to_user(
         subject = "[TEST] " if is_test else ""
         subject += article.title
 
-        (jwt, _) = AuthService.generate_token(user)
-
         # _, magic_link_token = await magic_link_service.request(
         #     session,
         #     user.email,
@@ -52,7 +106,7 @@ async def articles_send_to_user(
         #     expires_at=utc_now() + timedelta(hours=24),
         # )
 
-        email_headers: dict[str, str] = {}
+        from_name, email_headers = _get_sender(article)
 
         render_data = {
             # Add pre-authenticated tokens to the end of all links in the email
@@ -64,50 +118,134 @@ async def articles_send_to_user(
             session, user_id, article.organization_id
         )
         if subscriber:
-            unsubscribe_link = f"https://polar.sh/unsubscribe?org={article.organization.name}&id={subscriber.id}"
+            unsubscribe_link = _get_unsubscribe_link(article, subscriber.id)
             render_data["unsubscribe_link"] = unsubscribe_link
             email_headers["List-Unsubscribe"] = f"<{unsubscribe_link}>"
 
         async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{settings.FRONTEND_BASE_URL}/email/article/{article.id}",
-                json=render_data,
-                # Authenticating to the renderer as the user we're sending the email to
-                headers={"Cookie": f"polar_session={jwt};"},
-                # Increase the default timeout because it can be slow to render
-                timeout=60,
-            )
-
-        if not response.is_success:
-            log.error(f"failed to get rendered article: code={response.status_code}")
-            return None
+            html_content = await _render(client, article, user, render_data)
 
-        from_name = ""
-        if article.byline == Article.Byline.organization:
-            from_name = article.organization.pretty_name or article.organization.name
-            if article.organization.email:
-                email_headers[
-                    "Reply-To"
-                ] = f"{from_name} <{article.organization.email}>"
-        else:
-            from_name = article.created_by_user.public_name
-            if article.created_by_user.email:
-                email_headers[
-                    "Reply-To"
-                ] = f"{from_name} <{article.created_by_user.email}>"
+        if html_content is None:
+            return None
 
         email_sender = get_email_sender("article")
 
-        email_sender.send_to_user(
+        await email_sender.send_to_user(
             to_email_addr=user.email,
             subject=subject,
-            html_content=response.text,
+            html_content=html_content,
             from_name=from_name,
             from_email_addr=f"{article.organization.name}@posts.polar.sh",
             email_headers=email_headers,
         )
 
 
+@task("articles.send_to_subscribers_chunk")
+async def articles_send_to_subscribers_chunk(
+    ctx: JobContext,
+    article_id: UUID,
+    user_ids: list[UUID],
+    polar_context: PolarWorkerContext,
+    attempt: int = 0,
+) -> None:
+    start = time.perf_counter()
+
+    async with AsyncSessionMaker(ctx) as session:
+        article = await article_service.get_loaded(session, article_id)
+        if not article:
+            return
+
+        receivers = await article_service.get_receivers(
+            session, article.organization_id, user_ids
+        )
+
+    # Receivers see the same content if they share the same access level.
+    # The only personalized part is the unsubscribe link.
+    variants: dict[
+        tuple[bool, bool, bool], list[tuple[User, ArticlesSubscription | None]]
+    ] = defaultdict(list)
+    for user, subscriber, is_member in receivers:
+        paid_subscriber = subscriber is not None and subscriber.paid_subscriber
+        variant = (paid_subscriber, is_member, subscriber is not None)
+        variants[variant].append((user, subscriber))
+
+    from_name, sender_headers = _get_sender(article)
+    from_email_addr = f"{article.organization.name}@posts.polar.sh"
+    placeholder_unsubscribe_link = _get_unsubscribe_link(
+        article, UNSUBSCRIBE_PLACEHOLDER_ID
+    )
+
+    emails: list[Email] = []
+    user_ids_by_email: dict[str, UUID] = {}
+    async with httpx.AsyncClient() as client:
+        for (_, _, has_subscriber), variant_receivers in variants.items():
+            render_data: dict[str, Any] = {}
+            if has_subscriber:
+                render_data["unsubscribe_link"] = placeholder_unsubscribe_link
+
+            representative, _ = variant_receivers[0]
+            html_content = await _render(client, article, representative, render_data)
+            if html_content is None:
+                continue
+
+            for user, subscriber in variant_receivers:
+                email_headers = dict(sender_headers)
+                user_html_content = html_content
+                if subscriber is not None:
+                    user_html_content = html_content.replace(
+                        str(UNSUBSCRIBE_PLACEHOLDER_ID), str(subscriber.id)
+                    )
+                    unsubscribe_link = _get_unsubscribe_link(article, subscriber.id)
+                    email_headers["List-Unsubscribe"] = f"<{unsubscribe_link}>"
+
+                user_ids_by_email[user.email] = user.id
+                emails.append(
+                    Email(
+                        to_email_addr=user.email,
+                        subject=article.title,
+                        html_content=user_html_content,
+                        from_name=from_name,
+                        from_email_addr=from_email_addr,
+                        email_headers=email_headers,
+                    )
+                )
+
+    email_sender = get_email_sender("article")
+    try:
+        await email_sender.send_many(emails)
+    except EmailBatchSenderError as e:
+        if attempt >= SEND_MAX_RETRIES:
+            raise
+        # Only send again to the receivers whose batch failed
+        failed_user_ids = [
+            user_ids_by_email[email.to_email_addr] for email in e.failed_emails
+        ]
+        log.warning(
+            "articles.send_to_subscribers_chunk.retry",
+            article_id=article.id,
+            failed_count=len(failed_user_ids),
+            attempt=attempt,
+        )
+        enqueue_job(
+            "articles.send_to_subscribers_chunk",
+            article_id=article.id,
+            user_ids=failed_user_ids,
+            attempt=attempt + 1,
+            _defer_by=SEND_RETRY_DELAY * 2**attempt,
+        )
+
+    duration = time.perf_counter() - start
+    log.info(
+        "articles.send_to_subscribers_chunk.sent",
+        article_id=article.id,
+        chunk_size=len(user_ids),
+        emails_count=len(emails),
+        variants_count=len(variants),
+        duration=duration,
+        emails_per_second=len(emails) / duration if duration > 0 else None,
+    )
+
+
 @interval(second=0)
 async def articles_send_scheduled(
     ctx: JobContext,
@@ -18,6 +18,12 @@ from polar.models.subscription_tier import SubscriptionTier
 from polar.models.user import User
 from polar.postgres import AsyncSession, get_db_session
 from polar.repository.service import repository as repository_service
+from polar.user_organization.cache import (
+    MembershipCache,
+    Memberships,
+    authz_cache_lookups,
+    membership_cache,
+)
 from polar.user_organization.service import (
     user_organization as user_organization_service,
 )
@@ -67,24 +73,46 @@ class ScopedSubject:
 
 class Authz:
     session: AsyncSession
+    membership_cache: MembershipCache | None
 
     # request scoped caches
+    _cache_can: dict[tuple[UUID | None, AccessType, type[Object], UUID], bool]
     _cache_can_user_read_repository_id: dict[tuple[UUID, UUID], bool]
-    _cache_is_member: dict[tuple[UUID, UUID], bool]
-    _cache_is_member_and_admin: dict[tuple[UUID, UUID], bool]
+    _cache_memberships: dict[UUID, Memberships]
 
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self, session: AsyncSession, membership_cache: MembershipCache | None = None
+    ):
         self.session = session
+        self.membership_cache = membership_cache
+        self._cache_can = {}
         self._cache_can_user_read_repository_id = {}
-        self._cache_is_member = {}
-        self._cache_is_member_and_admin = {}
+        self._cache_memberships = {}
 
     @classmethod
     async def authz(cls, session: AsyncSession = Depends(get_db_session)) -> Self:
-        return cls(session=session)
+        return cls(session=session, membership_cache=membership_cache)
 
     async def can(
         self, subject: Subject, accessType: AccessType, object: Object
+    ) -> bool:
+        # Decisions are memoized for the lifetime of the Authz, i.e. the request
+        if object.id is None:
+            return await self._can(subject, accessType, object)
+
+        subject_id = subject.id if isinstance(subject, User) else None
+        key = (subject_id, accessType, type(object), object.id)
+        if key in self._cache_can:
+            authz_cache_lookups.labels(cache="request", result="hit").inc()
+            return self._cache_can[key]
+
+        authz_cache_lookups.labels(cache="request", result="miss").inc()
+        result = await self._can(subject, accessType, object)
+        self._cache_can[key] = result
+        return result
+
+    async def _can(
+        self, subject: Subject, accessType: AccessType, object: Object
     ) -> bool:
         # Anoymous users can only read
         if (isinstance(subject, Anonymous)) and accessType != AccessType.read:
@@ -304,38 +332,30 @@ class Authz:
         return False
 
     async def _is_member(self, user_id: UUID, organization_id: UUID) -> bool:
-        key = (user_id, organization_id)
-        if key in self._cache_is_member:
-            return self._cache_is_member[key]
-
-        memberships = await user_organization_service.list_by_user_id(
-            self.session, user_id
-        )
-
-        for m in memberships:
-            if m.organization_id == organization_id:
-                self._cache_is_member[key] = True
-                return True
-
-        self._cache_is_member[key] = False
-        return False
+        memberships = await self._get_memberships(user_id)
+        return organization_id in memberships
 
     async def _is_member_and_admin(self, user_id: UUID, organization_id: UUID) -> bool:
-        key = (user_id, organization_id)
-        if key in self._cache_is_member_and_admin:
-            return self._cache_is_member_and_admin[key]
-
-        memberships = await user_organization_service.list_by_user_id(
-            self.session, user_id
-        )
-
-        for m in memberships:
-            if m.organization_id == organization_id and m.is_admin:
-                self._cache_is_member_and_admin[key] = True
-                return True
-
-        self._cache_is_member_and_admin[key] = False
-        return False
+        memberships = await self._get_memberships(user_id)
+        return memberships.get(organization_id, False)
+
+    async def _get_memberships(self, user_id: UUID) -> Memberships:
+        if user_id in self._cache_memberships:
+            return self._cache_memberships[user_id]
+
+        memberships: Memberships | None = None
+        if self.membership_cache is not None:
+            memberships = await self.membership_cache.get(user_id)
+
+        if memberships is None:
+            memberships = await user_organization_service.get_memberships(
+                self.session, user_id
+            )
+            if self.membership_cache is not None:
+                await self.membership_cache.set(user_id, memberships)
+
+        self._cache_memberships[user_id] = memberships
+        return memberships
 
     #
     # Account
@@ -74,6 +74,12 @@ class Settings(BaseSettings):
     GITHUB_APP_NAMESPACE: str = ""
     GITHUB_APP_IDENTIFIER: str = ""
     GITHUB_APP_WEBHOOK_SECRET: str = ""
+    # Events about the same issue or pull request received within this window
+    # are handled once
+    GITHUB_WEBHOOK_COALESCE_WINDOW_SECONDS: float = 2.0
+    # Shared Redis cache of GitHub API responses, revalidated with ETags
+    GITHUB_HTTP_CACHE: bool = True
+    GITHUB_HTTP_CACHE_TTL_SECONDS: int = 60 * 60 * 24
     GITHUB_APP_PRIVATE_KEY: str = ""
     GITHUB_CLIENT_ID: str = ""
     GITHUB_CLIENT_SECRET: str = ""
@@ -92,6 +98,11 @@ class Settings(BaseSettings):
     # Stripe webhook secrets
     STRIPE_WEBHOOK_SECRET: str = ""
     STRIPE_CONNECT_WEBHOOK_SECRET: str = ""
+    # Stripe API client
+    STRIPE_API_BASE: str | None = None  # e.g. a local stripe-mock server
+    STRIPE_MAX_CONCURRENT_REQUESTS: int = 16
+    STRIPE_MAX_NETWORK_RETRIES: int = 2
+    STRIPE_TIMEOUT: int = 30
 
     # Open Collective
     OPEN_COLLECTIVE_PERSONAL_TOKEN: str | None = None
@@ -114,6 +125,13 @@ class Settings(BaseSettings):
     # Application behaviours
     API_PAGINATION_MAX_LIMIT: int = 100
 
+    # Maximum number of pending events per stream client, oldest ones are dropped
+    EVENTSTREAM_CLIENT_QUEUE_SIZE: int = 100
+
+    # Time to live of the shared cache of organization memberships used by Authz.
+    # Set to 0 to disable it.
+    AUTHZ_MEMBERSHIP_CACHE_TTL_SECONDS: int = 60
+
     AUTO_SUBSCRIBE_SUBSCRIPTION_TIER_ID: uuid.UUID | None = None
 
     GITHUB_BADGE_EMBED: bool = False
@@ -121,6 +139,9 @@ class Settings(BaseSettings):
 
     EMAIL_SENDER: EmailSender = EmailSender.logger
     RESEND_API_KEY: str = ""
+    RESEND_API_URL: str = "https://api.resend.com"
+    RESEND_MAX_CONCURRENCY: int = 4
+    RESEND_MAX_RETRIES: int = 3
 
     ACCOUNT_BALANCE_REVIEW_THRESHOLD: int = 10000
 
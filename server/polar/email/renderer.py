@@ -1,4 +1,5 @@
 import datetime
+import functools
 from collections.abc import Mapping
 from typing import Any
 
@@ -8,11 +9,17 @@ from jinja2 import (
     PackageLoader,
     PrefixLoader,
     StrictUndefined,
+    Template,
     select_autoescape,
 )
 
 EMAIL_TEMPLATES_FOLDER_NAME = "email_templates"
 
+# Maximum number of compiled templates from strings kept in memory per renderer.
+# Subjects and bodies are mostly static strings defined on notification payloads,
+# so this comfortably holds all of them.
+COMPILED_TEMPLATES_CACHE_SIZE = 256
+
 
 class EmailRenderer:
     def __init__(self, extras_templates_packages: Mapping[str, str] = {}) -> None:
@@ -45,12 +52,34 @@ class EmailRenderer:
             autoescape=select_autoescape(),
             undefined=StrictUndefined,
         )
+        self._from_string = functools.lru_cache(maxsize=COMPILED_TEMPLATES_CACHE_SIZE)(
+            self._compile_from_string
+        )
+        self._wrapped_body_from_string = functools.lru_cache(
+            maxsize=COMPILED_TEMPLATES_CACHE_SIZE
+        )(self._compile_wrapped_body_from_string)
 
     def render_from_string(
         self, subject: str, body: str, context: dict[str, Any]
     ) -> tuple[str, str]:
-        rendered_subject = self.env.from_string(subject).render(context).strip()
+        rendered_subject = self._from_string(subject).render(context).strip()
+
+        context = {**context, "current_year": datetime.datetime.now().year}
+
+        rendered_body = self._wrapped_body_from_string(body).render(context).strip()
+        return rendered_subject, rendered_body
+
+    def render_from_template(
+        self, subject: str, body_template: str, context: dict[str, Any]
+    ) -> tuple[str, str]:
+        rendered_subject = self._from_string(subject).render(context).strip()
+        rendered_body = self.env.get_template(body_template).render(context).strip()
+        return rendered_subject, rendered_body
+
+    def _compile_from_string(self, source: str) -> Template:
+        return self.env.from_string(source)
 
+    def _compile_wrapped_body_from_string(self, body: str) -> Template:
         wrapped_body = f"""
         {{% extends 'base.html' %}}
 
@@ -58,21 +87,21 @@ class EmailRenderer:
             {body}
         {{% endblock %}}
         """
+        return self.env.from_string(wrapped_body)
 
-        context["current_year"] = datetime.datetime.now().year
 
-        rendered_body = self.env.from_string(wrapped_body).render(context).strip()
-        return rendered_subject, rendered_body
-
-    def render_from_template(
-        self, subject: str, body_template: str, context: dict[str, Any]
-    ) -> tuple[str, str]:
-        rendered_subject = self.env.from_string(subject).render(context).strip()
-        rendered_body = self.env.get_template(body_template).render(context).strip()
-        return rendered_subject, rendered_body
+@functools.cache
+def _get_email_renderer(
+    extras_templates_packages: frozenset[tuple[str, str]],
+) -> EmailRenderer:
+    return EmailRenderer(dict(extras_templates_packages))
 
 
 def get_email_renderer(
     extras_templates_packages: Mapping[str, str] = {},
 ) -> EmailRenderer:
-    return EmailRenderer(extras_templates_packages)
+    """
+    Return a process-wide renderer for the given templates packages,
+    so its Jinja environment and compiled templates are reused across renders.
+    """
+    return _get_email_renderer(frozenset(extras_templates_packages.items()))
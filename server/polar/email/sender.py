@@ -1,18 +1,49 @@
+import asyncio
+import hashlib
+import json
+import uuid
 from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import Any
 
-import resend
+import httpx
 import structlog
 
 from polar.config import EmailSender as EmailSenderType
 from polar.config import settings
+from polar.exceptions import PolarError
 from polar.logging import Logger
 
 log: Logger = structlog.get_logger()
 
 
+class EmailSenderError(PolarError):
+    pass
+
+
+class EmailBatchSenderError(EmailSenderError):
+    def __init__(self, failed_emails: Sequence["Email"]) -> None:
+        self.failed_emails = failed_emails
+        message = f"{len(failed_emails)} emails failed to be sent."
+        super().__init__(message)
+
+
+@dataclass
+class Email:
+    to_email_addr: str
+    subject: str
+    html_content: str
+    from_name: str = "Polar"
+    from_email_addr: str = "notifications@polar.sh"
+    email_headers: dict[str, str] = field(default_factory=dict)
+    reply_to_name: str | None = None
+    reply_to_email_addr: str | None = None
+
+
 class EmailSender(ABC):
     @abstractmethod
-    def send_to_user(
+    async def send_to_user(
         self,
         *,
         to_email_addr: str,
@@ -26,9 +57,35 @@ class EmailSender(ABC):
     ) -> None:
         pass
 
+    async def send_many(self, emails: Sequence[Email]) -> None:
+        """
+        Send several emails.
+
+        Raises `EmailBatchSenderError` with the emails that failed,
+        after trying to send all of them.
+        """
+        failed_emails: list[Email] = []
+        for email in emails:
+            try:
+                await self.send_to_user(
+                    to_email_addr=email.to_email_addr,
+                    subject=email.subject,
+                    html_content=email.html_content,
+                    from_name=email.from_name,
+                    from_email_addr=email.from_email_addr,
+                    email_headers=email.email_headers,
+                    reply_to_name=email.reply_to_name,
+                    reply_to_email_addr=email.reply_to_email_addr,
+                )
+            except Exception:
+                log.exception("email.send_many.failed")
+                failed_emails.append(email)
+        if failed_emails:
+            raise EmailBatchSenderError(failed_emails)
+
 
 class LoggingEmailSender(EmailSender):
-    def send_to_user(
+    async def send_to_user(
         self,
         *,
         to_email_addr: str,
@@ -51,12 +108,34 @@ class LoggingEmailSender(EmailSender):
         )
 
 
+# Maximum number of emails accepted by Resend batch endpoint
+RESEND_BATCH_SIZE = 100
+
+
 class ResendEmailSender(EmailSender):
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = settings.RESEND_MAX_CONCURRENCY,
+        max_retries: int = settings.RESEND_MAX_RETRIES,
+        retry_backoff: float = 0.5,
+    ) -> None:
         super().__init__()
-        resend.api_key = settings.RESEND_API_KEY
+        # Single client per sender, so connections to Resend API are reused
+        self.client = httpx.AsyncClient(
+            base_url=settings.RESEND_API_URL,
+            headers={"Authorization": f"Bearer {settings.RESEND_API_KEY}"},
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+            timeout=30,
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
 
-    def send_to_user(
+    async def send_to_user(
         self,
         *,
         to_email_addr: str,
@@ -68,18 +147,21 @@ class ResendEmailSender(EmailSender):
         reply_to_name: str | None = None,
         reply_to_email_addr: str | None = None,
     ) -> None:
-        params = {
-            "from": f"{from_name} <{from_email_addr}>",
-            "to": [to_email_addr],
-            "subject": subject,
-            "html": html_content,
-            "headers": email_headers,
-        }
-
-        if reply_to_name and reply_to_email_addr:
-            params["reply_to"] = f"{reply_to_name} <{reply_to_email_addr}>"
+        params = self._get_params(
+            Email(
+                to_email_addr=to_email_addr,
+                subject=subject,
+                html_content=html_content,
+                from_name=from_name,
+                from_email_addr=from_email_addr,
+                email_headers=email_headers,
+                reply_to_name=reply_to_name,
+                reply_to_email_addr=reply_to_email_addr,
+            )
+        )
 
-        email = resend.Emails.send(params)
+        # Random key, reused by the retries of this call only
+        email = await self._request("/emails", params, str(uuid.uuid4()))
 
         log.info(
             "resend.send",
@@ -88,10 +170,88 @@ class ResendEmailSender(EmailSender):
             email_id=email["id"],
         )
 
+    async def send_many(self, emails: Sequence[Email]) -> None:
+        batches = [
+            emails[i : i + RESEND_BATCH_SIZE]
+            for i in range(0, len(emails), RESEND_BATCH_SIZE)
+        ]
+        results = await asyncio.gather(
+            *(self._send_batch(batch) for batch in batches), return_exceptions=True
+        )
+
+        failed_emails: list[Email] = []
+        for batch, result in zip(batches, results):
+            if isinstance(result, BaseException):
+                log.error("resend.send_many.failed", count=len(batch), error=result)
+                failed_emails.extend(batch)
+        if failed_emails:
+            raise EmailBatchSenderError(failed_emails)
+
+    async def _send_batch(self, emails: Sequence[Email]) -> None:
+        params = [self._get_params(email) for email in emails]
+        # Derived from the contents, so a batch sent again, by a retry here
+        # or by a retried job, is deduplicated by Resend.
+        idempotency_key = hashlib.sha256(
+            json.dumps(params, sort_keys=True).encode()
+        ).hexdigest()
+        sent = await self._request("/emails/batch", params, idempotency_key)
+        log.info(
+            "resend.send_many",
+            count=len(emails),
+            email_ids=[email["id"] for email in sent["data"]],
+        )
+
+    async def _request(self, path: str, json: Any, idempotency_key: str) -> Any:
+        async with self.semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self.client.post(
+                        path, json=json, headers={"Idempotency-Key": idempotency_key}
+                    )
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        raise EmailSenderError(str(e)) from e
+                else:
+                    if (
+                        response.status_code != 429
+                        and response.status_code < 500
+                        or attempt == self.max_retries
+                    ):
+                        try:
+                            response.raise_for_status()
+                        except httpx.HTTPStatusError as e:
+                            raise EmailSenderError(str(e)) from e
+                        return response.json()
+
+                backoff = self.retry_backoff * 2**attempt
+                log.warning("resend.retry", path=path, attempt=attempt, backoff=backoff)
+                await asyncio.sleep(backoff)
+
+    def _get_params(self, email: Email) -> dict[str, Any]:
+        params: dict[str, Any] = {
+            "from": f"{email.from_name} <{email.from_email_addr}>",
+            "to": [email.to_email_addr],
+            "subject": email.subject,
+            "html": email.html_content,
+            "headers": email.email_headers,
+        }
+
+        if email.reply_to_name and email.reply_to_email_addr:
+            params["reply_to"] = f"{email.reply_to_name} <{email.reply_to_email_addr}>"
+
+        return params
+
+
+_resend_email_sender: ResendEmailSender | None = None
+
 
 def get_email_sender(type: str = "notification") -> EmailSender:
     if settings.EMAIL_SENDER == EmailSenderType.resend:
-        return ResendEmailSender()
+        # Share the same sender, and thus the same connection pool, process-wide
+        global _resend_email_sender
+        if _resend_email_sender is None:
+            _resend_email_sender = ResendEmailSender()
+        return _resend_email_sender
 
     # Logging in development
     return LoggingEmailSender()
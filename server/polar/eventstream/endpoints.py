@@ -4,7 +4,6 @@ from typing import Any
 
 import structlog
 from fastapi import APIRouter, Depends, Request
-from redis.exceptions import ConnectionError
 from sse_starlette.sse import EventSourceResponse
 
 from polar.auth.dependencies import Auth, UserRequiredAuth
@@ -12,13 +11,13 @@ from polar.enums import Platforms
 from polar.exceptions import ResourceNotFound, Unauthorized
 from polar.organization.service import organization as organization_service
 from polar.postgres import AsyncSession, get_db_session
-from polar.redis import Redis, get_redis
 from polar.repository.service import repository as repository_service
 from polar.user_organization.service import (
     user_organization as user_organization_service,
 )
 
-from .service import Receivers
+from .multiplexer import EventStreamMultiplexer, get_multiplexer
+from .service import Receivers, get_user_channels
 
 router = APIRouter(tags=["stream"])
 
@@ -26,44 +25,34 @@ log = structlog.get_logger()
 
 
 async def subscribe(
-    redis: Redis,
+    multiplexer: EventStreamMultiplexer,
     channels: list[str],
     request: Request,
 ) -> AsyncGenerator[Any, Any]:
-    async with redis.pubsub() as pubsub:
-        await pubsub.subscribe(*channels)
-
+    async with multiplexer.subscribe(channels) as client:
         while True:
             if await request.is_disconnected():
-                await pubsub.close()
                 break
 
             try:
-                message = await pubsub.get_message(
-                    ignore_subscribe_messages=True,
-                    # Waits for up to 10s for a new message
-                    timeout=10.0,
-                )
-
-                if message is not None:
-                    log.info("redis.pubsub", message=message["data"])
-                    yield message["data"]
-            except asyncio.CancelledError as e:
-                await pubsub.close()
-                raise e
-            except ConnectionError as e:
-                await pubsub.close()
-                raise e
+                # Waits for up to 10s for a new message
+                message = await asyncio.wait_for(client.get(), timeout=10.0)
+            except TimeoutError:
+                continue
+
+            log.info("redis.pubsub", message=message)
+            yield message
 
 
 @router.get("/user/stream")
 async def user_stream(
     request: Request,
     auth: UserRequiredAuth,
-    redis: Redis = Depends(get_redis),
+    multiplexer: EventStreamMultiplexer = Depends(get_multiplexer),
+    session: AsyncSession = Depends(get_db_session),
 ) -> EventSourceResponse:
-    receivers = Receivers(user_id=auth.user.id)
-    return EventSourceResponse(subscribe(redis, receivers.get_channels(), request))
+    channels = await get_user_channels(session, auth.user.id)
+    return EventSourceResponse(subscribe(multiplexer, channels, request))
 
 
 @router.get("/{platform}/{org_name}/stream")
@@ -72,7 +61,7 @@ async def user_org_stream(
     org_name: str,
     request: Request,
     auth: Auth = Depends(Auth.current_user),
-    redis: Redis = Depends(get_redis),
+    multiplexer: EventStreamMultiplexer = Depends(get_multiplexer),
     session: AsyncSession = Depends(get_db_session),
 ) -> EventSourceResponse:
     if not auth.user:
@@ -90,8 +79,11 @@ async def user_org_stream(
     ):
         raise Unauthorized()
 
-    receivers = Receivers(user_id=auth.user.id, organization_id=org.id)
-    return EventSourceResponse(subscribe(redis, receivers.get_channels(), request))
+    receivers = Receivers(organization_id=org.id)
+    channels = await get_user_channels(session, auth.user.id)
+    return EventSourceResponse(
+        subscribe(multiplexer, [*channels, *receivers.get_channels()], request)
+    )
 
 
 @router.get("/{platform}/{org_name}/{repo_name}/stream")
@@ -101,7 +93,7 @@ async def user_org_repo_stream(
     repo_name: str,
     request: Request,
     auth: Auth = Depends(Auth.current_user),
-    redis: Redis = Depends(get_redis),
+    multiplexer: EventStreamMultiplexer = Depends(get_multiplexer),
     session: AsyncSession = Depends(get_db_session),
 ) -> EventSourceResponse:
     if not auth.user:
@@ -125,9 +117,8 @@ async def user_org_repo_stream(
     if not repo:
         raise ResourceNotFound()
 
-    receivers = Receivers(
-        user_id=auth.user.id,
-        organization_id=org.id,
-        repository_id=repo.id,
+    receivers = Receivers(organization_id=org.id, repository_id=repo.id)
+    channels = await get_user_channels(session, auth.user.id)
+    return EventSourceResponse(
+        subscribe(multiplexer, [*channels, *receivers.get_channels()], request)
     )
-    return EventSourceResponse(subscribe(redis, receivers.get_channels(), request))
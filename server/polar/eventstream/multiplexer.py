@@ -0,0 +1,220 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator, Iterable
+from contextlib import asynccontextmanager
+
+import structlog
+from prometheus_client import Counter, Gauge, Histogram
+from redis.asyncio.client import PubSub
+from redis.exceptions import ConnectionError
+
+from polar.config import settings
+from polar.logging import Logger
+from polar.redis import Redis, redis
+
+log: Logger = structlog.get_logger()
+
+connected_clients = Gauge(
+    "eventstream_connected_clients", "Number of clients connected to the event stream"
+)
+subscribed_channels = Gauge(
+    "eventstream_subscribed_channels", "Number of Redis channels subscribed to"
+)
+fanout_latency_seconds = Histogram(
+    "eventstream_fanout_latency_seconds",
+    "Time to dispatch a Redis message to the queues of its clients",
+)
+dropped_messages = Counter(
+    "eventstream_dropped_messages",
+    "Number of messages dropped because a client queue was full",
+)
+
+
+class EventStreamClient:
+    """
+    An event stream client, receiving the messages of its channels in a queue.
+
+    The queue is bounded: if the client doesn't keep up, oldest messages are dropped.
+    """
+
+    def __init__(self, channels: Iterable[str], max_size: int) -> None:
+        self.channels = frozenset(channels)
+        self._queue: asyncio.Queue[str] = asyncio.Queue(max_size)
+
+    def put(self, message: str) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+            dropped_messages.inc()
+        self._queue.put_nowait(message)
+
+    async def get(self) -> str:
+        return await self._queue.get()
+
+
+class EventStreamMultiplexer:
+    """
+    Share a single Redis pub/sub connection between all the event stream clients
+    of the process.
+
+    A background task reads the messages of all subscribed channels
+    and dispatches them to the clients subscribed to each channel.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        client_queue_size: int = settings.EVENTSTREAM_CLIENT_QUEUE_SIZE,
+        reconnect_delay: float = 1.0,
+    ) -> None:
+        self.redis = redis
+        self.client_queue_size = client_queue_size
+        self.reconnect_delay = reconnect_delay
+        self._clients: dict[str, set[EventStreamClient]] = {}
+        self._pubsub: PubSub | None = None
+        self._reader: asyncio.Task[None] | None = None
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def subscribe(
+        self, channels: Iterable[str]
+    ) -> AsyncIterator[EventStreamClient]:
+        client = EventStreamClient(channels, self.client_queue_size)
+        await self._add_client(client)
+        try:
+            yield client
+        finally:
+            await self._remove_client(client)
+
+    async def close(self) -> None:
+        async with self._lock:
+            if self._reader is not None:
+                self._reader.cancel()
+                try:
+                    await self._reader
+                except asyncio.CancelledError:
+                    pass
+                self._reader = None
+            if self._pubsub is not None:
+                await self._pubsub.close()
+                self._pubsub = None
+            self._clients = {}
+            connected_clients.set(0)
+            subscribed_channels.set(0)
+
+    async def _add_client(self, client: EventStreamClient) -> None:
+        async with self._lock:
+            new_channels: list[str] = []
+            for channel in client.channels:
+                clients = self._clients.setdefault(channel, set())
+                if len(clients) == 0:
+                    new_channels.append(channel)
+                clients.add(client)
+
+            if self._pubsub is None:
+                self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            if new_channels:
+                await self._pubsub.subscribe(*new_channels)
+            # Started after the first subscription, which opens the connection
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+
+            connected_clients.inc()
+            subscribed_channels.set(len(self._clients))
+
+    async def _remove_client(self, client: EventStreamClient) -> None:
+        async with self._lock:
+            old_channels: list[str] = []
+            for channel in client.channels:
+                clients = self._clients.get(channel)
+                if clients is None:
+                    continue
+                clients.discard(client)
+                if len(clients) == 0:
+                    del self._clients[channel]
+                    old_channels.append(channel)
+
+            if old_channels and self._pubsub is not None:
+                try:
+                    await self._pubsub.unsubscribe(*old_channels)
+                except ConnectionError:
+                    # Channels won't be subscribed again after reconnection anyway
+                    pass
+
+            connected_clients.dec()
+            subscribed_channels.set(len(self._clients))
+
+    async def _read(self) -> None:
+        while True:
+            assert self._pubsub is not None
+            try:
+                # Blocks until a message arrives; the stubs miss the None timeout
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=None,  # type: ignore[arg-type]
+                )
+            except ConnectionError as e:
+                log.warning("eventstream.multiplexer.connection_error", error=str(e))
+                if not await self._reconnect():
+                    # No more clients, the next one will start a new reader
+                    return
+                continue
+
+            if message is None or message["type"] != "message":
+                continue
+
+            self._dispatch(message["channel"], message["data"])
+
+    def _dispatch(self, channel: str, data: str) -> None:
+        start = time.perf_counter()
+        clients = self._clients.get(channel, ())
+        for client in clients:
+            client.put(data)
+        fanout_latency_seconds.observe(time.perf_counter() - start)
+        log.debug(
+            "eventstream.multiplexer.dispatch", channel=channel, clients=len(clients)
+        )
+
+    async def _reconnect(self) -> bool:
+        """
+        Open a new connection and subscribe again to the channels,
+        retrying until it succeeds.
+
+        Returns False if there is no client left.
+        """
+        while True:
+            await asyncio.sleep(self.reconnect_delay)
+            async with self._lock:
+                if self._pubsub is not None:
+                    try:
+                        await self._pubsub.close()
+                    except ConnectionError:
+                        pass
+                self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                if not self._clients:
+                    return False
+                try:
+                    await self._pubsub.subscribe(*self._clients.keys())
+                    return True
+                except ConnectionError as e:
+                    log.warning(
+                        "eventstream.multiplexer.connection_error", error=str(e)
+                    )
+
+
+_multiplexer: EventStreamMultiplexer | None = None
+
+
+def get_multiplexer() -> EventStreamMultiplexer:
+    # Share the same multiplexer, and thus the same connection, process-wide
+    global _multiplexer
+    if _multiplexer is None:
+        _multiplexer = EventStreamMultiplexer(redis)
+    return _multiplexer
+
+
+async def close_multiplexer() -> None:
+    global _multiplexer
+    if _multiplexer is not None:
+        await _multiplexer.close()
+        _multiplexer = None
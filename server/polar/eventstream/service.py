@@ -1,3 +1,4 @@
+from collections.abc import Iterable
 from typing import Any
 from uuid import UUID
 
@@ -39,10 +40,22 @@ class Event(BaseModel):
     payload: dict[str, Any]
 
 
-async def send(event: Event, channels: list[str]) -> None:
-    event_json = event.model_dump_json()
-    for channel in channels:
-        await redis.publish(channel, event_json)
+async def send(event: Event, channels: Iterable[str]) -> None:
+    await send_many([(event, channels)])
+
+
+async def send_many(events: Iterable[tuple[Event, Iterable[str]]]) -> None:
+    """
+    Publish events to their channels in a single round trip.
+
+    Each event is serialized once, whatever the number of its channels.
+    """
+    async with redis.pipeline(transaction=False) as pipe:
+        for event, channels in events:
+            event_json = event.model_dump_json()
+            for channel in channels:
+                pipe.publish(channel, event_json)
+        await pipe.execute()
 
 
 async def publish(
@@ -69,17 +82,55 @@ async def publish_members(
     key: str,
     payload: dict[str, Any],
     organization_id: UUID,
+    *,
+    members_channel: bool = False,
 ) -> None:
+    """
+    Publish an event to all the members of an organization.
+
+    By default, the event is published on the user channel of every member.
+    With `members_channel=True`, it's published once on the members channel of the
+    organization instead. User streams resolve the members channels they listen to
+    when they connect, so members removed since then still receive the event and
+    members added since then miss it until they reconnect: only opt in for events
+    where that is acceptable.
+    """
+    event = Event(
+        id=generate_uuid(),
+        key=key,
+        payload=payload,
+    )
+
+    if members_channel:
+        await send(event, [get_members_channel(organization_id)])
+        return
+
     members = await user_organization_service.list_by_org(
         session, org_id=organization_id
     )
+    channels = [
+        channel
+        for m in members
+        for channel in Receivers(user_id=m.user_id).get_channels()
+    ]
+    await send(event, channels)
+
 
-    for m in members:
-        receivers = Receivers(user_id=m.user_id)
-        channels = receivers.get_channels()
-        event = Event(
-            id=generate_uuid(),
-            key=key,
-            payload=payload,
-        )
-        await send(event, channels)
+def get_members_channel(organization_id: UUID) -> str:
+    return f"org_members:{organization_id}"
+
+
+async def get_user_channels(session: AsyncSession, user_id: UUID) -> list[str]:
+    """
+    Get the channels a user stream listens to: the user channel and the members
+    channel of each organization the user belongs to.
+
+    Memberships are resolved when the stream connects.
+    """
+    user_organizations = await user_organization_service.list_by_user_id(
+        session, user_id
+    )
+    return [
+        *Receivers(user_id=user_id).get_channels(),
+        *(get_members_channel(uo.organization_id) for uo in user_organizations),
+    ]
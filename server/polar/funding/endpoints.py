@@ -4,7 +4,12 @@ from fastapi import APIRouter, Depends, Query
 
 from polar.auth.dependencies import Auth
 from polar.exceptions import ResourceNotFound
-from polar.kit.pagination import ListResource, PaginationParamsQuery
+from polar.kit.pagination import (
+    CursorListResource,
+    CursorPaginationParamsQuery,
+    ListResource,
+    PaginationParamsQuery,
+)
 from polar.models import Repository
 from polar.organization.dependencies import OrganizationNamePlatform
 from polar.organization.service import organization as organization_service
@@ -67,6 +72,56 @@ async def search(
     )
 
 
+@router.get(
+    "/search/cursor",
+    response_model=CursorListResource[IssueFunding],
+    tags=[Tags.PUBLIC],
+)
+async def search_cursor(
+    pagination: CursorPaginationParamsQuery,
+    organization_name_platform: OrganizationNamePlatform,
+    repository_name: OptionalRepositoryNameQuery = None,
+    query: str | None = Query(None),
+    badged: bool | None = Query(None),
+    closed: bool | None = Query(None),
+    sorting: ListFundingSorting = [ListFundingSortBy.newest],
+    session: AsyncSession = Depends(get_db_session),
+    auth: Auth = Depends(Auth.optional_user),
+) -> CursorListResource[IssueFunding]:
+    organization_name, platform = organization_name_platform
+    organization = await organization_service.get_by_name(
+        session, platform, organization_name
+    )
+    if organization is None:
+        raise ResourceNotFound("Organization not found")
+
+    repository: Repository | None = None
+    if repository_name is not None:
+        repository = await repository_service.get_by_org_and_name(
+            session, organization.id, repository_name
+        )
+        if repository is None:
+            raise ResourceNotFound("Repository not found")
+
+    results, next_cursor, total_count = await funding_service.list_by_cursor(
+        session,
+        auth.subject,
+        query=query,
+        organization=organization,
+        repository=repository,
+        badged=badged,
+        closed=closed,
+        sorting=sorting,
+        pagination=pagination,
+    )
+
+    return CursorListResource.from_paginated_results(
+        [IssueFunding.from_list_by_result(result) for result in results],
+        next_cursor,
+        total_count,
+    )
+
+
 @router.get(
     "/lookup",
     name="lookup",
@@ -3,22 +3,18 @@ from enum import StrEnum
 from typing import Any, TypeVar, cast
 from uuid import UUID
 
-from sqlalchemy import (
-    Select,
-    UnaryExpression,
-    and_,
-    desc,
-    func,
-    nulls_last,
-    or_,
-    select,
-)
+from sqlalchemy import Select, and_, func, or_, select
 from sqlalchemy.orm import contains_eager
 
 from polar.authz.service import Anonymous, Subject
 from polar.funding.schemas import FundingResultType
 from polar.issue.search import search_query
-from polar.kit.pagination import PaginationParams
+from polar.kit.pagination import (
+    CursorPaginationParams,
+    PaginationParams,
+    SortKey,
+    paginate_cursor,
+)
 from polar.models import Issue, Organization, Pledge, Repository, UserOrganization
 from polar.models.pledge import PledgeState, PledgeType
 from polar.postgres import AsyncSession
@@ -52,63 +48,30 @@ class FundingService:
     ) -> tuple[Sequence[FundingResultType], int]:
         # Construct a inner statement that returns a list of Issue.id's
         # We're applying pagination and sorting to this inner statement
-        inner_statement = self._get_readable_issue_ids_statement(auth_subject)
-        count_statement = self._get_readable_issues_statement(
-            auth_subject
-        ).with_only_columns(func.count(Issue.id))
-
-        order_by_clauses: list[UnaryExpression[Any]] = []
-
-        if query is not None:
-            search = search_query(query)
-
-            inner_statement = inner_statement.where(
-                Issue.title_tsv.bool_op("@@")(func.to_tsquery(search))
-            )
-            count_statement = count_statement.where(
-                Issue.title_tsv.bool_op("@@")(func.to_tsquery(search))
-            )
-
-            # No matter the sorting option, always add a relevance sort first
-            order_by_clauses.append(
-                desc(func.ts_rank_cd(Issue.title_tsv, func.to_tsquery(search)))
-            )
-
-        if organization is not None:
-            inner_statement = inner_statement.where(Organization.id == organization.id)
-            count_statement = count_statement.where(Organization.id == organization.id)
-
-        if repository is not None:
-            inner_statement = inner_statement.where(Repository.id == repository.id)
-            count_statement = count_statement.where(Repository.id == repository.id)
-
-        if issue_ids is not None:
-            inner_statement = inner_statement.where(Issue.id.in_(issue_ids))
-            count_statement = count_statement.where(Issue.id.in_(issue_ids))
-
-        if badged is not None:
-            inner_statement = inner_statement.where(
-                Issue.pledge_badge_currently_embedded == badged
-            )
-            count_statement = count_statement.where(
-                Issue.pledge_badge_currently_embedded == badged
-            )
-
-        if closed is not None:
-            inner_statement = inner_statement.where(Issue.closed == closed)
-            count_statement = count_statement.where(Issue.closed == closed)
+        inner_statement = self._apply_list_filters(
+            self._get_readable_issue_ids_statement(auth_subject),
+            query=query,
+            organization=organization,
+            repository=repository,
+            badged=badged,
+            closed=closed,
+            issue_ids=issue_ids,
+        )
+        count_statement = self._apply_list_filters(
+            self._get_readable_issues_statement(auth_subject).with_only_columns(
+                func.count(Issue.id)
+            ),
+            query=query,
+            organization=organization,
+            repository=repository,
+            badged=badged,
+            closed=closed,
+            issue_ids=issue_ids,
+        )
 
-        for criterion in sorting:
-            if criterion == ListFundingSortBy.oldest:
-                order_by_clauses.append(Issue.created_at.asc())
-            elif criterion == ListFundingSortBy.newest:
-                order_by_clauses.append(Issue.created_at.desc())
-            elif criterion == ListFundingSortBy.most_funded:
-                order_by_clauses.append(nulls_last(desc(Issue.pledged_amount_sum)))
-            elif criterion == ListFundingSortBy.most_recently_funded:
-                order_by_clauses.append(nulls_last(desc(Issue.last_pledged_at)))
-            elif criterion == ListFundingSortBy.most_engagement:
-                order_by_clauses.append(Issue.total_engagement_count.desc())
+        order_by_clauses = [
+            key.order_by_clause for key in self._get_list_sort_keys(query, sorting)
+        ]
         inner_statement = inner_statement.order_by(*order_by_clauses)
 
         # paginate on inner query (issue listing)
@@ -139,6 +102,54 @@ class FundingService:
 
         return results, count
 
+    async def list_by_cursor(
+        self,
+        session: AsyncSession,
+        auth_subject: Subject,
+        *,
+        query: str | None = None,
+        organization: Organization | None = None,
+        repository: Repository | None = None,
+        badged: bool | None = None,
+        closed: bool | None = None,
+        sorting: list[ListFundingSortBy] = [ListFundingSortBy.oldest],
+        issue_ids: list[UUID] | None = None,
+        pagination: CursorPaginationParams,
+    ) -> tuple[Sequence[FundingResultType], str | None, int | None]:
+        inner_statement = self._apply_list_filters(
+            self._get_readable_issue_ids_statement(auth_subject),
+            query=query,
+            organization=organization,
+            repository=repository,
+            badged=badged,
+            closed=closed,
+            issue_ids=issue_ids,
+        )
+
+        sort_keys = self._get_list_sort_keys(query, sorting)
+        # Tie-breaker, so the order is deterministic
+        sort_keys.append(SortKey(Issue.id))
+
+        # paginate on inner query (issue listing)
+        page_issue_ids, next_cursor, total_count = await paginate_cursor(
+            session, inner_statement, pagination=pagination, sort_keys=sort_keys
+        )
+        if len(page_issue_ids) == 0:
+            return [], next_cursor, total_count
+
+        # Given a list of issues, join in the pledges
+        outer_statement = self._apply_pledges_summary_statement(
+            self._get_readable_issues_statement(auth_subject).where(
+                Issue.id.in_(page_issue_ids)
+            )
+        ).order_by(*(key.order_by_clause for key in sort_keys))
+
+        result = await session.execute(outer_statement)
+
+        results: list[Any] = [row._tuple() for row in result.unique().all()]
+
+        return results, next_cursor, total_count
+
     async def get_by_issue_id(
         self, session: AsyncSession, auth_subject: Subject, *, issue_id: UUID
     ) -> FundingResultType | None:
@@ -153,6 +164,69 @@ class FundingService:
             return row._tuple() if row is not None else None
         return row
 
+    def _apply_list_filters(
+        self,
+        statement: Select[T],
+        *,
+        query: str | None,
+        organization: Organization | None,
+        repository: Repository | None,
+        badged: bool | None,
+        closed: bool | None,
+        issue_ids: list[UUID] | None,
+    ) -> Select[T]:
+        if query is not None:
+            statement = statement.where(
+                Issue.title_tsv.bool_op("@@")(func.to_tsquery(search_query(query)))
+            )
+
+        if organization is not None:
+            statement = statement.where(Organization.id == organization.id)
+
+        if repository is not None:
+            statement = statement.where(Repository.id == repository.id)
+
+        if issue_ids is not None:
+            statement = statement.where(Issue.id.in_(issue_ids))
+
+        if badged is not None:
+            statement = statement.where(Issue.pledge_badge_currently_embedded == badged)
+
+        if closed is not None:
+            statement = statement.where(Issue.closed == closed)
+
+        return statement
+
+    def _get_list_sort_keys(
+        self, query: str | None, sorting: list[ListFundingSortBy]
+    ) -> list[SortKey]:
+        sort_keys: list[SortKey] = []
+
+        if query is not None:
+            # No matter the sorting option, always add a relevance sort first
+            sort_keys.append(
+                SortKey(
+                    func.ts_rank_cd(
+                        Issue.title_tsv, func.to_tsquery(search_query(query))
+                    ),
+                    True,
+                )
+            )
+
+        for criterion in sorting:
+            if criterion == ListFundingSortBy.oldest:
+                sort_keys.append(SortKey(Issue.created_at))
+            elif criterion == ListFundingSortBy.newest:
+                sort_keys.append(SortKey(Issue.created_at, True))
+            elif criterion == ListFundingSortBy.most_funded:
+                sort_keys.append(SortKey(Issue.pledged_amount_sum, True, True))
+            elif criterion == ListFundingSortBy.most_recently_funded:
+                sort_keys.append(SortKey(Issue.last_pledged_at, True, True))
+            elif criterion == ListFundingSortBy.most_engagement:
+                sort_keys.append(SortKey(Issue.total_engagement_count, True))
+
+        return sort_keys
+
     def _get_readable_issue_ids_statement(
         self, auth_subject: Subject
     ) -> Select[tuple[int]]:
@@ -1,19 +1,30 @@
+import uuid
+from collections import defaultdict
+from typing import Any
+
 import structlog
-from sqlalchemy import or_, select
-from sqlalchemy.orm import joinedload
+from sqlalchemy import Row, delete, insert, or_, select
 
+from polar.account.service import account as account_service
 from polar.exceptions import PolarError
 from polar.kit.services import ResourceServiceReader
+from polar.kit.utils import generate_uuid
 from polar.logging import Logger
 from polar.models import (
     Account,
     HeldBalance,
+    Pledge,
     Transaction,
 )
 from polar.models.organization import Organization
+from polar.models.transaction import PlatformFeeType, TransactionType
 from polar.postgres import AsyncSession
-from polar.transaction.service.balance import (
-    balance_transaction as balance_transaction_service,
+from polar.transaction.fees.stripe import (
+    get_stripe_invoice_fee,
+    get_stripe_subscription_fee,
+)
+from polar.transaction.service.account_balance import (
+    account_balance as account_balance_service,
 )
 from polar.transaction.service.platform_fee import (
     platform_fee_transaction as platform_fee_transaction_service,
@@ -22,10 +33,23 @@ from polar.transaction.service.platform_fee import (
 log: Logger = structlog.get_logger()
 
 
+# Number of held balances released per batch of INSERT statements
+RELEASE_CHUNK_SIZE = 1000
+
+
 class HeldBalanceError(PolarError):
     ...
 
 
+class DanglingHeldBalance(HeldBalanceError):
+    def __init__(self, held_balance_id: uuid.UUID) -> None:
+        self.held_balance_id = held_balance_id
+        message = (
+            f"Held balance {held_balance_id} not linked to a pledge or subscription."
+        )
+        super().__init__(message)
+
+
 class HeldBalanceService(ResourceServiceReader[HeldBalance]):
     async def create(
         self, session: AsyncSession, *, held_balance: HeldBalance
@@ -35,16 +59,35 @@ class HeldBalanceService(ResourceServiceReader[HeldBalance]):
 
         return held_balance
 
-    async def release_account(
-        self, session: AsyncSession, account: Account
-    ) -> list[tuple[Transaction, Transaction]]:
+    async def release_account(self, session: AsyncSession, account: Account) -> int:
+        """
+        Create the balance transactions, and the reversal of their fees,
+        of the held balances of an account, and delete them.
+
+        The transactions are built in memory and inserted in bulk, so releasing
+        thousands of held balances doesn't issue thousands of queries.
+
+        Held balances are deleted before their transactions are created:
+        those already deleted by a concurrent release are skipped.
+
+        Returns the number of released held balances.
+        """
         statement = (
-            select(HeldBalance)
+            select(
+                HeldBalance.id,
+                HeldBalance.amount,
+                HeldBalance.payment_transaction_id,
+                HeldBalance.pledge_id,
+                HeldBalance.subscription_id,
+                HeldBalance.issue_reward_id,
+                Pledge.invoice_id,
+            )
             .join(
                 Organization,
                 onclause=HeldBalance.organization_id == Organization.id,
                 isouter=True,
             )
+            .join(Pledge, onclause=HeldBalance.pledge_id == Pledge.id, isouter=True)
             .where(
                 or_(
                     HeldBalance.account_id == account.id,
@@ -52,38 +95,224 @@ class HeldBalanceService(ResourceServiceReader[HeldBalance]):
                 ),
                 HeldBalance.deleted_at.is_(None),
             )
-            .options(
-                joinedload(HeldBalance.payment_transaction),
-                joinedload(HeldBalance.pledge),
-                joinedload(HeldBalance.subscription),
-                joinedload(HeldBalance.issue_reward),
-            )
         )
-        held_balances = await session.stream_scalars(statement)
-
-        balance_transactions_list: list[tuple[Transaction, Transaction]] = []
-        async for held_balance in held_balances:
-            balance_transactions = await balance_transaction_service.create_balance(
-                session,
-                source_account=None,
-                destination_account=account,
-                payment_transaction=held_balance.payment_transaction,
-                amount=held_balance.amount,
-                pledge=held_balance.pledge,
-                subscription=held_balance.subscription,
-                issue_reward=held_balance.issue_reward,
+        result = await session.execute(statement)
+        held_balances = result.all()
+        if not held_balances:
+            return 0
+
+        # Fees incurred by the payments, loaded at once
+        payment_fees: defaultdict[uuid.UUID, list[int]] = defaultdict(list)
+        if account.processor_fees_applicable:
+            fees_statement = select(
+                Transaction.incurred_by_transaction_id, Transaction.amount
+            ).where(
+                Transaction.incurred_by_transaction_id.in_(
+                    statement.with_only_columns(
+                        HeldBalance.payment_transaction_id
+                    ).scalar_subquery()
+                )
+            )
+            fees_result = await session.execute(fees_statement)
+            for payment_transaction_id, fee_amount in fees_result.tuples().all():
+                payment_fees[payment_transaction_id].append(fee_amount)
+
+        released = 0
+        for i in range(0, len(held_balances), RELEASE_CHUNK_SIZE):
+            chunk = held_balances[i : i + RELEASE_CHUNK_SIZE]
+
+            # Delete first and only release the rows this session did delete:
+            # a concurrent release of the same account blocks on the deleted rows
+            # until we commit, then skips them, so they're never credited twice.
+            deleted_result = await session.execute(
+                delete(HeldBalance)
+                .where(
+                    HeldBalance.id.in_([held_balance.id for held_balance in chunk]),
+                    HeldBalance.deleted_at.is_(None),
+                )
+                .returning(HeldBalance.id)
             )
-            balance_transactions_list.append(balance_transactions)
+            deleted_ids = set(deleted_result.scalars().all())
+            chunk = [
+                held_balance for held_balance in chunk if held_balance.id in deleted_ids
+            ]
+            if not chunk:
+                continue
+            released += len(chunk)
 
-            await platform_fee_transaction_service.create_fees_reversal_balances(
-                session, balance_transactions=balance_transactions
+            balances: list[dict[str, Any]] = []
+            reversals: list[dict[str, Any]] = []
+            for held_balance in chunk:
+                outgoing, incoming = _build_balance(
+                    account,
+                    amount=held_balance.amount,
+                    payment_transaction_id=held_balance.payment_transaction_id,
+                    pledge_id=held_balance.pledge_id,
+                    subscription_id=held_balance.subscription_id,
+                    issue_reward_id=held_balance.issue_reward_id,
+                )
+                balances += [outgoing, incoming]
+
+                for platform_fee_type, fee_amount in self._get_fees(
+                    account,
+                    held_balance=held_balance,
+                    payment_fees=payment_fees[held_balance.payment_transaction_id],
+                ):
+                    reversals += _build_reversal_balance(
+                        account,
+                        outgoing=outgoing,
+                        incoming=incoming,
+                        amount=fee_amount,
+                        platform_fee_type=platform_fee_type,
+                    )
+
+            # Reversals reference the balances: insert them after
+            await session.execute(insert(Transaction), balances)
+            if reversals:
+                await session.execute(insert(Transaction), reversals)
+            await account_balance_service.apply_transactions(
+                session, [*balances, *reversals]
             )
 
-            await session.delete(held_balance)
+        log.info(
+            "held_balance.release_account",
+            account_id=str(account.id),
+            released=released,
+        )
 
         await session.commit()
 
-        return balance_transactions_list
+        if released:
+            await account_service.check_review_threshold(session, account)
+
+        return released
+
+    def _get_fees(
+        self,
+        account: Account,
+        *,
+        held_balance: Row[tuple[Any, ...]],
+        payment_fees: list[int],
+    ) -> list[tuple[PlatformFeeType, int]]:
+        """
+        Same fees as `PlatformFeeTransactionService.create_fees_reversal_balances`,
+        computed from the data loaded upfront.
+        """
+        fees: list[tuple[PlatformFeeType, int]] = []
+
+        platform_fee_amount = platform_fee_transaction_service.get_platform_fee_amount(
+            account,
+            amount=held_balance.amount,
+            pledge_id=held_balance.pledge_id,
+            issue_reward_id=held_balance.issue_reward_id,
+            subscription_id=held_balance.subscription_id,
+        )
+        if platform_fee_amount is None:
+            raise DanglingHeldBalance(held_balance.id)
+        fees.append((PlatformFeeType.platform, platform_fee_amount))
+
+        if not account.processor_fees_applicable:
+            return fees
+
+        for fee_amount in payment_fees:
+            fees.append((PlatformFeeType.payment, -fee_amount))
+        if held_balance.invoice_id is not None:
+            fees.append(
+                (PlatformFeeType.invoice, get_stripe_invoice_fee(held_balance.amount))
+            )
+        if held_balance.subscription_id is not None:
+            fees.append(
+                (
+                    PlatformFeeType.subscription,
+                    get_stripe_subscription_fee(held_balance.amount),
+                )
+            )
+
+        return fees
+
+
+def _build_balance(
+    account: Account,
+    *,
+    amount: int,
+    payment_transaction_id: uuid.UUID,
+    pledge_id: uuid.UUID | None,
+    subscription_id: uuid.UUID | None,
+    issue_reward_id: uuid.UUID | None,
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Same rows as `BalanceTransactionService.create_balance`, from Polar."""
+    currency = "usd"  # FIXME: Main Polar currency
+    common = {
+        "type": TransactionType.balance,
+        "currency": currency,
+        "account_currency": currency,
+        "tax_amount": 0,
+        "balance_correlation_key": str(uuid.uuid4()),
+        "pledge_id": pledge_id,
+        "issue_reward_id": issue_reward_id,
+        "subscription_id": subscription_id,
+        "payment_transaction_id": payment_transaction_id,
+    }
+    outgoing = {
+        **common,
+        "id": generate_uuid(),
+        "account_id": None,  # Polar account
+        "amount": -amount,  # Subtract the amount
+        "account_amount": -amount,
+    }
+    incoming = {
+        **common,
+        "id": generate_uuid(),
+        "account_id": account.id,
+        "amount": amount,  # Add the amount
+        "account_amount": amount,
+    }
+    return outgoing, incoming
+
+
+def _build_reversal_balance(
+    account: Account,
+    *,
+    outgoing: dict[str, Any],
+    incoming: dict[str, Any],
+    amount: int,
+    platform_fee_type: PlatformFeeType,
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """
+    Same rows as `BalanceTransactionService.create_reversal_balance`,
+    for a fee incurred by the given balance.
+    """
+    currency = "usd"  # FIXME: Main Polar currency
+    common = {
+        "type": TransactionType.balance,
+        "currency": currency,
+        "account_currency": currency,
+        "tax_amount": 0,
+        "balance_correlation_key": str(uuid.uuid4()),
+        "platform_fee_type": platform_fee_type,
+        "pledge_id": outgoing["pledge_id"],
+        "issue_reward_id": outgoing["issue_reward_id"],
+        "subscription_id": outgoing["subscription_id"],
+    }
+    outgoing_reversal = {
+        **common,
+        "id": generate_uuid(),
+        "account_id": account.id,  # User account
+        "amount": -amount,  # Subtract the amount
+        "account_amount": -amount,
+        "balance_reversal_transaction_id": incoming["id"],
+        "incurred_by_transaction_id": incoming["id"],
+    }
+    incoming_reversal = {
+        **common,
+        "id": generate_uuid(),
+        "account_id": None,  # Polar account
+        "amount": amount,  # Add the amount
+        "account_amount": amount,
+        "balance_reversal_transaction_id": outgoing["id"],
+        "incurred_by_transaction_id": outgoing["id"],
+    }
+    return outgoing_reversal, incoming_reversal
 
 
 held_balance = HeldBalanceService(HeldBalance)
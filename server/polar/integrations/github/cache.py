@@ -1,9 +1,23 @@
 import datetime
+from collections.abc import Callable
+from contextvars import ContextVar
+from hashlib import blake2b
+from typing import Any
 
+import hishel
+import httpcore
+import httpx
+import structlog
 from githubkit.cache.base import BaseCache
+from prometheus_client import Counter
+from redis.exceptions import RedisError
 
+from polar.config import settings
+from polar.logging import Logger
 from polar.redis import redis
 
+log: Logger = structlog.get_logger()
+
 
 class RedisCache(BaseCache):
     """Redis Backed Cache"""
@@ -22,3 +36,101 @@ class RedisCache(BaseCache):
 
     async def aset(self, key: str, value: str, ex: datetime.timedelta) -> None:
         await redis.setex("githubkit:" + key, time=ex, value=value)
+
+
+http_cache_requests = Counter(
+    "github_http_cache_requests",
+    "Number of GitHub API GET requests, by how the HTTP cache served them",
+    ["result"],  # hit, revalidated or miss
+)
+
+
+# Status of the last response received from the network in the current context,
+# None when the HTTP cache served it without any request
+network_response_status: ContextVar[int | None] = ContextVar(
+    "github_network_response_status", default=None
+)
+
+
+class NetworkTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.transport.handle_async_request(request)
+        # Skip the installation token requests made by the auth flow
+        if request.method == "GET":
+            network_response_status.set(response.status_code)
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+# Response stored by hishel, with its request and metadata.
+# Typed here since hishel only exposes these types in private modules.
+StoredResponse = tuple[httpcore.Response, httpcore.Request, Any]
+
+
+class RedisHTTPCacheStorage(hishel.AsyncRedisStorage):
+    """
+    Redis storage of GitHub API responses, shared by all processes.
+
+    Redis errors are treated as cache misses.
+    """
+
+    async def store(
+        self,
+        key: str,
+        response: httpcore.Response,
+        request: httpcore.Request,
+        metadata: Any,
+    ) -> None:
+        try:
+            await super().store(key, response, request, metadata)
+        except RedisError as e:
+            log.warning("github.http_cache.store_failed", error=str(e))
+
+    async def retrieve(self, key: str) -> StoredResponse | None:
+        try:
+            return await super().retrieve(key)
+        except RedisError as e:
+            log.warning("github.http_cache.retrieve_failed", error=str(e))
+            return None
+
+    async def aclose(self) -> None:
+        # The Redis client is shared
+        pass
+
+
+def get_http_cache_key_generator(
+    namespace: str,
+) -> Callable[[httpcore.Request], str]:
+    """
+    Key responses by namespace, e.g. the installation, so responses are only
+    served to clients having the same access; and by Accept header,
+    since GitHub varies the representation on it.
+    """
+
+    def _key_generator(request: httpcore.Request) -> str:
+        key = blake2b(digest_size=16)
+        key.update(request.method)
+        key.update(bytes(request.url))
+        for name, value in request.headers:
+            if name.lower() == b"accept":
+                key.update(value)
+        return f"githubkit:http:{namespace}:{key.hexdigest()}"
+
+    return _key_generator
+
+
+def get_http_cache_transport(namespace: str) -> httpx.AsyncBaseTransport:
+    return hishel.AsyncCacheTransport(
+        NetworkTransport(httpx.AsyncHTTPTransport()),
+        storage=RedisHTTPCacheStorage(
+            client=redis, ttl=settings.GITHUB_HTTP_CACHE_TTL_SECONDS
+        ),
+        controller=hishel.Controller(
+            key_generator=get_http_cache_key_generator(namespace)
+        ),
+    )
@@ -1,6 +1,11 @@
+import asyncio
 import time
+from collections import OrderedDict
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
 from typing import Any
 
+import httpx
 import structlog
 from githubkit import (
     AppAuthStrategy,
@@ -16,7 +21,13 @@ from githubkit.utils import UNSET, Unset
 from pydantic import BaseModel, Field
 
 from polar.config import settings
-from polar.integrations.github.cache import RedisCache
+from polar.integrations.github.cache import (
+    RedisCache,
+    get_http_cache_transport,
+    http_cache_requests,
+    network_response_status,
+)
+from polar.integrations.github.rate_limit import rate_limit_tracker
 from polar.models.user import OAuthAccount, OAuthPlatform, User
 from polar.postgres import AsyncSession
 from polar.user.oauth_service import oauth_account_service
@@ -163,16 +174,134 @@ def get_app_client() -> GitHub[AppAuthStrategy]:
     )
 
 
-def get_app_installation_client(
-    installation_id: int, *, permissions: AppPermissionsType | Unset = UNSET
-) -> GitHub[AppInstallationAuthStrategy]:
-    if not installation_id:
-        raise Exception("unable to create github client: no installation_id provided")
+class InstallationGitHub(GitHub[AppInstallationAuthStrategy]):
+    """
+    Installation client:
+
+    * sharing a Redis-backed cache of GET responses with all the clients of the
+      installation, revalidated with ETags so 304s don't count against the quota;
+    * reusing its HTTP connections across requests;
+    * recording the remaining quota of the installation from the rate limit headers.
+
+    With `pooled=False`, the HTTP client is created and closed around each request,
+    like githubkit does by default.
+    """
+
+    def __init__(self, *args: Any, pooled: bool = True, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.pooled = pooled
+        self._pooled_client: httpx.AsyncClient | None = None
+        self._pooled_client_loop: asyncio.AbstractEventLoop | None = None
+        # Requests in progress per client, so a retired client is closed once idle
+        self._client_requests: dict[httpx.AsyncClient, int] = {}
+
+    def _create_async_client(self) -> httpx.AsyncClient:
+        if not settings.GITHUB_HTTP_CACHE:
+            return super()._create_async_client()
+        return httpx.AsyncClient(
+            **self._get_client_defaults(),
+            transport=get_http_cache_transport(str(self.auth.installation_id)),
+        )
 
+    @asynccontextmanager
+    async def get_async_client(self) -> AsyncGenerator[httpx.AsyncClient, None]:
+        if not self.pooled:
+            async with super().get_async_client() as client:
+                yield client
+            return
+
+        # Connections are bound to the event loop they were opened in
+        loop = asyncio.get_running_loop()
+        if self._pooled_client is None or self._pooled_client_loop is not loop:
+            self.retire_pooled_client()
+            self._pooled_client = self._create_async_client()
+            self._pooled_client_loop = loop
+
+        client = self._pooled_client
+        self._client_requests[client] = self._client_requests.get(client, 0) + 1
+        try:
+            yield client
+        finally:
+            self._client_requests[client] -= 1
+            if client is not self._pooled_client and not self._client_requests[client]:
+                del self._client_requests[client]
+                await client.aclose()
+
+    def retire_pooled_client(self) -> None:
+        """
+        Stop reusing the pooled HTTP client, and close it on its event loop,
+        right away or once the requests using it are done.
+        """
+        client, loop = self._pooled_client, self._pooled_client_loop
+        self._pooled_client = None
+        self._pooled_client_loop = None
+        if client is None or loop is None or self._client_requests.get(client):
+            return
+        self._client_requests.pop(client, None)
+        _aclose_on_loop(client, loop)
+
+    async def _arequest(self, method: str, *args: Any, **kwargs: Any) -> httpx.Response:
+        if not settings.GITHUB_HTTP_CACHE:
+            response = await super()._arequest(method, *args, **kwargs)
+            await rate_limit_tracker.record(self.auth.installation_id, response.headers)
+            return response
+
+        network_response_status.set(None)
+        response = await super()._arequest(method, *args, **kwargs)
+        status = network_response_status.get()
+
+        if method.upper() == "GET":
+            if status is None:
+                result = "hit"
+            elif status == 304:
+                result = "revalidated"
+            else:
+                result = "miss"
+            http_cache_requests.labels(result=result).inc()
+
+        # Served from the cache, the headers are the ones of the cached response
+        if status is not None or method.upper() != "GET":
+            await rate_limit_tracker.record(self.auth.installation_id, response.headers)
+        return response
+
+
+# Keep a reference to the closing tasks until they're done
+_aclose_tasks: set[asyncio.Task[None]] = set()
+
+
+def _aclose_on_loop(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop) -> None:
+    # Its connections were dropped along with the loop
+    if loop.is_closed():
+        return
+
+    try:
+        running_loop: asyncio.AbstractEventLoop | None = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+
+    if loop is running_loop:
+        task = loop.create_task(client.aclose())
+        _aclose_tasks.add(task)
+        task.add_done_callback(_aclose_tasks.discard)
+    else:
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+
+# Installation clients kept per process, to share their connections
+INSTALLATION_CLIENTS_POOL_SIZE = 1024
+_installation_clients: OrderedDict[int, InstallationGitHub] = OrderedDict()
+
+
+def _create_app_installation_client(
+    installation_id: int,
+    *,
+    permissions: AppPermissionsType | Unset = UNSET,
+    pooled: bool = True,
+) -> InstallationGitHub:
     # Using the RedisCache() below to cache generated JWTs
     # This improves ETag/If-None-Match cache hits over the default in-memory cache, as
     # they can be reused across restarts of the python process and by multiple workers.
-    return GitHub(
+    return InstallationGitHub(
         AppInstallationAuthStrategy(
             app_id=settings.GITHUB_APP_IDENTIFIER,
             private_key=settings.GITHUB_APP_PRIVATE_KEY,
@@ -181,10 +310,35 @@ def get_app_installation_client(
             client_secret=settings.GITHUB_CLIENT_SECRET,
             permissions=permissions,
             cache=RedisCache(),
-        )
+        ),
+        pooled=pooled,
     )
 
 
+def get_app_installation_client(
+    installation_id: int, *, permissions: AppPermissionsType | Unset = UNSET
+) -> GitHub[AppInstallationAuthStrategy]:
+    if not installation_id:
+        raise Exception("unable to create github client: no installation_id provided")
+
+    # Tokens scoped to specific permissions aren't shared
+    if permissions is not UNSET:
+        return _create_app_installation_client(
+            installation_id, permissions=permissions, pooled=False
+        )
+
+    client = _installation_clients.get(installation_id)
+    if client is None:
+        client = _create_app_installation_client(installation_id)
+        _installation_clients[installation_id] = client
+        if len(_installation_clients) > INSTALLATION_CLIENTS_POOL_SIZE:
+            _, evicted_client = _installation_clients.popitem(last=False)
+            evicted_client.retire_pooled_client()
+    else:
+        _installation_clients.move_to_end(installation_id)
+    return client
+
+
 __all__ = [
     "get_client",
     "get_app_client",
@@ -1,3 +1,4 @@
+import json
 from typing import Literal
 from uuid import UUID
 
@@ -30,6 +31,11 @@ from polar.exceptions import (
     Unauthorized,
 )
 from polar.integrations.github import client as github
+from polar.integrations.github.ingestion import (
+    COALESCED_WEBHOOKS,
+    WEBHOOK_PAYLOAD_INLINE_MAX_SIZE,
+    webhook_ingestion,
+)
 from polar.kit import jwt
 from polar.kit.http import ReturnTo
 from polar.models.subscription_benefit import SubscriptionBenefitType
@@ -175,6 +181,9 @@ async def github_callback(
         subscription_benefit_type=SubscriptionBenefitType.github_repository,
     )
 
+    # Pre-warm the issue recommendations of the dashboard
+    enqueue_job("github.issue.recommendations.refresh", user_id=user.id)
+
     posthog.identify(user)
     posthog.user_event(user, "user", "github_oauth_login", "done")
 
@@ -431,17 +440,41 @@ def not_implemented() -> WebhookResponse:
     return WebhookResponse(success=False, message="Not implemented")
 
 
-async def enqueue(request: Request) -> WebhookResponse:
-    json_body = await request.json()
-    event_scope = request.headers["X-GitHub-Event"]
+async def enqueue(
+    event_scope: str, delivery_id: str | None, body: bytes
+) -> WebhookResponse:
+    json_body = json.loads(body)
     event_action = json_body["action"] if "action" in json_body else None
     event_name = f"{event_scope}.{event_action}" if event_action else event_scope
 
     if event_name not in IMPLEMENTED_WEBHOOKS:
         return not_implemented()
 
+    if delivery_id is not None and await webhook_ingestion.is_duplicate(delivery_id):
+        log.info("github.webhook.duplicate", delivery_id=delivery_id)
+        return WebhookResponse(success=True, message="Duplicate delivery")
+
     task_name = f"github.webhook.{event_name}"
-    enqueue_job(task_name, event_scope, event_action, json_body)
+
+    resource_field = COALESCED_WEBHOOKS.get(event_name)
+    resource = json_body.get(resource_field) if resource_field else None
+    if resource is not None:
+        # One job per resource, whatever the action: stored under the job ID,
+        # the job picks the latest payloads when it runs
+        task_name = "github.webhook.coalesced"
+        job_id, delay = webhook_ingestion.get_coalesced_job(
+            f"github.webhook.{event_scope}", resource["id"]
+        )
+        await webhook_ingestion.store_coalesced_payload(
+            job_id, json_body["action"], body, updated_at=resource.get("updated_at")
+        )
+        enqueue_job(task_name, event_scope, job_id, _job_id=job_id, _defer_by=delay)
+    elif delivery_id is not None and len(body) > WEBHOOK_PAYLOAD_INLINE_MAX_SIZE:
+        job_id = f"{task_name}:{delivery_id}"
+        await webhook_ingestion.store_payload(job_id, body)
+        enqueue_job(task_name, event_scope, event_action, job_id, _job_id=job_id)
+    else:
+        enqueue_job(task_name, event_scope, event_action, json_body)
 
     log.info("github.webhook.queued", task_name=task_name)
     return WebhookResponse(success=True)
@@ -449,13 +482,18 @@ async def enqueue(request: Request) -> WebhookResponse:
 
 @router.post("/webhook", response_model=WebhookResponse)
 async def webhook(request: Request) -> WebhookResponse:
+    body = await request.body()
     valid_signature = github.webhooks.verify(
         settings.GITHUB_APP_WEBHOOK_SECRET,
-        await request.body(),
+        body,
         request.headers["X-Hub-Signature-256"],
     )
     if valid_signature:
-        return await enqueue(request)
+        return await enqueue(
+            request.headers["X-GitHub-Event"],
+            request.headers.get("X-GitHub-Delivery"),
+            body,
+        )
 
     # Should be 403 Forbidden, but...
     # Throwing unsophisticated hackers/scrapers/bots off the scent
@@ -0,0 +1,187 @@
+import functools
+import json
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, Concatenate, ParamSpec, TypeVar
+
+import structlog
+
+from polar.config import settings
+from polar.logging import Logger
+from polar.redis import Redis, redis
+
+log: Logger = structlog.get_logger()
+
+# Events carrying the latest state of their resource: the ones received for the
+# same resource within a window are handled by a single job, in order,
+# with the latest payload of each action.
+COALESCED_WEBHOOKS = {
+    "issues.edited": "issue",
+    "issues.labeled": "issue",
+    "issues.unlabeled": "issue",
+    "issues.assigned": "issue",
+    "issues.unassigned": "issue",
+    "pull_request.edited": "pull_request",
+    "pull_request.synchronize": "pull_request",
+}
+
+# Payloads bigger than this are stored in Redis instead of inside the job
+WEBHOOK_PAYLOAD_INLINE_MAX_SIZE = 64 * 1024
+
+# GitHub doesn't redeliver by itself after that
+WEBHOOK_DELIVERY_TTL_SECONDS = 60 * 60 * 24
+WEBHOOK_PAYLOAD_TTL_SECONDS = 60 * 60 * 24
+
+# Keep the newest payload of each action of a resource, by its `updated_at`,
+# and the order in which they were received.
+#
+# KEYS: (payload_key,)
+# ARGV: (action, updated_at, payload, ttl)
+# Returns: 1 if the payload was stored
+_STORE_COALESCED_PAYLOAD_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'updated_at:' .. ARGV[1])
+if current and current > ARGV[2] then
+    return 0
+end
+local seq = redis.call('HINCRBY', KEYS[1], 'seq', 1)
+redis.call(
+    'HSET', KEYS[1],
+    'updated_at:' .. ARGV[1], ARGV[2],
+    'seq:' .. ARGV[1], seq,
+    'payload:' .. ARGV[1], ARGV[3]
+)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+class WebhookIngestion:
+    """
+    Deduplicate GitHub webhook deliveries, coalesce the ones targeting the same
+    resource and store large payloads out of the job queue.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        coalesce_window: float = settings.GITHUB_WEBHOOK_COALESCE_WINDOW_SECONDS,
+    ) -> None:
+        self.redis = redis
+        self.coalesce_window = coalesce_window
+
+    async def is_duplicate(self, delivery_id: str) -> bool:
+        try:
+            first = await self.redis.set(
+                f"github:webhook:delivery:{delivery_id}",
+                1,
+                nx=True,
+                ex=WEBHOOK_DELIVERY_TTL_SECONDS,
+            )
+        except Exception as e:
+            # Best effort: rather handle a delivery twice than drop it
+            log.warning(
+                "github.webhook.dedup_failed", delivery_id=delivery_id, error=str(e)
+            )
+            return False
+        return not first
+
+    def get_coalesced_job(
+        self, prefix: str, resource_id: int, now: float | None = None
+    ) -> tuple[str, float]:
+        """
+        Get the job ID and the delay of the job handling the events of a resource
+        received within the current window, whatever their action.
+
+        The job runs once the window is over, so it sees the latest payloads.
+        """
+        now = time.time() if now is None else now
+        window = int(now // self.coalesce_window)
+        delay = (window + 1) * self.coalesce_window - now
+        return f"{prefix}:{resource_id}:{window}", delay
+
+    async def store_payload(self, key: str, payload: bytes) -> None:
+        payload_key = self._get_payload_key(key)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(payload_key, "payload", payload)
+            pipe.expire(payload_key, WEBHOOK_PAYLOAD_TTL_SECONDS)
+            await pipe.execute()
+
+    async def load_payload(self, key: str) -> dict[str, Any] | None:
+        payload = await self.redis.hget(self._get_payload_key(key), "payload")
+        if payload is None:
+            return None
+        return json.loads(payload)
+
+    async def store_coalesced_payload(
+        self, key: str, action: str, payload: bytes, updated_at: str | None = None
+    ) -> bool:
+        """
+        Store a payload of a coalesced job under `key`,
+        unless a newer one of the same action is already stored.
+        """
+        script = self.redis.register_script(_STORE_COALESCED_PAYLOAD_SCRIPT)
+        stored = await script(
+            keys=[self._get_payload_key(key)],
+            args=[action, updated_at or "", payload, WEBHOOK_PAYLOAD_TTL_SECONDS],
+        )
+        return bool(stored)
+
+    async def load_coalesced_payloads(self, key: str) -> list[dict[str, Any]]:
+        """
+        Load the payloads of a coalesced job, oldest first.
+        """
+        fields = await self.redis.hgetall(self._get_payload_key(key))
+        actions = [
+            field.removeprefix("payload:")
+            for field in fields
+            if field.startswith("payload:")
+        ]
+        actions.sort(
+            key=lambda action: (
+                fields[f"updated_at:{action}"],
+                int(fields[f"seq:{action}"]),
+            )
+        )
+        return [json.loads(fields[f"payload:{action}"]) for action in actions]
+
+    def _get_payload_key(self, key: str) -> str:
+        return f"github:webhook:payload:{key}"
+
+
+webhook_ingestion = WebhookIngestion(redis)
+
+
+Scope = TypeVar("Scope")
+Params = ParamSpec("Params")
+
+
+def webhook_payload(
+    f: Callable[Concatenate[Any, Scope, str, dict[str, Any], Params], Awaitable[None]],
+) -> Callable[
+    Concatenate[Any, Scope, str, dict[str, Any] | str, Params], Awaitable[None]
+]:
+    """
+    Let a webhook task receive either the payload itself
+    or the key under which it was stored by `WebhookIngestion`.
+    """
+
+    @functools.wraps(f)
+    async def wrapper(
+        ctx: Any,
+        scope: Scope,
+        action: str,
+        payload: dict[str, Any] | str,
+        *args: Params.args,
+        **kwargs: Params.kwargs,
+    ) -> None:
+        if isinstance(payload, str):
+            key = payload
+            stored_payload = await webhook_ingestion.load_payload(key)
+            if stored_payload is None:
+                log.error("github.webhook.payload_not_found", key=key)
+                return
+            payload = stored_payload
+        await f(ctx, scope, action, payload, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,150 @@
+import time
+from collections.abc import Mapping, Sequence
+
+import structlog
+
+from polar.kit.schemas import Schema
+from polar.logging import Logger
+from polar.redis import Redis, redis
+
+log: Logger = structlog.get_logger()
+
+# Quota left untouched by crawlers, for webhooks and user-facing requests
+RATE_LIMIT_RESERVE = 1000
+
+# GCRA (token bucket) reservation of crawl jobs for an installation.
+#
+# The key holds the theoretical arrival time (TAT) of the next job: each granted
+# job pushes it by `interval` seconds. Jobs are granted until the TAT goes
+# beyond the horizon, so concurrent schedulers share the same budget.
+#
+# KEYS: (bucket_key,)
+# ARGV: (now, interval, count, horizon)
+# Returns: (granted count, delay of the first granted job)
+_RESERVE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local count = tonumber(ARGV[3])
+local horizon = tonumber(ARGV[4])
+local tat = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+if tat < now then
+    tat = now
+end
+local first_delay = tat - now
+local granted = 0
+while granted < count and tat - now < horizon do
+    tat = tat + interval
+    granted = granted + 1
+end
+if granted > 0 then
+    redis.call('SET', KEYS[1], tostring(tat), 'EX', math.ceil(tat - now) + 1)
+end
+return {granted, tostring(first_delay)}
+"""
+
+
+class RateLimit(Schema):
+    limit: int
+    remaining: int
+    used: int
+    reset: int
+
+
+class RateLimitTracker:
+    """
+    Track the GitHub REST quota of installations, as reported in response headers,
+    and dispatch crawl jobs within it.
+    """
+
+    def __init__(self, redis: Redis) -> None:
+        self.redis = redis
+
+    async def record(self, installation_id: int, headers: Mapping[str, str]) -> None:
+        # GraphQL, search... have their own quotas
+        if headers.get("x-ratelimit-resource", "core") != "core":
+            return
+        try:
+            rate_limit = RateLimit(
+                limit=int(headers["x-ratelimit-limit"]),
+                remaining=int(headers["x-ratelimit-remaining"]),
+                used=int(headers["x-ratelimit-used"]),
+                reset=int(headers["x-ratelimit-reset"]),
+            )
+        except (KeyError, ValueError):
+            return
+        await self.set(installation_id, rate_limit)
+
+    async def set(self, installation_id: int, rate_limit: RateLimit) -> None:
+        # Stale once the quota is reset
+        ttl = max(rate_limit.reset - int(time.time()), 1)
+        try:
+            await self.redis.set(
+                self._get_quota_key(installation_id),
+                rate_limit.model_dump_json(),
+                ex=ttl,
+            )
+        except Exception as e:
+            # Best effort: tracking must never fail a GitHub request
+            log.warning(
+                "github.rate_limit.record_failed",
+                installation_id=installation_id,
+                error=str(e),
+            )
+
+    async def get_many(
+        self, installation_ids: Sequence[int]
+    ) -> dict[int, RateLimit | None]:
+        if not installation_ids:
+            return {}
+        values = await self.redis.mget(
+            [
+                self._get_quota_key(installation_id)
+                for installation_id in installation_ids
+            ]
+        )
+        return {
+            installation_id: RateLimit.model_validate_json(value) if value else None
+            for installation_id, value in zip(installation_ids, values)
+        }
+
+    async def reserve(
+        self,
+        installation_id: int,
+        rate_limit: RateLimit,
+        *,
+        count: int,
+        cost: int,
+        horizon: int,
+    ) -> list[int]:
+        """
+        Reserve quota for up to `count` jobs, each consuming `cost` requests,
+        dispatched within the next `horizon` seconds.
+
+        The quota available above `RATE_LIMIT_RESERVE` is spread evenly
+        until its reset.
+
+        Returns the delays, in seconds, at which the granted jobs should run.
+        """
+        now = time.time()
+        available = rate_limit.remaining - RATE_LIMIT_RESERVE
+        if available <= 0 or count <= 0:
+            return []
+
+        rate = available / max(rate_limit.reset - now, 1)
+        interval = cost / rate
+
+        script = self.redis.register_script(_RESERVE_SCRIPT)
+        granted, first_delay = await script(
+            keys=[self._get_bucket_key(installation_id)],
+            args=[now, interval, count, horizon],
+        )
+        return [round(float(first_delay) + i * interval) for i in range(int(granted))]
+
+    def _get_quota_key(self, installation_id: int) -> str:
+        return f"github:rate_limit:{installation_id}"
+
+    def _get_bucket_key(self, installation_id: int) -> str:
+        return f"github:crawl_bucket:{installation_id}"
+
+
+rate_limit_tracker = RateLimitTracker(redis)
@@ -1,6 +1,9 @@
+from uuid import UUID
+
 import structlog
 
-from polar.issue.hooks import IssueHook, issue_upserted
+from polar.issue.hooks import IssuesHook, issues_upserted
+from polar.models import Organization, Repository
 from polar.organization.service import organization as organization_service
 from polar.repository.service import repository as repository_service
 from polar.worker import enqueue_job
@@ -9,36 +12,65 @@ from .badge import GithubBadge
 
 log = structlog.get_logger()
 
+ISSUE_BODY_PRERENDER_BATCH_SIZE = 50
+
 
 async def schedule_embed_badge_task(
-    hook: IssueHook,
+    hook: IssuesHook,
 ) -> None:
     session = hook.session
 
-    organization = await organization_service.get(session, hook.issue.organization_id)
-    if not organization:
-        return
+    # Issues of a batch usually share their organization and repository
+    organizations: dict[UUID, Organization | None] = {}
+    repositories: dict[UUID, Repository | None] = {}
+
+    for issue in hook.issues:
+        if issue.organization_id not in organizations:
+            organizations[issue.organization_id] = await organization_service.get(
+                session, issue.organization_id
+            )
+        organization = organizations[issue.organization_id]
+        if not organization:
+            continue
 
-    repository = await repository_service.get(session, hook.issue.repository_id)
-    if not repository:
-        return
+        if issue.repository_id not in repositories:
+            repositories[issue.repository_id] = await repository_service.get(
+                session, issue.repository_id
+            )
+        repository = repositories[issue.repository_id]
+        if not repository:
+            continue
 
-    should_embed, _ = GithubBadge.should_add_badge(
-        organization, repository, hook.issue, triggered_from_label=False
-    )
-    if not should_embed:
-        return
+        should_embed, _ = GithubBadge.should_add_badge(
+            organization, repository, issue, triggered_from_label=False
+        )
+        if not should_embed:
+            continue
 
-    log.info("github.badge.embed_on_issue:scheduled", issue_id=hook.issue.id)
-    enqueue_job("github.badge.embed_on_issue", hook.issue.id)
+        log.info("github.badge.embed_on_issue:scheduled", issue_id=issue.id)
+        enqueue_job("github.badge.embed_on_issue", issue.id)
 
 
 async def schedule_fetch_references_and_dependencies(
-    hook: IssueHook,
+    hook: IssuesHook,
+) -> None:
+    for issue in hook.issues:
+        enqueue_job("github.issue.sync.issue_references", issue.id)
+        enqueue_job("github.issue.sync.issue_dependencies", issue.id)
+
+
+async def schedule_prerender_issue_bodies(
+    hook: IssuesHook,
 ) -> None:
-    enqueue_job("github.issue.sync.issue_references", hook.issue.id)
-    enqueue_job("github.issue.sync.issue_dependencies", hook.issue.id)
+    # Bodies already rendered are skipped by the task
+    issue_ids = [issue.id for issue in hook.issues if issue.body]
+    for i in range(0, len(issue_ids), ISSUE_BODY_PRERENDER_BATCH_SIZE):
+        enqueue_job(
+            "github.issue.prerender_bodies",
+            issue_ids[i : i + ISSUE_BODY_PRERENDER_BATCH_SIZE],
+        )
 
 
-issue_upserted.add(schedule_fetch_references_and_dependencies)
-issue_upserted.add(schedule_embed_badge_task)
+issues_upserted.add(schedule_fetch_references_and_dependencies)
+issues_upserted.add(schedule_embed_badge_task)
+issues_upserted.add(schedule_prerender_issue_bodies)
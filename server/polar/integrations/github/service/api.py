@@ -2,14 +2,7 @@ from typing import Any
 
 from githubkit import GitHub
 
-from polar.kit.schemas import Schema
-
-
-class RateLimit(Schema):
-    limit: int
-    remaining: int
-    used: int
-    reset: int
+from ..rate_limit import RateLimit
 
 
 class GitHubApi:
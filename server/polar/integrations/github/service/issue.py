@@ -2,21 +2,27 @@ from __future__ import annotations
 
 import asyncio
 import datetime
-from collections.abc import Awaitable, Sequence
+from collections.abc import Awaitable, Iterable, Sequence
 from typing import Any, Literal
 from uuid import UUID
 
 import structlog
 from githubkit import GitHub, Paginator
-from githubkit.exception import RequestFailed
-from sqlalchemy import asc, or_
+from githubkit.exception import RateLimitExceeded, RequestFailed
+from githubkit.graphql import GraphQLResponse, build_graphql_request
+from sqlalchemy import ColumnElement, asc, desc, or_
+from sqlalchemy.orm import InstrumentedAttribute
 
 from polar.dashboard.schemas import IssueSortBy
 from polar.enums import Platforms
 from polar.exceptions import ResourceNotFound
 from polar.integrations.loops.service import loops as loops_service
-from polar.issue.hooks import IssueHook, issue_upserted
-from polar.issue.schemas import IssueCreate, IssueUpdate
+from polar.issue.hooks import IssuesHook, issues_upserted
+from polar.issue.schemas import (
+    GITHUB_GRAPHQL_ISSUE_FIELDS,
+    IssueCreate,
+    IssueUpdate,
+)
 from polar.issue.service import IssueService
 from polar.kit.db.postgres import (
     AsyncSession,
@@ -27,7 +33,6 @@ from polar.logging import Logger
 from polar.models import Issue, Organization, Repository
 from polar.models.user import User
 from polar.postgres import AsyncSessionMaker
-from polar.redis import redis
 from polar.repository.hooks import (
     repository_issue_synced,
     repository_issues_sync_completed,
@@ -49,6 +54,16 @@ class GithubIssueService(IssueService):
     ) -> Issue | None:
         return await self.get_by_platform(session, Platforms.github, external_id)
 
+    async def list_by_external_ids(
+        self, session: AsyncSession, external_ids: Iterable[int]
+    ) -> Sequence[Issue]:
+        stmt = sql.select(Issue).where(
+            Issue.platform == Platforms.github,
+            Issue.external_id.in_(external_ids),
+        )
+        res = await session.execute(stmt)
+        return res.scalars().unique().all()
+
     async def store(
         self,
         session: AsyncSession,
@@ -128,6 +143,15 @@ class GithubIssueService(IssueService):
             )
             return []
 
+        return await self.store_many_schemas(session, schemas, autocommit=autocommit)
+
+    async def store_many_schemas(
+        self,
+        session: AsyncSession,
+        schemas: list[IssueCreate],
+        *,
+        autocommit: bool = True,
+    ) -> Sequence[Issue]:
         records = await self.upsert_many(
             session,
             schemas,
@@ -146,8 +170,7 @@ class GithubIssueService(IssueService):
         #
         # TODO: migrate away from this hook!
         if autocommit:
-            for record in records:
-                await issue_upserted.call(IssueHook(session, record))
+            await issues_upserted.call(IssuesHook(session, records))
 
         return records
 
@@ -322,6 +345,7 @@ class GithubIssueService(IssueService):
                 log.info("github.sync_issue.404.marking_as_crawled")
                 issue.github_issue_fetched_at = utc_now()
                 session.add(issue)
+                return
             elif e.response.status_code == 410:  # 410 Gone, i.e. deleted
                 log.info("github.sync_issue.410.soft_deleting")
                 await self.soft_delete(session, issue.id)
@@ -378,10 +402,174 @@ class GithubIssueService(IssueService):
             issue.github_issue_etag = res.headers.get("etag", None)
             session.add(issue)
 
+    async def sync_issues_batch(
+        self,
+        session: AsyncSession,
+        org: Organization,
+        issues: Sequence[Issue],
+        crawl_with_installation_id: int
+        | None = None,  # Override which installation to use when crawling
+    ) -> None:
+        """
+        Refresh issues of an organization with a single GraphQL query.
+
+        Issues that can't be fetched this way, because the query failed
+        or they were not found, are synced one by one through the REST API.
+        """
+        if not issues:
+            return
+
+        installation_id = (
+            crawl_with_installation_id
+            if crawl_with_installation_id
+            else org.safe_installation_id
+        )
+
+        client = github.get_app_installation_client(installation_id)
+
+        repositories_res = await session.execute(
+            sql.select(Repository).where(
+                Repository.id.in_({issue.repository_id for issue in issues})
+            )
+        )
+        repositories = {
+            repository.id: repository for repository in repositories_res.scalars().all()
+        }
+        repository_aliases = {
+            repository_id: f"r{i}" for i, repository_id in enumerate(repositories)
+        }
+
+        query = self._get_issues_batch_query(issues, repository_aliases)
+        variables: dict[str, Any] = {"owner": org.name}
+        for repository_id, alias in repository_aliases.items():
+            variables[alias] = repositories[repository_id].name
+
+        data: dict[str, Any] = {}
+        try:
+            res = await client.arequest(
+                "POST",
+                "/graphql",
+                json=build_graphql_request(query, variables),
+                response_model=GraphQLResponse,
+            )
+            data = res.parsed_data.data or {}
+            if res.parsed_data.errors:
+                # Partial results: failed issues are null and fall back to REST
+                log.info(
+                    "github.sync_issues_batch.errors",
+                    organization_id=org.id,
+                    errors=[error.message for error in res.parsed_data.errors],
+                )
+        except RateLimitExceeded:
+            raise
+        except RequestFailed as e:
+            log.warning(
+                "github.sync_issues_batch.failed",
+                organization_id=org.id,
+                status_code=e.response.status_code,
+            )
+
+        schemas: list[IssueCreate] = []
+        fallback: list[tuple[Repository, Issue]] = []
+        fetched_at = utc_now()
+        for issue in issues:
+            repository = repositories.get(issue.repository_id)
+            if repository is None:
+                continue
+
+            node = (data.get(repository_aliases[repository.id]) or {}).get(
+                f"i{issue.number}"
+            )
+            if node is None:
+                fallback.append((repository, issue))
+                continue
+
+            # Moved issues, see sync_issue
+            if (
+                node["repository"]["databaseId"] != repository.external_id
+                or node["number"] != issue.number
+            ):
+                log.info(
+                    "github.sync_issues_batch.moved_skipping",
+                    issue_id=issue.id,
+                    expected_repo_id=repository.external_id,
+                    got_repo_id=node["repository"]["databaseId"],
+                )
+            else:
+                schemas.append(IssueCreate.from_github_graphql(node, org, repository))
+
+            issue.github_issue_fetched_at = fetched_at
+            session.add(issue)
+
+        if schemas:
+            await self.store_many_schemas(session, schemas)
+
+        for repository, issue in fallback:
+            await self.sync_issue(
+                session,
+                org,
+                repository,
+                issue,
+                crawl_with_installation_id=crawl_with_installation_id,
+            )
+
+        rate_limit = data.get("rateLimit") or {}
+        log.info(
+            "github.sync_issues_batch",
+            organization_id=org.id,
+            count=len(issues),
+            upserted_count=len(schemas),
+            fallback_count=len(fallback),
+            cost=rate_limit.get("cost"),
+            rate_limit_remaining=rate_limit.get("remaining"),
+        )
+
+    def _get_issues_batch_query(
+        self, issues: Sequence[Issue], repository_aliases: dict[UUID, str]
+    ) -> str:
+        numbers: dict[UUID, set[int]] = {}
+        for issue in issues:
+            if issue.repository_id in repository_aliases:
+                numbers.setdefault(issue.repository_id, set()).add(issue.number)
+
+        variables = "".join(
+            f", ${alias}: String!" for alias in repository_aliases.values()
+        )
+        repositories = "".join(
+            f"{repository_aliases[repository_id]}: "
+            f"repository(owner: $owner, name: ${repository_aliases[repository_id]}) {{"
+            + "".join(
+                f" i{number}: issue(number: {number}) {{ ...IssueFields }}"
+                for number in sorted(repository_numbers)
+            )
+            + " }\n"
+            for repository_id, repository_numbers in numbers.items()
+        )
+        return (
+            f"query IssuesBatch($owner: String!{variables}) {{\n"
+            "rateLimit { cost remaining }\n"
+            f"{repositories}"
+            "}\n"
+            f"{GITHUB_GRAPHQL_ISSUE_FIELDS}"
+        )
+
+    def _get_crawl_priority_clauses(
+        self, fetched_at: InstrumentedAttribute[datetime.datetime | None]
+    ) -> tuple[ColumnElement[Any], ...]:
+        # Pledged issues first, since they drive payouts, biggest pledges first;
+        # then the stalest ones, never fetched first.
+        return (
+            desc(Issue.pledged_amount_sum > 0),
+            desc(Issue.pledged_amount_sum),
+            asc(fetched_at).nulls_first(),
+        )
+
     async def list_issues_to_crawl_issue(
         self,
         session: AsyncSession,
         organization: Organization,
+        *,
+        limit: int = 100,
     ) -> Sequence[Issue]:
         current_time = utc_now()
         cutoff_time = current_time - datetime.timedelta(hours=12)
@@ -401,8 +589,8 @@ class GithubIssueService(IssueService):
                 Organization.installation_id.is_not(None),
                 Organization.id == organization.id,
             )
-            .order_by(asc(Issue.github_issue_fetched_at))
-            .limit(100)
+            .order_by(*self._get_crawl_priority_clauses(Issue.github_issue_fetched_at))
+            .limit(limit)
         )
 
         res = await session.execute(stmt)
@@ -413,6 +601,8 @@ class GithubIssueService(IssueService):
         self,
         session: AsyncSession,
         organization: Organization,
+        *,
+        limit: int = 100,
     ) -> Sequence[Issue]:
         current_time = utc_now()
         cutoff_time = current_time - datetime.timedelta(hours=12)
@@ -432,8 +622,10 @@ class GithubIssueService(IssueService):
                 Organization.installation_id.is_not(None),
                 Organization.id == organization.id,
             )
-            .order_by(asc(Issue.github_timeline_fetched_at))
-            .limit(100)
+            .order_by(
+                *self._get_crawl_priority_clauses(Issue.github_timeline_fetched_at)
+            )
+            .limit(limit)
         )
 
         res = await session.execute(stmt)
@@ -684,13 +876,15 @@ class GithubIssueService(IssueService):
         synced, errors = await github_paginated_service.store_paginated_resource(
             session,
             paginator=paginator,
-            store_resource_method=github_issue.store,
+            store_resources_method=github_issue.store_many,
             organization=organization,
             repository=repository,
             skip_condition=skip_if_pr,
             on_sync_signal=repository_issue_synced,
             on_completed_signal=repository_issues_sync_completed,
             resource_type="issue",
+            # One upsert per GitHub page
+            batch_size=per_page,
         )
         return (synced, errors)
 
@@ -700,17 +894,6 @@ class GithubIssueService(IssueService):
         sessionmaker: AsyncSessionMaker,
         user: User,
     ) -> list[Issue]:
-        # use cached result if we have one
-        cache_key = "recommendations:" + str(user.id)
-        val = await redis.lrange(cache_key, 0, -1)
-        if val:
-            res_issues: list[Issue] = []
-            for id in val:
-                issue = await github_issue.get(session, UUID(id))
-                if issue:
-                    res_issues.append(issue)
-            return res_issues
-
         client = await github.get_user_client(session, user)
 
         # get the latest starred repos
@@ -737,20 +920,7 @@ class GithubIssueService(IssueService):
         # collect the results from each coroutine
         results: list[list[Issue]] = await asyncio.gather(*jobs)
         await session.commit()
-        res = [i for sub in results for i in sub]
-
-        # No recommendations, nothing to cache!
-        if len(res) == 0:
-            return []
-
-        # set cache
-        async with redis.pipeline() as pipe:
-            pipe.delete(cache_key)
-            pipe.rpush(cache_key, *[str(i.id) for i in res])
-            pipe.expire(cache_key, datetime.timedelta(hours=24))
-            await pipe.execute()
-
-        return res
+        return [i for sub in results for i in sub]
 
     async def create_or_update_from_github(
         self,
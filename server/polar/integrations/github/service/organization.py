@@ -1,4 +1,7 @@
+import asyncio
+import time
 from datetime import datetime
+from typing import Literal
 from uuid import UUID
 
 import structlog
@@ -9,6 +12,7 @@ from githubkit import (
 )
 from githubkit.exception import RequestFailed
 from pydantic import BaseModel
+from sqlalchemy import and_
 
 from polar.enums import Platforms
 from polar.exceptions import (
@@ -17,6 +21,7 @@ from polar.exceptions import (
     ResourceNotFound,
 )
 from polar.integrations.github.service.user import github_user as github_user_service
+from polar.integrations.loops.service import loops as loops_service
 from polar.kit.utils import utc_now
 from polar.logging import Logger
 from polar.models import Organization, User
@@ -43,6 +48,11 @@ from .repository import github_repository
 log: Logger = structlog.get_logger(service="GithubOrganizationService")
 
 
+MEMBERS_PER_PAGE = 100
+MEMBERS_MAX_PAGES = 1000
+MEMBERS_PAGES_CONCURRENCY = 5
+
+
 class Member(BaseModel):
     external_id: int
     username: str
@@ -357,118 +367,159 @@ class GithubOrganizationService(OrganizationService):
     async def fetch_members(
         self,
         org: Organization,
+        *,
+        concurrency: int = MEMBERS_PAGES_CONCURRENCY,
     ) -> list[Member]:
         client = github.get_app_installation_client(org.safe_installation_id)
 
-        mems: list[Member] = []
-
-        # GitHub has no API to list all members and their role.
-
-        admins: set[int] = set()
-
-        per_page = 50
+        # GitHub has no API to list all members and their role:
+        # get all admins, and all users, including admins.
+        admins, users = await asyncio.gather(
+            self._list_members(client, org, role="admin", concurrency=concurrency),
+            self._list_members(client, org, role="all", concurrency=concurrency),
+        )
 
-        # First, we get all admins, and then we get all users
-        for page in range(1, 1000):
-            res = await client.rest.orgs.async_list_members(
-                org.name,
-                page=page,
-                per_page=per_page,
-                role="admin",
+        admin_ids = {m.id for m in admins}
+        return [
+            Member(
+                external_id=m.id,
+                username=m.login,
+                avatar_url=m.avatar_url,
+                is_admin=True,
             )
+            for m in admins
+        ] + [
+            Member(
+                external_id=m.id,
+                username=m.login,
+                avatar_url=m.avatar_url,
+                is_admin=False,
+            )
+            for m in users
+            if m.id not in admin_ids
+        ]
 
-            if len(res.parsed_data) == 0:
-                break
-
-            for m in res.parsed_data:
-                mems.append(
-                    Member(
-                        external_id=m.id,
-                        username=m.login,
-                        avatar_url=m.avatar_url,
-                        is_admin=True,
-                    )
-                )
-                admins.add(m.id)
-
-            if len(res.parsed_data) < per_page:
-                break
-
-        # ... then get all users, including admins, and filter away users that we already have!
-        for page in range(1, 1000):
+    async def _list_members(
+        self,
+        client: GitHub[AppInstallationAuthStrategy],
+        org: Organization,
+        *,
+        role: Literal["all", "admin", "member"],
+        concurrency: int,
+    ) -> list[types.SimpleUser]:
+        async def _get_page(page: int) -> list[types.SimpleUser]:
             res = await client.rest.orgs.async_list_members(
-                org.name, page=page, per_page=per_page, role="all"
+                org.name, page=page, per_page=MEMBERS_PER_PAGE, role=role
             )
+            return res.parsed_data
+
+        # Most organizations fit in the first page, then fetch pages concurrently
+        members = await _get_page(1)
+        if len(members) < MEMBERS_PER_PAGE:
+            return members
+
+        page = 2
+        while page <= MEMBERS_MAX_PAGES:
+            last_page = min(page + concurrency - 1, MEMBERS_MAX_PAGES)
+            pages = await asyncio.gather(
+                *(_get_page(p) for p in range(page, last_page + 1))
+            )
+            for page_members in pages:
+                members.extend(page_members)
+                if len(page_members) < MEMBERS_PER_PAGE:
+                    return members
+            page = last_page + 1
 
-            if len(res.parsed_data) == 0:
-                break
-
-            for m in res.parsed_data:
-                if m.id in admins:
-                    continue
-
-                mems.append(
-                    Member(
-                        external_id=m.id,
-                        username=m.login,
-                        avatar_url=m.avatar_url,
-                        is_admin=False,
-                    )
-                )
-
-            if len(res.parsed_data) < per_page:
-                break
-
-        return mems
+        return members
 
     async def synchronize_members(
         self, session: AsyncSession, org: Organization
     ) -> None:
-        # get members from github
         github_members = await self.fetch_members(org)
+        await self.update_members(session, org, github_members)
 
-        db_members_stmt = (
-            sql.select(OAuthAccount)
-            .where(
-                UserOrganization.user_id == OAuthAccount.user_id,
-                OAuthAccount.platform == "github",
-                OAuthAccount.deleted_at.is_(None),
-            )
-            .where(
-                UserOrganization.organization_id == org.id,
-                UserOrganization.deleted_at.is_(None),
-            )
-        )
+    async def update_members(
+        self, session: AsyncSession, org: Organization, github_members: list[Member]
+    ) -> None:
+        """
+        Make the members of the organization match its GitHub members.
 
-        res = await session.execute(db_members_stmt)
-        db_members = res.scalars().unique().all()
+        Users without a GitHub account linked are left untouched.
+        """
+        start = time.perf_counter()
 
-        # add or update members from github
-        for gh_m in github_members:
-            # get user
-            get_user = await github_user_service.get_user_by_github_id(
-                session, gh_m.external_id
-            )
-            if not get_user:
-                continue
+        users = await github_user_service.list_users_by_github_ids(
+            session, [m.external_id for m in github_members]
+        )
 
-            # add as member, or update admin status
-            await organization_service.add_user(
-                session, org, get_user, is_admin=gh_m.is_admin
+        memberships_stmt = (
+            sql.select(
+                UserOrganization.user_id,
+                UserOrganization.is_admin,
+                UserOrganization.deleted_at,
+                OAuthAccount.account_id,
             )
-
-        # remove members that are members in our DB, but not a member on github
-        github_user_ids: set[int] = set()
+            .outerjoin(
+                OAuthAccount,
+                and_(
+                    OAuthAccount.user_id == UserOrganization.user_id,
+                    OAuthAccount.platform == OAuthPlatform.github,
+                    OAuthAccount.deleted_at.is_(None),
+                ),
+            )
+            .where(UserOrganization.organization_id == org.id)
+        )
+        res = await session.execute(memberships_stmt)
+
+        # Current memberships, and the GitHub accounts of their users
+        memberships: dict[UUID, tuple[bool, bool]] = {}
+        github_accounts: dict[UUID, set[int]] = {}
+        for user_id, is_admin, deleted_at, account_id in res.all():
+            memberships[user_id] = (is_admin, deleted_at is None)
+            if account_id is not None:
+                github_accounts.setdefault(user_id, set()).add(int(account_id))
+
+        # Add members, restore removed ones, or update their admin status
+        to_add: list[tuple[UUID, UUID, bool]] = []
+        added_users: list[User] = []
         for gh_m in github_members:
-            github_user_ids.add(gh_m.external_id)
-
-        for db_m in db_members:
-            if int(db_m.account_id) in github_user_ids:
+            user = users.get(gh_m.external_id)
+            if user is None:
                 continue
-
-            await user_organization_service.remove_member(session, db_m.user_id, org.id)
+            membership = memberships.get(user.id)
+            if membership == (gh_m.is_admin, True):
+                continue
+            to_add.append((user.id, org.id, gh_m.is_admin))
+            if membership is None or not membership[1]:
+                added_users.append(user)
+
+        # Remove members that are members in our DB, but not a member on GitHub
+        github_ids = {m.external_id for m in github_members}
+        to_remove = [
+            user_id
+            for user_id, (_, active) in memberships.items()
+            if active
+            and user_id in github_accounts
+            and github_accounts[user_id].isdisjoint(github_ids)
+        ]
+
+        await user_organization_service.add_many(session, to_add)
+        await user_organization_service.remove_many(session, org.id, to_remove)
+
+        for user in added_users:
+            await loops_service.organization_installed(session, user=user)
 
         await subscription_service.update_organization_benefits_grants(session, org)
 
+        log.info(
+            "github.organization.update_members",
+            organization_id=org.id,
+            members=len(github_members),
+            added=len(added_users),
+            updated=len(to_add) - len(added_users),
+            removed=len(to_remove),
+            duration=time.perf_counter() - start,
+        )
+
 
 github_organization = GithubOrganizationService(Organization)
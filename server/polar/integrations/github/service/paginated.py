@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from collections.abc import Callable, Coroutine
+import time
+from collections.abc import Callable, Coroutine, Sequence
 from typing import Any, Literal
 
 import structlog
@@ -27,8 +28,8 @@ class GitHubPaginatedService:
         session: AsyncSession,
         *,
         paginator: Paginator[types.Issue] | Paginator[types.PullRequestSimple],
-        store_resource_method: Callable[
-            ..., Coroutine[Any, Any, Issue | PullRequest | None]
+        store_resources_method: Callable[
+            ..., Coroutine[Any, Any, Sequence[Issue] | Sequence[PullRequest]]
         ],
         organization: Organization,
         repository: Repository,
@@ -37,36 +38,51 @@ class GitHubPaginatedService:
         | None = None,
         on_sync_signal: Hook[SyncedHook] | None = None,
         on_completed_signal: Hook[SyncCompletedHook] | None = None,
+        batch_size: int = 100,
     ) -> tuple[SyncedCount, ErrorCount]:
+        """
+        Store the resources of a paginator, `batch_size` at a time.
+
+        Each batch is upserted with a single `store_resources_method` call,
+        and `on_sync_signal` is called once per batch.
+        """
         synced, errors = 0, 0
-        async for data in paginator:
-            synced += 1
+        start = time.perf_counter()
 
-            if skip_condition and skip_condition(data):
-                continue
+        def get_synced_per_second() -> float:
+            return synced / max(time.perf_counter() - start, 1e-9)
 
-            record = await store_resource_method(
+        async def store_batch(
+            batch: list[types.Issue | types.PullRequestSimple],
+        ) -> None:
+            nonlocal errors
+
+            records = await store_resources_method(
                 session,
-                data=data,
+                data=batch,
                 organization=organization,
                 repository=repository,
             )
 
-            if not record:
-                log.warning(
-                    f"{resource_type}.sync.failed",
-                    error="save was unsuccessful",
-                    received=data.model_dump(mode="json"),
-                )
-                errors += 1
-                continue
+            if len(records) < len(batch):
+                stored_external_ids = {record.external_id for record in records}
+                for data in batch:
+                    if data.id not in stored_external_ids:
+                        log.warning(
+                            f"{resource_type}.sync.failed",
+                            error="save was unsuccessful",
+                            received=data.model_dump(mode="json"),
+                        )
+                        errors += 1
+
+            if not records:
+                return
 
             log.debug(
                 f"{resource_type}.synced",
                 organization_id=organization.id,
                 repository_id=repository.id,
-                id=record.id,
-                title=record.title,
+                count=len(records),
             )
 
             if on_sync_signal:
@@ -74,17 +90,35 @@ class GitHubPaginatedService:
                     SyncedHook(
                         repository=repository,
                         organization=organization,
-                        record=record,
+                        records=records,
                         synced=synced,
+                        synced_per_second=get_synced_per_second(),
                     )
                 )
 
+        batch: list[types.Issue | types.PullRequestSimple] = []
+        async for data in paginator:
+            synced += 1
+
+            if skip_condition and skip_condition(data):
+                continue
+
+            batch.append(data)
+            if len(batch) >= batch_size:
+                await store_batch(batch)
+                batch = []
+
+        if batch:
+            await store_batch(batch)
+
+        synced_per_second = get_synced_per_second()
         log.info(
             f"{resource_type}.sync.completed",
             organization_id=organization.id,
             repository_id=repository.id,
             synced=synced,
             errors=errors,
+            synced_per_second=synced_per_second,
         )
 
         if on_completed_signal:
@@ -93,6 +127,7 @@ class GitHubPaginatedService:
                     repository=repository,
                     organization=organization,
                     synced=synced,
+                    synced_per_second=synced_per_second,
                 )
             )
 
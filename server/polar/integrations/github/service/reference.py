@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from typing import Annotated, Any, Union
 from uuid import UUID
 
@@ -36,6 +37,11 @@ from .. import types
 log: Logger = structlog.get_logger()
 
 
+REFERENCES_PER_PAGE = 100
+REFERENCES_MAX_PAGES = 99
+REFERENCES_PAGES_CONCURRENCY = 5
+
+
 class FallbackCommitEvent(GitHubModel):
     actor: types.SimpleUser = Field()
     event: str = Field()
@@ -77,11 +83,14 @@ class GitHubIssueReferencesService:
         repo: Repository,
         crawl_with_installation_id: int
         | None = None,  # Override which installation to use when crawling
+        concurrency: int = REFERENCES_PAGES_CONCURRENCY,
     ) -> None:
         """
         sync_repo_references lists repository events to find issues that have been
         mentioned. When we know which issues that have been mentioned, a job to fetch
         and parse timeline events will be triggered.
+
+        Pages of events are fetched up to `concurrency` at a time.
         """
 
         installation_id = (
@@ -121,54 +130,90 @@ class GitHubIssueReferencesService:
             name=repo.name,
         )
 
-        triggered_ids: set[int] = set()
-
-        for page in range(1, 100):  # Maximum 100 pages
+        async def _list_events(page: int) -> list[types.IssueEvent]:
             res = await client.rest.issues.async_list_events_for_repo(
-                owner=org.name, repo=repo.name, per_page=100, page=page
+                owner=org.name, repo=repo.name, per_page=REFERENCES_PER_PAGE, page=page
             )
+            return res.parsed_data
 
-            events = res.parsed_data
-
-            # Process events that are newer than the newest event we have
-            if pre_sync_timestamp:
-                events = [e for e in events if e.created_at >= pre_sync_timestamp]
+        triggered_ids: set[int] = set()
+        issue_ids: list[UUID] = []
+
+        # The first page alone is usually enough since the last sync,
+        # the next ones are fetched concurrently.
+        pages = range(1, 2)
+        done = False
+        while not done and len(pages) > 0:
+            results = await asyncio.gather(
+                *(_list_events(page) for page in pages), return_exceptions=True
+            )
+            for page, result in zip(pages, results):
+                if isinstance(result, BaseException):
+                    raise result
 
-            # No events, stop pagination
-            if len(events) == 0:
-                break
+                # Process events that are newer than the newest event we have
+                events = result
+                if pre_sync_timestamp:
+                    events = [e for e in events if e.created_at >= pre_sync_timestamp]
 
-            log.info(
-                "references.repo.page",
-                name=repo.name,
-                page=page,
-                num=len(events),
-            )
+                # No events, stop pagination
+                if len(events) == 0:
+                    done = True
+                    break
 
-            for external_issue_id in self.external_issue_ids_to_sync(events):
-                if external_issue_id in triggered_ids:
-                    continue
-                triggered_ids.add(external_issue_id)
+                log.info(
+                    "references.repo.page",
+                    name=repo.name,
+                    page=page,
+                    num=len(events),
+                )
 
-                issue = await github_issue.get_by_external_id(
-                    session, external_issue_id
+                external_issue_ids = (
+                    self.external_issue_ids_to_sync(events) - triggered_ids
                 )
-                if not issue:
-                    log.warn(
-                        "github.sync_repo_references.issue-not-found",
-                        repo_id=repo.id,
-                        external_issue_id=external_issue_id,
-                    )
-                    continue
-                # Trigger issue references sync job
-                enqueue_job(
-                    "github.issue.sync.issue_references",
-                    issue.id,
-                    crawl_with_installation_id=installation_id,
+                triggered_ids.update(external_issue_ids)
+                issue_ids += await self._get_issue_ids(
+                    session, repo, external_issue_ids
                 )
 
+                # Events are sorted newest first: stop on the last page
+                # or as soon as the cutoff is crossed
+                if len(result) < REFERENCES_PER_PAGE or len(events) < len(result):
+                    done = True
+                    break
+
+            pages = range(
+                pages.stop, min(pages.stop + concurrency, REFERENCES_MAX_PAGES + 1)
+            )
+
+        # Trigger issue references sync jobs
+        for issue_id in issue_ids:
+            enqueue_job(
+                "github.issue.sync.issue_references",
+                issue_id,
+                crawl_with_installation_id=installation_id,
+            )
+
         return None
 
+    async def _get_issue_ids(
+        self, session: AsyncSession, repo: Repository, external_issue_ids: set[int]
+    ) -> list[UUID]:
+        if not external_issue_ids:
+            return []
+
+        issues = await github_issue.list_by_external_ids(session, external_issue_ids)
+
+        not_found = external_issue_ids - {issue.external_id for issue in issues}
+        if not_found:
+            log.warn(
+                "github.sync_repo_references.issue-not-found",
+                repo_id=repo.id,
+                external_issue_ids=sorted(not_found),
+            )
+
+        return [issue.id for issue in issues]
+
     def external_issue_ids_to_sync(self, events: list[types.IssueEvent]) -> set[int]:
         res: set[int] = set()
 
@@ -1,3 +1,5 @@
+import asyncio
+from collections.abc import Sequence
 from typing import Any
 
 import structlog
@@ -7,13 +9,16 @@ from polar.exceptions import PolarError, ResourceAlreadyExists
 from polar.integrations.github.client import GitHub, TokenAuthStrategy
 from polar.integrations.loops.service import loops as loops_service
 from polar.kit.extensions.sqlalchemy import sql
-from polar.models import OAuthAccount, User
+from polar.models import OAuthAccount, Organization, User
 from polar.models.user import OAuthPlatform
 from polar.organization.service import organization
 from polar.postgres import AsyncSession
 from polar.posthog import posthog
 from polar.user.oauth_service import oauth_account_service
 from polar.user.service import UserService
+from polar.user_organization.service import (
+    user_organization as user_organization_service,
+)
 from polar.worker import enqueue_job
 
 from .. import client as github
@@ -74,6 +79,25 @@ class GithubUserService(UserService):
         res = await session.execute(stmt)
         return res.scalars().first()
 
+    async def list_users_by_github_ids(
+        self, session: AsyncSession, ids: Sequence[int]
+    ) -> dict[int, User]:
+        if not ids:
+            return {}
+        stmt = (
+            sql.select(OAuthAccount.account_id, User)
+            .join(OAuthAccount, User.id == OAuthAccount.user_id)
+            .where(
+                OAuthAccount.platform == OAuthPlatform.github,
+                OAuthAccount.account_id.in_([str(id) for id in ids]),
+            )
+        )
+        res = await session.execute(stmt)
+        users: dict[int, User] = {}
+        for account_id, user in res.unique().all():
+            users.setdefault(int(account_id), user)
+        return users
+
     async def get_user_by_github_username(
         self,
         session: AsyncSession,
@@ -353,8 +377,6 @@ class GithubUserService(UserService):
         user: User,
         github_user: GithubUser,
     ) -> int:
-        org_count = 0
-
         installations = await self.fetch_user_accessible_installations(session, user)
         log.info(
             "sync_github_orgs.installations",
@@ -366,8 +388,9 @@ class GithubUserService(UserService):
         )
         if not gh_oauth:
             log.error("sync_github_orgs.no_platform_oauth_found", user_id=user.id)
-            return org_count
+            return 0
 
+        accounts: dict[int, types.Installation] = {}
         for i in installations:
             if not i.account:
                 continue
@@ -376,74 +399,72 @@ class GithubUserService(UserService):
                 log.error("sync_github_orgs.github_enterprise_not_supported")
                 continue
 
-            org = await organization.get_by_platform(
-                session, Platforms.github, i.account.id
-            )
-            if not org:
+            accounts[i.account.id] = i
+
+        orgs = await organization.list_by_platform(
+            session, Platforms.github, list(accounts.keys())
+        )
+        orgs_by_external_id = {org.external_id: org for org in orgs}
+        for account_id, i in accounts.items():
+            if account_id not in orgs_by_external_id:
                 log.error("sync_github_orgs.org_not_found", id=i.id)
-                continue
 
+        async def _get_is_admin(
+            org: Organization, i: types.Installation
+        ) -> bool | None:
             # If installed on personal account, always admin
-            if i.account.id == int(gh_oauth.account_id):
-                log.info(
-                    "sync_github_orgs.add_admin",
+            if org.external_id == int(gh_oauth.account_id):
+                return True
+
+            if i.target_type != "Organization":
+                return None
+
+            # If installed on github org, check access
+            try:
+                client = github.get_app_installation_client(i.id)
+                membership = await client.rest.orgs.async_get_membership_for_user(
+                    org.name,
+                    github_user.login,
+                )
+            except Exception as e:
+                log.error(
+                    "sync_github_orgs.failed",
+                    err=e,
                     org_id=org.id,
                     user_id=user.id,
                 )
+                return None
 
-                # Add as admin in Polar (or upgrade existing memeber to admin)
-                await organization.add_user(session, org, user, is_admin=True)
-                org_count += 1
-                continue
+            data = membership.parsed_data
+            if data.state != "active":
+                log.info(
+                    "sync_github_orgs.skip_install",
+                    org_id=org.id,
+                    user_id=user.id,
+                )
+                return None
+            return data.role == "admin"
 
-            if i.target_type == "Organization":
-                # If installed on github org, check access
-                try:
-                    client = github.get_app_installation_client(i.id)
-                    membership = await client.rest.orgs.async_get_membership_for_user(
-                        i.account.login,
-                        github_user.login,
-                    )
+        # Check the memberships concurrently, then add them at once
+        is_admins = await asyncio.gather(
+            *(_get_is_admin(org, accounts[org.external_id]) for org in orgs)
+        )
+        memberships = [
+            (user.id, org.id, is_admin)
+            for org, is_admin in zip(orgs, is_admins)
+            if is_admin is not None
+        ]
+        log.info(
+            "sync_github_orgs.add_memberships",
+            user_id=user.id,
+            memberships=[(org_id, is_admin) for _, org_id, is_admin in memberships],
+        )
 
-                    data = membership.parsed_data
-
-                    if data.role == "admin" and data.state == "active":
-                        log.info(
-                            "sync_github_orgs.add_admin",
-                            org_id=org.id,
-                            user_id=user.id,
-                        )
-
-                        # Add as admin in Polar (or upgrade existing member to admin)
-                        await organization.add_user(session, org, user, is_admin=True)
-                        org_count += 1
-
-                    elif data.state == "active":
-                        log.info(
-                            "sync_github_orgs.add_non_admin",
-                            org_id=org.id,
-                            user_id=user.id,
-                        )
-
-                        # Add as admin in Polar
-                        await organization.add_user(session, org, user, is_admin=False)
-                        org_count += 1
-                    else:
-                        log.info(
-                            "sync_github_orgs.skip_install",
-                            org_id=org.id,
-                            user_id=user.id,
-                        )
-
-                except Exception as e:
-                    log.error(
-                        "sync_github_orgs.failed",
-                        err=e,
-                        org_id=org.id,
-                        user_id=user.id,
-                    )
+        await user_organization_service.add_many(session, memberships)
+        if memberships:
+            await loops_service.organization_installed(session, user=user)
 
-        return org_count
+        return len(memberships)
 
     async def fetch_authenticated_user(
         self, *, client: GitHub[TokenAuthStrategy]
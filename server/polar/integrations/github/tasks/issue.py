@@ -1,13 +1,22 @@
-import random
+import asyncio
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any
 from uuid import UUID
 
 import structlog
 
 from polar.integrations.github import service
 from polar.integrations.github.client import get_app_installation_client
+from polar.integrations.github.rate_limit import RateLimit, rate_limit_tracker
+from polar.issue.body import get_issue_body_renderer
+from polar.issue.recommendations import compute_recommendations, recommendations_cache
+from polar.issue.service import issue as issue_service
 from polar.locker import Locker
+from polar.models import Issue, Organization
 from polar.organization.service import organization as organization_service
+from polar.postgres import AsyncSession
 from polar.redis import get_redis
+from polar.user.service import user as user_service
 from polar.worker import (
     AsyncSessionMaker,
     JobContext,
@@ -57,6 +66,46 @@ async def issue_sync(
             )
 
 
+@task("github.issue.sync.batch")
+@github_rate_limit_retry
+async def issue_sync_batch(
+    ctx: JobContext,
+    issue_ids: list[UUID],
+    polar_context: PolarWorkerContext,
+    crawl_with_installation_id: int
+    | None = None,  # Override which installation to use when crawling
+) -> None:
+    with polar_context.to_execution_context():
+        async with AsyncSessionMaker(ctx) as session:
+            issues = await github_issue.list_by_ids(session, issue_ids)
+
+            issues_by_organization: dict[UUID, list[Issue]] = {}
+            for issue in issues:
+                if issue.organization_id and issue.repository_id:
+                    issues_by_organization.setdefault(issue.organization_id, []).append(
+                        issue
+                    )
+
+            for organization_id, organization_issues in issues_by_organization.items():
+                organization = await service.github_organization.get(
+                    session, organization_id
+                )
+                if not organization or not organization.installation_id:
+                    log.warning(
+                        "github.issue.sync.batch",
+                        error="organization not found",
+                        organization_id=organization_id,
+                    )
+                    continue
+
+                await github_issue.sync_issues_batch(
+                    session,
+                    org=organization,
+                    issues=organization_issues,
+                    crawl_with_installation_id=crawl_with_installation_id,
+                )
+
+
 @task("github.issue.sync.issue_references")
 @github_rate_limit_retry
 async def issue_sync_issue_references(
@@ -124,6 +173,168 @@ async def issue_sync_issue_dependencies(
             )
 
 
+# Crons run every 10 minutes: jobs are dispatched until the next run
+CRAWL_HORIZON_SECONDS = 60 * 10
+
+# Maximum number of issues considered per organization and run
+CRAWL_MAX_ISSUES = 1000
+
+# Approximate number of GitHub requests made by a crawl job
+ISSUE_SYNC_COST = 1
+ISSUE_REFERENCES_SYNC_COST = 2
+
+# Issues refreshed by a single GraphQL query. GraphQL has its own quota:
+# the REST cost of a batch only accounts for the issues falling back to it.
+ISSUE_SYNC_BATCH_SIZE = 100
+ISSUE_SYNC_BATCH_COST = 5
+
+
+async def get_rate_limits(
+    organizations: Sequence[Organization],
+) -> dict[int, RateLimit | None]:
+    """
+    Get the quota of the installations, as tracked from response headers.
+
+    The ones never seen are fetched from the API, concurrently.
+    """
+    installation_ids = list({org.safe_installation_id for org in organizations})
+    rate_limits = await rate_limit_tracker.get_many(installation_ids)
+
+    async def _fetch(installation_id: int) -> None:
+        client = get_app_installation_client(installation_id)
+        try:
+            rate_limit = await github_api.get_rate_limit(client)
+        except Exception as e:
+            log.info(
+                "failed to get rate limit, treating it as no remaining",
+                installation_id=installation_id,
+                err=e,
+            )
+            return
+        await rate_limit_tracker.set(installation_id, rate_limit)
+        rate_limits[installation_id] = rate_limit
+
+    await asyncio.gather(
+        *(
+            _fetch(installation_id)
+            for installation_id, rate_limit in rate_limits.items()
+            if rate_limit is None
+        )
+    )
+    return rate_limits
+
+
+async def schedule_crawl(
+    session: AsyncSession,
+    *,
+    name: str,
+    job_name: str,
+    list_issues: Callable[..., Awaitable[Sequence[Issue]]],
+    cost: int,
+    batch_size: int | None = None,
+) -> None:
+    """
+    Dispatch crawl jobs for the issues needing it, most important first,
+    at the rate the GitHub quota of each installation allows until its reset.
+
+    With `batch_size`, each job receives a list of up to `batch_size` issues
+    and `cost` is the one of the whole batch.
+    """
+    orgs = await organization_service.list_installed(session)
+    rate_limits = await get_rate_limits(orgs)
+
+    for org in orgs:
+        rate_limit = rate_limits.get(org.safe_installation_id)
+        if rate_limit is None:
+            continue
+
+        issues = await list_issues(session, org, limit=CRAWL_MAX_ISSUES)
+        if len(issues) == 0:
+            log.info(name, org_name=org.name, found_count=len(issues))
+            continue
+
+        jobs: list[tuple[Any, str]] = (
+            [
+                (
+                    [issue.id for issue in issues[i : i + batch_size]],
+                    f"{job_name}:{issues[i].id}",
+                )
+                for i in range(0, len(issues), batch_size)
+            ]
+            if batch_size
+            else [(issue.id, f"{job_name}:{issue.id}") for issue in issues]
+        )
+
+        delays = await rate_limit_tracker.reserve(
+            org.safe_installation_id,
+            rate_limit,
+            count=len(jobs),
+            cost=cost,
+            horizon=CRAWL_HORIZON_SECONDS,
+        )
+        if len(delays) == 0:
+            log.info(
+                f"{name}.rate_limit_almost_exhausted",
+                org_name=org.name,
+                rate_limit_remaining=rate_limit.remaining,
+            )
+            continue
+
+        log.info(
+            name,
+            org_name=org.name,
+            found_count=len(issues),
+            scheduled_count=len(delays),
+            rate_limit_remaining=rate_limit.remaining,
+        )
+
+        for (job_arg, job_id), delay in zip(jobs, delays):
+            enqueue_job(job_name, job_arg, _job_id=job_id, _defer_by=delay)
+
+
+@task("github.issue.prerender_bodies")
+@github_rate_limit_retry
+async def issue_prerender_bodies(
+    ctx: JobContext, issue_ids: list[UUID], polar_context: PolarWorkerContext
+) -> None:
+    with polar_context.to_execution_context():
+        async with AsyncSessionMaker(ctx) as session:
+            issues = await issue_service.list_loaded_by_ids(session, issue_ids)
+            rendered = await get_issue_body_renderer().prerender(
+                [
+                    (issue, issue.repository, issue.repository.organization)
+                    for issue in issues
+                ]
+            )
+            log.info(
+                "github.issue.prerender_bodies",
+                issues=len(issue_ids),
+                rendered=rendered,
+            )
+
+
+@task("github.issue.recommendations.refresh")
+@github_rate_limit_retry
+async def issue_recommendations_refresh(
+    ctx: JobContext, user_id: UUID, polar_context: PolarWorkerContext
+) -> None:
+    with polar_context.to_execution_context():
+        async with AsyncSessionMaker(ctx) as session:
+            user = await user_service.get(session, user_id)
+            if user is None:
+                log.warning(
+                    "github.issue.recommendations.refresh",
+                    error="user not found",
+                    user_id=user_id,
+                )
+                return
+
+            recommendations = await compute_recommendations(
+                session, ctx["sessionmaker"], user
+            )
+            await recommendations_cache.set(user.id, recommendations)
+
+
 @interval(
     minute={
         2,
@@ -138,50 +349,14 @@ async def issue_sync_issue_dependencies(
 @github_rate_limit_retry
 async def cron_refresh_issues(ctx: JobContext) -> None:
     async with AsyncSessionMaker(ctx) as session:
-        orgs = await organization_service.list_installed(session)
-        for org in orgs:
-            issues = await github_issue.list_issues_to_crawl_issue(session, org)
-            if len(issues) == 0:
-                log.info(
-                    "github.issue.sync.cron_refresh_issues",
-                    org_name=org.name,
-                    found_count=len(issues),
-                )
-                continue
-
-            client = get_app_installation_client(org.safe_installation_id)
-            try:
-                rate_limit = await github_api.get_rate_limit(client)
-            except Exception as e:
-                log.info(
-                    "failed to get rate limit, treating it as no remaining",
-                    org_name=org.name,
-                    err=e,
-                )
-                continue
-
-            if rate_limit.remaining < 1000:
-                log.info(
-                    "github.issue.sync.cron_refresh_issues.rate_limit_almost_exhausted",
-                    org_name=org.name,
-                    rate_limit_remaining=rate_limit.remaining,
-                )
-                continue
-
-            log.info(
-                "github.issue.sync.cron_refresh_issues",
-                org_name=org.name,
-                found_count=len(issues),
-                rate_limit_remaining=rate_limit.remaining,
-            )
-
-            for issue in issues:
-                enqueue_job(
-                    "github.issue.sync",
-                    issue.id,
-                    _job_id=f"github.issue.sync:{issue.id}",
-                    _defer_by=random.randint(0, 60 * 5),
-                )
+        await schedule_crawl(
+            session,
+            name="github.issue.sync.cron_refresh_issues",
+            job_name="github.issue.sync.batch",
+            list_issues=github_issue.list_issues_to_crawl_issue,
+            cost=ISSUE_SYNC_BATCH_COST,
+            batch_size=ISSUE_SYNC_BATCH_SIZE,
+        )
 
 
 @interval(
@@ -198,48 +373,10 @@ async def cron_refresh_issues(ctx: JobContext) -> None:
 @github_rate_limit_retry
 async def cron_refresh_issue_timelines(ctx: JobContext) -> None:
     async with AsyncSessionMaker(ctx) as session:
-        orgs = await organization_service.list_installed(session)
-        for org in orgs:
-            issues = await github_issue.list_issues_to_crawl_timeline(session, org)
-            if len(issues) == 0:
-                log.info(
-                    "github.issue.sync.cron_refresh_issue_timelines",
-                    org_name=org.name,
-                    found_count=len(issues),
-                )
-                continue
-
-            client = get_app_installation_client(org.safe_installation_id)
-
-            try:
-                rate_limit = await github_api.get_rate_limit(client)
-            except Exception as e:
-                log.info(
-                    "failed to get rate limit, treating it as no remaining",
-                    org_name=org.name,
-                    err=e,
-                )
-                continue
-
-            if rate_limit.remaining < 1000:
-                log.info(
-                    "github.issue.sync.cron_refresh_issue_timelines.rate_limit_almost_exhausted",
-                    org_name=org.name,
-                    rate_limit_remaining=rate_limit.remaining,
-                )
-                continue
-
-            log.info(
-                "github.issue.sync.cron_refresh_issue_timelines",
-                org_name=org.name,
-                found_count=len(issues),
-                rate_limit_remaining=rate_limit.remaining,
-            )
-
-            for issue in issues:
-                enqueue_job(
-                    "github.issue.sync.issue_references",
-                    issue.id,
-                    _job_id=f"github.issue.sync.issue_references:{issue.id}",
-                    _defer_by=random.randint(0, 60 * 5),
-                )
+        await schedule_crawl(
+            session,
+            name="github.issue.sync.cron_refresh_issue_timelines",
+            job_name="github.issue.sync.issue_references",
+            list_issues=github_issue.list_issues_to_crawl_timeline,
+            cost=ISSUE_REFERENCES_SYNC_COST,
+        )
@@ -1,3 +1,4 @@
+import time
 from uuid import UUID
 
 import structlog
@@ -46,12 +47,27 @@ async def organization_refresh_members(
             if not org:
                 return
 
-            log.info(
-                "github.organization.synchronize_members",
-                organization_id=organization_id,
-            )
+        log.info(
+            "github.organization.synchronize_members",
+            organization_id=organization_id,
+        )
+
+        # Don't hold a database connection while paging through GitHub
+        start = time.perf_counter()
+        github_members = await github_organization.fetch_members(org)
+        log.info(
+            "github.organization.synchronize_members.fetched",
+            organization_id=organization_id,
+            members=len(github_members),
+            duration=time.perf_counter() - start,
+        )
+
+        async with AsyncSessionMaker(ctx) as session:
+            org = await github_organization.get(session, organization_id)
+            if not org:
+                return
 
-            await github_organization.synchronize_members(session, org)
+            await github_organization.update_members(session, org, github_members)
 
 
 @interval(
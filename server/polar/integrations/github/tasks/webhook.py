@@ -1,4 +1,5 @@
 from collections.abc import Sequence
+from datetime import datetime
 from typing import Any, Literal
 from uuid import UUID
 
@@ -12,6 +13,7 @@ from polar.kit.extensions.sqlalchemy import sql
 from polar.kit.utils import utc_now
 from polar.models.issue import Issue
 from polar.models.organization import Organization
+from polar.models.pull_request import PullRequest
 from polar.organization.hooks import OrganizationHook, organization_upserted
 from polar.postgres import AsyncSession
 from polar.worker import (
@@ -23,6 +25,7 @@ from polar.worker import (
 )
 
 from .. import service, types
+from ..ingestion import webhook_ingestion, webhook_payload
 from .utils import (
     get_organization_and_repo,
     github_rate_limit_retry,
@@ -81,6 +84,22 @@ class UnknownIssueTransferOrganization(GitHubTasksWebhookError):
         super().__init__(message)
 
 
+def is_stale_payload(
+    record: Issue | PullRequest | None, updated_at: datetime | None
+) -> bool:
+    """
+    Whether the payload is older than the stored record.
+
+    Coalesced events run once their window is over, possibly after a later event.
+    """
+    return (
+        record is not None
+        and record.issue_modified_at is not None
+        and updated_at is not None
+        and updated_at < record.issue_modified_at
+    )
+
+
 # ------------------------------------------------------------------------------
 # ORGANIZATIONS
 # ------------------------------------------------------------------------------
@@ -129,6 +148,7 @@ async def organization_synchronize_members(
 
 
 @task(name="github.webhook.organization.renamed")
+@webhook_payload
 async def organizations_renamed(
     ctx: JobContext,
     scope: Literal["organization"],
@@ -146,6 +166,7 @@ async def organizations_renamed(
 
 
 @task(name="github.webhook.organization.member_added")
+@webhook_payload
 async def organizations_member_added(
     ctx: JobContext,
     scope: Literal["organization"],
@@ -163,6 +184,7 @@ async def organizations_member_added(
 
 
 @task(name="github.webhook.organization.member_removed")
+@webhook_payload
 async def organizations_member_removed(
     ctx: JobContext,
     scope: Literal["organization"],
@@ -271,6 +293,7 @@ async def remove_repositories(
 
 
 @task("github.webhook.installation_repositories.added")
+@webhook_payload
 async def repositories_added(
     ctx: JobContext,
     scope: Literal["installation_repositories"],
@@ -288,6 +311,7 @@ async def repositories_added(
 
 
 @task(name="github.webhook.installation_repositories.removed")
+@webhook_payload
 async def repositories_removed(
     ctx: JobContext,
     scope: Literal["installation_repositories"],
@@ -305,6 +329,7 @@ async def repositories_removed(
 
 
 @task(name="github.webhook.public")
+@webhook_payload
 async def repositories_public(
     ctx: JobContext,
     scope: Literal["public"],
@@ -322,6 +347,7 @@ async def repositories_public(
 
 
 @task(name="github.webhook.repository.renamed")
+@webhook_payload
 async def repositories_renamed(
     ctx: JobContext,
     scope: Literal["repository"],
@@ -339,6 +365,7 @@ async def repositories_renamed(
 
 
 @task(name="github.webhook.repository.edited")
+@webhook_payload
 async def repositories_redited(
     ctx: JobContext,
     scope: Literal["repository"],
@@ -356,6 +383,7 @@ async def repositories_redited(
 
 
 @task(name="github.webhook.repository.deleted")
+@webhook_payload
 async def repositories_deleted(
     ctx: JobContext,
     scope: Literal["repository"],
@@ -373,6 +401,7 @@ async def repositories_deleted(
 
 
 @task(name="github.webhook.repository.archived")
+@webhook_payload
 async def repositories_archived(
     ctx: JobContext,
     scope: Literal["repository"],
@@ -390,6 +419,7 @@ async def repositories_archived(
 
 
 @task(name="github.webhook.repository.transferred")
+@webhook_payload
 async def repositories_transferred(
     ctx: JobContext,
     scope: Literal["repository"],
@@ -584,6 +614,7 @@ async def handle_issue_transferred(
 
 
 @task("github.webhook.issues.opened")
+@webhook_payload
 async def issue_opened(
     ctx: JobContext,
     scope: Literal["issues"],
@@ -606,6 +637,7 @@ async def issue_opened(
 
 
 @task("github.webhook.issues.reopened")
+@webhook_payload
 async def issue_reopened(
     ctx: JobContext,
     scope: Literal["issues"],
@@ -628,6 +660,7 @@ async def issue_reopened(
 
 
 @task("github.webhook.issues.edited")
+@webhook_payload
 async def issue_edited(
     ctx: JobContext,
     scope: Literal["issues"],
@@ -642,14 +675,31 @@ async def issue_edited(
             raise Exception("unexpected webhook payload")
 
         async with AsyncSessionMaker(ctx) as session:
-            issue = await handle_issue(session, scope, action, parsed)
+            await issue_edited_async(session, scope, action, parsed)
 
-            # Add badge if has label
-            if issue.has_pledge_badge_label:
-                await update_issue_embed(session, issue=issue, embed=True)
+
+async def issue_edited_async(
+    session: AsyncSession,
+    scope: str,
+    action: str,
+    event: types.WebhookIssuesEdited,
+) -> None:
+    existing_issue = await service.github_issue.get_by_external_id(
+        session, event.issue.id
+    )
+    if is_stale_payload(existing_issue, event.issue.updated_at):
+        log.info("github.webhook.stale_payload", external_id=event.issue.id)
+        return
+
+    issue = await handle_issue(session, scope, action, event)
+
+    # Add badge if has label
+    if issue.has_pledge_badge_label:
+        await update_issue_embed(session, issue=issue, embed=True)
 
 
 @task("github.webhook.issues.closed")
+@webhook_payload
 async def issue_closed(
     ctx: JobContext,
     scope: Literal["issues"],
@@ -668,6 +718,7 @@ async def issue_closed(
 
 
 @task("github.webhook.issues.deleted")
+@webhook_payload
 async def issue_deleted(
     ctx: JobContext,
     scope: Literal["issues"],
@@ -696,6 +747,7 @@ async def issue_deleted(
 
 
 @task("github.webhook.issues.transferred")
+@webhook_payload
 async def issue_transferred(
     ctx: JobContext,
     scope: Literal["issues"],
@@ -714,6 +766,7 @@ async def issue_transferred(
 
 
 @task("github.webhook.issues.labeled")
+@webhook_payload
 async def issue_labeled(
     ctx: JobContext,
     scope: Literal["issues"],
@@ -732,6 +785,7 @@ async def issue_labeled(
 
 
 @task("github.webhook.issues.unlabeled")
+@webhook_payload
 async def issue_unlabeled(
     ctx: JobContext,
     scope: Literal["issues"],
@@ -810,6 +864,10 @@ async def issue_labeled_async(
         )
         return
 
+    if is_stale_payload(issue, event.issue.updated_at):
+        log.info("github.webhook.stale_payload", external_id=event.issue.id)
+        return
+
     repository = await service.github_repository.get(session, issue.repository_id)
     assert repository is not None
 
@@ -818,6 +876,8 @@ async def issue_labeled_async(
         labels = []
 
     had_polar_label = issue.has_pledge_badge_label
+    # So an older payload handled afterwards is detected as stale
+    issue.issue_modified_at = event.issue.updated_at
     issue = await service.github_issue.set_labels(session, issue, repository, labels)
 
     log.info(
@@ -829,17 +889,19 @@ async def issue_labeled_async(
         should_have_polar_label=issue.has_pledge_badge_label,
     )
 
-    # Add/remove polar badge if label has changed
+    # Add/remove polar badge if label has changed. Coalesced events only carry
+    # the last label, so compare the label states too.
     if (
         event.label
         and event.label.name.lower() == repository.pledge_badge_label.lower()
-    ):
+    ) or had_polar_label != issue.has_pledge_badge_label:
         await update_issue_embed(
             session, issue=issue, embed=issue.has_pledge_badge_label
         )
 
 
 @task("github.webhook.issues.assigned")
+@webhook_payload
 async def issue_assigned(
     ctx: JobContext,
     scope: Literal["issues"],
@@ -858,6 +920,7 @@ async def issue_assigned(
 
 
 @task("github.webhook.issues.unassigned")
+@webhook_payload
 async def issue_unassigned(
     ctx: JobContext,
     scope: Literal["issues"],
@@ -888,6 +951,10 @@ async def issue_assigned_async(
         )
         return
 
+    if is_stale_payload(issue, event.issue.updated_at):
+        log.info("github.webhook.stale_payload", external_id=event.issue.id)
+        return
+
     # modify assignee
 
     assignee = event.issue.assignee
@@ -938,6 +1005,13 @@ async def handle_pull_request(
     if not repository:
         return None
 
+    pull_request = await service.github_pull_request.get_by_external_id(
+        session, event.pull_request.id
+    )
+    if is_stale_payload(pull_request, event.pull_request.updated_at):
+        log.info("github.webhook.stale_payload", external_id=event.pull_request.id)
+        return None
+
     await service.github_pull_request.store_many_full(
         session, [event.pull_request], organization=organization, repository=repository
     )
@@ -946,6 +1020,7 @@ async def handle_pull_request(
 
 
 @task("github.webhook.pull_request.opened")
+@webhook_payload
 async def pull_request_opened(
     ctx: JobContext,
     scope: Literal["pull_request"],
@@ -964,6 +1039,7 @@ async def pull_request_opened(
 
 
 @task("github.webhook.pull_request.edited")
+@webhook_payload
 async def pull_request_edited(
     ctx: JobContext,
     scope: Literal["pull_request"],
@@ -982,6 +1058,7 @@ async def pull_request_edited(
 
 
 @task("github.webhook.pull_request.closed")
+@webhook_payload
 async def pull_request_closed(
     ctx: JobContext,
     scope: Literal["pull_request"],
@@ -1000,6 +1077,7 @@ async def pull_request_closed(
 
 
 @task("github.webhook.pull_request.reopened")
+@webhook_payload
 async def pull_request_reopened(
     ctx: JobContext,
     scope: Literal["pull_request"],
@@ -1018,6 +1096,7 @@ async def pull_request_reopened(
 
 
 @task("github.webhook.pull_request.synchronize")
+@webhook_payload
 async def pull_request_synchronize(
     ctx: JobContext,
     scope: Literal["pull_request"],
@@ -1035,12 +1114,61 @@ async def pull_request_synchronize(
             await handle_pull_request(session, scope, action, parsed)
 
 
+# ------------------------------------------------------------------------------
+# COALESCED
+# ------------------------------------------------------------------------------
+
+
+async def handle_coalesced(
+    session: AsyncSession, scope: str, action: str, payload: dict[str, Any]
+) -> None:
+    parsed = github.webhooks.parse_obj(scope, payload)
+    if isinstance(parsed, types.WebhookIssuesEdited):
+        await issue_edited_async(session, scope, action, parsed)
+    elif isinstance(parsed, types.WebhookIssuesLabeled | types.WebhookIssuesUnlabeled):
+        await issue_labeled_async(session, scope, action, parsed)
+    elif isinstance(
+        parsed, types.WebhookIssuesAssigned | types.WebhookIssuesUnassigned
+    ):
+        await issue_assigned_async(session, scope, action, parsed)
+    elif isinstance(
+        parsed, types.WebhookPullRequestEdited | types.WebhookPullRequestSynchronize
+    ):
+        await handle_pull_request(session, scope, action, parsed)
+    else:
+        log.error("github.webhook.unexpected_type")
+        raise Exception("unexpected webhook payload")
+
+
+@task("github.webhook.coalesced")
+async def coalesced(
+    ctx: JobContext,
+    scope: Literal["issues", "pull_request"],
+    key: str,
+    polar_context: PolarWorkerContext,
+) -> None:
+    """
+    Handle the events of a resource received within a coalescing window,
+    one by one in order, so they don't race with each other.
+    """
+    with polar_context.to_execution_context():
+        payloads = await webhook_ingestion.load_coalesced_payloads(key)
+        if not payloads:
+            log.error("github.webhook.payload_not_found", key=key)
+            return
+
+        async with AsyncSessionMaker(ctx) as session:
+            for payload in payloads:
+                await handle_coalesced(session, scope, payload["action"], payload)
+
+
 # ------------------------------------------------------------------------------
 # INSTALLATION
 # ------------------------------------------------------------------------------
 
 
 @task("github.webhook.installation.created")
+@webhook_payload
 async def installation_created(
     ctx: JobContext,
     scope: Literal["installation"],
@@ -1059,6 +1187,7 @@ async def installation_created(
 
 
 @task("github.webhook.installation.new_permissions_accepted")
+@webhook_payload
 async def installation_new_permissions_accepted(
     ctx: JobContext,
     scope: Literal["installation"],
@@ -1094,6 +1223,7 @@ async def installation_new_permissions_accepted(
 
 
 @task("github.webhook.installation.deleted")
+@webhook_payload
 async def installation_delete(
     ctx: JobContext,
     scope: Literal["installation"],
@@ -1121,6 +1251,7 @@ async def installation_delete(
 
 
 @task("github.webhook.installation.suspend")
+@webhook_payload
 async def installation_suspend(
     ctx: JobContext,
     scope: Literal["installation"],
@@ -1146,6 +1277,7 @@ async def installation_suspend(
 
 
 @task("github.webhook.installation.unsuspend")
+@webhook_payload
 async def installation_unsuspend(
     ctx: JobContext,
     scope: Literal["installation"],
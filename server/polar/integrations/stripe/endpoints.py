@@ -6,7 +6,11 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from starlette.responses import RedirectResponse
 
 from polar.config import settings
-from polar.worker import enqueue_job
+from polar.postgres import AsyncSession, get_db_session
+
+from .webhook_event import enqueue as enqueue_event
+from .webhook_event import is_pending
+from .webhook_event import stripe_webhook_event as stripe_webhook_event_service
 
 log = structlog.get_logger()
 
@@ -29,11 +33,19 @@ DIRECT_IMPLEMENTED_WEBHOOKS = {
 CONNECT_IMPLEMENTED_WEBHOOKS = {"account.updated", "payout.paid"}
 
 
-async def enqueue(event: stripe.Event) -> None:
-    event_type: str = event["type"]
-    task_name = f"stripe.webhook.{event_type}"
-    enqueue_job(task_name, event)
-    log.info("stripe.webhook.queued", task_name=task_name)
+async def enqueue(session: AsyncSession, event: stripe.Event) -> None:
+    created = await stripe_webhook_event_service.create(session, event)
+    if not created:
+        webhook_event = await stripe_webhook_event_service.get_by_stripe_id(
+            session, event["id"]
+        )
+        # Still pending: the first job may never have been pushed.
+        # Processing is idempotent, so enqueuing it again is safe.
+        if webhook_event is None or not is_pending(webhook_event):
+            log.info("stripe.webhook.duplicate", id=event["id"], type=event["type"])
+            return
+    enqueue_event(event["id"])
+    log.info("stripe.webhook.queued", id=event["id"], type=event["type"])
 
 
 @router.get("/refresh")
@@ -64,9 +76,10 @@ class WebhookEventGetter:
 @router.post("/webhook", status_code=202)
 async def webhook(
     event: stripe.Event = Depends(WebhookEventGetter(settings.STRIPE_WEBHOOK_SECRET)),
+    session: AsyncSession = Depends(get_db_session),
 ) -> None:
     if event["type"] in DIRECT_IMPLEMENTED_WEBHOOKS:
-        await enqueue(event)
+        await enqueue(session, event)
 
 
 @router.post("/webhook-connect", status_code=202)
@@ -74,6 +87,7 @@ async def webhook_connect(
     event: stripe.Event = Depends(
         WebhookEventGetter(settings.STRIPE_CONNECT_WEBHOOK_SECRET)
     ),
+    session: AsyncSession = Depends(get_db_session),
 ) -> None:
     if event["type"] in CONNECT_IMPLEMENTED_WEBHOOKS:
-        return await enqueue(event)
+        return await enqueue(session, event)
@@ -1,10 +1,17 @@
+import asyncio
+import contextvars
+import functools
+import time
 import uuid
-from collections.abc import Iterator
-from typing import Literal, TypedDict, Unpack, cast
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Literal, ParamSpec, TypedDict, TypeVar, Unpack, cast
 from uuid import UUID
 
 import stripe as stripe_lib
+from prometheus_client import Histogram
 from stripe import error as stripe_lib_error
+from stripe.http_client import RequestsClient
 
 from polar.account.schemas import AccountCreate
 from polar.config import settings
@@ -21,9 +28,65 @@ from polar.models.user import User
 from polar.postgres import AsyncSession, sql
 
 stripe_lib.api_key = settings.STRIPE_SECRET_KEY
+if settings.STRIPE_API_BASE is not None:
+    stripe_lib.api_base = settings.STRIPE_API_BASE
+# Retried POST requests are sent with an automatic idempotency key
+stripe_lib.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
+# Each thread of the executor keeps its own pooled HTTP session
+stripe_lib.default_http_client = RequestsClient(timeout=settings.STRIPE_TIMEOUT)
 
 StripeError = stripe_lib_error.StripeError
 
+P = ParamSpec("P")
+R = TypeVar("R")
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.STRIPE_MAX_CONCURRENT_REQUESTS,
+    thread_name_prefix="stripe",
+)
+
+stripe_request_duration_seconds = Histogram(
+    "stripe_request_duration_seconds",
+    "Time spent waiting for Stripe API calls",
+    ["operation"],
+)
+
+
+async def _call(
+    operation: str, fn: Callable[P, R], *args: P.args, **kwargs: P.kwargs
+) -> R:
+    """
+    Run a blocking call of the Stripe SDK in the Stripe thread pool,
+    so it doesn't block the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    start = time.perf_counter()
+    try:
+        return await loop.run_in_executor(
+            _executor, functools.partial(context.run, fn, *args, **kwargs)
+        )
+    finally:
+        stripe_request_duration_seconds.labels(operation=operation).observe(
+            time.perf_counter() - start
+        )
+
+
+async def _auto_paging_iter(
+    operation: str, fn: Callable[..., stripe_lib.ListObject[Any]], **params: Any
+) -> AsyncIterator[Any]:
+    """
+    Async equivalent of `ListObject.auto_paging_iter`,
+    fetching each page in the Stripe thread pool.
+    """
+    list_object = await _call(operation, fn, **params)
+    while True:
+        for item in list_object.data:
+            yield item
+        if not list_object.has_more:
+            return
+        list_object = await _call(operation, list_object.next_page)
+
 
 class ProductUpdateKwargs(TypedDict, total=False):
     name: str
@@ -38,7 +101,7 @@ class MissingOrganizationBillingEmail(PolarError):
 
 
 class StripeService:
-    def create_anonymous_intent(
+    async def create_anonymous_intent(
         self,
         amount: int,
         transfer_group: str,
@@ -53,7 +116,9 @@ class StripeService:
             anonymous=True,
             anonymous_email=anonymous_email,
         )
-        return stripe_lib.PaymentIntent.create(
+        return await _call(
+            "PaymentIntent.create",
+            stripe_lib.PaymentIntent.create,
             amount=amount,
             currency="USD",
             transfer_group=transfer_group,
@@ -88,7 +153,9 @@ class StripeService:
         if on_behalf_of_organization_id:
             metadata.on_behalf_of_organization_id = on_behalf_of_organization_id
 
-        return stripe_lib.PaymentIntent.create(
+        return await _call(
+            "PaymentIntent.create",
+            stripe_lib.PaymentIntent.create,
             amount=amount,
             currency="USD",
             transfer_group=transfer_group,
@@ -98,7 +165,7 @@ class StripeService:
             description=f"Pledge to {pledge_issue_org.name}/{pledge_issue_repo.name}#{pledge_issue.number}",  # noqa: E501
         )
 
-    def create_organization_intent(
+    async def create_organization_intent(
         self,
         amount: int,
         transfer_group: str,
@@ -116,7 +183,9 @@ class StripeService:
             organization_name=organization.name,
         )
 
-        return stripe_lib.PaymentIntent.create(
+        return await _call(
+            "PaymentIntent.create",
+            stripe_lib.PaymentIntent.create,
             amount=amount,
             currency="USD",
             transfer_group=transfer_group,
@@ -124,7 +193,7 @@ class StripeService:
             receipt_email=user.email,
         )
 
-    def modify_intent(
+    async def modify_intent(
         self,
         id: str,
         amount: int,
@@ -138,7 +207,9 @@ class StripeService:
             else "",  # Set to empty string to unset the value on Stripe.
         )
 
-        return stripe_lib.PaymentIntent.modify(
+        return await _call(
+            "PaymentIntent.modify",
+            stripe_lib.PaymentIntent.modify,
             id,
             amount=amount,
             receipt_email=receipt_email,
@@ -146,10 +217,12 @@ class StripeService:
             metadata=metadata.model_dump(exclude_none=True),
         )
 
-    def retrieve_intent(self, id: str) -> stripe_lib.PaymentIntent:
-        return stripe_lib.PaymentIntent.retrieve(id)
+    async def retrieve_intent(self, id: str) -> stripe_lib.PaymentIntent:
+        return await _call(
+            "PaymentIntent.retrieve", stripe_lib.PaymentIntent.retrieve, id
+        )
 
-    def create_account(
+    async def create_account(
         self, account: AccountCreate, name: str | None
     ) -> stripe_lib.Account:
         create_params: stripe_lib.Account.CreateParams = {
@@ -166,45 +239,51 @@ class StripeService:
 
         if account.country != "US":
             create_params["tos_acceptance"] = {"service_agreement": "recipient"}
-        return stripe_lib.Account.create(**create_params)
+        return await _call("Account.create", stripe_lib.Account.create, **create_params)
 
-    def update_account(self, id: str, name: str | None) -> None:
+    async def update_account(self, id: str, name: str | None) -> None:
         obj = {}
         if name:
             obj["business_profile"] = {"name": name}
-        stripe_lib.Account.modify(id, **obj)
+        await _call("Account.modify", stripe_lib.Account.modify, id, **obj)
 
-    def retrieve_account(self, id: str) -> stripe_lib.Account:
-        return stripe_lib.Account.retrieve(id)
+    async def retrieve_account(self, id: str) -> stripe_lib.Account:
+        return await _call("Account.retrieve", stripe_lib.Account.retrieve, id)
 
-    def retrieve_balance(self, id: str) -> tuple[str, int]:
+    async def retrieve_balance(self, id: str) -> tuple[str, int]:
         # Return available balance in the account's default currency (we assume that
         # there is no balance in other currencies for now)
-        account = stripe_lib.Account.retrieve(id)
-        balance = stripe_lib.Balance.retrieve(stripe_account=id)
+        account = await _call("Account.retrieve", stripe_lib.Account.retrieve, id)
+        balance = await _call(
+            "Balance.retrieve", stripe_lib.Balance.retrieve, stripe_account=id
+        )
         for b in balance.available:
             if b.currency == account.default_currency:
                 return (b.currency, b.amount)
         return (cast(str, account.default_currency), 0)
 
-    def create_account_link(
+    async def create_account_link(
         self, stripe_id: str, return_path: str
     ) -> stripe_lib.AccountLink:
         refresh_url = settings.generate_external_url(
             f"/integrations/stripe/refresh?return_path={return_path}"
         )
         return_url = settings.generate_frontend_url(return_path)
-        return stripe_lib.AccountLink.create(
+        return await _call(
+            "AccountLink.create",
+            stripe_lib.AccountLink.create,
             account=stripe_id,
             refresh_url=refresh_url,
             return_url=return_url,
             type="account_onboarding",
         )
 
-    def create_login_link(self, stripe_id: str) -> stripe_lib.LoginLink:
-        return stripe_lib.Account.create_login_link(stripe_id)
+    async def create_login_link(self, stripe_id: str) -> stripe_lib.LoginLink:
+        return await _call(
+            "Account.create_login_link", stripe_lib.Account.create_login_link, stripe_id
+        )
 
-    def transfer(
+    async def transfer(
         self,
         destination_stripe_id: str,
         amount: int,
@@ -212,6 +291,7 @@ class StripeService:
         source_transaction: str | None = None,
         transfer_group: str | None = None,
         metadata: dict[str, str] | None = None,
+        idempotency_key: str | None = None,
     ) -> stripe_lib.Transfer:
         create_params: stripe_lib.Transfer.CreateParams = {
             "amount": amount,
@@ -223,26 +303,40 @@ class StripeService:
             create_params["source_transaction"] = source_transaction
         if transfer_group is not None:
             create_params["transfer_group"] = transfer_group
-        return stripe_lib.Transfer.create(**create_params)
+        if idempotency_key is not None:
+            create_params["idempotency_key"] = idempotency_key
+        return await _call(
+            "Transfer.create", stripe_lib.Transfer.create, **create_params
+        )
 
-    def reverse_transfer(
+    async def reverse_transfer(
         self,
         transfer_id: str,
         amount: int,
         *,
         metadata: dict[str, str] | None = None,
+        idempotency_key: str | None = None,
     ) -> stripe_lib.Reversal:
         create_params: stripe_lib.Transfer.CreateReversalParams = {
             "amount": amount,
             "metadata": metadata or {},
         }
-        return stripe_lib.Transfer.create_reversal(transfer_id, **create_params)
+        if idempotency_key is not None:
+            create_params["idempotency_key"] = idempotency_key
+        return await _call(
+            "Transfer.create_reversal",
+            stripe_lib.Transfer.create_reversal,
+            transfer_id,
+            **create_params,
+        )
 
-    def get_transfer(self, id: str) -> stripe_lib.Transfer:
-        return stripe_lib.Transfer.retrieve(id)
+    async def get_transfer(self, id: str) -> stripe_lib.Transfer:
+        return await _call("Transfer.retrieve", stripe_lib.Transfer.retrieve, id)
 
-    def get_customer(self, customer_id: str) -> stripe_lib.Customer:
-        return stripe_lib.Customer.retrieve(customer_id)
+    async def get_customer(self, customer_id: str) -> stripe_lib.Customer:
+        return await _call(
+            "Customer.retrieve", stripe_lib.Customer.retrieve, customer_id
+        )
 
     async def get_or_create_user_customer(
         self,
@@ -250,9 +344,11 @@ class StripeService:
         user: User,
     ) -> stripe_lib.Customer | None:
         if user.stripe_customer_id:
-            return self.get_customer(user.stripe_customer_id)
+            return await self.get_customer(user.stripe_customer_id)
 
-        customer = stripe_lib.Customer.create(
+        customer = await _call(
+            "Customer.create",
+            stripe_lib.Customer.create,
             name=user.username_or_email,
             email=user.email,
             metadata={
@@ -279,12 +375,14 @@ class StripeService:
         self, session: AsyncSession, org: Organization
     ) -> stripe_lib.Customer | None:
         if org.stripe_customer_id:
-            return self.get_customer(org.stripe_customer_id)
+            return await self.get_customer(org.stripe_customer_id)
 
         if org.billing_email is None:
             raise MissingOrganizationBillingEmail(org.id)
 
-        customer = stripe_lib.Customer.create(
+        customer = await _call(
+            "Customer.create",
+            stripe_lib.Customer.create,
             name=org.name,
             email=org.billing_email,
             metadata={
@@ -315,15 +413,17 @@ class StripeService:
         if not customer:
             return []
 
-        payment_methods = stripe_lib.PaymentMethod.list(
+        payment_methods = await _call(
+            "PaymentMethod.list",
+            stripe_lib.PaymentMethod.list,
             customer=customer.id,
             type="card",
         )
 
         return payment_methods.data
 
-    def detach_payment_method(self, id: str) -> stripe_lib.PaymentMethod:
-        return stripe_lib.PaymentMethod.detach(id)
+    async def detach_payment_method(self, id: str) -> stripe_lib.PaymentMethod:
+        return await _call("PaymentMethod.detach", stripe_lib.PaymentMethod.detach, id)
 
     async def create_user_pledge_invoice(
         self,
@@ -340,12 +440,14 @@ class StripeService:
 
         # Sync user email
         if not customer.email or customer.email != user.email:
-            stripe_lib.Customer.modify(
+            await _call(
+                "Customer.modify",
+                stripe_lib.Customer.modify,
                 customer.id,
                 email=user.email,
             )
 
-        return self.create_pledge_invoice(
+        return await self.create_pledge_invoice(
             customer,
             pledge,
             pledge_issue,
@@ -371,12 +473,14 @@ class StripeService:
 
         # Sync billing email
         if not customer.email or customer.email != organization.billing_email:
-            stripe_lib.Customer.modify(
+            await _call(
+                "Customer.modify",
+                stripe_lib.Customer.modify,
                 customer.id,
                 email=organization.billing_email,
             )
 
-        return self.create_pledge_invoice(
+        return await self.create_pledge_invoice(
             customer,
             pledge,
             pledge_issue,
@@ -384,7 +488,7 @@ class StripeService:
             pledge_issue_org,
         )
 
-    def create_pledge_invoice(
+    async def create_pledge_invoice(
         self,
         customer: stripe_lib.Customer,
         pledge: Pledge,
@@ -393,7 +497,9 @@ class StripeService:
         pledge_issue_org: Organization,
     ) -> stripe_lib.Invoice | None:
         # Create an invoice, then add line items to it
-        invoice = stripe_lib.Invoice.create(
+        invoice = await _call(
+            "Invoice.create",
+            stripe_lib.Invoice.create,
             customer=customer.id,
             description=f"""You pledged to {pledge_issue_org.name}/{pledge_issue_repo.name}#{pledge_issue.number} on {pledge.created_at.strftime('%Y-%m-%d')}, which has now been fixed!
 
@@ -412,7 +518,9 @@ Thank you for your support!
 
         assert invoice.id is not None
 
-        stripe_lib.InvoiceItem.create(
+        await _call(
+            "InvoiceItem.create",
+            stripe_lib.InvoiceItem.create,
             invoice=invoice.id,
             customer=customer.id,
             amount=pledge.amount_including_fee,
@@ -423,9 +531,16 @@ Thank you for your support!
             },
         )
 
-        stripe_lib.Invoice.finalize_invoice(invoice.id, auto_advance=True)
+        await _call(
+            "Invoice.finalize_invoice",
+            stripe_lib.Invoice.finalize_invoice,
+            invoice.id,
+            auto_advance=True,
+        )
 
-        sent_invoice = stripe_lib.Invoice.send_invoice(invoice.id)
+        sent_invoice = await _call(
+            "Invoice.send_invoice", stripe_lib.Invoice.send_invoice, invoice.id
+        )
 
         return sent_invoice
 
@@ -438,7 +553,9 @@ Thank you for your support!
         if not customer:
             return None
 
-        return stripe_lib.billing_portal.Session.create(
+        return await _call(
+            "billing_portal.Session.create",
+            stripe_lib.billing_portal.Session.create,
             customer=customer.id,
             return_url=f"{settings.FRONTEND_BASE_URL}/settings",
         )
@@ -452,12 +569,14 @@ Thank you for your support!
         if not customer:
             return None
 
-        return stripe_lib.billing_portal.Session.create(
+        return await _call(
+            "billing_portal.Session.create",
+            stripe_lib.billing_portal.Session.create,
             customer=customer.id,
             return_url=f"{settings.FRONTEND_BASE_URL}/team/{org.name}/settings",
         )
 
-    def create_product_with_price(
+    async def create_product_with_price(
         self,
         name: str,
         *,
@@ -477,9 +596,9 @@ Thank you for your support!
         }
         if description is not None:
             create_params["description"] = description
-        return stripe_lib.Product.create(**create_params)
+        return await _call("Product.create", stripe_lib.Product.create, **create_params)
 
-    def create_price_for_product(
+    async def create_price_for_product(
         self,
         product: str,
         price_amount: int,
@@ -487,28 +606,39 @@ Thank you for your support!
         *,
         set_default: bool = False,
     ) -> stripe_lib.Price:
-        price = stripe_lib.Price.create(
+        price = await _call(
+            "Price.create",
+            stripe_lib.Price.create,
             currency=price_currency,
             product=product,
             unit_amount=price_amount,
             recurring={"interval": "month"},
         )
         if set_default:
-            stripe_lib.Product.modify(product, default_price=price.id)
+            await _call(
+                "Product.modify",
+                stripe_lib.Product.modify,
+                product,
+                default_price=price.id,
+            )
         return price
 
-    def update_product(
+    async def update_product(
         self, product: str, **kwargs: Unpack[ProductUpdateKwargs]
     ) -> stripe_lib.Product:
-        return stripe_lib.Product.modify(product, **kwargs)
+        return await _call(
+            "Product.modify", stripe_lib.Product.modify, product, **kwargs
+        )
 
-    def archive_product(self, id: str) -> stripe_lib.Product:
-        return stripe_lib.Product.modify(id, active=False)
+    async def archive_product(self, id: str) -> stripe_lib.Product:
+        return await _call(
+            "Product.modify", stripe_lib.Product.modify, id, active=False
+        )
 
-    def archive_price(self, id: str) -> stripe_lib.Price:
-        return stripe_lib.Price.modify(id, active=False)
+    async def archive_price(self, id: str) -> stripe_lib.Price:
+        return await _call("Price.modify", stripe_lib.Price.modify, id, active=False)
 
-    def create_subscription_checkout_session(
+    async def create_subscription_checkout_session(
         self,
         price: str,
         success_url: str,
@@ -540,18 +670,31 @@ Thank you for your support!
             create_params["customer_email"] = customer_email
         if subscription_metadata is not None:
             create_params["subscription_data"] = {"metadata": subscription_metadata}
-        return stripe_lib.checkout.Session.create(**create_params)
+        return await _call(
+            "checkout.Session.create",
+            stripe_lib.checkout.Session.create,
+            **create_params,
+        )
 
-    def get_checkout_session(self, id: str) -> stripe_lib.checkout.Session:
-        return stripe_lib.checkout.Session.retrieve(id)
+    async def get_checkout_session(self, id: str) -> stripe_lib.checkout.Session:
+        return await _call(
+            "checkout.Session.retrieve", stripe_lib.checkout.Session.retrieve, id
+        )
 
-    def get_subscription(self, id: str) -> stripe_lib.Subscription:
-        return stripe_lib.Subscription.retrieve(id, expand=["latest_invoice"])
+    async def get_subscription(self, id: str) -> stripe_lib.Subscription:
+        return await _call(
+            "Subscription.retrieve",
+            stripe_lib.Subscription.retrieve,
+            id,
+            expand=["latest_invoice"],
+        )
 
-    def update_subscription_price(
+    async def update_subscription_price(
         self, id: str, *, old_price: str, new_price: str
     ) -> stripe_lib.Subscription:
-        subscription = stripe_lib.Subscription.retrieve(id)
+        subscription = await _call(
+            "Subscription.retrieve", stripe_lib.Subscription.retrieve, id
+        )
 
         old_items = subscription["items"]
         new_items: list[stripe_lib.Subscription.ModifyParamsItem] = []
@@ -560,22 +703,31 @@ Thank you for your support!
                 new_items.append({"id": item.id, "deleted": True})
         new_items.append({"price": new_price, "quantity": 1})
 
-        return stripe_lib.Subscription.modify(id, items=new_items)
+        return await _call(
+            "Subscription.modify", stripe_lib.Subscription.modify, id, items=new_items
+        )
 
-    def cancel_subscription(self, id: str) -> stripe_lib.Subscription:
-        return stripe_lib.Subscription.modify(
+    async def cancel_subscription(self, id: str) -> stripe_lib.Subscription:
+        return await _call(
+            "Subscription.modify",
+            stripe_lib.Subscription.modify,
             id,
             cancel_at_period_end=True,
         )
 
-    def update_invoice(
+    async def update_invoice(
         self, id: str, *, metadata: dict[str, str] | None = None
     ) -> stripe_lib.Invoice:
-        return stripe_lib.Invoice.modify(id, metadata=metadata or {})
+        return await _call(
+            "Invoice.modify", stripe_lib.Invoice.modify, id, metadata=metadata or {}
+        )
 
-    def get_customer_credit_balance(self, customer_id: str) -> int:
-        transactions = stripe_lib.Customer.list_balance_transactions(
-            customer_id, limit=1
+    async def get_customer_credit_balance(self, customer_id: str) -> int:
+        transactions = await _call(
+            "Customer.list_balance_transactions",
+            stripe_lib.Customer.list_balance_transactions,
+            customer_id,
+            limit=1,
         )
 
         for transaction in transactions:
@@ -592,8 +744,11 @@ Thank you for your support!
         if not customer:
             return 0
 
-        transactions = stripe_lib.Customer.list_balance_transactions(
-            customer.id, limit=1
+        transactions = await _call(
+            "Customer.list_balance_transactions",
+            stripe_lib.Customer.list_balance_transactions,
+            customer.id,
+            limit=1,
         )
 
         for transaction in transactions:
@@ -601,11 +756,18 @@ Thank you for your support!
 
         return 0
 
-    def get_balance_transaction(self, id: str) -> stripe_lib.BalanceTransaction:
-        return stripe_lib.BalanceTransaction.retrieve(id)
+    async def get_balance_transaction(self, id: str) -> stripe_lib.BalanceTransaction:
+        return await _call(
+            "BalanceTransaction.retrieve", stripe_lib.BalanceTransaction.retrieve, id
+        )
 
-    def get_invoice(self, id: str) -> stripe_lib.Invoice:
-        return stripe_lib.Invoice.retrieve(id, expand=["total_tax_amounts.tax_rate"])
+    async def get_invoice(self, id: str) -> stripe_lib.Invoice:
+        return await _call(
+            "Invoice.retrieve",
+            stripe_lib.Invoice.retrieve,
+            id,
+            expand=["total_tax_amounts.tax_rate"],
+        )
 
     def list_balance_transactions(
         self,
@@ -613,7 +775,7 @@ Thank you for your support!
         account_id: str | None = None,
         payout: str | None = None,
         type: str | None = None,
-    ) -> Iterator[stripe_lib.BalanceTransaction]:
+    ) -> AsyncIterator[stripe_lib.BalanceTransaction]:
         params: stripe_lib.BalanceTransaction.ListParams = {
             "limit": 100,
             "stripe_account": account_id,
@@ -624,66 +786,84 @@ Thank you for your support!
         if type is not None:
             params["type"] = type
 
-        return stripe_lib.BalanceTransaction.list(**params).auto_paging_iter()
+        return _auto_paging_iter(
+            "BalanceTransaction.list", stripe_lib.BalanceTransaction.list, **params
+        )
 
     def list_refunds(
         self,
         *,
         charge: str | None = None,
-    ) -> Iterator[stripe_lib.Refund]:
+    ) -> AsyncIterator[stripe_lib.Refund]:
         params: stripe_lib.Refund.ListParams = {"limit": 100}
         if charge is not None:
             params["charge"] = charge  # type: ignore
 
-        return stripe_lib.Refund.list(**params).auto_paging_iter()
+        return _auto_paging_iter("Refund.list", stripe_lib.Refund.list, **params)
 
-    def get_charge(
+    async def get_charge(
         self,
         id: str,
         *,
         stripe_account: str | None = None,
         expand: list[str] | None = None,
     ) -> stripe_lib.Charge:
-        return stripe_lib.Charge.retrieve(
-            id, stripe_account=stripe_account, expand=expand or []
+        return await _call(
+            "Charge.retrieve",
+            stripe_lib.Charge.retrieve,
+            id,
+            stripe_account=stripe_account,
+            expand=expand or [],
         )
 
-    def get_refund(
+    async def get_refund(
         self,
         id: str,
         *,
         stripe_account: str | None = None,
         expand: list[str] | None = None,
     ) -> stripe_lib.Refund:
-        return stripe_lib.Refund.retrieve(
-            id, stripe_account=stripe_account, expand=expand or []
+        return await _call(
+            "Refund.retrieve",
+            stripe_lib.Refund.retrieve,
+            id,
+            stripe_account=stripe_account,
+            expand=expand or [],
         )
 
-    def get_dispute(
+    async def get_dispute(
         self,
         id: str,
         *,
         stripe_account: str | None = None,
         expand: list[str] | None = None,
     ) -> stripe_lib.Dispute:
-        return stripe_lib.Dispute.retrieve(
-            id, stripe_account=stripe_account, expand=expand or []
+        return await _call(
+            "Dispute.retrieve",
+            stripe_lib.Dispute.retrieve,
+            id,
+            stripe_account=stripe_account,
+            expand=expand or [],
         )
 
-    def create_payout(
+    async def create_payout(
         self,
         *,
         stripe_account: str,
         amount: int,
         currency: str,
         metadata: dict[str, str] | None = None,
+        idempotency_key: str | None = None,
     ) -> stripe_lib.Payout:
-        return stripe_lib.Payout.create(
-            stripe_account=stripe_account,
-            amount=amount,
-            currency=currency,
-            metadata=metadata or {},
-        )
+        create_params: stripe_lib.Payout.CreateParams = {
+            "stripe_account": stripe_account,
+            "amount": amount,
+            "currency": currency,
+            "metadata": metadata or {},
+        }
+        if idempotency_key is not None:
+            create_params["idempotency_key"] = idempotency_key
+        return await _call("Payout.create", stripe_lib.Payout.create, **create_params)
 
 
 stripe = StripeService()
@@ -1,3 +1,7 @@
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+
 import stripe
 import structlog
 from arq import Retry
@@ -8,7 +12,10 @@ from polar.integrations.stripe.schemas import (
     PaymentIntentSuccessWebhook,
     ProductType,
 )
+from polar.kit.utils import utc_now
+from polar.locker import Locker, TimeoutLockError
 from polar.pledge.service import pledge as pledge_service
+from polar.postgres import AsyncSession
 from polar.subscription.service.subscription import SubscriptionDoesNotExist
 from polar.subscription.service.subscription import subscription as subscription_service
 from polar.transaction.service.balance import PaymentTransactionForChargeDoesNotExist
@@ -33,15 +40,44 @@ from polar.transaction.service.payout import (
 from polar.transaction.service.refund import (
     refund_transaction as refund_transaction_service,
 )
-from polar.worker import AsyncSessionMaker, JobContext, PolarWorkerContext, task
+from polar.worker import (
+    AsyncSessionMaker,
+    JobContext,
+    PolarWorkerContext,
+    interval,
+    task,
+)
 
 from .service import stripe as stripe_service
+from .webhook_event import enqueue as enqueue_event
+from .webhook_event import is_pending, to_stripe_event
+from .webhook_event import stripe_webhook_event as stripe_webhook_event_service
 
 log = structlog.get_logger()
 
+# Handlers retry up to MAX_RETRIES times, then fail on the next and last try
 MAX_RETRIES = 5
 DELAY = 10
 
+# Events of the same object are processed under this lock
+OBJECT_LOCK_TIMEOUT = 300
+OBJECT_LOCK_BLOCKING_TIMEOUT = 30
+
+# Pending events received longer ago than this are enqueued again
+STUCK_EVENT_DELAY = timedelta(minutes=30)
+STUCK_EVENTS_LIMIT = 1000
+
+WebhookHandler = Callable[[JobContext, AsyncSession, stripe.Event], Awaitable[None]]
+WEBHOOK_HANDLERS: dict[str, WebhookHandler] = {}
+
+
+def webhook_handler(event_type: str) -> Callable[[WebhookHandler], WebhookHandler]:
+    def decorator(f: WebhookHandler) -> WebhookHandler:
+        WEBHOOK_HANDLERS[event_type] = f
+        return f
+
+    return decorator
+
 
 class StripeTaskError(PolarError):
     ...
@@ -57,231 +93,287 @@ class UnsetAccountOnPayoutEvent(StripeTaskError):
         super().__init__(message)
 
 
-@task("stripe.webhook.account.updated")
+@webhook_handler("account.updated")
 async def account_updated(
-    ctx: JobContext, event: stripe.Event, polar_context: PolarWorkerContext
+    ctx: JobContext, session: AsyncSession, event: stripe.Event
 ) -> None:
-    with polar_context.to_execution_context():
-        async with AsyncSessionMaker(ctx) as session:
-            stripe_account: stripe.Account = event["data"]["object"]
-            await account_service.update_account_from_stripe(
-                session, stripe_account=stripe_account
-            )
+    stripe_account: stripe.Account = event["data"]["object"]
+    await account_service.update_account_from_stripe(
+        session, stripe_account=stripe_account
+    )
 
 
-@task("stripe.webhook.payment_intent.succeeded")
+@webhook_handler("payment_intent.succeeded")
 async def payment_intent_succeeded(
-    ctx: JobContext, event: stripe.Event, polar_context: PolarWorkerContext
+    ctx: JobContext, session: AsyncSession, event: stripe.Event
 ) -> None:
-    with polar_context.to_execution_context():
-        async with AsyncSessionMaker(ctx) as session:
-            payment_intent = event["data"]["object"]
-            payload = PaymentIntentSuccessWebhook.model_validate(payment_intent)
-
-            # payments for pay_upfront (pi has metadata)
-            if payment_intent.metadata.get("type") == ProductType.pledge:
-                await pledge_service.handle_payment_intent_success(
-                    session=session,
-                    payload=payload,
-                )
-                return
-
-            # payment for pay_on_completion
-            # metadata is on the invoice, not the payment_intent
-            if payload.invoice:
-                invoice = stripe_service.get_invoice(payload.invoice)
-                if (
-                    invoice.metadata
-                    and invoice.metadata.get("type") == ProductType.pledge
-                ):
-                    await pledge_service.handle_payment_intent_success(
-                        session=session,
-                        payload=payload,
-                    )
-                return
-
-            log.error(
-                "stripe.webhook.payment_intent.succeeded.not_handled",
-                pi=payload.id,
+    payment_intent = event["data"]["object"]
+    payload = PaymentIntentSuccessWebhook.model_validate(payment_intent)
+
+    # payments for pay_upfront (pi has metadata)
+    if payment_intent.metadata.get("type") == ProductType.pledge:
+        await pledge_service.handle_payment_intent_success(
+            session=session,
+            payload=payload,
+        )
+        return
+
+    # payment for pay_on_completion
+    # metadata is on the invoice, not the payment_intent
+    if payload.invoice:
+        invoice = await stripe_service.get_invoice(payload.invoice)
+        if invoice.metadata and invoice.metadata.get("type") == ProductType.pledge:
+            await pledge_service.handle_payment_intent_success(
+                session=session,
+                payload=payload,
             )
+        return
 
+    log.error(
+        "stripe.webhook.payment_intent.succeeded.not_handled",
+        pi=payload.id,
+    )
 
-@task("stripe.webhook.charge.succeeded")
+
+@webhook_handler("charge.succeeded")
 async def charge_succeeded(
-    ctx: JobContext, event: stripe.Event, polar_context: PolarWorkerContext
+    ctx: JobContext, session: AsyncSession, event: stripe.Event
 ) -> None:
-    with polar_context.to_execution_context():
-        async with AsyncSessionMaker(ctx) as session:
-            charge = event["data"]["object"]
-            try:
-                await payment_transaction_service.create_payment(
-                    session=session, charge=charge
-                )
-            except (
-                PaymentTransactionPledgeDoesNotExist,
-                PaymentTransactionSubscriptionDoesNotExist,
-            ) as e:
-                # Retry because we might not have been able to handle other events
-                # triggering the creation of Pledge and Subscription
-                if ctx["job_try"] <= MAX_RETRIES:
-                    raise Retry(DELAY ** ctx["job_try"]) from e
-                else:
-                    raise
-
-
-@task("stripe.webhook.charge.refunded")
+    charge = event["data"]["object"]
+    try:
+        await payment_transaction_service.create_payment(session=session, charge=charge)
+    except (
+        PaymentTransactionPledgeDoesNotExist,
+        PaymentTransactionSubscriptionDoesNotExist,
+    ) as e:
+        # Retry because we might not have been able to handle other events
+        # triggering the creation of Pledge and Subscription
+        if ctx["job_try"] <= MAX_RETRIES:
+            raise Retry(DELAY ** ctx["job_try"]) from e
+        else:
+            raise
+
+
+@webhook_handler("charge.refunded")
 async def charge_refunded(
-    ctx: JobContext, event: stripe.Event, polar_context: PolarWorkerContext
+    ctx: JobContext, session: AsyncSession, event: stripe.Event
 ) -> None:
-    with polar_context.to_execution_context():
-        async with AsyncSessionMaker(ctx) as session:
-            charge = event["data"]["object"]
+    charge = event["data"]["object"]
 
-            await refund_transaction_service.create_refunds(session, charge=charge)
+    await refund_transaction_service.create_refunds(session, charge=charge)
 
-            if charge.metadata.get("type") == ProductType.pledge:
-                await pledge_service.refund_by_payment_id(
-                    session=session,
-                    payment_id=charge["payment_intent"],
-                    amount=charge["amount_refunded"],
-                    transaction_id=charge["id"],
-                )
+    if charge.metadata.get("type") == ProductType.pledge:
+        await pledge_service.refund_by_payment_id(
+            session=session,
+            payment_id=charge["payment_intent"],
+            amount=charge["amount_refunded"],
+            transaction_id=charge["id"],
+        )
 
 
-@task("stripe.webhook.charge.dispute.created")
+@webhook_handler("charge.dispute.created")
 async def charge_dispute_created(
-    ctx: JobContext, event: stripe.Event, polar_context: PolarWorkerContext
+    ctx: JobContext, session: AsyncSession, event: stripe.Event
 ) -> None:
-    with polar_context.to_execution_context():
-        async with AsyncSessionMaker(ctx) as session:
-            dispute = event["data"]["object"]
+    dispute = event["data"]["object"]
+
+    try:
+        await dispute_transaction_service.create_dispute(session, dispute=dispute)
+    except DisputeUnknownPaymentTransaction as e:
+        # Retry because Stripe webhooks order is not guaranteed,
+        # so we might not have been able to handle charge.succeeded yet!
+        if ctx["job_try"] <= MAX_RETRIES:
+            raise Retry(DELAY ** ctx["job_try"]) from e
+        else:
+            raise
+
+    charge = await stripe_service.get_charge(dispute.charge)
+    if charge.metadata.get("type") == ProductType.pledge:
+        await pledge_service.mark_charge_disputed_by_payment_id(
+            session=session,
+            payment_id=dispute["payment_intent"],
+            amount=dispute["amount"],
+            transaction_id=dispute["id"],
+        )
 
-            try:
-                await dispute_transaction_service.create_dispute(
-                    session, dispute=dispute
-                )
-            except DisputeUnknownPaymentTransaction as e:
-                # Retry because Stripe webhooks order is not guaranteed,
-                # so we might not have been able to handle charge.succeeded yet!
-                if ctx["job_try"] <= MAX_RETRIES:
-                    raise Retry(DELAY ** ctx["job_try"]) from e
-                else:
-                    raise
-
-            charge = stripe_service.get_charge(dispute.charge)
-            if charge.metadata.get("type") == ProductType.pledge:
-                await pledge_service.mark_charge_disputed_by_payment_id(
-                    session=session,
-                    payment_id=dispute["payment_intent"],
-                    amount=dispute["amount"],
-                    transaction_id=dispute["id"],
-                )
-
-
-@task("stripe.webhook.charge.dispute.funds_reinstated")
+
+@webhook_handler("charge.dispute.funds_reinstated")
 async def charge_dispute_funds_reinstated(
-    ctx: JobContext, event: stripe.Event, polar_context: PolarWorkerContext
+    ctx: JobContext, session: AsyncSession, event: stripe.Event
 ) -> None:
-    with polar_context.to_execution_context():
-        async with AsyncSessionMaker(ctx) as session:
-            dispute = event["data"]["object"]
+    dispute = event["data"]["object"]
 
-            await dispute_transaction_service.create_dispute_reversal(
-                session, dispute=dispute
-            )
+    await dispute_transaction_service.create_dispute_reversal(session, dispute=dispute)
 
 
-@task("stripe.webhook.customer.subscription.created")
+@webhook_handler("customer.subscription.created")
 async def customer_subscription_created(
-    ctx: JobContext, event: stripe.Event, polar_context: PolarWorkerContext
+    ctx: JobContext, session: AsyncSession, event: stripe.Event
 ) -> None:
-    with polar_context.to_execution_context():
-        async with AsyncSessionMaker(ctx) as session:
-            subscription = stripe.Subscription.construct_from(
-                event["data"]["object"], None
-            )
-            await subscription_service.create_subscription_from_stripe(
-                session, stripe_subscription=subscription
-            )
+    subscription = stripe.Subscription.construct_from(event["data"]["object"], None)
+    await subscription_service.create_subscription_from_stripe(
+        session, stripe_subscription=subscription
+    )
 
 
-@task("stripe.webhook.customer.subscription.updated")
+@webhook_handler("customer.subscription.updated")
 async def customer_subscription_updated(
-    ctx: JobContext, event: stripe.Event, polar_context: PolarWorkerContext
+    ctx: JobContext, session: AsyncSession, event: stripe.Event
 ) -> None:
-    with polar_context.to_execution_context():
-        async with AsyncSessionMaker(ctx) as session:
-            subscription = stripe.Subscription.construct_from(
-                event["data"]["object"], None
-            )
-            try:
-                await subscription_service.update_subscription_from_stripe(
-                    session, stripe_subscription=subscription
-                )
-            except SubscriptionDoesNotExist as e:
-                # Retry because Stripe webhooks order is not guaranteed,
-                # so we might not have been able to handle subscription.created yet!
-                if ctx["job_try"] <= MAX_RETRIES:
-                    raise Retry(DELAY ** ctx["job_try"]) from e
-                else:
-                    raise
-
-
-@task("stripe.webhook.customer.subscription.deleted")
+    subscription = stripe.Subscription.construct_from(event["data"]["object"], None)
+    try:
+        await subscription_service.update_subscription_from_stripe(
+            session, stripe_subscription=subscription
+        )
+    except SubscriptionDoesNotExist as e:
+        # Retry because Stripe webhooks order is not guaranteed,
+        # so we might not have been able to handle subscription.created yet!
+        if ctx["job_try"] <= MAX_RETRIES:
+            raise Retry(DELAY ** ctx["job_try"]) from e
+        else:
+            raise
+
+
+@webhook_handler("customer.subscription.deleted")
 async def customer_subscription_deleted(
-    ctx: JobContext, event: stripe.Event, polar_context: PolarWorkerContext
+    ctx: JobContext, session: AsyncSession, event: stripe.Event
 ) -> None:
-    with polar_context.to_execution_context():
-        async with AsyncSessionMaker(ctx) as session:
-            subscription = stripe.Subscription.construct_from(
-                event["data"]["object"], None
-            )
-            try:
-                await subscription_service.update_subscription_from_stripe(
-                    session, stripe_subscription=subscription
-                )
-            except SubscriptionDoesNotExist as e:
-                # Retry because Stripe webhooks order is not guaranteed,
-                # so we might not have been able to handle subscription.created yet!
-                if ctx["job_try"] <= MAX_RETRIES:
-                    raise Retry(DELAY ** ctx["job_try"]) from e
-                else:
-                    raise
-
-
-@task("stripe.webhook.invoice.paid")
+    subscription = stripe.Subscription.construct_from(event["data"]["object"], None)
+    try:
+        await subscription_service.update_subscription_from_stripe(
+            session, stripe_subscription=subscription
+        )
+    except SubscriptionDoesNotExist as e:
+        # Retry because Stripe webhooks order is not guaranteed,
+        # so we might not have been able to handle subscription.created yet!
+        if ctx["job_try"] <= MAX_RETRIES:
+            raise Retry(DELAY ** ctx["job_try"]) from e
+        else:
+            raise
+
+
+@webhook_handler("invoice.paid")
 async def invoice_paid(
-    ctx: JobContext, event: stripe.Event, polar_context: PolarWorkerContext
+    ctx: JobContext, session: AsyncSession, event: stripe.Event
 ) -> None:
-    with polar_context.to_execution_context():
-        async with AsyncSessionMaker(ctx) as session:
-            invoice = stripe.Invoice.construct_from(event["data"]["object"], None)
-            try:
-                await subscription_service.transfer_subscription_paid_invoice(
-                    session, invoice=invoice
-                )
-            except (
-                SubscriptionDoesNotExist,
-                PaymentTransactionForChargeDoesNotExist,
-            ) as e:
-                # Retry because Stripe webhooks order is not guaranteed,
-                # so we might not have been able to handle subscription.created
-                # or charge.succeeded yet!
-                if ctx["job_try"] <= MAX_RETRIES:
-                    raise Retry(DELAY ** ctx["job_try"]) from e
-                else:
-                    raise
-
-
-@task("stripe.webhook.payout.paid")
+    invoice = stripe.Invoice.construct_from(event["data"]["object"], None)
+    try:
+        await subscription_service.transfer_subscription_paid_invoice(
+            session, invoice=invoice
+        )
+    except (
+        SubscriptionDoesNotExist,
+        PaymentTransactionForChargeDoesNotExist,
+    ) as e:
+        # Retry because Stripe webhooks order is not guaranteed,
+        # so we might not have been able to handle subscription.created
+        # or charge.succeeded yet!
+        if ctx["job_try"] <= MAX_RETRIES:
+            raise Retry(DELAY ** ctx["job_try"]) from e
+        else:
+            raise
+
+
+@webhook_handler("payout.paid")
 async def payout_paid(
-    ctx: JobContext, event: stripe.Event, polar_context: PolarWorkerContext
+    ctx: JobContext, session: AsyncSession, event: stripe.Event
 ) -> None:
     if event.account is None:
         raise UnsetAccountOnPayoutEvent(event.id)
+    payout = event["data"]["object"]
+    await payout_transaction_service.create_payout_from_stripe(
+        session, payout=payout, stripe_account_id=event.account
+    )
+
+
+async def _process_event(
+    ctx: JobContext, session: AsyncSession, id: uuid.UUID, job_event_id: str
+) -> None:
+    webhook_event = await stripe_webhook_event_service.get(session, id)
+    assert webhook_event is not None
+    stripe_id = webhook_event.stripe_id
+
+    if await stripe_webhook_event_service.is_stale(session, webhook_event):
+        log.info("stripe.webhook.stale", id=stripe_id, type=webhook_event.type)
+    else:
+        handler = WEBHOOK_HANDLERS[webhook_event.type]
+        nested = await session.begin_nested()
+        try:
+            await handler(ctx, session, to_stripe_event(webhook_event))
+        except Retry:
+            raise
+        except Exception as e:
+            # Handlers committing by themselves already released the savepoint
+            if nested.is_active:
+                await nested.rollback()
+            await stripe_webhook_event_service.mark_failed(session, id, repr(e))
+            await session.commit()
+            log.exception("stripe.webhook.failed", id=stripe_id)
+            # Don't let an older event block the one of this job
+            if stripe_id == job_event_id:
+                raise
+            return
+        if nested.is_active:
+            await nested.commit()
+
+    await stripe_webhook_event_service.mark_processed(session, id)
+    # Handlers may commit by themselves: commit after each event,
+    # so the processed events are the ones whose changes are persisted.
+    await session.commit()
+
+
+# Results aren't kept, so a job of the same event can be enqueued again
+# as soon as the previous one is finished, e.g. to replay it.
+@task("stripe.webhook.process_event", keep_result=0, max_tries=MAX_RETRIES + 1)
+async def process_event(
+    ctx: JobContext, event_id: str, polar_context: PolarWorkerContext
+) -> None:
     with polar_context.to_execution_context():
         async with AsyncSessionMaker(ctx) as session:
-            payout = event["data"]["object"]
-            await payout_transaction_service.create_payout_from_stripe(
-                session, payout=payout, stripe_account_id=event.account
+            webhook_event = await stripe_webhook_event_service.get_by_stripe_id(
+                session, event_id
             )
+            if webhook_event is None:
+                log.warning("stripe.webhook.unknown", id=event_id)
+                return
+            if not is_pending(webhook_event):
+                log.info("stripe.webhook.already_processed", id=event_id)
+                return
+
+            # Process the older pending events of the object first, in order.
+            # Events of the same object are processed by one job at a time:
+            # the next job will find its event already processed.
+            error: Exception | None = None
+            try:
+                async with Locker(ctx["redis"]).lock(
+                    f"stripe.webhook.{webhook_event.object_id}",
+                    timeout=OBJECT_LOCK_TIMEOUT,
+                    blocking_timeout=OBJECT_LOCK_BLOCKING_TIMEOUT,
+                ):
+                    try:
+                        for id in await stripe_webhook_event_service.list_pending_ids(
+                            session, webhook_event
+                        ):
+                            await _process_event(ctx, session, id, event_id)
+                    except Exception as e:
+                        # Release the lock before giving the error back to the worker
+                        error = e
+            except TimeoutLockError as e:
+                raise Retry(DELAY) from e
+
+            if error is not None:
+                raise error
+
+
+@interval(minute={0, 15, 30, 45})
+async def requeue_stuck_events(ctx: JobContext) -> None:
+    async with AsyncSessionMaker(ctx) as session:
+        stripe_ids = await stripe_webhook_event_service.list_stuck_stripe_ids(
+            session,
+            received_before=utc_now() - STUCK_EVENT_DELAY,
+            limit=STUCK_EVENTS_LIMIT,
+        )
+    for stripe_id in stripe_ids:
+        enqueue_event(stripe_id)
+    if stripe_ids:
+        log.warning("stripe.webhook.requeued", count=len(stripe_ids))
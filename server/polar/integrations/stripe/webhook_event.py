@@ -0,0 +1,169 @@
+import uuid
+from collections.abc import Sequence
+from datetime import UTC, datetime
+
+import stripe as stripe_lib
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from polar.kit.services import ResourceServiceReader
+from polar.kit.utils import utc_now
+from polar.models import StripeWebhookEvent
+from polar.postgres import AsyncSession
+from polar.worker import enqueue_job
+
+# Field of the event object identifying the Stripe object whose events
+# have to be processed serially. Defaults to the object's own `id`.
+OBJECT_ID_FIELDS = {
+    "charge.dispute.created": "charge",
+    "charge.dispute.funds_reinstated": "charge",
+    "invoice.paid": "subscription",
+}
+
+# Events only carrying the latest state of their object: an event older
+# than an already processed one of the same type would revert it.
+SNAPSHOT_WEBHOOKS = {"account.updated", "customer.subscription.updated"}
+
+
+def get_object_id(event: stripe_lib.Event) -> str:
+    event_object = event["data"]["object"]
+    field = OBJECT_ID_FIELDS.get(event["type"], "id")
+    return event_object.get(field) or event_object["id"]
+
+
+class StripeWebhookEventService(ResourceServiceReader[StripeWebhookEvent]):
+    async def get_by_stripe_id(
+        self, session: AsyncSession, stripe_id: str
+    ) -> StripeWebhookEvent | None:
+        return await self.get_by(session, stripe_id=stripe_id)
+
+    async def create(self, session: AsyncSession, event: stripe_lib.Event) -> bool:
+        """
+        Store a received event.
+
+        Returns `False` if the event was already received, i.e. Stripe retried it.
+        """
+        statement = (
+            insert(StripeWebhookEvent)
+            .values(
+                stripe_id=event["id"],
+                type=event["type"],
+                account=event.get("account"),
+                object_id=get_object_id(event),
+                stripe_created=datetime.fromtimestamp(event["created"], UTC),
+                payload=event.to_dict_recursive(),
+            )
+            .on_conflict_do_nothing(index_elements=[StripeWebhookEvent.stripe_id])
+            .returning(StripeWebhookEvent.id)
+        )
+        result = await session.execute(statement)
+        return result.scalar_one_or_none() is not None
+
+    async def list_pending_ids(
+        self, session: AsyncSession, event: StripeWebhookEvent
+    ) -> Sequence[uuid.UUID]:
+        """
+        List the events of the same object not processed yet, up to the given one,
+        in the order they were created on Stripe.
+        """
+        statement = (
+            select(StripeWebhookEvent.id)
+            .where(
+                StripeWebhookEvent.object_id == event.object_id,
+                StripeWebhookEvent.stripe_created <= event.stripe_created,
+                StripeWebhookEvent.processed_at.is_(None),
+                StripeWebhookEvent.failed_at.is_(None),
+            )
+            .order_by(
+                StripeWebhookEvent.stripe_created.asc(),
+                StripeWebhookEvent.created_at.asc(),
+            )
+        )
+        result = await session.execute(statement)
+        return result.scalars().all()
+
+    async def list_stuck_stripe_ids(
+        self, session: AsyncSession, *, received_before: datetime, limit: int
+    ) -> Sequence[str]:
+        """
+        List the events received before the given time and still pending,
+        e.g. because their job was never pushed or was lost.
+        """
+        statement = (
+            select(StripeWebhookEvent.stripe_id)
+            .where(
+                StripeWebhookEvent.created_at < received_before,
+                StripeWebhookEvent.processed_at.is_(None),
+                StripeWebhookEvent.failed_at.is_(None),
+            )
+            .order_by(StripeWebhookEvent.stripe_created.asc())
+            .limit(limit)
+        )
+        result = await session.execute(statement)
+        return result.scalars().all()
+
+    async def is_stale(self, session: AsyncSession, event: StripeWebhookEvent) -> bool:
+        """
+        Whether a newer event of the same type and object was already processed,
+        making this one outdated.
+        """
+        if event.type not in SNAPSHOT_WEBHOOKS:
+            return False
+
+        statement = select(StripeWebhookEvent.id).where(
+            StripeWebhookEvent.object_id == event.object_id,
+            StripeWebhookEvent.type == event.type,
+            StripeWebhookEvent.stripe_created > event.stripe_created,
+            StripeWebhookEvent.processed_at.is_not(None),
+        )
+        result = await session.execute(statement.limit(1))
+        return result.scalar_one_or_none() is not None
+
+    async def mark_processed(self, session: AsyncSession, id: uuid.UUID) -> None:
+        await session.execute(
+            update(StripeWebhookEvent)
+            .where(StripeWebhookEvent.id == id)
+            .values(processed_at=utc_now())
+        )
+
+    async def mark_failed(
+        self, session: AsyncSession, id: uuid.UUID, error: str
+    ) -> None:
+        await session.execute(
+            update(StripeWebhookEvent)
+            .where(StripeWebhookEvent.id == id)
+            .values(failed_at=utc_now(), error=error)
+        )
+
+    async def replay(self, session: AsyncSession, event: StripeWebhookEvent) -> None:
+        """
+        Process again an event, e.g. after it failed or after fixing its handler.
+        """
+        await session.execute(
+            update(StripeWebhookEvent)
+            .where(StripeWebhookEvent.id == event.id)
+            .values(processed_at=None, failed_at=None, error=None)
+        )
+        enqueue(event.stripe_id)
+
+
+def is_pending(event: StripeWebhookEvent) -> bool:
+    return event.processed_at is None and event.failed_at is None
+
+
+def enqueue(stripe_id: str) -> None:
+    # Only the ID is sent: the event is loaded from the database by the worker.
+    # One job per event: it's not enqueued again while its job is queued,
+    # running or waiting for a retry.
+    enqueue_job(
+        "stripe.webhook.process_event",
+        stripe_id,
+        _job_id=f"stripe.webhook.process_event:{stripe_id}",
+    )
+
+
+def to_stripe_event(event: StripeWebhookEvent) -> stripe_lib.Event:
+    return stripe_lib.Event.construct_from(event.payload, None)
+
+
+stripe_webhook_event = StripeWebhookEventService(StripeWebhookEvent)
@@ -1,7 +1,11 @@
+import asyncio
+from collections.abc import Sequence
+from hashlib import blake2b
 from typing import Any
 
 import structlog
 from githubkit import GitHub
+from githubkit.exception import RateLimitExceeded, RequestFailed
 
 from polar.enums import Platforms
 from polar.integrations.github.badge import PLEDGE_BADGE_COMMENT_START
@@ -19,10 +23,21 @@ log: Logger = structlog.get_logger()
 
 _CACHE_TTL_SECONDS = 3600 * 24 * 30  # 30 days
 
+# Bodies rendered at once through the GitHub API when prerendering
+RENDER_CONCURRENCY = 4
+
 
 class IssueBodyRenderer:
-    def __init__(self, redis: Redis) -> None:
+    """
+    Render issue bodies to HTML, caching the result by content.
+
+    Bodies are prerendered in the background when issues are upserted,
+    so rendering on demand is mostly a cache hit.
+    """
+
+    def __init__(self, redis: Redis, *, concurrency: int = RENDER_CONCURRENCY) -> None:
         self.redis = redis
+        self.concurrency = concurrency
 
     async def render(
         self, issue: Issue, repository: Repository, organization: Organization
@@ -35,22 +50,102 @@ class IssueBodyRenderer:
         if issue.body is None:
             return ""
 
-        cache_key = f"polar:issue-body-cache:{issue.id}{issue.issue_modified_at}"
+        body = self._preprocess(issue.body)
+        cache_key = self._get_cache_key(body, issue, repository, organization)
         cached_body = await self.redis.get(cache_key)
         if cached_body is not None:
             bounded_logger.debug("cache hit")
             return cached_body
 
-        body = self._preprocess(issue.body)
+        return await self._render_and_cache(
+            cache_key, body, issue, repository, organization
+        )
 
+    async def prerender(
+        self, issues: Sequence[tuple[Issue, Repository, Organization]]
+    ) -> int:
+        """
+        Render and cache the bodies of issues not already in the cache.
+
+        Errors other than rate limits are logged and skipped:
+        those bodies will be rendered on demand.
+
+        Returns the number of rendered bodies.
+        """
+        to_render: dict[str, tuple[str, Issue, Repository, Organization]] = {}
+        for issue, repository, organization in issues:
+            if issue.body is None:
+                continue
+            body = self._preprocess(issue.body)
+            cache_key = self._get_cache_key(body, issue, repository, organization)
+            to_render[cache_key] = (body, issue, repository, organization)
+
+        if not to_render:
+            return 0
+
+        cached_bodies = await self.redis.mget(list(to_render.keys()))
+        for cache_key, cached_body in zip(list(to_render.keys()), cached_bodies):
+            if cached_body is not None:
+                del to_render[cache_key]
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _prerender(
+            cache_key: str,
+            body: str,
+            issue: Issue,
+            repository: Repository,
+            organization: Organization,
+        ) -> bool:
+            async with semaphore:
+                try:
+                    await self._render_and_cache(
+                        cache_key, body, issue, repository, organization
+                    )
+                except RateLimitExceeded:
+                    raise
+                except RequestFailed as e:
+                    log.warning(
+                        "issue.body.prerender_failed", issue=issue.id, error=str(e)
+                    )
+                    return False
+                return True
+
+        rendered = await asyncio.gather(
+            *(_prerender(cache_key, *args) for cache_key, args in to_render.items())
+        )
+        return sum(rendered)
+
+    async def _render_and_cache(
+        self,
+        cache_key: str,
+        body: str,
+        issue: Issue,
+        repository: Repository,
+        organization: Organization,
+    ) -> str:
         if issue.platform == Platforms.github:
-            bounded_logger.debug("render from GitHub API")
+            log.debug("render from GitHub API", issue=issue.id)
             body = await self._render_github(body, repository, organization)
 
         await self.redis.set(cache_key, body, ex=_CACHE_TTL_SECONDS)
 
         return body
 
+    def _get_cache_key(
+        self,
+        body: str,
+        issue: Issue,
+        repository: Repository,
+        organization: Organization,
+    ) -> str:
+        # Keyed by content, so unchanged bodies stay cached across issue updates.
+        # References like #123 are rendered relatively to the repository.
+        key = blake2b(digest_size=16)
+        key.update(f"{issue.platform}:{organization.name}/{repository.name}:".encode())
+        key.update(body.encode())
+        return f"polar:issue-body-cache:{key.hexdigest()}"
+
     def _preprocess(self, body: str) -> str:
         return body.split(PLEDGE_BADGE_COMMENT_START)[0]
 
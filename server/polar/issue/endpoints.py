@@ -1,7 +1,7 @@
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 
 from polar.auth.dependencies import Auth, UserRequiredAuth
 from polar.authz.service import AccessType, Authz
@@ -28,7 +28,9 @@ from polar.tags.api import Tags
 from polar.user_organization.service import (
     user_organization as user_organization_service,
 )
+from polar.worker import enqueue_job
 
+from .recommendations import compute_recommendations, recommendations_cache
 from .schemas import (
     ConfirmIssue,
     IssueUpdateBadgeMessage,
@@ -232,57 +234,22 @@ async def for_you(
     auth: UserRequiredAuth,
     session: AsyncSession = Depends(get_db_session),
     sessionmaker: AsyncSessionMaker = Depends(get_db_sessionmaker),
-) -> ListResource[IssueSchema]:
-    issues = await github_issue_service.list_issues_from_starred(
-        session, sessionmaker, auth.user
-    )
-
-    # get loaded
-    issues = [
-        i for i in [await issue_service.get_loaded(session, i.id) for i in issues] if i
-    ]
-    items = [IssueSchema.from_db(i) for i in issues]
-
-    # sort
-    items.sort(
-        key=lambda i: i.reactions.plus_one if i.reactions else 0,
-        reverse=True,
-    )
-
-    # hacky solution to spread out the repositories in the results
-    def spread(items: list[IssueSchema]) -> list[IssueSchema]:
-        penalties: dict[str, int] = {}
-        res: list[IssueSchema] = []
-
-        while len(items) > 0:
-            # In the next 5 issues, pick the one with the lowest penalty
-            lowest_penalty = 0
-            lowest: IssueSchema | None = None
-            lowest_idx = 0
-
-            for idx, candidate in enumerate(items[0:5]):
-                pen = penalties.get(candidate.repository.name, 0)
+) -> Response:
+    content, stale = await recommendations_cache.get(auth.user.id)
 
-                if lowest is None or pen < lowest_penalty:
-                    lowest = candidate
-                    lowest_penalty = pen
-                    lowest_idx = idx
-
-            if lowest is None:
-                break
-
-            # if lowest is not None:
-            penalties[lowest.repository.name] = lowest_penalty + 1
-            res.append(lowest)
-            del items[lowest_idx]
-
-        return res
-
-    items = spread(items)
+    if content is None:
+        # Not computed yet: crawl now so the user doesn't get an empty list
+        recommendations = await compute_recommendations(
+            session, sessionmaker, auth.user
+        )
+        content = await recommendations_cache.set(auth.user.id, recommendations)
+    elif stale:
+        job_id = recommendations_cache.get_refresh_job_id(auth.user.id)
+        enqueue_job(
+            "github.issue.recommendations.refresh", auth.user.id, _job_id=job_id
+        )
 
-    return ListResource(
-        items=items, pagination=Pagination(total_count=len(items), max_page=1)
-    )
+    return Response(content=content, media_type="application/json")
 
 
 @router.get(
@@ -0,0 +1,149 @@
+import time
+from collections import deque
+from collections.abc import Iterable
+from uuid import UUID
+
+import structlog
+from prometheus_client import Counter
+from redis.exceptions import RedisError
+
+from polar.integrations.github.service.issue import github_issue as github_issue_service
+from polar.kit.pagination import ListResource, Pagination
+from polar.logging import Logger
+from polar.models import User
+from polar.postgres import AsyncSession, AsyncSessionMaker
+from polar.redis import Redis, redis
+
+from .schemas import Issue as IssueSchema
+from .service import issue as issue_service
+
+log: Logger = structlog.get_logger()
+
+# Recommendations are served for that long...
+RECOMMENDATIONS_TTL_SECONDS = 60 * 60 * 24
+# ...and refreshed in the background once they're older than that
+RECOMMENDATIONS_REFRESH_AFTER_SECONDS = 60 * 60
+
+# Repositories of the next issues the spread picks from
+SPREAD_WINDOW = 5
+
+recommendations_cache_lookups = Counter(
+    "issue_recommendations_cache_lookups",
+    "Number of lookups in the cache of issue recommendations",
+    ["result"],  # hit, stale or miss
+)
+
+
+async def compute_recommendations(
+    session: AsyncSession, sessionmaker: AsyncSessionMaker, user: User
+) -> ListResource[IssueSchema]:
+    """
+    Crawl the repositories starred by the user for issues to recommend.
+    """
+    crawled = await github_issue_service.list_issues_from_starred(
+        session, sessionmaker, user
+    )
+    issues = await issue_service.list_loaded_by_ids(
+        session, [issue.id for issue in crawled]
+    )
+
+    items = [IssueSchema.from_db(issue) for issue in issues]
+    items.sort(
+        key=lambda i: i.reactions.plus_one if i.reactions else 0,
+        reverse=True,
+    )
+    items = spread(items)
+
+    return ListResource(
+        items=items, pagination=Pagination(total_count=len(items), max_page=1)
+    )
+
+
+def spread(items: Iterable[IssueSchema]) -> list[IssueSchema]:
+    """
+    Spread out the repositories in the results: among the next issues,
+    pick the one from the repository picked the fewest times so far.
+    """
+    penalties: dict[str, int] = {}
+    queue = deque(items)
+    res: list[IssueSchema] = []
+
+    while queue:
+        lowest_idx = min(
+            range(min(SPREAD_WINDOW, len(queue))),
+            key=lambda idx: penalties.get(queue[idx].repository.name, 0),
+        )
+        lowest = queue[lowest_idx]
+        # Removing near the left end of a deque is O(1)
+        del queue[lowest_idx]
+
+        penalties[lowest.repository.name] = penalties.get(lowest.repository.name, 0) + 1
+        res.append(lowest)
+
+    return res
+
+
+class RecommendationsCache:
+    """
+    Cache of the serialized issue recommendations of users, in Redis.
+
+    Recommendations are served from the cache as-is while a background job
+    refreshes them once they get stale.
+    Redis errors are logged and treated as cache misses.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        ttl: int = RECOMMENDATIONS_TTL_SECONDS,
+        refresh_after: int = RECOMMENDATIONS_REFRESH_AFTER_SECONDS,
+    ) -> None:
+        self.redis = redis
+        self.ttl = ttl
+        self.refresh_after = refresh_after
+
+    async def get(self, user_id: UUID) -> tuple[str | None, bool]:
+        """
+        Get the serialized recommendations of a user.
+
+        Returns the cached `ListResource[IssueSchema]` JSON, if any,
+        and whether it should be refreshed.
+        """
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(self._get_key(user_id))
+                pipe.ttl(self._get_key(user_id))
+                value, ttl = await pipe.execute()
+        except RedisError as e:
+            log.warning("issue.recommendations_cache.error", error=str(e))
+            return None, True
+
+        if value is None:
+            recommendations_cache_lookups.labels(result="miss").inc()
+            return None, True
+
+        stale = self.ttl - ttl >= self.refresh_after
+        recommendations_cache_lookups.labels(result="stale" if stale else "hit").inc()
+        return value, stale
+
+    async def set(
+        self, user_id: UUID, recommendations: ListResource[IssueSchema]
+    ) -> str:
+        value = recommendations.model_dump_json()
+        try:
+            await self.redis.set(self._get_key(user_id), value, ex=self.ttl)
+        except RedisError as e:
+            log.warning("issue.recommendations_cache.error", error=str(e))
+        return value
+
+    def get_refresh_job_id(self, user_id: UUID) -> str:
+        # Refresh at most once per period, whatever the number of requests
+        period = int(time.time() // self.refresh_after)
+        return f"github.issue.recommendations.refresh:{user_id}:{period}"
+
+    def _get_key(self, user_id: UUID) -> str:
+        return f"issue:recommendations:{user_id}"
+
+
+recommendations_cache = RecommendationsCache(redis)
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 from enum import Enum
-from typing import Literal, Self, cast
+from typing import Any, Literal, Self, cast
 from uuid import UUID
 
 import structlog
@@ -325,6 +325,64 @@ class IssueAndPullRequestBase(Base):
         )
 
 
+# Fields of the issues fetched in batch from the GitHub GraphQL API
+GITHUB_GRAPHQL_ISSUE_FIELDS = """
+fragment ActorFields on Actor {
+  login
+  url
+  avatarUrl
+  ... on User { databaseId }
+  ... on Bot { databaseId }
+  ... on Mannequin { databaseId }
+  ... on Organization { databaseId }
+}
+
+fragment IssueFields on Issue {
+  databaseId
+  number
+  title
+  body
+  state
+  stateReason
+  authorAssociation
+  createdAt
+  updatedAt
+  closedAt
+  repository { databaseId }
+  author { ...ActorFields }
+  comments { totalCount }
+  labels(first: 50) { nodes { name color } }
+  assignees(first: 10) { nodes { ...ActorFields } }
+  milestone { number title description state url dueOn }
+  reactions { totalCount }
+  reactionGroups { content reactors { totalCount } }
+  timelineItems(itemTypes: [CLOSED_EVENT], last: 1) {
+    nodes { ... on ClosedEvent { actor { ...ActorFields } } }
+  }
+}
+"""
+
+_GRAPHQL_REACTIONS = {
+    "THUMBS_UP": "plus_one",
+    "THUMBS_DOWN": "minus_one",
+    "LAUGH": "laugh",
+    "HOORAY": "hooray",
+    "CONFUSED": "confused",
+    "HEART": "heart",
+    "ROCKET": "rocket",
+    "EYES": "eyes",
+}
+
+
+def _graphql_actor_to_json(actor: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "id": actor.get("databaseId"),
+        "login": actor["login"],
+        "html_url": actor["url"],
+        "avatar_url": actor["avatarUrl"],
+    }
+
+
 class IssueCreate(IssueAndPullRequestBase):
     external_lookup_key: str | None = None
     has_pledge_badge_label: bool = False
@@ -346,33 +404,119 @@ class IssueCreate(IssueAndPullRequestBase):
         repository: RepositoryModel,
     ) -> Self:
         ret = super().get_normalized_github_issue(data, organization, repository)
+        ret._set_polar_fields(
+            organization,
+            repository,
+            Reactions.model_validate(ret.reactions) if ret.reactions else None,
+        )
+        return ret
 
-        ret.external_lookup_key = f"{organization.name}/{repository.name}/{data.number}"
+    @classmethod
+    def from_github_graphql(
+        cls,
+        data: dict[str, Any],
+        organization: OrganizationModel,
+        repository: RepositoryModel,
+    ) -> Self:
+        """
+        Build from an issue node of the GitHub GraphQL API,
+        as queried by `GITHUB_GRAPHQL_ISSUE_FIELDS`.
 
-        ret.has_pledge_badge_label = IssueModel.contains_pledge_badge_label(
-            ret.labels, repository.pledge_badge_label
+        JSON fields are shaped like their REST counterparts.
+        """
+        reaction_counts = {
+            _GRAPHQL_REACTIONS[group["content"]]: group["reactors"]["totalCount"]
+            for group in data["reactionGroups"] or []
+            if group["content"] in _GRAPHQL_REACTIONS
+        }
+        reactions = Reactions(
+            total_count=data["reactions"]["totalCount"],
+            **{key: reaction_counts.get(key, 0) for key in _GRAPHQL_REACTIONS.values()},
         )
 
-        if ret.body and GithubBadge.badge_is_embedded(ret.body):
-            ret.pledge_badge_embedded_at = ret.issue_modified_at
+        assignees = [
+            _graphql_actor_to_json(assignee) for assignee in data["assignees"]["nodes"]
+        ]
+
+        closed_by: dict[str, Any] | None = None
+        for event in data["timelineItems"]["nodes"]:
+            if event and event.get("actor"):
+                closed_by = _graphql_actor_to_json(event["actor"])
+
+        milestone = data["milestone"]
+
+        ret = cls(
+            platform=Platforms.github,
+            external_id=data["databaseId"],
+            organization_id=organization.id,
+            repository_id=repository.id,
+            number=data["number"],
+            title=data["title"],
+            body=data["body"] if data["body"] else "",
+            comments=data["comments"]["totalCount"],
+            author=_graphql_actor_to_json(data["author"]) if data["author"] else None,
+            author_association=data["authorAssociation"],
+            labels=[
+                {"name": label["name"], "color": label["color"]}
+                for label in data["labels"]["nodes"]
+            ]
+            if data["labels"] and data["labels"]["nodes"]
+            else None,
+            assignee=assignees[0] if assignees else None,
+            assignees=assignees if assignees else None,
+            milestone={
+                "number": milestone["number"],
+                "title": milestone["title"],
+                "description": milestone["description"],
+                "state": milestone["state"].lower(),
+                "html_url": milestone["url"],
+                "due_on": milestone["dueOn"],
+            }
+            if milestone
+            else None,
+            closed_by=closed_by,
+            reactions=reactions.model_dump(mode="json"),
+            state=IssueModel.State(data["state"].lower()),
+            state_reason=data["stateReason"].lower() if data["stateReason"] else None,
+            issue_closed_at=data["closedAt"],
+            issue_created_at=data["createdAt"],
+            issue_modified_at=data["updatedAt"],
+        )
+        ret._set_polar_fields(organization, repository, reactions)
+        return ret
+
+    def _set_polar_fields(
+        self,
+        organization: OrganizationModel,
+        repository: RepositoryModel,
+        reactions: Reactions | None,
+    ) -> None:
+        self.external_lookup_key = (
+            f"{organization.name}/{repository.name}/{self.number}"
+        )
+
+        self.has_pledge_badge_label = IssueModel.contains_pledge_badge_label(
+            self.labels, repository.pledge_badge_label
+        )
+
+        if self.body and GithubBadge.badge_is_embedded(self.body):
+            self.pledge_badge_embedded_at = self.issue_modified_at
 
         # this is not good, we're risking setting positive_reactions_count to 0 if the
         # payload is missing
         # TODO: only update if payload actually is set
-        if data.reactions:
+        if reactions:
             # excluding: confused, minus_one
-            ret.positive_reactions_count = (
-                data.reactions.plus_one
-                + data.reactions.laugh
-                + data.reactions.heart
-                + data.reactions.hooray
-                + data.reactions.eyes
-                + data.reactions.rocket
+            self.positive_reactions_count = (
+                reactions.plus_one
+                + reactions.laugh
+                + reactions.heart
+                + reactions.hooray
+                + reactions.eyes
+                + reactions.rocket
             )
 
-            ret.total_engagement_count = data.reactions.total_count + data.comments
-
-        return ret
+            self.total_engagement_count = reactions.total_count + (self.comments or 0)
 
 
 class IssueUpdate(IssueCreate):
@@ -136,6 +136,28 @@ class IssueService(ResourceService[Issue, IssueCreate, IssueUpdate]):
             session, platform=platform, external_lookup_key=external_lookup_key
         )
 
+    async def list_by_ids(
+        self, session: AsyncSession, ids: Sequence[UUID]
+    ) -> Sequence[Issue]:
+        statement = sql.select(Issue).where(
+            Issue.id.in_(ids), Issue.deleted_at.is_(None)
+        )
+        res = await session.execute(statement)
+        return res.scalars().unique().all()
+
+    async def list_loaded_by_ids(
+        self, session: AsyncSession, ids: Sequence[UUID]
+    ) -> Sequence[Issue]:
+        statement = (
+            sql.select(Issue)
+            .where(Issue.id.in_(ids), Issue.deleted_at.is_(None))
+            .options(
+                joinedload(Issue.repository).joinedload(Repository.organization),
+            )
+        )
+        res = await session.execute(statement)
+        return res.scalars().unique().all()
+
     async def list_by_repository(
         self, session: AsyncSession, repository_id: UUID
     ) -> Sequence[Issue]:
@@ -511,28 +533,57 @@ class IssueService(ResourceService[Issue, IssueCreate, IssueUpdate]):
 
         return True
 
-    async def mark_not_needs_confirmation(
-        self, session: AsyncSession, issue_id: UUID
-    ) -> bool:
-        issue = await self.get(session, issue_id)
-        if not issue:
-            return False
+    async def mark_needs_confirmation_many(
+        self, session: AsyncSession, issue_ids: Sequence[UUID]
+    ) -> Sequence[UUID]:
+        """
+        Mark closed issues as needing confirmation they're solved.
 
-        # Already marked as solved, do not go back to needs confirmation
-        if issue.confirmed_solved_at:
-            return False
+        Returns the IDs of the issues that were changed.
+        """
+        if not issue_ids:
+            return []
 
         stmt = (
             sql.update(Issue)
-            .where(Issue.id == issue_id)
+            .where(
+                Issue.id.in_(issue_ids),
+                # issue needs to be closed
+                Issue.state == Issue.State.CLOSED,
+                # Already marked as needs solving or confirmed solved
+                Issue.needs_confirmation_solved.is_(False),
+                Issue.confirmed_solved_at.is_(None),
+            )
+            .values(needs_confirmation_solved=True)
+            .returning(Issue.id)
+        )
+
+        res = await session.execute(stmt)
+        changed_issue_ids = res.scalars().all()
+        await session.commit()
+
+        return changed_issue_ids
+
+    async def mark_not_needs_confirmation_many(
+        self, session: AsyncSession, issue_ids: Sequence[UUID]
+    ) -> None:
+        if not issue_ids:
+            return
+
+        stmt = (
+            sql.update(Issue)
+            .where(
+                Issue.id.in_(issue_ids),
+                # Already marked as solved, do not go back to needs confirmation
+                Issue.confirmed_solved_at.is_(None),
+                Issue.needs_confirmation_solved.is_(True),
+            )
             .values(needs_confirmation_solved=False)
         )
 
         await session.execute(stmt)
         await session.commit()
 
-        return True
-
     async def transfer(
         self, session: AsyncSession, old_issue: Issue, new_issue: Issue
     ) -> Issue:
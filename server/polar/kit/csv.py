@@ -1,6 +1,6 @@
 import collections
 import csv
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator
 from typing import TYPE_CHECKING, Any, BinaryIO
 
 if TYPE_CHECKING:
@@ -14,31 +14,38 @@ def get_iterable_from_binary_io(file: BinaryIO) -> Iterable[str]:
         yield line.decode("utf-8")
 
 
-def get_emails_from_csv(lines: Iterable[str]) -> set[str]:
-    emails: set[str] = set()
+def iter_emails_from_csv(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Yield the valid emails of a CSV file, line by line.
 
+    Emails are deduplicated case-insensitively, keeping the first occurrence.
+    """
     reader = csv.DictReader(lines)
     if reader.fieldnames is None:
-        return emails
+        return
 
     try:
         email_field = next(
             field for field in reader.fieldnames if "email" in field.lower()
         )
     except StopIteration:
-        return emails
+        return
 
+    seen: set[str] = set()
     for row in reader:
         email = row.get(email_field)
-        if email is not None:
-            try:
-                validate_email(email)
-            except EmailNotValidError:
-                continue
-            else:
-                emails.add(email)
-
-    return emails
+        if email is None or email.lower() in seen:
+            continue
+        try:
+            validate_email(email)
+        except EmailNotValidError:
+            continue
+        seen.add(email.lower())
+        yield email
+
+
+def get_emails_from_csv(lines: Iterable[str]) -> set[str]:
+    return set(iter_emails_from_csv(lines))
 
 
 class IterableCSVWriter:
@@ -1,9 +1,24 @@
-from collections.abc import Callable, Coroutine
+import time
+from collections.abc import Callable, Coroutine, Iterator
+from contextlib import contextmanager
 from typing import Any, Generic, TypeVar
 
+import structlog
+from prometheus_client import Histogram
+
+from polar.logging import Logger
+
+log: Logger = structlog.get_logger()
+
 T = TypeVar("T")
 HookFunc = Callable[[T], Coroutine[Any, Any, Any]]
 
+hook_duration_seconds = Histogram(
+    "hook_duration_seconds",
+    "Time spent in a hook receiver, per call",
+    ["receiver"],
+)
+
 
 class Hook(Generic[T]):
     hooks: list[HookFunc[T]]
@@ -19,4 +34,21 @@ class Hook(Generic[T]):
 
     async def call(self, payload: T) -> None:
         for fn in self.hooks:
-            await fn(payload)
+            with _timed(fn):
+                await fn(payload)
+
+
+@contextmanager
+def _timed(fun: Callable[..., Any]) -> Iterator[None]:
+    receiver = f"{fun.__module__}.{fun.__qualname__}"
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        hook_duration_seconds.labels(receiver=receiver).observe(duration)
+        log.debug(
+            "hook.receiver.called",
+            receiver=receiver,
+            duration=duration,
+        )
@@ -1,13 +1,40 @@
+import base64
+import binascii
+import json
 import math
 from collections.abc import Sequence
+from datetime import datetime
+from decimal import Decimal
+from enum import StrEnum
 from typing import Annotated, Any, Generic, NamedTuple, Self, TypeVar, overload
+from uuid import UUID
 
 from fastapi import Depends, Query
 from pydantic import BaseModel
-from sqlalchemy import Select, func, over
+from sqlalchemy import (
+    Column,
+    ColumnElement,
+    Select,
+    SQLColumnExpression,
+    UnaryExpression,
+    and_,
+    asc,
+    desc,
+    false,
+    func,
+    nulls_first,
+    nulls_last,
+    or_,
+    over,
+    select,
+    text,
+    tuple_,
+)
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.sql._typing import _ColumnsClauseArgument
 
 from polar.config import settings
+from polar.exceptions import BadRequest
 from polar.kit.db.models import RecordModel
 from polar.kit.db.postgres import AsyncSession
 from polar.kit.schemas import Schema
@@ -111,3 +138,292 @@ class ListResource(BaseModel, Generic[T]):
                 max_page=math.ceil(total_count / pagination_params.limit),
             ),
         )
+
+
+class InvalidCursor(BadRequest):
+    def __init__(self) -> None:
+        super().__init__("Invalid pagination cursor.")
+
+
+class CursorPaginationCount(StrEnum):
+    none = "none"
+    estimate = "estimate"
+    exact = "exact"
+
+
+class CursorPaginationParams(NamedTuple):
+    cursor: str | None
+    limit: int
+    total_count: CursorPaginationCount = CursorPaginationCount.none
+
+
+class SortKey(NamedTuple):
+    """
+    A column the results are sorted by, used to build keyset conditions.
+
+    `nulls_last` defaults to PostgreSQL behavior:
+    NULLs come last when sorting ascending, first when sorting descending.
+    """
+
+    column: SQLColumnExpression[Any]
+    desc: bool = False
+    nulls_last: bool | None = None
+
+    @property
+    def is_nulls_last(self) -> bool:
+        return not self.desc if self.nulls_last is None else self.nulls_last
+
+    @property
+    def order_by_clause(self) -> UnaryExpression[Any]:
+        clause: UnaryExpression[Any] = (
+            desc(self.column) if self.desc else asc(self.column)
+        )
+        if self.nulls_last is None:
+            return clause
+        return nulls_last(clause) if self.nulls_last else nulls_first(clause)
+
+    @property
+    def is_nullable(self) -> bool:
+        expression = getattr(self.column, "expression", self.column)
+        return not isinstance(expression, Column) or bool(expression.nullable)
+
+
+def _cursor_value_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, UUID):
+        return {"$uuid": str(value)}
+    if isinstance(value, Decimal):
+        return {"$dec": str(value)}
+    raise TypeError(f"Can't encode {type(value)} in a cursor")
+
+
+def _cursor_value_hook(value: dict[str, Any]) -> Any:
+    if "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    if "$uuid" in value:
+        return UUID(value["$uuid"])
+    if "$dec" in value:
+        return Decimal(value["$dec"])
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps(list(values), default=_cursor_value_default)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _is_valid_cursor_value(key: SortKey, value: Any) -> bool:
+    """
+    Check that `value` can be compared to the column of `key`,
+    so a tampered cursor doesn't fail in the database.
+    """
+    if value is None:
+        return key.is_nullable
+
+    column_type = key.column.type
+    # Unwrap TypeDecorator, e.g. StringEnum
+    column_type = getattr(column_type, "impl", column_type)
+    try:
+        python_type = column_type.python_type
+    except NotImplementedError:
+        return True
+
+    # bool is an int, but not the other way around
+    if isinstance(value, bool):
+        return python_type is bool
+    if python_type is float:
+        return isinstance(value, int | float)
+    return isinstance(value, python_type)
+
+
+def decode_cursor(cursor: str, sort_keys: Sequence[SortKey]) -> list[Any]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(payload, object_hook=_cursor_value_hook)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor() from e
+    if not isinstance(values, list) or len(values) != len(sort_keys):
+        raise InvalidCursor()
+    if not all(
+        _is_valid_cursor_value(key, value) for key, value in zip(sort_keys, values)
+    ):
+        raise InvalidCursor()
+    return values
+
+
+def _get_keyset_clause(
+    sort_keys: Sequence[SortKey], values: Sequence[Any]
+) -> ColumnElement[bool]:
+    """
+    Build the condition selecting rows sorted strictly after `values`.
+    """
+    # Simple case, that PostgreSQL can serve efficiently from an index:
+    # a row comparison, if all keys go the same way and can't be NULL.
+    if len({key.desc for key in sort_keys}) == 1 and not any(
+        key.is_nullable for key in sort_keys
+    ):
+        row = tuple_(*(key.column for key in sort_keys))
+        row_values = tuple_(*values)
+        return row < row_values if sort_keys[0].desc else row > row_values
+
+    clauses: list[ColumnElement[bool]] = []
+    for i, (key, value) in enumerate(zip(sort_keys, values)):
+        after_clause: ColumnElement[bool] | None
+        if value is None:
+            after_clause = None if key.is_nulls_last else key.column.is_not(None)
+        else:
+            value_clause = key.column < value if key.desc else key.column > value
+            after_clause = (
+                or_(value_clause, key.column.is_(None))
+                if key.is_nulls_last
+                else value_clause
+            )
+        if after_clause is not None:
+            clauses.append(
+                and_(
+                    *(
+                        previous_key.column.is_(None)
+                        if previous_value is None
+                        else previous_key.column == previous_value
+                        for previous_key, previous_value in zip(
+                            sort_keys[:i], values[:i]
+                        )
+                    ),
+                    after_clause,
+                )
+            )
+    return or_(*clauses) if clauses else false()
+
+
+async def count_results(
+    session: AsyncSession, statement: Select[Any], count: CursorPaginationCount
+) -> int | None:
+    """
+    Count the rows returned by `statement`.
+
+    The estimate is read from PostgreSQL planner,
+    so it doesn't need to scan the whole filtered set.
+    """
+    statement = statement.order_by(None).limit(None).offset(None)
+
+    if count == CursorPaginationCount.exact:
+        count_statement = select(func.count()).select_from(statement.subquery())
+        return (await session.execute(count_statement)).scalar_one()
+
+    if count == CursorPaginationCount.estimate:
+        compiled = statement.compile(
+            dialect=postgresql.dialect(paramstyle="named"),
+            compile_kwargs={"render_postcompile": True},
+        )
+        result = await session.execute(
+            text(f"EXPLAIN (FORMAT JSON) {compiled}"), compiled.params
+        )
+        plan = result.scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    return None
+
+
+async def paginate_cursor(
+    session: AsyncSession,
+    statement: Select[Any],
+    *,
+    pagination: CursorPaginationParams,
+    sort_keys: Sequence[SortKey],
+) -> tuple[Sequence[Any], str | None, int | None]:
+    """
+    Paginate `statement` using keyset pagination.
+
+    Unlike `paginate`, fetching a page costs the same regardless of its depth.
+
+    `sort_keys` should end with a unique column, typically the primary key,
+    so the order is deterministic.
+
+    Returns the results, the cursor of the next page if any,
+    and the total count if requested.
+    """
+    total_count = await count_results(session, statement, pagination.total_count)
+
+    statement = statement.order_by(*(key.order_by_clause for key in sort_keys))
+    if pagination.cursor is not None:
+        values = decode_cursor(pagination.cursor, sort_keys)
+        statement = statement.where(_get_keyset_clause(sort_keys, values))
+    statement = statement.add_columns(*(key.column for key in sort_keys)).limit(
+        pagination.limit + 1
+    )
+
+    result = await session.execute(statement)
+    rows = result.unique().all()
+
+    next_cursor: str | None = None
+    if len(rows) > pagination.limit:
+        rows = rows[: pagination.limit]
+        next_cursor = encode_cursor(rows[-1]._tuple()[-len(sort_keys) :])
+
+    results: list[Any] = []
+    for row in rows:
+        queried_data = row._tuple()[: -len(sort_keys)]
+        if len(queried_data) == 1:
+            results.append(queried_data[0])
+        else:
+            results.append(list(queried_data))
+
+    return results, next_cursor, total_count
+
+
+async def get_cursor_pagination_params(
+    cursor: str | None = Query(
+        None,
+        description=(
+            "Cursor of the page to fetch, as returned by the previous page. "
+            "Omit it to fetch the first page."
+        ),
+    ),
+    limit: int = Query(
+        10,
+        description=(
+            f"Size of a page, defaults to 10. "
+            f"Maximum is {settings.API_PAGINATION_MAX_LIMIT}"
+        ),
+        gt=0,
+    ),
+    total_count: CursorPaginationCount = Query(
+        CursorPaginationCount.none,
+        description=(
+            "Whether to compute the total count of results: "
+            "`none`, `estimate` (fast, approximate) or `exact`."
+        ),
+    ),
+) -> CursorPaginationParams:
+    return CursorPaginationParams(
+        cursor, min(settings.API_PAGINATION_MAX_LIMIT, limit), total_count
+    )
+
+
+CursorPaginationParamsQuery = Annotated[
+    CursorPaginationParams, Depends(get_cursor_pagination_params)
+]
+
+
+class CursorPagination(Schema):
+    next_cursor: str | None
+    total_count: int | None
+
+
+class CursorListResource(BaseModel, Generic[T]):
+    items: Sequence[T] = []
+    pagination: CursorPagination
+
+    @classmethod
+    def from_paginated_results(
+        cls, items: Sequence[T], next_cursor: str | None, total_count: int | None
+    ) -> Self:
+        return cls(
+            items=items,
+            pagination=CursorPagination(
+                next_cursor=next_cursor, total_count=total_count
+            ),
+        )
@@ -1,6 +1,7 @@
 from polar.kit.db.models import Model, TimestampedModel
 
 from .account import Account
+from .account_balance import AccountBalance
 from .advertisement_campaign import AdvertisementCampaign
 from .article import Article
 from .articles_subscription import ArticlesSubscription
@@ -18,11 +19,13 @@ from .pledge import Pledge
 from .pledge_transaction import PledgeTransaction
 from .pull_request import PullRequest
 from .repository import Repository
+from .stripe_webhook_event import StripeWebhookEvent
 from .subscription import Subscription
 from .subscription_benefit import SubscriptionBenefit
 from .subscription_benefit_grant import SubscriptionBenefitGrant
 from .subscription_tier import SubscriptionTier
 from .subscription_tier_benefit import SubscriptionTierBenefit
+from .subscriptions_import import SubscriptionsImport
 from .traffic import Traffic
 from .transaction import Transaction
 from .user import OAuthAccount, User
@@ -33,6 +36,7 @@ from .webhook_notifications import WebhookNotification
 
 __all__ = [
     "Account",
+    "AccountBalance",
     "AdvertisementCampaign",
     "Article",
     "ArticlesSubscription",
@@ -52,11 +56,13 @@ __all__ = [
     "PledgeTransaction",
     "PullRequest",
     "Repository",
+    "StripeWebhookEvent",
     "Subscription",
     "SubscriptionBenefit",
     "SubscriptionBenefitGrant",
     "SubscriptionTier",
     "SubscriptionTierBenefit",
+    "SubscriptionsImport",
     "TimestampedModel",
     "Transaction",
     "Traffic",
@@ -0,0 +1,146 @@
+from typing import TYPE_CHECKING
+from uuid import UUID
+
+from sqlalchemy import BigInteger, Connection, ForeignKey, event, inspect
+from sqlalchemy.dialects.postgresql import Insert, insert
+from sqlalchemy.orm import Mapped, Mapper, declared_attr, mapped_column, relationship
+
+from polar.kit.db.models import RecordModel
+from polar.kit.extensions.sqlalchemy import PostgresUUID
+
+from .transaction import Transaction, TransactionType
+
+if TYPE_CHECKING:
+    from polar.models import Account
+
+
+class AccountBalance(RecordModel):
+    """
+    Running totals of the transactions of an `Account`.
+
+    It's maintained in the same database transaction as the `Transaction` rows
+    it sums, so reading it is equivalent to summing the whole ledger of the account.
+    """
+
+    __tablename__ = "account_balances"
+
+    account_id: Mapped[UUID] = mapped_column(
+        PostgresUUID,
+        ForeignKey("accounts.id", ondelete="cascade"),
+        nullable=False,
+        unique=True,
+    )
+    """ID of the `Account` concerned by this balance."""
+
+    @declared_attr
+    def account(cls) -> Mapped["Account"]:
+        return relationship("Account", lazy="raise")
+
+    amount: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    """Sum of the transactions amounts, from Polar's perspective."""
+    account_amount: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    """Sum of the transactions amounts, from user's account perspective."""
+    balance_amount: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    """Sum of the `TransactionType.balance` amounts, from Polar's perspective."""
+    payout_amount: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    """Sum of the `TransactionType.payout` amounts, from Polar's perspective."""
+    account_payout_amount: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0
+    )
+    """Sum of the `TransactionType.payout` amounts, from user's account perspective."""
+
+
+def get_balance_values(
+    type: TransactionType, amount: int, account_amount: int
+) -> dict[str, int]:
+    """Get the increments to apply to an `AccountBalance` for a transaction."""
+    return {
+        "amount": amount,
+        "account_amount": account_amount,
+        "balance_amount": amount if type == TransactionType.balance else 0,
+        "payout_amount": amount if type == TransactionType.payout else 0,
+        "account_payout_amount": (
+            account_amount if type == TransactionType.payout else 0
+        ),
+    }
+
+
+def get_increment_statement(account_id: UUID, values: dict[str, int]) -> Insert:
+    """Build a statement incrementing the balance of an account, creating it if needed."""
+    statement = insert(AccountBalance).values(account_id=account_id, **values)
+    return statement.on_conflict_do_update(
+        index_elements=[AccountBalance.account_id],
+        set_={
+            **{
+                key: getattr(AccountBalance, key) + getattr(statement.excluded, key)
+                for key in values
+            },
+            "modified_at": statement.excluded.created_at,
+        },
+    )
+
+
+def _apply_transaction(
+    connection: Connection,
+    account_id: UUID | None,
+    type: TransactionType,
+    amount: int,
+    account_amount: int,
+    sign: int = 1,
+) -> None:
+    if account_id is None:
+        return
+
+    values = get_balance_values(type, amount * sign, account_amount * sign)
+    connection.execute(get_increment_statement(account_id, values))
+
+
+@event.listens_for(Transaction, "after_insert")
+def _transaction_after_insert(
+    mapper: Mapper[Transaction], connection: Connection, target: Transaction
+) -> None:
+    _apply_transaction(
+        connection,
+        target.account_id,
+        target.type,
+        target.amount,
+        target.account_amount,
+    )
+
+
+@event.listens_for(Transaction, "after_update")
+def _transaction_after_update(
+    mapper: Mapper[Transaction], connection: Connection, target: Transaction
+) -> None:
+    state = inspect(target)
+    keys = ("account_id", "type", "amount", "account_amount")
+    histories = {key: state.attrs[key].history for key in keys}
+    if not any(history.deleted for history in histories.values()):
+        return
+
+    previous = {
+        key: history.deleted[0] if history.deleted else getattr(target, key)
+        for key, history in histories.items()
+    }
+    _apply_transaction(connection, **previous, sign=-1)
+    _apply_transaction(
+        connection,
+        target.account_id,
+        target.type,
+        target.amount,
+        target.account_amount,
+    )
+
+
+@event.listens_for(Transaction, "after_delete")
+def _transaction_after_delete(
+    mapper: Mapper[Transaction], connection: Connection, target: Transaction
+) -> None:
+    _apply_transaction(
+        connection,
+        target.account_id,
+        target.type,
+        target.amount,
+        target.account_amount,
+        sign=-1,
+    )
@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import TIMESTAMP, Index, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from polar.kit.db.models import RecordModel
+
+
+class StripeWebhookEvent(RecordModel):
+    """
+    A Stripe webhook event, stored when received and processed asynchronously.
+
+    Events are processed one at a time for a given Stripe object,
+    in the order they were created on Stripe's side.
+    """
+
+    __tablename__ = "stripe_webhook_events"
+    __table_args__ = (
+        Index(
+            "ix_stripe_webhook_events_object_id_stripe_created",
+            "object_id",
+            "stripe_created",
+        ),
+    )
+
+    stripe_id: Mapped[str] = mapped_column(String(100), nullable=False, unique=True)
+    """ID of the event on Stripe."""
+    type: Mapped[str] = mapped_column(String(100), nullable=False)
+    """Type of the event, e.g. `customer.subscription.updated`."""
+    account: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    """ID of the connected account, for Connect events."""
+    object_id: Mapped[str] = mapped_column(String(100), nullable=False)
+    """ID of the Stripe object whose events are processed serially, e.g. `sub_...`."""
+    stripe_created: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False
+    )
+    """Creation time of the event on Stripe."""
+    payload: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False)
+    """Raw event, as sent by Stripe."""
+
+    processed_at: Mapped[datetime | None] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=True, default=None
+    )
+    failed_at: Mapped[datetime | None] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=True, default=None
+    )
+    error: Mapped[str | None] = mapped_column(Text, nullable=True, default=None)
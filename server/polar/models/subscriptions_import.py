@@ -0,0 +1,27 @@
+from uuid import UUID
+
+from sqlalchemy import ForeignKey, LargeBinary
+from sqlalchemy.orm import Mapped, deferred, mapped_column
+
+from polar.kit.db.models import RecordModel
+from polar.kit.extensions.sqlalchemy import PostgresUUID
+
+
+class SubscriptionsImport(RecordModel):
+    """
+    A CSV file of emails uploaded to be subscribed to a free tier
+    by a background job, which deletes it once done.
+    """
+
+    __tablename__ = "subscriptions_imports"
+
+    subscription_tier_id: Mapped[UUID] = mapped_column(
+        PostgresUUID,
+        ForeignKey("subscription_tiers.id", ondelete="cascade"),
+        nullable=False,
+    )
+    user_id: Mapped[UUID] = mapped_column(
+        PostgresUUID, ForeignKey("users.id", ondelete="cascade"), nullable=False
+    )
+    """The user who uploaded the file, notified of the import progress."""
+    file: Mapped[bytes] = deferred(mapped_column(LargeBinary, nullable=False))
@@ -14,6 +14,8 @@ from polar.kit.extensions.sqlalchemy import PostgresUUID
 
 from .account import Account
 
+USERNAME_MAX_LENGTH = 50
+
 
 class OAuthPlatform(StrEnum):
     github = "github"
@@ -64,7 +66,9 @@ class User(RecordModel):
         ),
     )
 
-    username: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
+    username: Mapped[str] = mapped_column(
+        String(USERNAME_MAX_LENGTH), unique=True, nullable=False
+    )
     email: Mapped[str] = mapped_column(String(320), nullable=False)
     email_verified: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
     avatar_url: Mapped[str | None] = mapped_column(
@@ -13,6 +13,7 @@ from polar.integrations.loops.service import loops as loops_service
 from polar.kit.services import ResourceService
 from polar.models import Organization, User, UserOrganization
 from polar.postgres import AsyncSession, sql
+from polar.user_organization.cache import membership_cache
 from polar.user_organization.service import (
     user_organization as user_organization_service,
 )
@@ -96,6 +97,16 @@ class OrganizationService(
     ) -> Organization | None:
         return await self.get_by(session, platform=platform, external_id=external_id)
 
+    async def list_by_platform(
+        self, session: AsyncSession, platform: Platforms, external_ids: Sequence[int]
+    ) -> Sequence[Organization]:
+        stmt = sql.select(Organization).where(
+            Organization.platform == platform,
+            Organization.external_id.in_(external_ids),
+        )
+        res = await session.execute(stmt)
+        return res.scalars().all()
+
     async def get_by_name(
         self, session: AsyncSession, platform: Platforms, name: str
     ) -> Organization | None:
@@ -181,6 +192,7 @@ class OrganizationService(
             await session.execute(stmt)
             await session.commit()
         finally:
+            await membership_cache.invalidate([user.id])
             await loops_service.organization_installed(session, user=user)
 
     async def update_settings(
@@ -76,7 +76,7 @@ class PaymentIntentService:
 
         # Create a payment intent with Stripe
         try:
-            payment_intent = stripe.create_anonymous_intent(
+            payment_intent = await stripe.create_anonymous_intent(
                 amount=amount_including_fee,
                 transfer_group=str(intent.issue_id),
                 pledge_issue=pledge_issue,
@@ -136,7 +136,7 @@ class PaymentIntentService:
         fee = self.calculate_fee(updates.amount)
         amount_including_fee = updates.amount + fee
 
-        payment_intent = stripe.modify_intent(
+        payment_intent = await stripe.modify_intent(
             payment_intent_id,
             amount=amount_including_fee,
             receipt_email=updates.email,
@@ -165,7 +165,7 @@ class PaymentIntentService:
         if pledge:
             return pledge
 
-        intent = stripe.retrieve_intent(payment_intent_id)
+        intent = await stripe.retrieve_intent(payment_intent_id)
         if not intent:
             raise ResourceNotFound()
 
@@ -1,3 +1,4 @@
+from collections.abc import Sequence
 from dataclasses import dataclass
 
 from polar.kit.hook import Hook
@@ -6,9 +7,9 @@ from polar.postgres import AsyncSession
 
 
 @dataclass
-class PullRequestHook:
+class PullRequestsHook:
     session: AsyncSession
-    pull_request: PullRequest
+    pull_requests: Sequence[PullRequest]
 
 
-pull_request_upserted: Hook[PullRequestHook] = Hook()
+pull_request_upserted: Hook[PullRequestsHook] = Hook()
@@ -1,9 +1,16 @@
 import structlog
 
-from polar.eventstream.service import publish, publish_members
-from polar.issue.hooks import IssueHook, issue_upserted
+from polar.eventstream.service import (
+    Event,
+    Receivers,
+    publish,
+    publish_members,
+    send_many,
+)
+from polar.issue.hooks import IssuesHook, issues_upserted
+from polar.kit.utils import generate_uuid
 from polar.organization.hooks import OrganizationHook, organization_upserted
-from polar.pull_request.hooks import PullRequestHook, pull_request_upserted
+from polar.pull_request.hooks import PullRequestsHook, pull_request_upserted
 from polar.repository.hooks import (
     SyncCompletedHook,
     SyncedHook,
@@ -15,21 +22,25 @@ log = structlog.get_logger()
 
 
 async def on_issue_synced(hook: SyncedHook) -> None:
+    # Progress is reported once per synced batch, with its last issue
+    record = hook.records[-1]
     log.info(
         "issue.synced",
-        issue=hook.record.id,
-        title=hook.record.title,
+        issue=record.id,
+        title=record.title,
         synced=hook.synced,
+        synced_per_second=hook.synced_per_second,
     )
     await publish(
         "issue.synced",
         {
             "issue": {
-                "id": hook.record.id,
-                "title": hook.record.title,
+                "id": record.id,
+                "title": record.title,
             },
             "open_issues": hook.repository.open_issues or 0,
             "synced_issues": hook.synced,
+            "synced_per_second": hook.synced_per_second,
             "repository_id": hook.repository.id,
         },
         organization_id=hook.organization.id,
@@ -42,12 +53,18 @@ repository_issue_synced.add(on_issue_synced)
 async def on_issue_sync_completed(
     hook: SyncCompletedHook,
 ) -> None:
-    log.info("issue.sync.completed", repository=hook.repository.id, synced=hook.synced)
+    log.info(
+        "issue.sync.completed",
+        repository=hook.repository.id,
+        synced=hook.synced,
+        synced_per_second=hook.synced_per_second,
+    )
     await publish(
         "issue.sync.completed",
         {
             "open_issues": hook.repository.open_issues or 0,
             "synced_issues": hook.synced,
+            "synced_per_second": hook.synced_per_second,
             "repository_id": hook.repository.id,
         },
         organization_id=hook.organization.id,
@@ -62,28 +79,44 @@ repository_issues_sync_completed.add(on_issue_sync_completed)
 ###############################################################################
 
 
-async def on_issue_updated(hook: IssueHook) -> None:
-    await publish(
-        "issue.updated",
-        {
-            "issue_id": hook.issue.id,
-            "organization_id": hook.issue.organization_id,
-            "repository_id": hook.issue.repository_id,
-        },
-        repository_id=hook.issue.repository_id,
-        organization_id=hook.issue.organization_id,
+async def on_issue_updated(hook: IssuesHook) -> None:
+    await send_many(
+        (
+            Event(
+                id=generate_uuid(),
+                key="issue.updated",
+                payload={
+                    "issue_id": issue.id,
+                    "organization_id": issue.organization_id,
+                    "repository_id": issue.repository_id,
+                },
+            ),
+            Receivers(
+                repository_id=issue.repository_id,
+                organization_id=issue.organization_id,
+            ).get_channels(),
+        )
+        for issue in hook.issues
     )
 
 
-issue_upserted.add(on_issue_updated)
+issues_upserted.add(on_issue_updated)
 
 
-async def on_pull_request_updated(hook: PullRequestHook) -> None:
-    await publish(
-        "pull_request.updated",
-        {"pull_request": hook.pull_request.id},
-        repository_id=hook.pull_request.repository_id,
-        organization_id=hook.pull_request.organization_id,
+async def on_pull_request_updated(hook: PullRequestsHook) -> None:
+    await send_many(
+        (
+            Event(
+                id=generate_uuid(),
+                key="pull_request.updated",
+                payload={"pull_request": pull_request.id},
+            ),
+            Receivers(
+                repository_id=pull_request.repository_id,
+                organization_id=pull_request.organization_id,
+            ).get_channels(),
+        )
+        for pull_request in hook.pull_requests
     )
 
 
@@ -98,6 +131,8 @@ async def on_organization_upserted(hook: OrganizationHook) -> None:
             "organization_id": hook.organization.id,
         },
         organization_id=hook.organization.id,
+        # Only a hint for clients to refetch the organization, which is authorized
+        members_channel=True,
     )
 
 
@@ -4,7 +4,7 @@ from slack_sdk.webhook import WebhookClient as SlackWebhookClient
 
 from polar.account.service import account as account_service
 from polar.config import settings
-from polar.issue.hooks import IssueHook, issue_upserted
+from polar.issue.hooks import IssuesHook, issues_upserted
 from polar.issue.service import issue as issue_service
 from polar.kit.money import get_cents_in_dollar_string
 from polar.models import Issue
@@ -42,29 +42,30 @@ log = structlog.get_logger()
 
 
 async def mark_pledges_confirmation_pending_on_issue_close(
-    hook: IssueHook,
+    hook: IssuesHook,
 ) -> None:
-    if hook.issue.state == "closed":
-        # Only do this if the issue has pledges
-        pledges = await pledge_service.get_by_issue_ids(hook.session, [hook.issue.id])
-        if len(pledges) == 0:
-            return
-
-        # Mark pledges in "created" as "confirmation_pending"
-        changed = await issue_service.mark_needs_confirmation(
-            hook.session, hook.issue.id
+    closed_issue_ids = [issue.id for issue in hook.issues if issue.state == "closed"]
+    other_issue_ids = [issue.id for issue in hook.issues if issue.state != "closed"]
+
+    # Only closed issues with pledges
+    pledges = await pledge_service.get_by_issue_ids(hook.session, closed_issue_ids)
+    pledged_issue_ids = list({pledge.issue_id for pledge in pledges})
+
+    # Mark pledges in "created" as "confirmation_pending"
+    changed_issue_ids = await issue_service.mark_needs_confirmation_many(
+        hook.session, pledged_issue_ids
+    )
+
+    # Send notifications
+    for issue_id in changed_issue_ids:
+        await pledge_service.pledge_confirmation_pending_notifications(
+            hook.session, issue_id
         )
 
-        # Send notifications
-        if changed:
-            await pledge_service.pledge_confirmation_pending_notifications(
-                hook.session, hook.issue.id
-            )
-    else:
-        await issue_service.mark_not_needs_confirmation(hook.session, hook.issue.id)
+    await issue_service.mark_not_needs_confirmation_many(hook.session, other_issue_ids)
 
 
-issue_upserted.add(mark_pledges_confirmation_pending_on_issue_close)
+issues_upserted.add(mark_pledges_confirmation_pending_on_issue_close)
 
 
 async def pledge_created_backoffice_discord_alert(hook: PledgeHook) -> None:
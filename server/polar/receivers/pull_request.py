@@ -1,14 +1,16 @@
-from polar.enums import Platforms
+from uuid import UUID
+
 from polar.integrations.github.service.url import github_url
 from polar.issue.service import issue as issue_service
+from polar.models import Organization, Repository
 from polar.organization.service import organization as organization_service
-from polar.pull_request.hooks import PullRequestHook, pull_request_upserted
+from polar.pull_request.hooks import PullRequestsHook, pull_request_upserted
 from polar.repository.service import repository as repository_service
 from polar.worker import enqueue_job
 
 
 async def pull_request_find_reverse_references(
-    hook: PullRequestHook,
+    hook: PullRequestsHook,
 ) -> None:
     """
     Find links to issues within the same repository, and re-crawl those issues for
@@ -17,43 +19,51 @@ async def pull_request_find_reverse_references(
     This is needed as there are no webooks on new issue timeline events, and we're
     using this as a proxy for when a new crawl is needed.
     """
-
     session = hook.session
-    item = hook.pull_request
 
-    if not item.body:
-        return
+    # Linked issue numbers, by repository
+    numbers: dict[UUID, set[int]] = {}
+    repositories: dict[UUID, Repository | None] = {}
+    organizations: dict[UUID, Organization | None] = {}
+
+    for item in hook.pull_requests:
+        if not item.body:
+            continue
 
-    repo = await repository_service.get(session, item.repository_id)
-    if not repo:
-        return
+        if item.repository_id not in repositories:
+            repositories[item.repository_id] = await repository_service.get(
+                session, item.repository_id
+            )
+        repo = repositories[item.repository_id]
+        if not repo:
+            continue
 
-    org = await organization_service.get(session, item.organization_id)
-    if not org:
-        return
+        if item.organization_id not in organizations:
+            organizations[item.organization_id] = await organization_service.get(
+                session, item.organization_id
+            )
+        org = organizations[item.organization_id]
+        if not org:
+            continue
 
-    urls = github_url.parse_urls(item.body)
+        for url in github_url.parse_urls(item.body):
+            # Find deps in same repository, and trigger syncs for the issue
+            is_same_owner = url.owner is None or url.owner == org.name
+            is_same_repo = url.repo is None or url.repo == repo.name
 
-    for url in urls:
-        # Find deps in same repository, and trigger syncs for the issue
-        is_same_owner = url.owner is None or url.owner == org.name
-        is_same_repo = url.repo is None or url.repo == repo.name
+            if not is_same_owner or not is_same_repo:
+                continue
 
-        if not is_same_owner or not is_same_repo:
-            continue
+            numbers.setdefault(repo.id, set()).add(url.number)
 
-        linked_issue = await issue_service.get_by_number(
-            session,
-            Platforms.github,
-            organization_id=org.id,
-            repository_id=repo.id,
-            number=url.number,
+    for repository_id, repository_numbers in numbers.items():
+        linked_issues = await issue_service.list_by_repository_and_numbers(
+            session, repository_id, list(repository_numbers)
         )
-        if not linked_issue:
-            continue
 
-        # Schedule sync for this issue
-        enqueue_job("github.issue.sync.issue_references", linked_issue.id)
+        # Schedule sync for these issues
+        for linked_issue in linked_issues:
+            enqueue_job("github.issue.sync.issue_references", linked_issue.id)
 
 
 pull_request_upserted.add(pull_request_find_reverse_references)
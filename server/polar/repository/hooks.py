@@ -1,3 +1,4 @@
+from collections.abc import Sequence
 from dataclasses import dataclass
 
 from polar.kit.hook import Hook
@@ -11,8 +12,9 @@ from polar.models.repository import Repository
 class SyncedHook:
     repository: Repository
     organization: Organization
-    record: Issue | PullRequest
+    records: Sequence[Issue | PullRequest]
     synced: int
+    synced_per_second: float
 
 
 @dataclass
@@ -20,6 +22,7 @@ class SyncCompletedHook:
     repository: Repository
     organization: Organization
     synced: int
+    synced_per_second: float
 
 
 repository_issue_synced: Hook[SyncedHook] = Hook()
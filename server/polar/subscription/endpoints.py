@@ -1,4 +1,3 @@
-from collections.abc import AsyncGenerator
 from datetime import date
 from typing import Annotated
 
@@ -11,8 +10,13 @@ from polar.auth.dependencies import Auth, UserRequiredAuth
 from polar.authz.service import AccessType, Authz
 from polar.enums import UserSignupType
 from polar.exceptions import BadRequest, ResourceNotFound, Unauthorized
-from polar.kit.csv import get_emails_from_csv, get_iterable_from_binary_io
-from polar.kit.pagination import ListResource, PaginationParams, PaginationParamsQuery
+from polar.kit.csv import get_iterable_from_binary_io, iter_emails_from_csv
+from polar.kit.pagination import (
+    CursorListResource,
+    CursorPaginationParamsQuery,
+    ListResource,
+    PaginationParamsQuery,
+)
 from polar.kit.routing import APIRouter
 from polar.kit.sorting import Sorting, SortingGetter
 from polar.models import Repository, Subscription, SubscriptionBenefit, SubscriptionTier
@@ -24,12 +28,18 @@ from polar.organization.dependencies import (
     OrganizationNamePlatform,
 )
 from polar.organization.service import organization as organization_service
-from polar.postgres import AsyncSession, get_db_session
+from polar.postgres import (
+    AsyncSession,
+    AsyncSessionMaker,
+    get_db_session,
+    get_db_sessionmaker,
+)
 from polar.posthog import posthog
 from polar.repository.dependencies import OptionalRepositoryNameQuery
 from polar.repository.service import repository as repository_service
 from polar.tags.api import Tags
 from polar.user.service import user as user_service
+from polar.worker import enqueue_job
 
 from .schemas import (
     FreeSubscriptionCreate,
@@ -39,6 +49,7 @@ from .schemas import (
     SubscriptionBenefitUpdate,
     SubscriptionCreateEmail,
     SubscriptionsImported,
+    SubscriptionsImportEnqueued,
     SubscriptionsStatistics,
     SubscriptionSubscriber,
     SubscriptionSummary,
@@ -52,7 +63,7 @@ from .schemas import Subscription as SubscriptionSchema
 from .schemas import SubscriptionBenefit as SubscriptionBenefitSchema
 from .schemas import SubscriptionTier as SubscriptionTierSchema
 from .service.subscribe_session import subscribe_session as subscribe_session_service
-from .service.subscription import AlreadySubscribed, SearchSortProperty
+from .service.subscription import SearchSortProperty
 from .service.subscription import subscription as subscription_service
 from .service.subscription_benefit import (
     subscription_benefit as subscription_benefit_service,
@@ -558,6 +569,62 @@ async def search_subscriptions(
     )
 
 
+@router.get(
+    "/subscriptions/search/cursor",
+    response_model=CursorListResource[SubscriptionSchema],
+    tags=[Tags.PUBLIC],
+)
+async def search_subscriptions_cursor(
+    auth: UserRequiredAuth,
+    pagination: CursorPaginationParamsQuery,
+    sorting: SearchSorting,
+    organization_name_platform: OrganizationNamePlatform,
+    repository_name: OptionalRepositoryNameQuery = None,
+    direct_organization: bool = Query(True),
+    type: SubscriptionTierType | None = Query(None),
+    subscription_tier_id: UUID4 | None = Query(None),
+    subscriber_user_id: UUID4 | None = Query(None),
+    subscriber_organization_id: UUID4 | None = Query(None),
+    active: bool | None = Query(None),
+    session: AsyncSession = Depends(get_db_session),
+) -> CursorListResource[SubscriptionSchema]:
+    organization_name, platform = organization_name_platform
+    organization = await organization_service.get_by_name(
+        session, platform, organization_name
+    )
+    if organization is None:
+        raise ResourceNotFound("Organization not found")
+
+    repository: Repository | None = None
+    if repository_name is not None:
+        repository = await repository_service.get_by_org_and_name(
+            session, organization.id, repository_name
+        )
+        if repository is None:
+            raise ResourceNotFound("Repository not found")
+
+    results, next_cursor, total_count = await subscription_service.search_cursor(
+        session,
+        auth.user,
+        type=type,
+        organization=organization,
+        repository=repository,
+        direct_organization=direct_organization,
+        subscription_tier_id=subscription_tier_id,
+        subscriber_user_id=subscriber_user_id,
+        subscriber_organization_id=subscriber_organization_id,
+        active=active,
+        pagination=pagination,
+        sorting=sorting,
+    )
+
+    return CursorListResource.from_paginated_results(
+        [SubscriptionSchema.model_validate(result) for result in results],
+        next_cursor,
+        total_count,
+    )
+
+
 @router.get(
     "/subscriptions/subscribed",
     response_model=ListResource[SubscriptionSubscriber],
@@ -761,23 +828,11 @@ async def subscriptions_import(
     if not await authz.can(auth.subject, AccessType.write, organization):
         raise Unauthorized()
 
-    emails = get_emails_from_csv(get_iterable_from_binary_io(file.file))
-
-    count = 0
-
-    for email in emails:
-        try:
-            user = await user_service.get_by_email_or_signup(
-                session, email, signup_type=UserSignupType.imported
-            )
-            await subscription_service.create_arbitrary_subscription(
-                session, user=user, subscription_tier=free_tier
-            )
-            count += 1
-        except AlreadySubscribed:
-            pass
-        except Exception as e:
-            log.error("subscriptions_import.failed", e=e)
+    count = await subscription_service.import_subscriptions(
+        session,
+        emails=iter_emails_from_csv(get_iterable_from_binary_io(file.file)),
+        subscription_tier=free_tier,
+    )
 
     posthog.user_event(
         auth.user,
@@ -793,17 +848,20 @@ async def subscriptions_import(
     return SubscriptionsImported(count=count)
 
 
-@router.get(
-    "/subscriptions/export",
+@router.post(
+    "/subscriptions/import/background",
+    response_model=SubscriptionsImportEnqueued,
+    status_code=202,
     tags=[Tags.PUBLIC],
 )
-async def subscriptions_export(
+async def subscriptions_import_background(
     auth: UserRequiredAuth,
+    file: UploadFile,
     organization_name_platform: OrganizationNamePlatform,
     repository_name: OptionalRepositoryNameQuery = None,
     authz: Authz = Depends(Authz.authz),
     session: AsyncSession = Depends(get_db_session),
-) -> Response:
+) -> SubscriptionsImportEnqueued:
     organization: Organization | None = None
     if organization_name_platform is not None:
         organization_name, platform = organization_name_platform
@@ -825,41 +883,85 @@ async def subscriptions_export(
         if repository is None:
             raise ResourceNotFound("Repository not found")
 
+    # find free tier
+    free_tier = await subscription_tier_service.get_free(
+        session, organization=organization, repository=repository
+    )
+    if free_tier is None:
+        raise ResourceNotFound("No free tier found")
+
     # authz
     if not await authz.can(auth.subject, AccessType.write, organization):
         raise Unauthorized()
 
-    async def create_csv() -> AsyncGenerator[str, None]:
-        # CSV header
-        yield "email,name,created_at,active,tier\n"
+    # The file is stored in the database: only its ID is sent to the worker
+    subscriptions_import = await subscription_service.create_import(
+        session, subscription_tier=free_tier, user=auth.user, file=await file.read()
+    )
+    enqueue_job(
+        "subscription.subscription.import",
+        subscriptions_import_id=subscriptions_import.id,
+    )
 
-        (subscribers, _) = await subscription_service.search(
-            session,
-            user=auth.subject,
-            organization=organization,
-            repository=repository,
-            pagination=PaginationParams(limit=1000000, page=1),
-        )
+    posthog.user_event(
+        auth.user,
+        "subscriptions",
+        "import",
+        "create",
+        {
+            "subscription_tier_id": free_tier.id,
+            "background": True,
+        },
+    )
 
-        for sub in subscribers:
-            fields = [
-                sub.user.email,
-                sub.user.username_or_email,
-                sub.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                "true" if sub.active else "false",
-                sub.subscription_tier.name,
-            ]
+    return SubscriptionsImportEnqueued(id=subscriptions_import.id)
+
+
+@router.get(
+    "/subscriptions/export",
+    tags=[Tags.PUBLIC],
+)
+async def subscriptions_export(
+    auth: UserRequiredAuth,
+    organization_name_platform: OrganizationNamePlatform,
+    repository_name: OptionalRepositoryNameQuery = None,
+    authz: Authz = Depends(Authz.authz),
+    session: AsyncSession = Depends(get_db_session),
+    sessionmaker: AsyncSessionMaker = Depends(get_db_sessionmaker),
+) -> Response:
+    organization: Organization | None = None
+    if organization_name_platform is not None:
+        organization_name, platform = organization_name_platform
+        organization = await organization_service.get_by_name(
+            session, platform, organization_name
+        )
+        if organization is None:
+            raise ResourceNotFound("Organization not found")
 
-            # strip commas (poor mans CSV)
-            fields = [f.replace(",", "") for f in fields]
+    repository: Repository | None = None
+    if repository_name is not None:
+        if organization is None:
+            raise BadRequest(
+                "organization_name and platform are required when repository_name is set"
+            )
+        repository = await repository_service.get_by_org_and_name(
+            session, organization.id, repository_name
+        )
+        if repository is None:
+            raise ResourceNotFound("Repository not found")
 
-            yield ",".join(fields) + "\n"
+    # authz
+    if not await authz.can(auth.subject, AccessType.write, organization):
+        raise Unauthorized()
 
     posthog.user_event(auth.user, "subscriptions", "export", "create")
 
+    content = subscription_service.get_export_csv(
+        sessionmaker, auth.user, organization=organization, repository=repository
+    )
     name = f"{organization.name}_subscribers.csv"
     headers = {"Content-Disposition": f'attachment; filename="{name}"'}
-    return StreamingResponse(create_csv(), headers=headers, media_type="text/csv")
+    return StreamingResponse(content, headers=headers, media_type="text/csv")
 
 
 @router.post(
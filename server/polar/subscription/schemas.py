@@ -561,6 +561,10 @@ class SubscriptionsImported(Schema):
     count: int
 
 
+class SubscriptionsImportEnqueued(Schema):
+    id: UUID4
+
+
 class SubscriptionSummary(Schema):
     user: SubscriptionPublicUser
     organization: SubscriptionOrganization | None = None
@@ -1,10 +1,13 @@
+import io
+import itertools
 import uuid
-from collections.abc import Sequence
+from collections.abc import AsyncIterable, Awaitable, Callable, Iterable, Sequence
 from datetime import UTC, date, datetime
 from enum import StrEnum
 from typing import Any, cast, overload
 
 import stripe as stripe_lib
+import structlog
 from sqlalchemy import (
     Select,
     UnaryExpression,
@@ -13,13 +16,14 @@ from sqlalchemy import (
     desc,
     distinct,
     func,
+    insert,
     not_,
     or_,
     select,
     text,
     tuple_,
 )
-from sqlalchemy.orm import aliased, contains_eager, joinedload
+from sqlalchemy.orm import aliased, contains_eager, joinedload, undefer
 
 from polar.auth.dependencies import AuthMethod
 from polar.authz.service import AccessType, Authz, Subject
@@ -30,17 +34,30 @@ from polar.held_balance.service import held_balance as held_balance_service
 from polar.integrations.loops.service import loops as loops_service
 from polar.integrations.stripe.service import stripe as stripe_service
 from polar.integrations.stripe.utils import get_expandable_id
-from polar.kit.db.postgres import AsyncSession
-from polar.kit.pagination import PaginationParams, paginate
+from polar.kit.csv import (
+    IterableCSVWriter,
+    get_iterable_from_binary_io,
+    iter_emails_from_csv,
+)
+from polar.kit.db.postgres import AsyncSession, async_sessionmaker
+from polar.kit.pagination import (
+    CursorPaginationParams,
+    PaginationParams,
+    SortKey,
+    paginate,
+    paginate_cursor,
+)
 from polar.kit.services import ResourceServiceReader
 from polar.kit.sorting import Sorting
 from polar.kit.utils import utc_now
+from polar.logging import Logger
 from polar.models import (
     HeldBalance,
     OAuthAccount,
     Organization,
     Repository,
     Subscription,
+    SubscriptionsImport,
     SubscriptionTier,
     Transaction,
     User,
@@ -85,6 +102,11 @@ from .subscription_benefit_grant import (
 )
 from .subscription_tier import subscription_tier as subscription_tier_service
 
+log: Logger = structlog.get_logger()
+
+EXPORT_CSV_BATCH_SIZE = 1000
+IMPORT_CHUNK_SIZE = 1000
+
 
 class SubscriptionError(PolarError):
     ...
@@ -236,6 +258,79 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
             (SearchSortProperty.started_at, True)
         ],
     ) -> tuple[Sequence[Subscription], int]:
+        statement = self._get_search_statement(
+            user,
+            organization=organization,
+            repository=repository,
+            direct_organization=direct_organization,
+            type=type,
+            subscription_tier_id=subscription_tier_id,
+            subscriber_user_id=subscriber_user_id,
+            subscriber_organization_id=subscriber_organization_id,
+            active=active,
+        )
+
+        statement = statement.order_by(
+            *(key.order_by_clause for key in self._get_search_sort_keys(sorting))
+        )
+
+        results, count = await paginate(session, statement, pagination=pagination)
+
+        return results, count
+
+    async def search_cursor(
+        self,
+        session: AsyncSession,
+        user: User,
+        *,
+        organization: Organization,
+        repository: Repository | None = None,
+        direct_organization: bool = True,
+        type: SubscriptionTierType | None = None,
+        subscription_tier_id: uuid.UUID | None = None,
+        subscriber_user_id: uuid.UUID | None = None,
+        subscriber_organization_id: uuid.UUID | None = None,
+        active: bool | None = None,
+        pagination: CursorPaginationParams,
+        sorting: list[Sorting[SearchSortProperty]] = [
+            (SearchSortProperty.started_at, True)
+        ],
+    ) -> tuple[Sequence[Subscription], str | None, int | None]:
+        statement = self._get_search_statement(
+            user,
+            organization=organization,
+            repository=repository,
+            direct_organization=direct_organization,
+            type=type,
+            subscription_tier_id=subscription_tier_id,
+            subscriber_user_id=subscriber_user_id,
+            subscriber_organization_id=subscriber_organization_id,
+            active=active,
+        )
+
+        sort_keys = self._get_search_sort_keys(sorting)
+        # Tie-breaker, so the order is deterministic
+        sort_keys.append(
+            SortKey(Subscription.id, sort_keys[0].desc if sort_keys else False)
+        )
+
+        return await paginate_cursor(
+            session, statement, pagination=pagination, sort_keys=sort_keys
+        )
+
+    def _get_search_statement(
+        self,
+        user: User,
+        *,
+        organization: Organization,
+        repository: Repository | None,
+        direct_organization: bool,
+        type: SubscriptionTierType | None,
+        subscription_tier_id: uuid.UUID | None,
+        subscriber_user_id: uuid.UUID | None,
+        subscriber_organization_id: uuid.UUID | None,
+        active: bool | None,
+    ) -> Select[tuple[Subscription]]:
         statement = self._get_readable_subscriptions_statement(user).where(
             Subscription.started_at.is_not(None)
         )
@@ -274,36 +369,34 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
             else:
                 statement = statement.where(Subscription.canceled.is_(True))
 
-        order_by_clauses: list[UnaryExpression[Any]] = []
+        statement = statement.options(
+            contains_eager(Subscription.subscription_tier),
+            contains_eager(Subscription.user),
+            joinedload(Subscription.organization),
+        )
+
+        return statement
+
+    def _get_search_sort_keys(
+        self, sorting: list[Sorting[SearchSortProperty]]
+    ) -> list[SortKey]:
+        sort_keys: list[SortKey] = []
         for criterion, is_desc in sorting:
-            clause_function = desc if is_desc else asc
             if criterion == SearchSortProperty.user:
-                order_by_clauses.append(clause_function(User.username))
+                sort_keys.append(SortKey(User.username, is_desc))
             if criterion == SearchSortProperty.status:
-                order_by_clauses.append(clause_function(Subscription.status))
+                sort_keys.append(SortKey(Subscription.status, is_desc))
             if criterion == SearchSortProperty.started_at:
-                order_by_clauses.append(clause_function(Subscription.started_at))
+                sort_keys.append(SortKey(Subscription.started_at, is_desc))
             if criterion == SearchSortProperty.current_period_end:
-                order_by_clauses.append(
-                    clause_function(Subscription.current_period_end)
-                )
+                sort_keys.append(SortKey(Subscription.current_period_end, is_desc))
             if criterion == SearchSortProperty.price_amount:
-                order_by_clauses.append(clause_function(Subscription.price_amount))
+                sort_keys.append(SortKey(Subscription.price_amount, is_desc))
             if criterion == SearchSortProperty.subscription_tier_type:
-                order_by_clauses.append(clause_function(SubscriptionTier.type))
+                sort_keys.append(SortKey(SubscriptionTier.type, is_desc))
             if criterion == SearchSortProperty.subscription_tier:
-                order_by_clauses.append(clause_function(SubscriptionTier.name))
-        statement = statement.order_by(*order_by_clauses)
-
-        statement = statement.options(
-            contains_eager(Subscription.subscription_tier),
-            contains_eager(Subscription.user),
-            joinedload(Subscription.organization),
-        )
-
-        results, count = await paginate(session, statement, pagination=pagination)
-
-        return results, count
+                sort_keys.append(SortKey(SubscriptionTier.name, is_desc))
+        return sort_keys
 
     async def search_subscribed(
         self,
@@ -391,6 +484,53 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
 
         return results, count
 
+    async def get_export_csv(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        user: User,
+        *,
+        organization: Organization,
+        repository: Repository | None = None,
+    ) -> AsyncIterable[str]:
+        statement = self._get_search_statement(
+            user,
+            organization=organization,
+            repository=repository,
+            direct_organization=True,
+            type=None,
+            subscription_tier_id=None,
+            subscriber_user_id=None,
+            subscriber_organization_id=None,
+            active=None,
+        ).order_by(Subscription.started_at.desc())
+        # Joined eager loading of collections can't be combined with yield_per
+        statement = statement.options(
+            contains_eager(Subscription.user).selectinload(User.oauth_accounts)
+        )
+        # Fetch rows from a server-side cursor, by batches,
+        # so memory doesn't grow with the number of subscribers
+        statement = statement.execution_options(yield_per=EXPORT_CSV_BATCH_SIZE)
+
+        csv_writer = IterableCSVWriter(dialect="excel")
+        yield csv_writer.getrow(("email", "name", "created_at", "active", "tier"))
+
+        # StreamingResponse is running its own async task to exhaust the iterator
+        # Thus, rely on the main session generated by the FastAPI dependency leads to
+        # garbage collection problems.
+        # We create a new session to avoid this.
+        async with sessionmaker() as session:
+            subscriptions = await session.stream_scalars(statement)
+            async for subscription in subscriptions:
+                yield csv_writer.getrow(
+                    (
+                        subscription.user.email,
+                        subscription.user.username_or_email,
+                        subscription.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+                        "true" if subscription.active else "false",
+                        subscription.subscription_tier.name,
+                    )
+                )
+
     async def search_summary(
         self,
         session: AsyncSession,
@@ -545,6 +685,169 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
 
         return subscription
 
+    async def create_arbitrary_subscriptions(
+        self,
+        session: AsyncSession,
+        *,
+        users: Sequence[User],
+        subscription_tier: SubscriptionTier,
+    ) -> Sequence[Subscription]:
+        """
+        Bulk version of `create_arbitrary_subscription`.
+
+        Users already having an active subscription are skipped,
+        instead of raising `AlreadySubscribed`.
+        """
+        if len(users) == 0:
+            return []
+
+        subscribed_statement = (
+            select(Subscription.user_id)
+            .join(Subscription.subscription_tier)
+            .where(
+                Subscription.user_id.in_([user.id for user in users]),
+                Subscription.active.is_(True),
+            )
+        )
+        if subscription_tier.organization_id is not None:
+            subscribed_statement = subscribed_statement.where(
+                SubscriptionTier.organization_id == subscription_tier.organization_id
+            )
+        if subscription_tier.repository_id is not None:
+            subscribed_statement = subscribed_statement.where(
+                SubscriptionTier.repository_id == subscription_tier.repository_id
+            )
+        subscribed_user_ids = set(
+            (await session.execute(subscribed_statement)).scalars().all()
+        )
+
+        start = utc_now()
+        values = [
+            {
+                "status": SubscriptionStatus.active,
+                "current_period_start": start,
+                "cancel_at_period_end": False,
+                "started_at": start,
+                "price_currency": subscription_tier.price_currency,
+                "price_amount": subscription_tier.price_amount,
+                "user_id": user.id,
+                "organization_id": None,
+                "subscription_tier_id": subscription_tier.id,
+            }
+            for user in users
+            if user.id not in subscribed_user_ids
+        ]
+        if len(values) == 0:
+            return []
+
+        result = await session.execute(
+            insert(Subscription).returning(Subscription), values
+        )
+        subscriptions = result.scalars().all()
+
+        for subscription in subscriptions:
+            enqueue_job(
+                "subscription.subscription.enqueue_benefits_grants", subscription.id
+            )
+
+        return subscriptions
+
+    async def create_import(
+        self,
+        session: AsyncSession,
+        *,
+        subscription_tier: SubscriptionTier,
+        user: User,
+        file: bytes,
+    ) -> SubscriptionsImport:
+        subscriptions_import = SubscriptionsImport(
+            subscription_tier_id=subscription_tier.id, user_id=user.id, file=file
+        )
+        session.add(subscriptions_import)
+        await session.flush()
+        return subscriptions_import
+
+    async def get_import(
+        self, session: AsyncSession, id: uuid.UUID
+    ) -> SubscriptionsImport | None:
+        statement = (
+            select(SubscriptionsImport)
+            .where(
+                SubscriptionsImport.id == id,
+                SubscriptionsImport.deleted_at.is_(None),
+            )
+            .options(undefer(SubscriptionsImport.file))
+        )
+        result = await session.execute(statement)
+        return result.scalar_one_or_none()
+
+    async def import_subscriptions_from_file(
+        self,
+        session: AsyncSession,
+        *,
+        subscriptions_import: SubscriptionsImport,
+        subscription_tier: SubscriptionTier,
+        on_progress: Callable[[int, int], Awaitable[None]] | None = None,
+    ) -> int:
+        """
+        Run an import uploaded with `create_import`, and delete it.
+
+        The CSV file is parsed lazily, along the chunks of the import.
+        """
+        count = await self.import_subscriptions(
+            session,
+            emails=iter_emails_from_csv(
+                get_iterable_from_binary_io(io.BytesIO(subscriptions_import.file))
+            ),
+            subscription_tier=subscription_tier,
+            on_progress=on_progress,
+        )
+        await session.delete(subscriptions_import)
+        return count
+
+    async def import_subscriptions(
+        self,
+        session: AsyncSession,
+        *,
+        emails: Iterable[str],
+        subscription_tier: SubscriptionTier,
+        on_progress: Callable[[int, int], Awaitable[None]] | None = None,
+    ) -> int:
+        """
+        Subscribe a list of emails to a subscription tier,
+        signing up the ones not having an account yet.
+
+        Emails are processed and committed by chunks of `IMPORT_CHUNK_SIZE`,
+        so `emails` can be a lazy iterator over a large file.
+        `on_progress` is called after each chunk
+        with the number of processed emails and the number of created subscriptions.
+
+        Returns the number of created subscriptions.
+        """
+        processed = 0
+        count = 0
+        for chunk in itertools.batched(emails, IMPORT_CHUNK_SIZE):
+            users = await user_service.get_by_emails_or_signup(
+                session, chunk, signup_type=UserSignupType.imported
+            )
+            subscriptions = await self.create_arbitrary_subscriptions(
+                session, users=users, subscription_tier=subscription_tier
+            )
+            await session.commit()
+
+            processed += len(chunk)
+            count += len(subscriptions)
+            log.info(
+                "subscription.import.chunk",
+                subscription_tier_id=subscription_tier.id,
+                processed=processed,
+                count=count,
+            )
+            if on_progress is not None:
+                await on_progress(processed, count)
+
+        return count
+
     async def create_subscription_from_stripe(
         self, session: AsyncSession, *, stripe_subscription: stripe_lib.Subscription
     ) -> Subscription:
@@ -602,7 +905,7 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
         subscription.set_started_at()
 
         customer_id = get_expandable_id(stripe_subscription.customer)
-        customer = stripe_service.get_customer(customer_id)
+        customer = await stripe_service.get_customer(customer_id)
         customer_email = cast(str, customer.email)
 
         # Subscribe as organization
@@ -936,7 +1239,7 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
             raise InvalidSubscriptionTierUpgrade(new_subscription_tier.id)
 
         assert old_subscription_tier.stripe_price_id is not None
-        stripe_service.update_subscription_price(
+        await stripe_service.update_subscription_price(
             subscription.stripe_subscription_id,
             old_price=old_subscription_tier.stripe_price_id,
             new_price=new_subscription_tier.stripe_price_id,
@@ -968,7 +1271,9 @@ class SubscriptionService(ResourceServiceReader[Subscription]):
             raise AlreadyCanceledSubscription(subscription)
 
         if subscription.stripe_subscription_id is not None:
-            stripe_service.cancel_subscription(subscription.stripe_subscription_id)
+            await stripe_service.cancel_subscription(
+                subscription.stripe_subscription_id
+            )
         else:
             subscription.ended_at = utc_now()
             subscription.cancel_at_period_end = True
@@ -4,6 +4,7 @@ from arq import Retry
 from discord_webhook import AsyncDiscordWebhook, DiscordEmbed
 
 from polar.config import settings
+from polar.eventstream.service import publish as eventstream_publish
 from polar.exceptions import PolarError
 from polar.kit.money import get_cents_in_dollar_string
 from polar.models.subscription_benefit import SubscriptionBenefitType
@@ -33,6 +34,16 @@ class SubscriptionDoesNotExist(SubscriptionTaskError):
         super().__init__(message, 500)
 
 
+class SubscriptionsImportDoesNotExist(SubscriptionTaskError):
+    def __init__(self, subscriptions_import_id: uuid.UUID) -> None:
+        self.subscriptions_import_id = subscriptions_import_id
+        message = (
+            f"The subscriptions import with id {subscriptions_import_id} "
+            "does not exist."
+        )
+        super().__init__(message, 500)
+
+
 class SubscriptionTierDoesNotExist(SubscriptionTaskError):
     def __init__(self, subscription_tier_id: uuid.UUID) -> None:
         self.subscription_tier_id = subscription_tier_id
@@ -81,6 +92,48 @@ async def subscription_enqueue_benefits_grants(
         await subscription_service.enqueue_benefits_grants(session, subscription)
 
 
+@task("subscription.subscription.import", timeout=3600)
+async def subscription_import(
+    ctx: JobContext,
+    subscriptions_import_id: uuid.UUID,
+    polar_context: PolarWorkerContext,
+) -> None:
+    async with AsyncSessionMaker(ctx) as session:
+        subscriptions_import = await subscription_service.get_import(
+            session, subscriptions_import_id
+        )
+        if subscriptions_import is None:
+            raise SubscriptionsImportDoesNotExist(subscriptions_import_id)
+
+        subscription_tier_id = subscriptions_import.subscription_tier_id
+        subscription_tier = await subscription_tier_service.get(
+            session, subscription_tier_id
+        )
+        if subscription_tier is None:
+            raise SubscriptionTierDoesNotExist(subscription_tier_id)
+
+        user_id = subscriptions_import.user_id
+
+        async def on_progress(processed: int, count: int) -> None:
+            await eventstream_publish(
+                "subscription.subscription.import.progress",
+                {
+                    "subscriptions_import_id": subscriptions_import_id,
+                    "subscription_tier_id": subscription_tier_id,
+                    "processed": processed,
+                    "count": count,
+                },
+                user_id=user_id,
+            )
+
+        await subscription_service.import_subscriptions_from_file(
+            session,
+            subscriptions_import=subscriptions_import,
+            subscription_tier=subscription_tier,
+            on_progress=on_progress,
+        )
+
+
 @task("subscription.subscription.update_subscription_tier_benefits_grants")
 async def subscription_update_subscription_tier_benefits_grants(
     ctx: JobContext, subscription_tier_id: uuid.UUID, polar_context: PolarWorkerContext
@@ -8,7 +8,12 @@ from polar.account.service import account as account_service
 from polar.auth.dependencies import UserRequiredAuth
 from polar.authz.service import AccessType, Authz
 from polar.exceptions import NotPermitted, ResourceNotFound
-from polar.kit.pagination import ListResource, PaginationParamsQuery
+from polar.kit.pagination import (
+    CursorListResource,
+    CursorPaginationParamsQuery,
+    ListResource,
+    PaginationParamsQuery,
+)
 from polar.kit.sorting import Sorting, SortingGetter
 from polar.models import Transaction as TransactionModel
 from polar.models.transaction import TransactionType
@@ -71,6 +76,41 @@ async def search_transactions(
     )
 
 
+@router.get(
+    "/search/cursor",
+    response_model=CursorListResource[Transaction],
+    tags=[Tags.PUBLIC],
+)
+async def search_transactions_cursor(
+    pagination: CursorPaginationParamsQuery,
+    sorting: SearchSorting,
+    auth: UserRequiredAuth,
+    type: TransactionType | None = Query(None),
+    account_id: UUID4 | None = Query(None),
+    payment_user_id: UUID4 | None = Query(None),
+    payment_organization_id: UUID4 | None = Query(None),
+    exclude_platform_fees: bool = Query(False),
+    session: AsyncSession = Depends(get_db_session),
+) -> CursorListResource[Transaction]:
+    results, next_cursor, total_count = await transaction_service.search_cursor(
+        session,
+        auth.subject,
+        type=type,
+        account_id=account_id,
+        payment_user_id=payment_user_id,
+        payment_organization_id=payment_organization_id,
+        exclude_platform_fees=exclude_platform_fees,
+        pagination=pagination,
+        sorting=sorting,
+    )
+
+    return CursorListResource.from_paginated_results(
+        [Transaction.model_validate(result) for result in results],
+        next_cursor,
+        total_count,
+    )
+
+
 @router.get("/lookup", response_model=TransactionDetails, tags=[Tags.PUBLIC])
 async def lookup_transaction(
     transaction_id: UUID4,
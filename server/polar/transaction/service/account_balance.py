@@ -0,0 +1,194 @@
+import uuid
+from collections import defaultdict
+from collections.abc import Iterable, Mapping, Sequence
+from typing import Any, cast
+
+import structlog
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from polar.kit.services import ResourceServiceReader
+from polar.logging import Logger
+from polar.models import Account, AccountBalance, Transaction
+from polar.models.account_balance import get_balance_values, get_increment_statement
+from polar.models.transaction import TransactionType
+from polar.postgres import AsyncSession
+
+log: Logger = structlog.get_logger()
+
+# Number of accounts reconciled per database transaction
+RECONCILE_BATCH_SIZE = 100
+
+_BALANCE_KEYS = (
+    "amount",
+    "account_amount",
+    "balance_amount",
+    "payout_amount",
+    "account_payout_amount",
+)
+
+
+class AccountBalanceService(ResourceServiceReader[AccountBalance]):
+    async def get_by_account_id(
+        self, session: AsyncSession, account_id: uuid.UUID
+    ) -> AccountBalance | None:
+        statement = (
+            select(AccountBalance)
+            .where(AccountBalance.account_id == account_id)
+            # Balances are updated behind the ORM's back when transactions are flushed
+            .execution_options(populate_existing=True)
+        )
+        result = await session.execute(statement)
+        return result.scalar_one_or_none()
+
+    async def apply_transactions(
+        self, session: AsyncSession, transactions: Iterable[Mapping[str, Any]]
+    ) -> None:
+        """
+        Apply transactions inserted in bulk to the balances of their accounts.
+
+        Bulk inserts bypass the ORM events maintaining the balances:
+        this should be called in the same database transaction.
+        """
+        increments: defaultdict[uuid.UUID, dict[str, int]] = defaultdict(
+            lambda: dict.fromkeys(_BALANCE_KEYS, 0)
+        )
+        for transaction in transactions:
+            account_id = transaction.get("account_id")
+            if account_id is None:
+                continue
+            values = get_balance_values(
+                transaction["type"],
+                transaction["amount"],
+                transaction["account_amount"],
+            )
+            for key, value in values.items():
+                increments[account_id][key] += value
+
+        for account_id, values in increments.items():
+            await session.execute(get_increment_statement(account_id, values))
+
+    async def reconcile(self, session: AsyncSession) -> list[uuid.UUID]:
+        """
+        Verify the account balances against the sums of the raw `Transaction` rows,
+        and fix the ones that drifted.
+
+        Accounts are reconciled by batches, each one committed on its own,
+        so balances are only locked for the time of their batch.
+
+        Returns the IDs of the accounts whose balance was fixed.
+        """
+        fixed_account_ids: list[uuid.UUID] = []
+        last_account_id: uuid.UUID | None = None
+        while True:
+            statement = (
+                select(Account.id).order_by(Account.id).limit(RECONCILE_BATCH_SIZE)
+            )
+            if last_account_id is not None:
+                statement = statement.where(Account.id > last_account_id)
+            result = await session.execute(statement)
+            account_ids = result.scalars().all()
+            if not account_ids:
+                break
+
+            fixed_account_ids += await self._reconcile_batch(session, account_ids)
+            await session.commit()
+            last_account_id = account_ids[-1]
+
+        return fixed_account_ids
+
+    async def _reconcile_batch(
+        self, session: AsyncSession, account_ids: Sequence[uuid.UUID]
+    ) -> list[uuid.UUID]:
+        # Lock the balances first: concurrent transactions will wait for us
+        # before applying their own changes, on top of the reconciled values.
+        balances_result = await session.execute(
+            select(AccountBalance)
+            .where(AccountBalance.account_id.in_(account_ids))
+            .with_for_update()
+        )
+        balances = {
+            balance.account_id: balance for balance in balances_result.scalars().all()
+        }
+
+        sums_result = await session.execute(
+            select(
+                Transaction.account_id,
+                cast(type[int], func.sum(Transaction.amount)),
+                cast(type[int], func.sum(Transaction.account_amount)),
+                cast(
+                    type[int],
+                    func.coalesce(
+                        func.sum(Transaction.amount).filter(
+                            Transaction.type == TransactionType.balance
+                        ),
+                        0,
+                    ),
+                ),
+                cast(
+                    type[int],
+                    func.coalesce(
+                        func.sum(Transaction.amount).filter(
+                            Transaction.type == TransactionType.payout
+                        ),
+                        0,
+                    ),
+                ),
+                cast(
+                    type[int],
+                    func.coalesce(
+                        func.sum(Transaction.account_amount).filter(
+                            Transaction.type == TransactionType.payout
+                        ),
+                        0,
+                    ),
+                ),
+            )
+            .where(Transaction.account_id.in_(account_ids))
+            .group_by(Transaction.account_id)
+        )
+        expected_balances = {
+            account_id: dict(zip(_BALANCE_KEYS, sums))
+            for account_id, *sums in sums_result.tuples().all()
+        }
+
+        fixed_account_ids: list[uuid.UUID] = []
+        for account_id in account_ids:
+            balance = balances.get(account_id)
+            expected = expected_balances.get(
+                account_id, dict.fromkeys(_BALANCE_KEYS, 0)
+            )
+            actual = (
+                {key: getattr(balance, key) for key in _BALANCE_KEYS}
+                if balance is not None
+                else dict.fromkeys(_BALANCE_KEYS, 0)
+            )
+            if actual == expected:
+                continue
+
+            log.warning(
+                "account_balance.reconcile.mismatch",
+                account_id=str(account_id),
+                actual=actual,
+                expected=expected,
+            )
+            if balance is not None:
+                await session.execute(
+                    update(AccountBalance)
+                    .where(AccountBalance.id == balance.id)
+                    .values(**expected)
+                )
+            else:
+                # A concurrent transaction may have created it meanwhile:
+                # leave it to the next reconciliation.
+                await session.execute(
+                    insert(AccountBalance)
+                    .values(account_id=account_id, **expected)
+                    .on_conflict_do_nothing(index_elements=[AccountBalance.account_id])
+                )
+            fixed_account_ids.append(account_id)
+
+        return fixed_account_ids
+
+
+account_balance = AccountBalanceService(AccountBalance)
@@ -1,10 +1,15 @@
+import asyncio
+import hashlib
+import time
+import uuid
 from collections.abc import AsyncIterable, Sequence
-from typing import cast
+from typing import NamedTuple, cast
 
 import stripe as stripe_lib
 import structlog
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload, selectinload
+from prometheus_client import Counter, Histogram
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.orm import aliased, joinedload, selectinload
 
 from polar.account.service import account as account_service
 from polar.enums import AccountType
@@ -26,6 +31,31 @@ from .transaction import transaction as transaction_service
 
 log: Logger = structlog.get_logger()
 
+# Maximum number of Stripe transfers made at the same time for a payout
+PAYOUT_TRANSFERS_CONCURRENCY = 8
+# Maximum number of transfers matched by a single UPDATE statement
+PAYOUT_UPDATE_CHUNK_SIZE = 5000
+# Namespace of the payout transaction IDs derived from the balances they pay
+PAYOUT_ID_NAMESPACE = uuid.UUID("9b6d2c1e-4f3a-4b8e-9c0d-5e7f1a2b3c4d")
+
+payout_paid_transactions = Counter(
+    "payout_paid_transactions",
+    "Number of balance transactions paid out",
+    ["processor"],
+)
+payout_duration_seconds = Histogram(
+    "payout_duration_seconds",
+    "Time to prepare a payout, including the transfers to the account",
+    ["processor"],
+)
+
+
+class UnpaidBalance(NamedTuple):
+    id: uuid.UUID
+    transfer_id: str | None
+    charge_id: str | None
+    net_amount: int
+
 
 class PayoutTransactionError(BaseTransactionServiceError):
     ...
@@ -138,8 +168,12 @@ class PayoutTransactionService(BaseTransactionService):
         except PayoutAmountTooLow as e:
             raise InsufficientBalance(account, balance_amount) from e
 
+        start = time.perf_counter()
+        unpaid_balances = await self._get_unpaid_balances(session, account)
+        payout_fees = balance_amount - balance_amount_after_fees
+
         transaction = Transaction(
-            id=generate_uuid(),
+            id=_get_payout_id(account, unpaid_balances),
             type=TransactionType.payout,
             currency="usd",  # FIXME: Main Polar currency
             amount=-balance_amount_after_fees,
@@ -150,29 +184,21 @@ class PayoutTransactionService(BaseTransactionService):
             pledge=None,
             issue_reward=None,
             subscription=None,
-            paid_transactions=[],
             incurred_transactions=[],
             account_incurred_transactions=[],
         )
 
-        unpaid_balance_transactions = await self._get_unpaid_balance_transactions(
-            session, account
-        )
-        payout_fees = balance_amount - balance_amount_after_fees
-
+        transfer_ids: dict[uuid.UUID, str] = {}
         if account.account_type == AccountType.stripe:
-            transaction = await self._prepare_stripe_payout(
+            transfer_ids = await self._prepare_stripe_payout(
                 transaction=transaction,
                 account=account,
-                unpaid_balance_transactions=unpaid_balance_transactions,
+                unpaid_balances=unpaid_balances,
                 payout_fees=payout_fees,
             )
         elif account.account_type == AccountType.open_collective:
             transaction.processor = PaymentProcessor.open_collective
 
-        for balance_transaction in unpaid_balance_transactions:
-            transaction.paid_transactions.append(balance_transaction)
-
         for outgoing, incoming in payout_fees_balances:
             transaction.incurred_transactions.append(outgoing)
             transaction.account_incurred_transactions.append(outgoing)
@@ -181,6 +207,35 @@ class PayoutTransactionService(BaseTransactionService):
         session.add(transaction)
         await session.flush()
 
+        # Mark the balances as paid, and save the transfers, in one statement
+        if unpaid_balances:
+            await session.execute(
+                update(Transaction),
+                [
+                    {
+                        "id": balance.id,
+                        "payout_transaction_id": transaction.id,
+                        "transfer_id": transfer_ids.get(
+                            balance.id, balance.transfer_id
+                        ),
+                    }
+                    for balance in unpaid_balances
+                ],
+            )
+
+        duration = time.perf_counter() - start
+        processor = str(account.account_type)
+        payout_paid_transactions.labels(processor=processor).inc(len(unpaid_balances))
+        payout_duration_seconds.labels(processor=processor).observe(duration)
+        log.info(
+            "payout.created",
+            payout_id=str(transaction.id),
+            account_id=str(account.id),
+            paid_transactions=len(unpaid_balances),
+            transfers=len(set(transfer_ids.values())),
+            duration=duration,
+        )
+
         return transaction
 
     async def trigger_stripe_payouts(self, session: AsyncSession) -> None:
@@ -198,7 +253,7 @@ class PayoutTransactionService(BaseTransactionService):
             account = payout.account
             assert account is not None
             assert account.stripe_id is not None
-            _, balance = stripe_service.retrieve_balance(account.stripe_id)
+            _, balance = await stripe_service.retrieve_balance(account.stripe_id)
 
             if balance < -payout.account_amount:
                 log.info(
@@ -213,13 +268,15 @@ class PayoutTransactionService(BaseTransactionService):
                 continue
 
             # Trigger a payout on the Stripe Connect account
-            stripe_payout = stripe_service.create_payout(
+            stripe_payout = await stripe_service.create_payout(
                 stripe_account=account.stripe_id,
                 amount=-payout.account_amount,
                 currency=payout.account_currency,
                 metadata={
                     "payout_transaction_id": str(payout.id),
                 },
+                # If we failed to save the payout ID, don't pay it twice on next run
+                idempotency_key=f"payout-{payout.id}",
             )
             payout.payout_id = stripe_payout.id
 
@@ -267,29 +324,17 @@ class PayoutTransactionService(BaseTransactionService):
             account=account,
         )
 
-        # Retrieve and mark all transactions paid by this payout
+        # Retrieve all the transfers paid by this payout
+        source_transfers: list[str] = []
         balance_transactions = stripe_service.list_balance_transactions(
             account_id=account.stripe_id, payout=payout.id
         )
-        for balance_transaction in balance_transactions:
+        async for balance_transaction in balance_transactions:
             source = balance_transaction.source
             if source is not None:
                 source_transfer: str | None = getattr(source, "source_transfer", None)
                 if source_transfer is not None:
-                    paid_transactions_statement = select(Transaction).where(
-                        Transaction.transfer_id == source_transfer,
-                        Transaction.account_id == account.id,
-                    )
-                    paid_transactions = await session.stream_scalars(
-                        paid_transactions_statement
-                    )
-                    async for paid_transaction in paid_transactions:
-                        paid_transaction.payout_transaction = transaction
-                        session.add(paid_transaction)
-
-                        # Compute the amount in our main currency
-                        transaction.currency = paid_transaction.currency
-                        transaction.amount -= paid_transaction.amount
+                    source_transfers.append(source_transfer)
                 else:
                     bound_logger.warning(
                         "An unknown type of transaction was paid out",
@@ -299,6 +344,27 @@ class PayoutTransactionService(BaseTransactionService):
         session.add(transaction)
         await session.flush()
 
+        # Mark the transactions paid by those transfers
+        for i in range(0, len(source_transfers), PAYOUT_UPDATE_CHUNK_SIZE):
+            result = await session.execute(
+                update(Transaction)
+                .where(
+                    Transaction.transfer_id.in_(
+                        source_transfers[i : i + PAYOUT_UPDATE_CHUNK_SIZE]
+                    ),
+                    Transaction.account_id == account.id,
+                )
+                .values(payout_transaction_id=transaction.id)
+                .returning(Transaction.currency, Transaction.amount)
+                .execution_options(synchronize_session=False)
+            )
+            for currency, amount in result.tuples().all():
+                # Compute the amount in our main currency
+                transaction.currency = currency
+                transaction.amount -= amount
+
+        await session.flush()
+
         return transaction
 
     async def get_payout_csv(
@@ -390,9 +456,9 @@ class PayoutTransactionService(BaseTransactionService):
         *,
         transaction: Transaction,
         account: Account,
-        unpaid_balance_transactions: Sequence[Transaction],
+        unpaid_balances: Sequence[UnpaidBalance],
         payout_fees: int,
-    ) -> Transaction:
+    ) -> dict[uuid.UUID, str]:
         """
         The Stripe payout is a two-steps process:
 
@@ -400,27 +466,35 @@ class PayoutTransactionService(BaseTransactionService):
         2. Trigger a payout on the Stripe Connect account,
         but later once the balance is actually available.
 
-        This function performs the first step and returns the transaction
-        with an empty payout_id.
+        This function performs the first step, with one transfer per source charge,
+        and returns the transfer ID of each balance transaction.
+        The transaction is left with an empty payout_id.
         """
         transaction.processor = PaymentProcessor.stripe
-        transfer_group = str(transaction.id)
-
-        transfers: list[tuple[str, int, Transaction]] = []
-        for balance_transaction in unpaid_balance_transactions:
-            if (
-                balance_transaction.payment_transaction is not None
-                and balance_transaction.payment_transaction.charge_id is not None
-            ):
-                source_transaction = balance_transaction.payment_transaction.charge_id
-                transfer_amount = max(balance_transaction.net_amount - payout_fees, 0)
-                if transfer_amount > 0:
-                    transfers.append(
-                        (source_transaction, transfer_amount, balance_transaction)
-                    )
-                payout_fees -= balance_transaction.net_amount - transfer_amount
 
-        transfers_sum = sum(amount for _, amount, _ in transfers)
+        # Balances from the same charge are transferred at once
+        charges_transfers: dict[str, tuple[int, list[uuid.UUID]]] = {}
+        # Case where the transfer has already been made
+        # Legacy behavior from the time when we automatically
+        # transferred each balance
+        existing_transfers: dict[str, tuple[int, list[uuid.UUID]]] = {}
+        transfers_sum = 0
+        for balance in unpaid_balances:
+            if balance.charge_id is None:
+                continue
+            transfer_amount = max(balance.net_amount - payout_fees, 0)
+            payout_fees -= balance.net_amount - transfer_amount
+            if transfer_amount <= 0:
+                continue
+
+            transfers_sum += transfer_amount
+            if balance.transfer_id is not None:
+                transfers, key = existing_transfers, balance.transfer_id
+            else:
+                transfers, key = charges_transfers, balance.charge_id
+            amount, balance_ids = transfers.get(key, (0, []))
+            transfers[key] = (amount + transfer_amount, [*balance_ids, balance.id])
+
         if transfers_sum != -transaction.amount:
             raise UnmatchingTransfersAmount()
 
@@ -429,73 +503,176 @@ class PayoutTransactionService(BaseTransactionService):
         if transaction.currency != transaction.account_currency:
             transaction.account_amount = 0
 
-        # Make individual transfers with the payment transaction as source
-        assert account.stripe_id is not None
-        for source_transaction, amount, balance_transaction in transfers:
-            if balance_transaction.transfer_id is None:
-                stripe_transfer = stripe_service.transfer(
-                    account.stripe_id,
-                    amount,
-                    source_transaction=source_transaction,
-                    transfer_group=transfer_group,
-                    metadata={"payout_transaction_id": str(transaction.id)},
+        semaphore = asyncio.Semaphore(PAYOUT_TRANSFERS_CONCURRENCY)
+        stripe_transfers = await asyncio.gather(
+            *(
+                self._create_stripe_transfer(
+                    semaphore,
+                    transaction=transaction,
+                    account=account,
+                    source_transaction=charge_id,
+                    amount=amount,
+                    balance_ids=balance_ids,
                 )
-                balance_transaction.transfer_id = stripe_transfer.id
-            # Case where the transfer has already been made
-            # Legacy behavior from the time when we automatically
-            # transferred each balance
-            else:
-                stripe_transfer = stripe_service.get_transfer(
-                    balance_transaction.transfer_id
+                for charge_id, (amount, balance_ids) in charges_transfers.items()
+            ),
+            *(
+                self._get_stripe_transfer(
+                    semaphore,
+                    transaction=transaction,
+                    account=account,
+                    id=transfer_id,
+                    amount=amount,
                 )
+                for transfer_id, (amount, _) in existing_transfers.items()
+            ),
+        )
 
-            # Different source and destination currencies: get the converted amount
-            if transaction.currency != transaction.account_currency:
-                assert stripe_transfer.destination_payment is not None
-                stripe_destination_charge = stripe_service.get_charge(
-                    get_expandable_id(stripe_transfer.destination_payment),
-                    stripe_account=account.stripe_id,
-                    expand=["balance_transaction"],
-                )
-                stripe_destination_balance_transaction = cast(
-                    stripe_lib.BalanceTransaction,
-                    stripe_destination_charge.balance_transaction,
-                )
-                transaction.account_amount -= (
-                    stripe_destination_balance_transaction.amount
-                )
-                log.info(
-                    (
-                        "Source and destination currency don't match. "
-                        "A conversion has been done by Stripe."
-                    ),
-                    source_currency=transaction.currency,
-                    destination_currency=transaction.account_currency,
-                    source_amount=amount,
-                    destination_amount=stripe_destination_balance_transaction.amount,
-                    exchange_rate=stripe_destination_balance_transaction.exchange_rate,
-                    account_id=str(account.id),
-                )
+        transfer_ids: dict[uuid.UUID, str] = {}
+        balances_ids = [
+            *(balance_ids for _, balance_ids in charges_transfers.values()),
+            *(balance_ids for _, balance_ids in existing_transfers.values()),
+        ]
+        for (transfer_id, destination_amount), balance_ids in zip(
+            stripe_transfers, balances_ids
+        ):
+            transfer_ids.update(dict.fromkeys(balance_ids, transfer_id))
+            if destination_amount is not None:
+                transaction.account_amount -= destination_amount
+
+        return transfer_ids
+
+    async def _create_stripe_transfer(
+        self,
+        semaphore: asyncio.Semaphore,
+        *,
+        transaction: Transaction,
+        account: Account,
+        source_transaction: str,
+        amount: int,
+        balance_ids: Sequence[uuid.UUID],
+    ) -> tuple[str, int | None]:
+        assert account.stripe_id is not None
+        # Keyed on the transferred balances, which don't change across re-runs.
+        # If they did, Stripe rejects the reused key instead of paying twice.
+        balances_digest = hashlib.sha256(
+            ",".join(sorted(str(id) for id in balance_ids)).encode()
+        ).hexdigest()
+        async with semaphore:
+            stripe_transfer = await stripe_service.transfer(
+                account.stripe_id,
+                amount,
+                source_transaction=source_transaction,
+                transfer_group=str(transaction.id),
+                metadata={"payout_transaction_id": str(transaction.id)},
+                idempotency_key=f"payout-transfer-{account.id}-{balances_digest}",
+            )
+            destination_amount = await self._get_destination_amount(
+                transaction=transaction,
+                account=account,
+                stripe_transfer=stripe_transfer,
+                amount=amount,
+            )
+        return stripe_transfer.id, destination_amount
 
-        return transaction
+    async def _get_stripe_transfer(
+        self,
+        semaphore: asyncio.Semaphore,
+        *,
+        transaction: Transaction,
+        account: Account,
+        id: str,
+        amount: int,
+    ) -> tuple[str, int | None]:
+        async with semaphore:
+            stripe_transfer = await stripe_service.get_transfer(id)
+            destination_amount = await self._get_destination_amount(
+                transaction=transaction,
+                account=account,
+                stripe_transfer=stripe_transfer,
+                amount=amount,
+            )
+        return stripe_transfer.id, destination_amount
 
-    async def _get_unpaid_balance_transactions(
+    async def _get_destination_amount(
+        self,
+        *,
+        transaction: Transaction,
+        account: Account,
+        stripe_transfer: stripe_lib.Transfer,
+        amount: int,
+    ) -> int | None:
+        """
+        Get the converted amount of a transfer when the source and destination
+        currencies are different. Returns `None` if they're the same.
+        """
+        if transaction.currency == transaction.account_currency:
+            return None
+
+        assert stripe_transfer.destination_payment is not None
+        stripe_destination_charge = await stripe_service.get_charge(
+            get_expandable_id(stripe_transfer.destination_payment),
+            stripe_account=account.stripe_id,
+            expand=["balance_transaction"],
+        )
+        stripe_destination_balance_transaction = cast(
+            stripe_lib.BalanceTransaction,
+            stripe_destination_charge.balance_transaction,
+        )
+        log.info(
+            (
+                "Source and destination currency don't match. "
+                "A conversion has been done by Stripe."
+            ),
+            source_currency=transaction.currency,
+            destination_currency=transaction.account_currency,
+            source_amount=amount,
+            destination_amount=stripe_destination_balance_transaction.amount,
+            exchange_rate=stripe_destination_balance_transaction.exchange_rate,
+            account_id=str(account.id),
+        )
+        return stripe_destination_balance_transaction.amount
+
+    async def _get_unpaid_balances(
         self, session: AsyncSession, account: Account
-    ) -> Sequence[Transaction]:
+    ) -> Sequence[UnpaidBalance]:
+        """
+        Get the unpaid balance transactions of an account, with their source charge
+        and their amount net of the fees they incurred to the account.
+        """
+        payment_transaction = aliased(Transaction)
+        incurred_transaction = aliased(Transaction)
         statement = (
-            select(Transaction)
+            select(
+                Transaction.id,
+                Transaction.transfer_id,
+                payment_transaction.charge_id,
+                Transaction.amount
+                + func.coalesce(func.sum(incurred_transaction.amount), 0),
+            )
+            .join(
+                payment_transaction,
+                onclause=Transaction.payment_transaction_id == payment_transaction.id,
+                isouter=True,
+            )
+            .join(
+                incurred_transaction,
+                onclause=and_(
+                    incurred_transaction.incurred_by_transaction_id == Transaction.id,
+                    incurred_transaction.account_id == Transaction.account_id,
+                ),
+                isouter=True,
+            )
             .where(
                 Transaction.type == TransactionType.balance,
                 Transaction.account_id == account.id,
                 Transaction.payout_transaction_id.is_(None),
             )
-            .options(
-                selectinload(Transaction.account_incurred_transactions),
-                selectinload(Transaction.payment_transaction),
-            )
+            .group_by(Transaction.id, payment_transaction.charge_id)
+            .order_by(Transaction.created_at.asc(), Transaction.id.asc())
         )
         result = await session.execute(statement)
-        return result.scalars().all()
+        return [UnpaidBalance(*row) for row in result.tuples().all()]
 
     async def _get_pending_stripe_payouts(
         self, session: AsyncSession
@@ -523,4 +700,22 @@ class PayoutTransactionService(BaseTransactionService):
         return result.scalar()
 
 
+def _get_payout_id(
+    account: Account, unpaid_balances: Sequence[UnpaidBalance]
+) -> uuid.UUID:
+    """
+    Derive the payout transaction ID from the balances transferred by it.
+
+    A re-run after a failed commit gets the same ID, so the Stripe transfers,
+    grouped and tagged by this ID, are sent again with identical parameters
+    and Stripe replays them instead of transferring twice.
+    """
+    balance_ids = sorted(
+        str(balance.id) for balance in unpaid_balances if balance.charge_id is not None
+    )
+    if not balance_ids:
+        return generate_uuid()
+    return uuid.uuid5(PAYOUT_ID_NAMESPACE, f"{account.id}:{','.join(balance_ids)}")
+
+
 payout_transaction = PayoutTransactionService(Transaction)
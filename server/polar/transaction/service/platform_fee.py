@@ -66,6 +66,28 @@ class PlatformFeeTransactionService(BaseTransactionService):
 
         return fees_reversal_balances
 
+    def get_platform_fee_amount(
+        self,
+        account: Account,
+        *,
+        amount: int,
+        pledge_id: UUID | None,
+        issue_reward_id: UUID | None,
+        subscription_id: UUID | None,
+    ) -> int | None:
+        """
+        Get the platform fee of a balance to the account.
+
+        Returns `None` if the balance is not linked to a pledge or a subscription.
+        """
+        if pledge_id is not None and issue_reward_id is not None:
+            fee_percent = account.platform_pledge_fee_percent
+        elif subscription_id is not None:
+            fee_percent = account.platform_subscription_fee_percent
+        else:
+            return None
+        return math.floor(amount * (fee_percent / 100))
+
     async def get_payout_fees(
         self, session: AsyncSession, *, account: Account, balance_amount: int
     ) -> list[tuple[PlatformFeeType, int]]:
@@ -133,13 +155,14 @@ class PlatformFeeTransactionService(BaseTransactionService):
         account = await account_service.get_by_id(session, account_id)
         assert account is not None
 
-        if incoming.pledge_id is not None and incoming.issue_reward_id is not None:
-            fee_percent = account.platform_pledge_fee_percent
-            fee_amount = math.floor(incoming.amount * (fee_percent / 100))
-        elif incoming.subscription_id is not None:
-            fee_percent = account.platform_subscription_fee_percent
-            fee_amount = math.floor(incoming.amount * (fee_percent / 100))
-        else:
+        fee_amount = self.get_platform_fee_amount(
+            account,
+            amount=incoming.amount,
+            pledge_id=incoming.pledge_id,
+            issue_reward_id=incoming.issue_reward_id,
+            subscription_id=incoming.subscription_id,
+        )
+        if fee_amount is None:
             raise DanglingBalanceTransactions(balance_transactions)
 
         return await balance_transaction_service.create_reversal_balance(
@@ -1,15 +1,20 @@
 import uuid
 from collections.abc import Sequence
 from enum import StrEnum
-from typing import Any, cast
+from typing import Any
 
-from sqlalchemy import Select, UnaryExpression, asc, desc, func, or_, select
-from sqlalchemy.exc import NoResultFound
+from sqlalchemy import Select, func, or_, select
 from sqlalchemy.orm import aliased, joinedload, subqueryload
 
 from polar.authz.service import AccessType, Authz
 from polar.exceptions import NotPermitted, ResourceNotFound
-from polar.kit.pagination import PaginationParams, paginate
+from polar.kit.pagination import (
+    CursorPaginationParams,
+    PaginationParams,
+    SortKey,
+    paginate,
+    paginate_cursor,
+)
 from polar.kit.sorting import Sorting
 from polar.models import (
     Account,
@@ -29,6 +34,7 @@ from ..schemas import (
     TransactionsBalance,
     TransactionsSummary,
 )
+from .account_balance import account_balance as account_balance_service
 from .base import BaseTransactionService
 
 
@@ -53,6 +59,67 @@ class TransactionService(BaseTransactionService):
             (SearchSortProperty.created_at, True)
         ],
     ) -> tuple[Sequence[Transaction], int]:
+        statement = self._get_search_statement(
+            user,
+            type=type,
+            account_id=account_id,
+            payment_user_id=payment_user_id,
+            payment_organization_id=payment_organization_id,
+            exclude_platform_fees=exclude_platform_fees,
+        )
+
+        statement = statement.order_by(
+            *(key.order_by_clause for key in self._get_search_sort_keys(sorting))
+        )
+
+        results, count = await paginate(session, statement, pagination=pagination)
+
+        return results, count
+
+    async def search_cursor(
+        self,
+        session: AsyncSession,
+        user: User,
+        *,
+        type: TransactionType | None = None,
+        account_id: uuid.UUID | None = None,
+        payment_user_id: uuid.UUID | None = None,
+        payment_organization_id: uuid.UUID | None = None,
+        exclude_platform_fees: bool = False,
+        pagination: CursorPaginationParams,
+        sorting: list[Sorting[SearchSortProperty]] = [
+            (SearchSortProperty.created_at, True)
+        ],
+    ) -> tuple[Sequence[Transaction], str | None, int | None]:
+        statement = self._get_search_statement(
+            user,
+            type=type,
+            account_id=account_id,
+            payment_user_id=payment_user_id,
+            payment_organization_id=payment_organization_id,
+            exclude_platform_fees=exclude_platform_fees,
+        )
+
+        sort_keys = self._get_search_sort_keys(sorting)
+        # Tie-breaker, so the order is deterministic
+        sort_keys.append(
+            SortKey(Transaction.id, sort_keys[0].desc if sort_keys else False)
+        )
+
+        return await paginate_cursor(
+            session, statement, pagination=pagination, sort_keys=sort_keys
+        )
+
+    def _get_search_statement(
+        self,
+        user: User,
+        *,
+        type: TransactionType | None,
+        account_id: uuid.UUID | None,
+        payment_user_id: uuid.UUID | None,
+        payment_organization_id: uuid.UUID | None,
+        exclude_platform_fees: bool,
+    ) -> Select[tuple[Transaction]]:
         statement = self._get_readable_transactions_statement(user)
 
         statement = statement.options(
@@ -90,18 +157,18 @@ class TransactionService(BaseTransactionService):
         if exclude_platform_fees:
             statement = statement.where(Transaction.platform_fee_type.is_(None))
 
-        order_by_clauses: list[UnaryExpression[Any]] = []
+        return statement
+
+    def _get_search_sort_keys(
+        self, sorting: list[Sorting[SearchSortProperty]]
+    ) -> list[SortKey]:
+        sort_keys: list[SortKey] = []
         for criterion, is_desc in sorting:
-            clause_function = desc if is_desc else asc
             if criterion == SearchSortProperty.created_at:
-                order_by_clauses.append(clause_function(Transaction.created_at))
+                sort_keys.append(SortKey(Transaction.created_at, is_desc))
             elif criterion == SearchSortProperty.amount:
-                order_by_clauses.append(clause_function(Transaction.amount))
-        statement = statement.order_by(*order_by_clauses)
-
-        results, count = await paginate(session, statement, pagination=pagination)
-
-        return results, count
+                sort_keys.append(SortKey(Transaction.amount, is_desc))
+        return sort_keys
 
     async def lookup(
         self, session: AsyncSession, id: uuid.UUID, user: User
@@ -160,43 +227,20 @@ class TransactionService(BaseTransactionService):
         if not await authz.can(user, AccessType.read, account):
             raise NotPermitted()
 
-        statement = select(
-            cast(type[int], func.coalesce(func.sum(Transaction.amount), 0)),
-            cast(type[int], func.coalesce(func.sum(Transaction.account_amount), 0)),
-            cast(
-                type[int],
-                func.coalesce(
-                    func.sum(Transaction.amount).filter(
-                        Transaction.type == TransactionType.payout
-                    ),
-                    0,
-                ),
-            ),
-            cast(
-                type[int],
-                func.coalesce(
-                    func.sum(Transaction.account_amount).filter(
-                        Transaction.type == TransactionType.payout
-                    ),
-                    0,
-                ),
-            ),
-        ).where(Transaction.account_id == account.id)
-
-        result = await session.execute(statement)
+        account_balance = await account_balance_service.get_by_account_id(
+            session, account.id
+        )
 
         currency = "usd"  # FIXME: Main Polar currency
         account_currency = account.currency
         assert account_currency is not None
 
-        try:
-            (
-                amount,
-                account_amount,
-                payout_amount,
-                account_payout_amount,
-            ) = result.one()._tuple()
-        except NoResultFound:
+        if account_balance is not None:
+            amount = account_balance.amount
+            account_amount = account_balance.account_amount
+            payout_amount = account_balance.payout_amount
+            account_payout_amount = account_balance.account_payout_amount
+        else:
             amount = 0
             account_amount = 0
             payout_amount = 0
@@ -224,6 +268,23 @@ class TransactionService(BaseTransactionService):
         *,
         type: TransactionType | None = None,
     ) -> int:
+        # Accounts balances are materialized, but not Polar's one
+        if account_id is not None and type in {
+            None,
+            TransactionType.balance,
+            TransactionType.payout,
+        }:
+            account_balance = await account_balance_service.get_by_account_id(
+                session, account_id
+            )
+            if account_balance is None:
+                return 0
+            if type == TransactionType.balance:
+                return account_balance.balance_amount
+            if type == TransactionType.payout:
+                return account_balance.payout_amount
+            return account_balance.amount
+
         statement = select(func.coalesce(func.sum(Transaction.amount), 0)).where(
             Transaction.account_id == account_id
         )
@@ -1,6 +1,7 @@
 from polar.exceptions import PolarError
 from polar.worker import AsyncSessionMaker, JobContext, interval
 
+from .service.account_balance import account_balance as account_balance_service
 from .service.payout import payout_transaction as payout_transaction_service
 from .service.processor_fee import (
     processor_fee_transaction as processor_fee_transaction_service,
@@ -21,3 +22,9 @@ async def sync_stripe_fees(ctx: JobContext) -> None:
 async def trigger_stripe_payouts(ctx: JobContext) -> None:
     async with AsyncSessionMaker(ctx) as session:
         await payout_transaction_service.trigger_stripe_payouts(session)
+
+
+@interval(hour=3, minute=0)
+async def reconcile_account_balances(ctx: JobContext) -> None:
+    async with AsyncSessionMaker(ctx) as session:
+        await account_balance_service.reconcile(session)
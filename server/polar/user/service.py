@@ -1,3 +1,4 @@
+from collections.abc import Iterable, Sequence
 from uuid import UUID
 
 import structlog
@@ -11,6 +12,7 @@ from polar.integrations.loops.service import loops as loops_service
 from polar.kit.services import ResourceService
 from polar.logging import Logger
 from polar.models import User
+from polar.models.user import USERNAME_MAX_LENGTH
 from polar.postgres import AsyncSession, sql
 from polar.posthog import posthog
 from polar.worker import enqueue_job
@@ -82,6 +84,118 @@ class UserService(ResourceService[User, UserCreate, UserUpdate]):
             await loops_service.user_update(user)
         return user
 
+    async def get_by_emails_or_signup(
+        self,
+        session: AsyncSession,
+        emails: Sequence[str],
+        *,
+        signup_type: UserSignupType | None = None,
+    ) -> list[User]:
+        """
+        Bulk version of `get_by_email_or_signup`.
+
+        Existing users are resolved with a single query,
+        and missing ones are created with a single multi-row insert.
+        """
+        emails_map = {email.lower(): email for email in emails}
+        users = list(await self._get_by_lower_emails(session, emails_map.keys()))
+
+        missing_emails = emails_map.keys() - {user.email.lower() for user in users}
+        # The email is used as username: skip the ones not fitting in it,
+        # so a single invalid row doesn't fail the whole insert.
+        too_long_emails = {
+            email for email in missing_emails if len(email) > USERNAME_MAX_LENGTH
+        }
+        if too_long_emails:
+            log.warning(
+                "user.signup.email_too_long",
+                emails=[emails_map[email] for email in too_long_emails],
+            )
+            missing_emails -= too_long_emails
+
+        # ... and skip the ones already used as username by another user,
+        # e.g. one who changed their email since.
+        if missing_emails:
+            taken_usernames = await self._get_taken_usernames(
+                session, [emails_map[email] for email in missing_emails]
+            )
+            taken_username_emails = {
+                email
+                for email in missing_emails
+                if emails_map[email] in taken_usernames
+            }
+            if taken_username_emails:
+                log.warning(
+                    "user.signup.username_taken",
+                    emails=[emails_map[email] for email in taken_username_emails],
+                )
+                missing_emails -= taken_username_emails
+
+        signed_up_users: Sequence[User] = []
+        if missing_emails:
+            insert_statement = (
+                sql.insert(User)
+                # Another request might have signed them up concurrently
+                .on_conflict_do_nothing(index_elements=[func.lower(User.email)])
+                .returning(User)
+            )
+            result = await session.execute(
+                insert_statement,
+                [
+                    {"username": emails_map[email], "email": emails_map[email]}
+                    for email in missing_emails
+                ],
+            )
+            signed_up_users = result.scalars().unique().all()
+
+            conflicting_emails = missing_emails - {
+                user.email.lower() for user in signed_up_users
+            }
+            if conflicting_emails:
+                conflicting_users = await self._get_by_lower_emails(
+                    session, conflicting_emails
+                )
+                users += conflicting_users
+                # E.g. the email of a deleted user
+                unresolved_emails = conflicting_emails - {
+                    user.email.lower() for user in conflicting_users
+                }
+                if unresolved_emails:
+                    log.warning(
+                        "user.signup.email_unresolved",
+                        emails=[emails_map[email] for email in unresolved_emails],
+                    )
+
+        for user in users:
+            await loops_service.user_update(user)
+
+        for user in signed_up_users:
+            posthog.identify(user)
+            posthog.user_event_raw(user, "User Signed Up")
+            log.info("user signed up by email", user_id=user.id, email=user.email)
+            enqueue_job("user.on_after_signup", user_id=user.id)
+            await loops_service.user_signup(user, signup_type)
+
+        return [*users, *signed_up_users]
+
+    async def _get_taken_usernames(
+        self, session: AsyncSession, usernames: Iterable[str]
+    ) -> set[str]:
+        # Deleted users included: they still hold their username
+        query = sql.select(User.username).where(User.username.in_(usernames))
+        res = await session.execute(query)
+        return set(res.scalars().all())
+
+    async def _get_by_lower_emails(
+        self, session: AsyncSession, emails: Iterable[str]
+    ) -> Sequence[User]:
+        query = sql.select(User).where(
+            func.lower(User.email).in_(emails),
+            User.deleted_at.is_(None),
+        )
+        res = await session.execute(query)
+        return res.scalars().unique().all()
+
     async def signup_by_email(self, session: AsyncSession, email: str) -> User:
         user = User(username=email, email=email, oauth_accounts=[])
         session.add(user)
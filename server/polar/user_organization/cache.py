@@ -0,0 +1,99 @@
+import json
+from collections.abc import Iterable
+from uuid import UUID
+
+import structlog
+from prometheus_client import Counter
+from redis.exceptions import RedisError
+
+from polar.config import settings
+from polar.logging import Logger
+from polar.redis import Redis, redis
+
+log: Logger = structlog.get_logger()
+
+Memberships = dict[UUID, bool]
+"""Organizations a user is a member of, mapped to the admin flag."""
+
+authz_cache_lookups = Counter(
+    "authz_cache_lookups",
+    "Number of lookups in the Authz caches",
+    ["cache", "result"],
+)
+
+
+class MembershipCache:
+    """
+    Short-lived cache of user memberships, shared between processes through Redis.
+
+    It's invalidated when memberships are added or removed,
+    the TTL only bounds staleness in case of a race with a concurrent read.
+    Redis errors are logged and treated as cache misses.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        ttl: int = settings.AUTHZ_MEMBERSHIP_CACHE_TTL_SECONDS,
+    ) -> None:
+        self.redis = redis
+        self.ttl = ttl
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    async def get(self, user_id: UUID) -> Memberships | None:
+        if not self.enabled:
+            return None
+
+        try:
+            value = await self.redis.get(self._get_key(user_id))
+        except RedisError as e:
+            log.warning("authz.membership_cache.error", error=str(e))
+            return None
+
+        if value is None:
+            authz_cache_lookups.labels(cache="shared", result="miss").inc()
+            return None
+
+        authz_cache_lookups.labels(cache="shared", result="hit").inc()
+        return {
+            UUID(organization_id): is_admin
+            for organization_id, is_admin in json.loads(value).items()
+        }
+
+    async def set(self, user_id: UUID, memberships: Memberships) -> None:
+        if not self.enabled:
+            return
+
+        value = json.dumps(
+            {
+                str(organization_id): is_admin
+                for organization_id, is_admin in memberships.items()
+            }
+        )
+        try:
+            await self.redis.set(self._get_key(user_id), value, ex=self.ttl)
+        except RedisError as e:
+            log.warning("authz.membership_cache.error", error=str(e))
+
+    async def invalidate(self, user_ids: Iterable[UUID]) -> None:
+        if not self.enabled:
+            return
+
+        keys = [self._get_key(user_id) for user_id in user_ids]
+        if not keys:
+            return
+
+        try:
+            await self.redis.delete(*keys)
+        except RedisError as e:
+            log.warning("authz.membership_cache.error", error=str(e))
+
+    def _get_key(self, user_id: UUID) -> str:
+        return f"authz:memberships:{user_id}"
+
+
+membership_cache = MembershipCache(redis)
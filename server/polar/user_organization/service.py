@@ -9,8 +9,13 @@ from polar.kit.utils import utc_now
 from polar.models import Organization, UserOrganization
 from polar.postgres import AsyncSession, sql
 
+from .cache import Memberships, membership_cache
+
 log = structlog.get_logger()
 
+# Rows per statement, keeping large organizations below the parameters limit
+MEMBERSHIPS_BATCH_SIZE = 1000
+
 
 class UserOrganizationervice:
     async def list_by_org(
@@ -52,6 +57,18 @@ class UserOrganizationervice:
         res = await session.execute(stmt)
         return res.scalars().unique().all()
 
+    async def get_memberships(
+        self, session: AsyncSession, user_id: UUID
+    ) -> Memberships:
+        stmt = sql.select(
+            UserOrganization.organization_id, UserOrganization.is_admin
+        ).where(
+            UserOrganization.user_id == user_id,
+            UserOrganization.deleted_at.is_(None),
+        )
+        res = await session.execute(stmt)
+        return {organization_id: is_admin for organization_id, is_admin in res.all()}
+
     async def get_personal_org(
         self, session: AsyncSession, platform: Platforms, user_id: UUID
     ) -> UserOrganization | None:
@@ -111,6 +128,72 @@ class UserOrganizationervice:
         )
         await session.execute(stmt)
         await session.commit()
+        await membership_cache.invalidate([user_id])
+
+    async def add_many(
+        self,
+        session: AsyncSession,
+        memberships: Sequence[tuple[UUID, UUID, bool]],
+    ) -> None:
+        """
+        Add users to organizations, given as (user_id, organization_id, is_admin).
+
+        Removed memberships are restored
+        and the admin flag of existing ones is updated.
+        """
+        if not memberships:
+            return
+
+        for i in range(0, len(memberships), MEMBERSHIPS_BATCH_SIZE):
+            insert_stmt = sql.insert(UserOrganization).values(
+                [
+                    {
+                        "user_id": user_id,
+                        "organization_id": organization_id,
+                        "is_admin": is_admin,
+                    }
+                    for user_id, organization_id, is_admin in memberships[
+                        i : i + MEMBERSHIPS_BATCH_SIZE
+                    ]
+                ]
+            )
+            await session.execute(
+                insert_stmt.on_conflict_do_update(
+                    index_elements=[
+                        UserOrganization.user_id,
+                        UserOrganization.organization_id,
+                    ],
+                    set_={
+                        "is_admin": insert_stmt.excluded.is_admin,
+                        "modified_at": utc_now(),
+                        "deleted_at": None,
+                    },
+                )
+            )
+        await session.commit()
+        await membership_cache.invalidate({user_id for user_id, _, _ in memberships})
+
+    async def remove_many(
+        self,
+        session: AsyncSession,
+        organization_id: UUID,
+        user_ids: Sequence[UUID],
+    ) -> None:
+        if not user_ids:
+            return
+
+        stmt = (
+            sql.update(UserOrganization)
+            .where(
+                UserOrganization.user_id.in_(user_ids),
+                UserOrganization.organization_id == organization_id,
+                UserOrganization.deleted_at.is_(None),
+            )
+            .values(deleted_at=utc_now())
+        )
+        await session.execute(stmt)
+        await session.commit()
+        await membership_cache.invalidate(user_ids)
 
 
 user_organization = UserOrganizationervice()
@@ -10,8 +10,11 @@ import structlog
 from arq import cron, func
 from arq.connections import ArqRedis, RedisSettings
 from arq.connections import create_pool as arq_create_pool
+from arq.constants import job_key_prefix, result_key_prefix
 from arq.cron import CronJob
+from arq.jobs import serialize_job
 from arq.typing import OptionType, SecondsTimedelta, WeekdayOptionType
+from arq.utils import timestamp_ms, to_ms, to_unix_ms
 from arq.worker import Function
 from pydantic import BaseModel
 
@@ -28,7 +31,7 @@ from polar.postgres import create_engine
 
 log = structlog.get_logger()
 
-JobToEnqueue: TypeAlias = tuple[str, tuple[Any], dict[str, Any]]
+JobToEnqueue: TypeAlias = tuple[str, tuple[Any, ...], dict[str, Any]]
 _jobs_to_enqueue = contextvars.ContextVar[list[JobToEnqueue]](
     "polar_worker_jobs_to_enqueue", default=[]
 )
@@ -134,12 +137,101 @@ def enqueue_job(name: str, *args: Any, **kwargs: Any) -> None:
     log.debug("polar.worker.job_enqueued", name=name, args=args, kwargs=kwargs)
 
 
+# Atomically enqueue a batch of jobs in a single round-trip.
+#
+# Mirrors the semantics of `ArqRedis.enqueue_job`: a job is skipped if a job
+# or a result with the same ID already exists.
+#
+# KEYS: (job_key, result_key, queue_name) for each job
+# ARGV: (job_id, score, expires_ms, serialized_job) for each job
+_ENQUEUE_JOBS_SCRIPT = """
+local enqueued = {}
+for i = 0, (#KEYS / 3) - 1 do
+    local job_key = KEYS[i * 3 + 1]
+    local result_key = KEYS[i * 3 + 2]
+    local queue_name = KEYS[i * 3 + 3]
+    if redis.call('EXISTS', job_key, result_key) == 0 then
+        redis.call('PSETEX', job_key, ARGV[i * 4 + 3], ARGV[i * 4 + 4])
+        redis.call('ZADD', queue_name, ARGV[i * 4 + 2], ARGV[i * 4 + 1])
+        enqueued[i + 1] = 1
+    else
+        enqueued[i + 1] = 0
+    end
+end
+return enqueued
+"""
+
+# Maximum number of jobs written in a single script call,
+# so we don't block Redis for too long on huge fan-outs.
+ENQUEUE_JOBS_CHUNK_SIZE = 1000
+
+
+async def enqueue_jobs_bulk(arq_pool: ArqRedis, jobs: list[JobToEnqueue]) -> int:
+    """
+    Enqueue several jobs at once, in a single Redis round-trip per chunk.
+
+    Supports the same special keyword arguments as `ArqRedis.enqueue_job`.
+
+    Returns the number of jobs actually enqueued,
+    i.e. excluding the ones already existing with the same ID.
+    """
+    script = arq_pool.register_script(_ENQUEUE_JOBS_SCRIPT)
+    enqueued_count = 0
+    for i in range(0, len(jobs), ENQUEUE_JOBS_CHUNK_SIZE):
+        keys: list[str] = []
+        argv: list[str | int | bytes] = []
+        enqueue_time_ms = timestamp_ms()
+        for name, args, kwargs in jobs[i : i + ENQUEUE_JOBS_CHUNK_SIZE]:
+            kwargs = dict(kwargs)
+            job_id: str = kwargs.pop("_job_id", None) or uuid.uuid4().hex
+            queue_name: str = (
+                kwargs.pop("_queue_name", None) or arq_pool.default_queue_name
+            )
+            defer_until: datetime | None = kwargs.pop("_defer_until", None)
+            defer_by_ms = to_ms(kwargs.pop("_defer_by", None))
+            expires_ms = to_ms(kwargs.pop("_expires", None))
+            job_try: int | None = kwargs.pop("_job_try", None)
+            assert not (
+                defer_until and defer_by_ms
+            ), "use either 'defer_until' or 'defer_by' or neither, not both"
+
+            if defer_until is not None:
+                score = to_unix_ms(defer_until)
+            elif defer_by_ms:
+                score = enqueue_time_ms + defer_by_ms
+            else:
+                score = enqueue_time_ms
+            expires_ms = (
+                expires_ms or score - enqueue_time_ms + arq_pool.expires_extra_ms
+            )
+
+            job = serialize_job(
+                name,
+                args,
+                kwargs,
+                job_try,
+                enqueue_time_ms,
+                serializer=arq_pool.job_serializer,
+            )
+            keys += [job_key_prefix + job_id, result_key_prefix + job_id, queue_name]
+            argv += [job_id, score, expires_ms, job]
+
+        results: list[int] = await script(keys=keys, args=argv)
+        enqueued_count += sum(results)
+    return enqueued_count
+
+
 async def flush_enqueued_jobs(arq_pool: ArqRedis) -> None:
     if _jobs_to_enqueue_list := _jobs_to_enqueue.get([]):
-        log.debug("polar.worker.flush_enqueued_jobs")
+        log.debug("polar.worker.flush_enqueued_jobs", count=len(_jobs_to_enqueue_list))
+        enqueued_count = await enqueue_jobs_bulk(arq_pool, _jobs_to_enqueue_list)
         for name, args, kwargs in _jobs_to_enqueue_list:
-            await arq_pool.enqueue_job(name, *args, **kwargs)
             log.debug("polar.worker.job_flushed", name=name, args=args, kwargs=kwargs)
+        log.debug(
+            "polar.worker.flushed_enqueued_jobs",
+            count=len(_jobs_to_enqueue_list),
+            enqueued_count=enqueued_count,
+        )
         _jobs_to_enqueue.set([])
 
 
@@ -270,6 +362,7 @@ __all__ = [
     "task",
     "lifespan",
     "enqueue_job",
+    "enqueue_jobs_bulk",
     "JobContext",
     "AsyncSessionMaker",
     "ArqRedis",
@@ -0,0 +1,159 @@
+import asyncio
+import logging.config
+import secrets
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from functools import wraps
+from typing import Any
+
+import structlog
+import typer
+from sqlalchemy import func, select, text
+
+from polar.enums import AccountType
+from polar.kit.db.postgres import AsyncSession
+from polar.models import Account, Transaction, User
+from polar.models.transaction import TransactionType
+from polar.postgres import create_engine
+from polar.transaction.service.account_balance import (
+    account_balance as account_balance_service,
+)
+from polar.transaction.service.transaction import transaction as transaction_service
+
+cli = typer.Typer()
+
+
+def drop_all(*args: Any, **kwargs: Any) -> Any:
+    raise structlog.DropEvent
+
+
+structlog.configure(processors=[drop_all])
+logging.config.dictConfig(
+    {
+        "version": 1,
+        "disable_existing_loggers": True,
+    }
+)
+
+
+def typer_async(f):  # type: ignore
+    # From https://github.com/tiangolo/typer/issues/85
+    @wraps(f)
+    def wrapper(*args, **kwargs):  # type: ignore
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+
+engine = create_engine("script")
+
+
+@asynccontextmanager
+async def _get_session() -> AsyncIterator[AsyncSession]:
+    """
+    Session whose changes, including commits, are rolled back at the end.
+    """
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        session = AsyncSession(
+            bind=connection,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        )
+        try:
+            yield session
+        finally:
+            await session.close()
+            await transaction.rollback()
+
+
+async def _create_account(session: AsyncSession, transactions: int) -> Account:
+    suffix = secrets.token_hex(4)
+    user = User(username=f"benchmark-{suffix}", email=f"benchmark-{suffix}@polar.sh")
+    account = Account(
+        account_type=AccountType.stripe,
+        admin=user,
+        country="US",
+        currency="usd",
+        is_details_submitted=True,
+        is_charges_enabled=True,
+        is_payouts_enabled=True,
+        status=Account.Status.ACTIVE,
+    )
+    session.add_all([user, account])
+    await session.flush()
+
+    # Plain SQL insert: it doesn't go through the ORM, so the balance is built
+    # by the reconciliation below, like for transactions predating the ledger.
+    await session.execute(
+        text(
+            """
+            INSERT INTO transactions (
+                id, created_at, type, currency, amount, account_currency,
+                account_amount, tax_amount, account_id
+            )
+            SELECT
+                uuid_generate_v4(), NOW(),
+                CASE WHEN i % 100 = 0 THEN 'payout' ELSE 'balance' END,
+                'usd', CASE WHEN i % 100 = 0 THEN -5000 ELSE 100 END, 'usd',
+                CASE WHEN i % 100 = 0 THEN -5000 ELSE 100 END, 0, :account_id
+            FROM generate_series(1, :transactions) AS i
+            """
+        ),
+        {"account_id": account.id, "transactions": transactions},
+    )
+    await account_balance_service.reconcile(session)
+    await session.execute(text("ANALYZE transactions"))
+    return account
+
+
+async def _sum_ledger(session: AsyncSession, account: Account) -> int:
+    # Previous behavior: sum every transaction of the account
+    statement = select(func.coalesce(func.sum(Transaction.amount), 0)).where(
+        Transaction.account_id == account.id
+    )
+    result = await session.execute(statement)
+    return result.scalar_one()
+
+
+@cli.command()
+@typer_async
+async def benchmark_account_balance(
+    sizes: list[int] = typer.Option(
+        [10000, 100000, 1000000], help="Number of transactions of the account."
+    ),
+    repeat: int = typer.Option(20, help="Number of reads to average."),
+) -> None:
+    for size in sizes:
+        async with _get_session() as session:
+            account = await _create_account(session, size)
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                ledger_sum = await _sum_ledger(session, account)
+            ledger_duration = (time.perf_counter() - start) / repeat
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                balance_sum = await transaction_service.get_transactions_sum(
+                    session, account.id
+                )
+            balance_duration = (time.perf_counter() - start) / repeat
+
+            assert ledger_sum == balance_sum
+            assert balance_sum == await transaction_service.get_transactions_sum(
+                session, account.id, type=TransactionType.balance
+            ) + await transaction_service.get_transactions_sum(
+                session, account.id, type=TransactionType.payout
+            )
+
+            typer.echo(
+                f"{size:>8} transactions | sum of transactions: "
+                f"{ledger_duration * 1000:8.2f} ms | "
+                f"account balance: {balance_duration * 1000:8.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    cli()
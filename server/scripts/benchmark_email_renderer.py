@@ -0,0 +1,90 @@
+import enum
+import time
+import typing
+import uuid
+from typing import Any
+
+import typer
+
+from polar.email.renderer import EmailRenderer, get_email_renderer
+from polar.notifications.notification import (
+    NotificationPayload,
+    NotificationPayloadBase,
+    NotificationType,
+)
+
+cli = typer.Typer()
+
+
+def _sample_value(annotation: Any) -> Any:
+    if annotation in (str, str | None):
+        return "sample"
+    if annotation is int:
+        return 42
+    if annotation is bool:
+        return True
+    if annotation in (uuid.UUID, uuid.UUID | None):
+        return uuid.uuid4()
+    for arg in typing.get_args(annotation) or (annotation,):
+        if isinstance(arg, type) and issubclass(arg, enum.Enum):
+            return next(iter(arg))
+    return {}
+
+
+def _sample_payloads() -> dict[NotificationType, NotificationPayloadBase]:
+    payloads: dict[NotificationType, NotificationPayloadBase] = {}
+    for payload_class in typing.get_args(NotificationPayload):
+        notification_type = NotificationType(
+            payload_class.__name__.removesuffix("Payload")
+        )
+        payloads[notification_type] = payload_class(
+            **{
+                name: _sample_value(field.annotation)
+                for name, field in payload_class.model_fields.items()
+            }
+        )
+    return payloads
+
+
+def _render_uncached(payload: NotificationPayloadBase) -> tuple[str, str]:
+    # Previous behavior: a brand new environment for every render
+    return EmailRenderer().render_from_string(
+        payload.subject(), payload.body(), vars(payload)
+    )
+
+
+@cli.command()
+def benchmark_email_renderer(
+    iterations: int = typer.Option(200, help="Renders per notification type."),
+) -> None:
+    payloads = _sample_payloads()
+    get_email_renderer()  # Warm-up
+
+    total_uncached = 0.0
+    total_cached = 0.0
+    for notification_type, payload in payloads.items():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            _render_uncached(payload)
+        uncached = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            payload.render()
+        cached = time.perf_counter() - start
+
+        total_uncached += uncached
+        total_cached += cached
+        typer.echo(
+            f"{notification_type:<50} uncached: {uncached / iterations * 1000:7.3f} ms"
+            f" | cached: {cached / iterations * 1000:7.3f} ms"
+        )
+
+    typer.echo(
+        f"{'Total':<50} uncached: {total_uncached:7.3f} s"
+        f" | cached: {total_cached:7.3f} s"
+    )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import logging.config
+import time
+from functools import wraps
+from typing import Any
+
+import httpx
+import structlog
+import typer
+
+from polar.config import settings
+from polar.email.sender import Email, ResendEmailSender
+
+cli = typer.Typer()
+
+
+def drop_all(*args: Any, **kwargs: Any) -> Any:
+    raise structlog.DropEvent
+
+
+structlog.configure(processors=[drop_all])
+logging.config.dictConfig(
+    {
+        "version": 1,
+        "disable_existing_loggers": True,
+    }
+)
+
+
+def typer_async(f):  # type: ignore
+    # From https://github.com/tiangolo/typer/issues/85
+    @wraps(f)
+    def wrapper(*args, **kwargs):  # type: ignore
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+
+def _get_sender(latency: float, max_concurrency: int) -> ResendEmailSender:
+    """
+    Resend sender hitting a fake API answering after `latency` seconds.
+    """
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        if request.url.path == "/emails/batch":
+            params = json.loads(request.content)
+            return httpx.Response(
+                200, json={"data": [{"id": str(i)} for i in range(len(params))]}
+            )
+        return httpx.Response(200, json={"id": "0"})
+
+    sender = ResendEmailSender(max_concurrency=max_concurrency)
+    sender.client = httpx.AsyncClient(
+        base_url=settings.RESEND_API_URL,
+        transport=httpx.MockTransport(handler),  # type: ignore[arg-type]
+    )
+    return sender
+
+
+@cli.command()
+@typer_async
+async def benchmark_email_sender(
+    count: int = typer.Option(1000, help="Number of emails to send."),
+    latency: float = typer.Option(0.1, help="Simulated API latency in seconds."),
+    max_concurrency: int = typer.Option(4, help="Maximum concurrent API requests."),
+) -> None:
+    emails = [
+        Email(
+            to_email_addr=f"user{i}@example.com",
+            subject="Benchmark",
+            html_content="<p>Benchmark</p>",
+        )
+        for i in range(count)
+    ]
+
+    sender = _get_sender(latency, max_concurrency)
+    start = time.perf_counter()
+    for email in emails:
+        await sender.send_to_user(
+            to_email_addr=email.to_email_addr,
+            subject=email.subject,
+            html_content=email.html_content,
+        )
+    duration = time.perf_counter() - start
+    typer.echo(
+        f"send_to_user loop: {duration:8.2f} s ({count / duration:10.0f} emails/s)"
+    )
+
+    sender = _get_sender(latency, max_concurrency)
+    start = time.perf_counter()
+    await sender.send_many(emails)
+    duration = time.perf_counter() - start
+    typer.echo(
+        f"send_many:         {duration:8.2f} s ({count / duration:10.0f} emails/s)"
+    )
+
+
+if __name__ == "__main__":
+    cli()
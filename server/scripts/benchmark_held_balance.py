@@ -0,0 +1,239 @@
+import asyncio
+import logging.config
+import secrets
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime, timedelta
+from functools import wraps
+from typing import Any
+
+import structlog
+import typer
+from sqlalchemy import select, text
+from sqlalchemy.orm import joinedload
+
+from polar.enums import AccountType, Platforms
+from polar.held_balance.service import held_balance as held_balance_service
+from polar.kit.db.postgres import AsyncSession
+from polar.models import (
+    Account,
+    HeldBalance,
+    Organization,
+    Subscription,
+    SubscriptionTier,
+    User,
+)
+from polar.models.subscription import SubscriptionStatus
+from polar.models.subscription_tier import SubscriptionTierType
+from polar.postgres import create_engine
+from polar.transaction.service.balance import (
+    balance_transaction as balance_transaction_service,
+)
+from polar.transaction.service.platform_fee import (
+    platform_fee_transaction as platform_fee_transaction_service,
+)
+
+cli = typer.Typer()
+
+
+def drop_all(*args: Any, **kwargs: Any) -> Any:
+    raise structlog.DropEvent
+
+
+structlog.configure(processors=[drop_all])
+logging.config.dictConfig(
+    {
+        "version": 1,
+        "disable_existing_loggers": True,
+    }
+)
+
+
+def typer_async(f):  # type: ignore
+    # From https://github.com/tiangolo/typer/issues/85
+    @wraps(f)
+    def wrapper(*args, **kwargs):  # type: ignore
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+
+engine = create_engine("script")
+
+
+@asynccontextmanager
+async def _get_session() -> AsyncIterator[AsyncSession]:
+    """
+    Session whose changes, including commits, are rolled back at the end.
+    """
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        session = AsyncSession(
+            bind=connection,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        )
+        try:
+            yield session
+        finally:
+            await session.close()
+            await transaction.rollback()
+
+
+async def _create_held_balances(session: AsyncSession, count: int) -> Account:
+    suffix = secrets.token_hex(4)
+    user = User(username=f"benchmark-{suffix}", email=f"benchmark-{suffix}@polar.sh")
+    organization = Organization(
+        platform=Platforms.github,
+        name=f"benchmark-{suffix}",
+        external_id=secrets.randbelow(2**31),
+        avatar_url="https://avatars.githubusercontent.com/u/105373340?s=200&v=4",
+        is_personal=False,
+    )
+    account = Account(
+        account_type=AccountType.stripe,
+        admin=user,
+        country="US",
+        currency="usd",
+        is_details_submitted=True,
+        is_charges_enabled=True,
+        is_payouts_enabled=True,
+        processor_fees_applicable=True,
+        status=Account.Status.ACTIVE,
+    )
+    organization.account = account
+    subscription_tier = SubscriptionTier(
+        type=SubscriptionTierType.individual,
+        name="Benchmark",
+        price_amount=500,
+        price_currency="USD",
+        organization=organization,
+    )
+    subscription = Subscription(
+        status=SubscriptionStatus.active,
+        current_period_start=datetime.now(UTC),
+        current_period_end=datetime.now(UTC) + timedelta(days=30),
+        cancel_at_period_end=False,
+        price_amount=500,
+        price_currency="USD",
+        user=user,
+        subscription_tier=subscription_tier,
+    )
+    session.add_all([user, organization, account, subscription_tier, subscription])
+    await session.flush()
+
+    # Small subscription payments, each with a processor fee, held for the organization
+    await session.execute(
+        text(
+            """
+            WITH payments AS (
+                INSERT INTO transactions (
+                    id, created_at, type, processor, currency, amount,
+                    account_currency, account_amount, tax_amount, subscription_id
+                )
+                SELECT
+                    uuid_generate_v4(), NOW(), 'payment', 'stripe', 'usd', 500,
+                    'usd', 500, 0, :subscription_id
+                FROM generate_series(1, :count)
+                RETURNING id
+            ), fees AS (
+                INSERT INTO transactions (
+                    id, created_at, type, processor, processor_fee_type, currency,
+                    amount, account_currency, account_amount, tax_amount,
+                    incurred_by_transaction_id
+                )
+                SELECT
+                    uuid_generate_v4(), NOW(), 'processor_fee', 'stripe', 'payment',
+                    'usd', -45, 'usd', -45, 0, id
+                FROM payments
+            )
+            INSERT INTO held_balances (
+                id, created_at, amount, organization_id, payment_transaction_id,
+                subscription_id
+            )
+            SELECT
+                uuid_generate_v4(), NOW(), 500, :organization_id, id, :subscription_id
+            FROM payments
+            """
+        ),
+        {
+            "count": count,
+            "organization_id": organization.id,
+            "subscription_id": subscription.id,
+        },
+    )
+    await session.execute(text("ANALYZE transactions"))
+    await session.execute(text("ANALYZE held_balances"))
+    return account
+
+
+async def _release_sequentially(session: AsyncSession, account: Account) -> None:
+    # Previous behavior: one group of queries per held balance
+    statement = (
+        select(HeldBalance)
+        .join(Organization, onclause=HeldBalance.organization_id == Organization.id)
+        .where(Organization.account_id == account.id)
+        .options(
+            joinedload(HeldBalance.payment_transaction),
+            joinedload(HeldBalance.pledge),
+            joinedload(HeldBalance.subscription),
+            joinedload(HeldBalance.issue_reward),
+        )
+    )
+    held_balances = await session.stream_scalars(statement)
+    async for held_balance in held_balances:
+        balance_transactions = await balance_transaction_service.create_balance(
+            session,
+            source_account=None,
+            destination_account=account,
+            payment_transaction=held_balance.payment_transaction,
+            amount=held_balance.amount,
+            pledge=held_balance.pledge,
+            subscription=held_balance.subscription,
+            issue_reward=held_balance.issue_reward,
+        )
+        await platform_fee_transaction_service.create_fees_reversal_balances(
+            session, balance_transactions=balance_transactions
+        )
+        await session.delete(held_balance)
+    await session.flush()
+
+
+@cli.command()
+@typer_async
+async def benchmark_held_balance(
+    sizes: list[int] = typer.Option([1000, 10000], help="Number of held balances."),
+    sequential: bool = typer.Option(
+        True, help="Also time the previous, one balance at a time, release."
+    ),
+) -> None:
+    for size in sizes:
+        sequential_duration: float | None = None
+        if sequential:
+            async with _get_session() as session:
+                account = await _create_held_balances(session, size)
+                start = time.perf_counter()
+                await _release_sequentially(session, account)
+                sequential_duration = time.perf_counter() - start
+
+        async with _get_session() as session:
+            account = await _create_held_balances(session, size)
+            start = time.perf_counter()
+            released = await held_balance_service.release_account(session, account)
+            batched_duration = time.perf_counter() - start
+            assert released == size
+
+        typer.echo(
+            f"{size:>6} held balances | "
+            + (
+                f"sequential: {sequential_duration:8.2f} s | "
+                if sequential_duration is not None
+                else ""
+            )
+            + f"batched: {batched_duration:8.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,188 @@
+import asyncio
+import logging.config
+import secrets
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from functools import wraps
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import patch
+
+import structlog
+import typer
+
+from polar.enums import Platforms
+from polar.integrations.github import client as github
+from polar.integrations.github.service.reference import (
+    REFERENCES_PAGES_CONCURRENCY,
+    REFERENCES_PER_PAGE,
+    github_reference,
+)
+from polar.kit.db.postgres import AsyncSession
+from polar.kit.utils import utc_now
+from polar.models import Issue, Organization, Repository
+from polar.postgres import create_engine
+from polar.worker import _jobs_to_enqueue
+
+cli = typer.Typer()
+
+
+def drop_all(*args: Any, **kwargs: Any) -> Any:
+    raise structlog.DropEvent
+
+
+structlog.configure(processors=[drop_all])
+logging.config.dictConfig(
+    {
+        "version": 1,
+        "disable_existing_loggers": True,
+    }
+)
+
+
+def typer_async(f):  # type: ignore
+    # From https://github.com/tiangolo/typer/issues/85
+    @wraps(f)
+    def wrapper(*args, **kwargs):  # type: ignore
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+
+engine = create_engine("script")
+
+
+@asynccontextmanager
+async def _get_session() -> AsyncIterator[AsyncSession]:
+    """
+    Session whose changes, including commits, are rolled back at the end.
+    """
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        session = AsyncSession(
+            bind=connection,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        )
+        try:
+            yield session
+        finally:
+            await session.close()
+            await transaction.rollback()
+
+
+class FakeGitHub:
+    """
+    Local fake of the repository events API of a busy repository,
+    answering each page after `latency` seconds.
+    """
+
+    def __init__(self, pages: int, issue_external_ids: list[int], latency: float):
+        self.latency = latency
+        now = utc_now()
+        self.pages = [
+            [
+                SimpleNamespace(
+                    event="referenced",
+                    created_at=now,
+                    issue=SimpleNamespace(
+                        id=issue_external_ids[
+                            (page * REFERENCES_PER_PAGE + i) % len(issue_external_ids)
+                        ]
+                    ),
+                )
+                for i in range(REFERENCES_PER_PAGE)
+            ]
+            for page in range(pages)
+        ]
+        self.rest = SimpleNamespace(
+            issues=SimpleNamespace(async_list_events_for_repo=self._list_events)
+        )
+
+    async def _list_events(
+        self, *, owner: str, repo: str, per_page: int, page: int
+    ) -> SimpleNamespace:
+        await asyncio.sleep(self.latency)
+        events = self.pages[page - 1] if page <= len(self.pages) else []
+        return SimpleNamespace(parsed_data=events)
+
+
+async def _create_repository(
+    session: AsyncSession, issues: int
+) -> tuple[Organization, Repository, list[int]]:
+    organization = Organization(
+        platform=Platforms.github,
+        name=f"benchmark-{secrets.token_hex(4)}",
+        external_id=secrets.randbelow(100000),
+        avatar_url="https://avatars.githubusercontent.com/u/105373340?s=200&v=4",
+        is_personal=False,
+        installation_id=secrets.randbelow(100000),
+        installation_created_at=utc_now(),
+        installation_updated_at=utc_now(),
+    )
+    repository = Repository(
+        platform=Platforms.github,
+        name="busy",
+        external_id=secrets.randbelow(100000),
+        organization=organization,
+        is_private=False,
+    )
+    issue_external_ids = [secrets.randbelow(2**31) for _ in range(issues)]
+    session.add_all(
+        [
+            organization,
+            repository,
+            *(
+                Issue(
+                    organization=organization,
+                    repository=repository,
+                    title="issue title",
+                    number=i,
+                    platform=Platforms.github,
+                    external_id=external_id,
+                    state="open",
+                    issue_created_at=utc_now(),
+                    external_lookup_key=f"{organization.name}/busy/{i}",
+                    issue_has_in_progress_relationship=False,
+                    issue_has_pull_request_relationship=False,
+                )
+                for i, external_id in enumerate(issue_external_ids)
+            ),
+        ]
+    )
+    await session.commit()
+    return organization, repository, issue_external_ids
+
+
+@cli.command()
+@typer_async
+async def benchmark_repo_references(
+    pages: list[int] = typer.Option([5, 20, 99], help="Pages of events."),
+    issues: int = typer.Option(500, help="Number of referenced issues."),
+    latency: float = typer.Option(0.2, help="Latency of the fake GitHub, in s."),
+) -> None:
+    for size in pages:
+        for concurrency in (1, REFERENCES_PAGES_CONCURRENCY):
+            async with _get_session() as session:
+                _jobs_to_enqueue.set([])
+                organization, repository, issue_external_ids = await _create_repository(
+                    session, issues
+                )
+                fake_github = FakeGitHub(size, issue_external_ids, latency)
+                with patch.object(
+                    github, "get_app_installation_client", return_value=fake_github
+                ):
+                    start = time.perf_counter()
+                    await github_reference.sync_repo_references(
+                        session, organization, repository, concurrency=concurrency
+                    )
+                    duration = time.perf_counter() - start
+                typer.echo(
+                    f"{size:>3} pages | concurrency {concurrency}: {duration:6.2f} s "
+                    f"({len(_jobs_to_enqueue.get([])):>5} jobs)"
+                )
+
+
+if __name__ == "__main__":
+    cli()
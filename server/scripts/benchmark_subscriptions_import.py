@@ -0,0 +1,160 @@
+import asyncio
+import logging.config
+import secrets
+import time
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from functools import wraps
+from typing import Any
+
+import structlog
+import typer
+
+from polar.enums import Platforms, UserSignupType
+from polar.kit.db.postgres import AsyncSession
+from polar.kit.utils import utc_now
+from polar.models import Organization, SubscriptionTier
+from polar.models.subscription_tier import SubscriptionTierType
+from polar.postgres import create_engine
+from polar.subscription.service.subscription import AlreadySubscribed
+from polar.subscription.service.subscription import (
+    subscription as subscription_service,
+)
+from polar.user.service import user as user_service
+from polar.worker import _jobs_to_enqueue
+
+cli = typer.Typer()
+
+
+def drop_all(*args: Any, **kwargs: Any) -> Any:
+    raise structlog.DropEvent
+
+
+structlog.configure(processors=[drop_all])
+logging.config.dictConfig(
+    {
+        "version": 1,
+        "disable_existing_loggers": True,
+    }
+)
+
+
+def typer_async(f):  # type: ignore
+    # From https://github.com/tiangolo/typer/issues/85
+    @wraps(f)
+    def wrapper(*args, **kwargs):  # type: ignore
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+
+engine = create_engine("script")
+
+
+@asynccontextmanager
+async def _get_session() -> AsyncIterator[AsyncSession]:
+    """
+    Session whose changes, including commits, are rolled back at the end.
+    """
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        session = AsyncSession(
+            bind=connection,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        )
+        try:
+            yield session
+        finally:
+            await session.close()
+            await transaction.rollback()
+
+
+async def _create_free_tier(session: AsyncSession) -> SubscriptionTier:
+    organization = Organization(
+        platform=Platforms.github,
+        name=f"benchmark-{secrets.token_hex(4)}",
+        external_id=secrets.randbelow(100000),
+        avatar_url="https://avatars.githubusercontent.com/u/105373340?s=200&v=4",
+        is_personal=False,
+        installation_id=secrets.randbelow(100000),
+        installation_created_at=utc_now(),
+        installation_updated_at=utc_now(),
+    )
+    subscription_tier = SubscriptionTier(
+        type=SubscriptionTierType.free,
+        name="Free",
+        price_amount=0,
+        price_currency="usd",
+        organization=organization,
+        subscription_tier_benefits=[],
+    )
+    session.add_all([organization, subscription_tier])
+    await session.commit()
+    return subscription_tier
+
+
+def _get_emails(count: int) -> list[str]:
+    prefix = uuid.uuid4().hex[:8]
+    return [f"benchmark-{prefix}-{i}@example.com" for i in range(count)]
+
+
+async def _import_one_by_one(
+    session: AsyncSession, emails: list[str], subscription_tier: SubscriptionTier
+) -> int:
+    # Previous behavior: queries and commits for every single email
+    count = 0
+    for email in emails:
+        user = await user_service.get_by_email_or_signup(
+            session, email, signup_type=UserSignupType.imported
+        )
+        try:
+            await subscription_service.create_arbitrary_subscription(
+                session, user=user, subscription_tier=subscription_tier
+            )
+            count += 1
+        except AlreadySubscribed:
+            pass
+    return count
+
+
+@cli.command()
+@typer_async
+async def benchmark_subscriptions_import(
+    sizes: list[int] = typer.Option([1000, 10000, 100000], help="Number of emails."),
+    one_by_one_max_size: int = typer.Option(
+        10000, help="Skip the one-by-one import above this number of emails."
+    ),
+) -> None:
+    for size in sizes:
+        if size <= one_by_one_max_size:
+            async with _get_session() as session:
+                _jobs_to_enqueue.set([])
+                subscription_tier = await _create_free_tier(session)
+                start = time.perf_counter()
+                count = await _import_one_by_one(
+                    session, _get_emails(size), subscription_tier
+                )
+                duration = time.perf_counter() - start
+                typer.echo(
+                    f"{size:>7} emails | one by one: {duration:8.2f} s "
+                    f"({count / duration:8.0f} subscriptions/s)"
+                )
+
+        async with _get_session() as session:
+            _jobs_to_enqueue.set([])
+            subscription_tier = await _create_free_tier(session)
+            start = time.perf_counter()
+            count = await subscription_service.import_subscriptions(
+                session, emails=_get_emails(size), subscription_tier=subscription_tier
+            )
+            duration = time.perf_counter() - start
+            typer.echo(
+                f"{size:>7} emails | bulk:       {duration:8.2f} s "
+                f"({count / duration:8.0f} subscriptions/s)"
+            )
+
+
+if __name__ == "__main__":
+    cli()
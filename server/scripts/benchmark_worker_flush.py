@@ -0,0 +1,99 @@
+import asyncio
+import logging.config
+import time
+import uuid
+from functools import wraps
+from typing import Any
+
+import structlog
+import typer
+from arq.connections import ArqRedis, create_pool
+
+from polar.worker import (
+    JobToEnqueue,
+    WorkerSettings,
+    _jobs_to_enqueue,
+    enqueue_job,
+    flush_enqueued_jobs,
+)
+
+cli = typer.Typer()
+
+
+def drop_all(*args: Any, **kwargs: Any) -> Any:
+    raise structlog.DropEvent
+
+
+structlog.configure(processors=[drop_all])
+logging.config.dictConfig(
+    {
+        "version": 1,
+        "disable_existing_loggers": True,
+    }
+)
+
+
+def typer_async(f):  # type: ignore
+    # From https://github.com/tiangolo/typer/issues/85
+    @wraps(f)
+    def wrapper(*args, **kwargs):  # type: ignore
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+
+def _fill_jobs(count: int) -> list[JobToEnqueue]:
+    _jobs_to_enqueue.set([])
+    for i in range(count):
+        enqueue_job("benchmark.noop", i, foo="bar")
+    return list(_jobs_to_enqueue.get())
+
+
+async def _sequential_flush(arq_pool: ArqRedis, jobs: list[JobToEnqueue]) -> None:
+    for name, args, kwargs in jobs:
+        await arq_pool.enqueue_job(name, *args, **kwargs)
+
+
+@cli.command()
+@typer_async
+async def benchmark_worker_flush(
+    sizes: list[int] = typer.Option([1, 100, 10_000], help="Number of jobs to flush."),
+    sequential: bool = typer.Option(
+        True, help="Also measure the one-job-at-a-time baseline."
+    ),
+) -> None:
+    queue_name = f"polar:benchmark:queue:{uuid.uuid4().hex}"
+    arq_pool = await create_pool(
+        WorkerSettings.redis_settings, default_queue_name=queue_name
+    )
+    try:
+        for size in sizes:
+            jobs = _fill_jobs(size)
+            start = time.perf_counter()
+            await flush_enqueued_jobs(arq_pool)
+            bulk_duration = time.perf_counter() - start
+            await arq_pool.delete(queue_name)
+            typer.echo(
+                f"{size:>8} jobs | bulk flush: {bulk_duration * 1000:10.2f} ms"
+                f" ({size / bulk_duration:10.0f} jobs/s)"
+            )
+
+            if sequential:
+                jobs = _fill_jobs(size)
+                _jobs_to_enqueue.set([])
+                start = time.perf_counter()
+                await _sequential_flush(arq_pool, jobs)
+                sequential_duration = time.perf_counter() - start
+                await arq_pool.delete(queue_name)
+                typer.echo(
+                    f"{size:>8} jobs | sequential: {sequential_duration * 1000:10.2f} ms"
+                    f" ({size / sequential_duration:10.0f} jobs/s)"
+                )
+    finally:
+        # Job keys expire on their own, only the queue needs cleanup.
+        await arq_pool.delete(queue_name)
+        await arq_pool.close(True)
+
+
+if __name__ == "__main__":
+    cli()
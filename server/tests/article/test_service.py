@@ -6,6 +6,7 @@ from datetime import datetime
 
 import pytest
 import pytest_asyncio
+from pytest_mock import MockerFixture
 
 from polar.article.service import article_service
 from polar.authz.service import Anonymous, Subject
@@ -788,3 +789,94 @@ class TestListReceivers:
         receivers = await article_service.list_receivers(session, organization.id, True)
         assert len(receivers) == 1
         assert receivers[0] == (user.id, True, True)
+
+
+@pytest.mark.asyncio
+class TestGetReceivers:
+    async def test_subscribers_and_members(
+        self,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        user: User,
+        user_second: User,
+        organization: Organization,
+        user_organization: UserOrganization,
+    ) -> None:
+        subscription = await create_articles_subscription(
+            save_fixture,
+            user=user_second,
+            organization=organization,
+            paid_subscriber=True,
+        )
+        other_user = await create_user(save_fixture)
+
+        # then
+        session.expunge_all()
+
+        receivers = await article_service.get_receivers(
+            session, organization.id, [user.id, user_second.id, other_user.id]
+        )
+        receivers_map = {
+            receiver.id: (subscriber, is_member)
+            for receiver, subscriber, is_member in receivers
+        }
+        assert len(receivers_map) == 3
+
+        assert receivers_map[user.id] == (None, True)
+
+        subscriber, is_member = receivers_map[user_second.id]
+        assert subscriber is not None
+        assert subscriber.id == subscription.id
+        assert is_member is False
+
+        assert receivers_map[other_user.id] == (None, False)
+
+
+@pytest.mark.asyncio
+class TestSendToSubscribers:
+    async def test_chunks(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        user: User,
+        organization: Organization,
+    ) -> None:
+        mocker.patch("polar.article.service.SEND_TO_SUBSCRIBERS_CHUNK_SIZE", 2)
+        enqueue_job_mock = mocker.patch("polar.article.service.enqueue_job")
+
+        subscribers = [await create_user(save_fixture) for _ in range(5)]
+        for subscriber in subscribers:
+            await create_articles_subscription(
+                save_fixture,
+                user=subscriber,
+                organization=organization,
+                paid_subscriber=False,
+            )
+        article = await create_article(
+            save_fixture,
+            created_by_user=user,
+            organization=organization,
+            visibility=Article.Visibility.public,
+            paid_subscribers_only=False,
+            published_at=utc_now(),
+        )
+        article.notify_subscribers = True
+        await save_fixture(article)
+
+        # then
+        session.expunge_all()
+
+        article_loaded = await article_service.get_loaded(session, article.id)
+        assert article_loaded is not None
+        await article_service.send_to_subscribers(session, article_loaded)
+
+        assert enqueue_job_mock.call_count == 3
+        enqueued_user_ids = []
+        for call in enqueue_job_mock.call_args_list:
+            assert call.args == ("articles.send_to_subscribers_chunk",)
+            assert call.kwargs["article_id"] == article.id
+            assert len(call.kwargs["user_ids"]) <= 2
+            enqueued_user_ids += call.kwargs["user_ids"]
+        assert set(enqueued_user_ids) == {subscriber.id for subscriber in subscribers}
+        assert article_loaded.email_sent_to_count == 5
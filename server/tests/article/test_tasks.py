@@ -0,0 +1,173 @@
+import httpx
+import pytest
+import respx
+from pytest_mock import MockerFixture
+
+from polar.article.tasks import (
+    SEND_MAX_RETRIES,
+    SEND_RETRY_DELAY,
+    UNSUBSCRIBE_PLACEHOLDER_ID,
+    articles_send_to_subscribers_chunk,
+)
+from polar.config import settings
+from polar.email.sender import EmailBatchSenderError
+from polar.kit.utils import utc_now
+from polar.models import Article, Organization, User, UserOrganization
+from polar.postgres import AsyncSession
+from polar.worker import JobContext, PolarWorkerContext
+from tests.article.test_service import create_article, create_articles_subscription
+from tests.fixtures.database import SaveFixture
+from tests.fixtures.email import FakeEmailSender
+from tests.fixtures.random_objects import create_user
+
+
+@pytest.mark.asyncio
+class TestArticlesSendToSubscribersChunk:
+    async def test_render_once_per_variant(
+        self,
+        mocker: MockerFixture,
+        respx_mock: respx.MockRouter,
+        email_sender: FakeEmailSender,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        user: User,
+        organization: Organization,
+        user_organization: UserOrganization,
+    ) -> None:
+        free_subscribers = [await create_user(save_fixture) for _ in range(3)]
+        free_subscriptions = [
+            await create_articles_subscription(
+                save_fixture,
+                user=subscriber,
+                organization=organization,
+                paid_subscriber=False,
+            )
+            for subscriber in free_subscribers
+        ]
+        paid_subscriber = await create_user(save_fixture)
+        await create_articles_subscription(
+            save_fixture,
+            user=paid_subscriber,
+            organization=organization,
+            paid_subscriber=True,
+        )
+        article = await create_article(
+            save_fixture,
+            created_by_user=user,
+            organization=organization,
+            visibility=Article.Visibility.public,
+            paid_subscribers_only=False,
+            published_at=utc_now(),
+        )
+
+        # then
+        session.expunge_all()
+
+        render_route = respx_mock.post(
+            f"{settings.FRONTEND_BASE_URL}/email/article/{article.id}"
+        ).mock(
+            return_value=httpx.Response(
+                200, text=f"<a href='?id={UNSUBSCRIBE_PLACEHOLDER_ID}'>Unsubscribe</a>"
+            )
+        )
+        mocker.patch("polar.article.tasks.get_email_sender", return_value=email_sender)
+
+        await articles_send_to_subscribers_chunk(
+            job_context,
+            article.id,
+            [user.id, paid_subscriber.id, *(s.id for s in free_subscribers)],
+            polar_worker_context,
+        )
+
+        # Member, paid subscriber and free subscribers
+        assert render_route.call_count == 3
+
+        emails = email_sender.sent
+        assert len(emails) == 5
+
+        emails_map = {email.to_email_addr: email for email in emails}
+        for subscriber, subscription in zip(free_subscribers, free_subscriptions):
+            email = emails_map[subscriber.email]
+            assert email.subject == article.title
+            assert str(subscription.id) in email.html_content
+            assert str(subscription.id) in email.email_headers["List-Unsubscribe"]
+
+        member_email = emails_map[user.email]
+        assert "List-Unsubscribe" not in member_email.email_headers
+
+    async def test_retry_failed_emails(
+        self,
+        mocker: MockerFixture,
+        respx_mock: respx.MockRouter,
+        email_sender: FakeEmailSender,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        user: User,
+        organization: Organization,
+    ) -> None:
+        subscribers = [await create_user(save_fixture) for _ in range(2)]
+        for subscriber in subscribers:
+            await create_articles_subscription(
+                save_fixture,
+                user=subscriber,
+                organization=organization,
+                paid_subscriber=False,
+            )
+        article = await create_article(
+            save_fixture,
+            created_by_user=user,
+            organization=organization,
+            visibility=Article.Visibility.public,
+            paid_subscribers_only=False,
+            published_at=utc_now(),
+        )
+
+        # then
+        session.expunge_all()
+
+        respx_mock.post(
+            f"{settings.FRONTEND_BASE_URL}/email/article/{article.id}"
+        ).mock(return_value=httpx.Response(200, text="<p>Article</p>"))
+        mocker.patch("polar.article.tasks.get_email_sender", return_value=email_sender)
+        mocker.patch.object(
+            email_sender,
+            "send_many",
+            side_effect=lambda emails: _raise(
+                EmailBatchSenderError(
+                    [e for e in emails if e.to_email_addr == subscribers[1].email]
+                )
+            ),
+        )
+        enqueue_job_mock = mocker.patch("polar.article.tasks.enqueue_job")
+
+        await articles_send_to_subscribers_chunk(
+            job_context,
+            article.id,
+            [subscriber.id for subscriber in subscribers],
+            polar_worker_context,
+        )
+
+        enqueue_job_mock.assert_called_once_with(
+            "articles.send_to_subscribers_chunk",
+            article_id=article.id,
+            user_ids=[subscribers[1].id],
+            attempt=1,
+            _defer_by=SEND_RETRY_DELAY,
+        )
+
+        with pytest.raises(EmailBatchSenderError):
+            await articles_send_to_subscribers_chunk(
+                job_context,
+                article.id,
+                [subscriber.id for subscriber in subscribers],
+                polar_worker_context,
+                attempt=SEND_MAX_RETRIES,
+            )
+
+
+def _raise(e: Exception) -> None:
+    raise e
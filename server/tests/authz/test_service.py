@@ -2,6 +2,7 @@ from dataclasses import dataclass
 from typing import Any
 
 import pytest
+from pytest_mock import MockerFixture
 
 from polar.authz.service import AccessType, Anonymous, Authz, Subject
 from polar.models.issue import Issue
@@ -11,7 +12,13 @@ from polar.models.pledge import Pledge, PledgeState
 from polar.models.repository import Repository
 from polar.models.user import User
 from polar.models.user_organization import UserOrganization
+from polar.organization.service import organization as organization_service
 from polar.postgres import AsyncSession
+from polar.redis import Redis
+from polar.user_organization.cache import MembershipCache
+from polar.user_organization.service import (
+    user_organization as user_organization_service,
+)
 from tests.fixtures.database import SaveFixture
 from tests.fixtures.random_objects import (
     create_issue,
@@ -734,3 +741,90 @@ async def test_can_write_pledge(
                 )
                 is tc.expected
             )
+
+
+@pytest.mark.asyncio
+class TestCaches:
+    async def test_request_cache(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        organization: Organization,
+        repository: Repository,
+        user: User,
+        user_organization_admin: UserOrganization,
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        get_memberships_spy = mocker.spy(user_organization_service, "get_memberships")
+        authz = Authz(session)
+
+        for _ in range(3):
+            assert await authz.can(user, AccessType.write, organization) is True
+            assert await authz.can(user, AccessType.write, repository) is True
+
+        # Memberships of the user are loaded once for all the organizations
+        assert get_memberships_spy.call_count == 1
+
+    async def test_shared_cache(
+        self,
+        mocker: MockerFixture,
+        redis: Redis,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        user: User,
+        user_organization: UserOrganization,
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        membership_cache = MembershipCache(redis, ttl=60)
+        await membership_cache.invalidate([user.id])
+        get_memberships_spy = mocker.spy(user_organization_service, "get_memberships")
+
+        authz = Authz(session, membership_cache)
+        assert await authz.can(user, AccessType.write, organization) is False
+        assert get_memberships_spy.call_count == 1
+
+        # Another request reads the memberships from the shared cache
+        authz = Authz(session, membership_cache)
+        assert await authz.can(user, AccessType.write, organization) is False
+        assert get_memberships_spy.call_count == 1
+
+        # Explicit invalidation
+        user_organization.is_admin = True
+        await save_fixture(user_organization)
+        await membership_cache.invalidate([user.id])
+
+        authz = Authz(session, membership_cache)
+        assert await authz.can(user, AccessType.write, organization) is True
+        assert get_memberships_spy.call_count == 2
+
+        await membership_cache.invalidate([user.id])
+
+    async def test_shared_cache_invalidated_on_add_user(
+        self,
+        mocker: MockerFixture,
+        redis: Redis,
+        session: AsyncSession,
+        organization: Organization,
+        user: User,
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        membership_cache = MembershipCache(redis, ttl=60)
+        mocker.patch("polar.organization.service.membership_cache", membership_cache)
+        mocker.patch("polar.organization.service.loops_service", new=mocker.AsyncMock())
+
+        authz = Authz(session, membership_cache)
+        assert await authz.can(user, AccessType.write, organization) is False
+
+        await organization_service.add_user(session, organization, user, is_admin=True)
+
+        authz = Authz(session, membership_cache)
+        assert await authz.can(user, AccessType.write, organization) is True
+
+        await membership_cache.invalidate([user.id])
@@ -1,4 +1,6 @@
-from polar.email.renderer import EmailRenderer
+from pytest_mock import MockerFixture
+
+from polar.email.renderer import EmailRenderer, get_email_renderer
 
 email_renderer = EmailRenderer()
 
@@ -14,3 +16,33 @@ def test_render_from_string() -> None:
     assert rendered_subject == "Hello, John!"
     assert rendered_body.startswith("<!DOCTYPE html")
     assert "<p>Hi, John! Welcome to Polar!</p>" in rendered_body
+
+
+def test_render_from_string_cached_compilation(mocker: MockerFixture) -> None:
+    renderer = EmailRenderer()
+    from_string_spy = mocker.spy(renderer.env, "from_string")
+
+    subject = "Hello, {{ name }}!"
+    body = "<p>Hi, {{ name }}! Welcome to Polar!</p>"
+    context = {"name": "John"}
+
+    first = renderer.render_from_string(subject, body, context=context)
+    second = renderer.render_from_string(subject, body, context={"name": "Jane"})
+
+    assert first[0] == "Hello, John!"
+    assert second[0] == "Hello, Jane!"
+    assert "<p>Hi, Jane! Welcome to Polar!</p>" in second[1]
+    # Subject and body compiled once
+    assert from_string_spy.call_count == 2
+    # Context is left untouched
+    assert context == {"name": "John"}
+
+
+def test_get_email_renderer_shared() -> None:
+    assert get_email_renderer() is get_email_renderer()
+    assert get_email_renderer({"magic_link": "polar.magic_link"}) is (
+        get_email_renderer({"magic_link": "polar.magic_link"})
+    )
+    assert get_email_renderer() is not (
+        get_email_renderer({"magic_link": "polar.magic_link"})
+    )
@@ -0,0 +1,144 @@
+import json
+
+import httpx
+import pytest
+import respx
+
+from polar.config import settings
+from polar.email.sender import (
+    Email,
+    EmailBatchSenderError,
+    EmailSenderError,
+    ResendEmailSender,
+)
+
+
+def get_emails(count: int) -> list[Email]:
+    return [
+        Email(
+            to_email_addr=f"user{i}@example.com",
+            subject="Subject",
+            html_content="<p>Content</p>",
+        )
+        for i in range(count)
+    ]
+
+
+def batch_response(request: httpx.Request) -> httpx.Response:
+    params = json.loads(request.content)
+    return httpx.Response(
+        200, json={"data": [{"id": f"email_{i}"} for i in range(len(params))]}
+    )
+
+
+@pytest.mark.asyncio
+class TestResendEmailSender:
+    async def test_send_to_user(self, respx_mock: respx.MockRouter) -> None:
+        route = respx_mock.post(f"{settings.RESEND_API_URL}/emails").mock(
+            return_value=httpx.Response(200, json={"id": "email_1"})
+        )
+        sender = ResendEmailSender()
+
+        await sender.send_to_user(
+            to_email_addr="user@example.com",
+            subject="Subject",
+            html_content="<p>Content</p>",
+            reply_to_name="Polar Support",
+            reply_to_email_addr="support@polar.sh",
+        )
+
+        assert route.call_count == 1
+        params = json.loads(route.calls.last.request.content)
+        assert params["to"] == ["user@example.com"]
+        assert params["reply_to"] == "Polar Support <support@polar.sh>"
+
+    async def test_send_many(self, respx_mock: respx.MockRouter) -> None:
+        route = respx_mock.post(f"{settings.RESEND_API_URL}/emails/batch").mock(
+            side_effect=batch_response
+        )
+        sender = ResendEmailSender()
+
+        await sender.send_many(get_emails(250))
+
+        assert route.call_count == 3
+        batch_sizes = sorted(
+            len(json.loads(call.request.content)) for call in route.calls
+        )
+        assert batch_sizes == [50, 100, 100]
+
+    async def test_retry(self, respx_mock: respx.MockRouter) -> None:
+        route = respx_mock.post(f"{settings.RESEND_API_URL}/emails/batch").mock(
+            side_effect=[
+                httpx.Response(429),
+                httpx.ConnectError("Connection error"),
+                httpx.Response(200, json={"data": [{"id": "email_1"}]}),
+            ]
+        )
+        sender = ResendEmailSender(retry_backoff=0)
+
+        await sender.send_many(get_emails(1))
+
+        assert route.call_count == 3
+        idempotency_keys = {
+            call.request.headers["Idempotency-Key"] for call in route.calls
+        }
+        assert len(idempotency_keys) == 1
+
+    async def test_idempotency_key_from_contents(
+        self, respx_mock: respx.MockRouter
+    ) -> None:
+        route = respx_mock.post(f"{settings.RESEND_API_URL}/emails/batch").mock(
+            side_effect=batch_response
+        )
+        sender = ResendEmailSender()
+
+        await sender.send_many(get_emails(1))
+        await sender.send_many(get_emails(1))
+        await sender.send_many(get_emails(2))
+
+        idempotency_keys = [
+            call.request.headers["Idempotency-Key"] for call in route.calls
+        ]
+        assert idempotency_keys[0] == idempotency_keys[1]
+        assert idempotency_keys[0] != idempotency_keys[2]
+
+    async def test_partial_failure(self, respx_mock: respx.MockRouter) -> None:
+        def failing_batch_response(request: httpx.Request) -> httpx.Response:
+            params = json.loads(request.content)
+            if params[0]["to"] == ["user100@example.com"]:
+                return httpx.Response(422)
+            return batch_response(request)
+
+        route = respx_mock.post(f"{settings.RESEND_API_URL}/emails/batch").mock(
+            side_effect=failing_batch_response
+        )
+        sender = ResendEmailSender(retry_backoff=0)
+        emails = get_emails(250)
+
+        with pytest.raises(EmailBatchSenderError) as e:
+            await sender.send_many(emails)
+
+        assert route.call_count == 3
+        assert e.value.failed_emails == emails[100:200]
+
+    async def test_retry_exhausted(self, respx_mock: respx.MockRouter) -> None:
+        route = respx_mock.post(f"{settings.RESEND_API_URL}/emails/batch").mock(
+            return_value=httpx.Response(503)
+        )
+        sender = ResendEmailSender(max_retries=2, retry_backoff=0)
+
+        with pytest.raises(EmailSenderError):
+            await sender.send_many(get_emails(1))
+
+        assert route.call_count == 3
+
+    async def test_client_error_not_retried(self, respx_mock: respx.MockRouter) -> None:
+        route = respx_mock.post(f"{settings.RESEND_API_URL}/emails/batch").mock(
+            return_value=httpx.Response(422)
+        )
+        sender = ResendEmailSender(retry_backoff=0)
+
+        with pytest.raises(EmailSenderError):
+            await sender.send_many(get_emails(1))
+
+        assert route.call_count == 1
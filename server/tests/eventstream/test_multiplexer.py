@@ -0,0 +1,129 @@
+import asyncio
+import uuid
+from collections.abc import AsyncIterator
+
+import pytest
+import pytest_asyncio
+
+from polar.eventstream.multiplexer import (
+    EventStreamClient,
+    EventStreamMultiplexer,
+    connected_clients,
+    dropped_messages,
+    subscribed_channels,
+)
+from polar.redis import Redis
+
+
+@pytest_asyncio.fixture
+async def multiplexer(redis: Redis) -> AsyncIterator[EventStreamMultiplexer]:
+    multiplexer = EventStreamMultiplexer(redis, client_queue_size=3)
+    yield multiplexer
+    await multiplexer.close()
+
+
+def get_channel() -> str:
+    return f"test:{uuid.uuid4()}"
+
+
+async def get_subscribed_count(redis: Redis, channel: str) -> int:
+    result = await redis.pubsub_numsub(channel)
+    return result[0][1]
+
+
+async def get_message(client: EventStreamClient) -> str:
+    return await asyncio.wait_for(client.get(), timeout=5)
+
+
+def test_client_drop_oldest() -> None:
+    client = EventStreamClient(["channel"], 2)
+    dropped_before = dropped_messages._value.get()
+
+    for message in ["1", "2", "3"]:
+        client.put(message)
+
+    assert dropped_messages._value.get() == dropped_before + 1
+    assert client._queue.get_nowait() == "2"
+    assert client._queue.get_nowait() == "3"
+
+
+@pytest.mark.asyncio
+class TestEventStreamMultiplexer:
+    async def test_fan_out(
+        self, redis: Redis, multiplexer: EventStreamMultiplexer
+    ) -> None:
+        channel = get_channel()
+        other_channel = get_channel()
+
+        async with (
+            multiplexer.subscribe([channel]) as client_1,
+            multiplexer.subscribe([channel, other_channel]) as client_2,
+        ):
+            # A single connection for both clients
+            assert await get_subscribed_count(redis, channel) == 1
+            assert connected_clients._value.get() == 2
+            assert subscribed_channels._value.get() == 2
+
+            await redis.publish(channel, "shared")
+            await redis.publish(other_channel, "other")
+
+            assert await get_message(client_1) == "shared"
+            assert await get_message(client_2) == "shared"
+            assert await get_message(client_2) == "other"
+            assert client_1._queue.empty()
+
+    async def test_unsubscribe_on_exit(
+        self, redis: Redis, multiplexer: EventStreamMultiplexer
+    ) -> None:
+        channel = get_channel()
+        other_channel = get_channel()
+
+        async with multiplexer.subscribe([channel]):
+            async with multiplexer.subscribe([channel, other_channel]):
+                assert await get_subscribed_count(redis, other_channel) == 1
+                assert multiplexer._clients.keys() == {channel, other_channel}
+
+            assert await get_subscribed_count(redis, other_channel) == 0
+            assert await get_subscribed_count(redis, channel) == 1
+            assert multiplexer._clients.keys() == {channel}
+
+        assert await get_subscribed_count(redis, channel) == 0
+        assert multiplexer._clients == {}
+
+    async def test_slow_client(
+        self, redis: Redis, multiplexer: EventStreamMultiplexer
+    ) -> None:
+        channel = get_channel()
+
+        async with multiplexer.subscribe([channel]) as client:
+            for i in range(5):
+                await redis.publish(channel, str(i))
+            # Sentinel on another client, to know when all messages were dispatched
+            async with multiplexer.subscribe([channel]) as sentinel:
+                await redis.publish(channel, "end")
+                while await get_message(sentinel) != "end":
+                    pass
+
+            assert [await get_message(client) for _ in range(3)] == ["3", "4", "end"]
+
+    async def test_reconnect(
+        self, redis: Redis, multiplexer: EventStreamMultiplexer
+    ) -> None:
+        multiplexer.reconnect_delay = 0.01
+        channel = get_channel()
+
+        async with multiplexer.subscribe([channel]) as client:
+            assert multiplexer._pubsub is not None
+            assert multiplexer._pubsub.connection is not None
+            await multiplexer._pubsub.connection.disconnect()
+
+            async def _publish_until_received() -> str:
+                while True:
+                    await redis.publish(channel, "after_reconnect")
+                    try:
+                        return await asyncio.wait_for(client.get(), timeout=0.1)
+                    except TimeoutError:
+                        continue
+
+            message = await asyncio.wait_for(_publish_until_received(), timeout=5)
+            assert message == "after_reconnect"
@@ -0,0 +1,141 @@
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+import pytest_asyncio
+from pytest_mock import MockerFixture
+from redis.asyncio.client import PubSub
+
+from polar.eventstream.service import (
+    Event,
+    get_members_channel,
+    get_user_channels,
+    publish_members,
+    send_many,
+)
+from polar.kit.utils import generate_uuid
+from polar.models import Organization, User, UserOrganization
+from polar.postgres import AsyncSession
+from polar.redis import Redis
+
+
+@pytest.fixture(autouse=True)
+def service_redis(mocker: MockerFixture, redis: Redis) -> Redis:
+    mocker.patch("polar.eventstream.service.redis", new=redis)
+    return redis
+
+
+@pytest_asyncio.fixture
+async def pubsub(redis: Redis) -> AsyncIterator[PubSub]:
+    async with redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+        yield pubsub
+
+
+async def get_messages(pubsub: PubSub, count: int) -> list[dict[str, Any]]:
+    messages: list[dict[str, Any]] = []
+    while len(messages) < count:
+        message = await asyncio.wait_for(
+            pubsub.get_message(ignore_subscribe_messages=True, timeout=5.0), timeout=5
+        )
+        if message is not None:
+            messages.append(message)
+    return messages
+
+
+def create_event(key: str) -> Event:
+    return Event(id=generate_uuid(), key=key, payload={})
+
+
+@pytest.mark.asyncio
+async def test_send_many(redis: Redis, pubsub: PubSub, mocker: MockerFixture) -> None:
+    await pubsub.subscribe("test:a", "test:b")
+    publish_spy = mocker.spy(redis, "publish")
+
+    event_1 = create_event("event_1")
+    event_2 = create_event("event_2")
+    await send_many([(event_1, ["test:a", "test:b"]), (event_2, ["test:b"])])
+
+    # Issued in a pipeline, not one by one
+    publish_spy.assert_not_called()
+
+    messages = await get_messages(pubsub, 3)
+    assert [(m["channel"], Event.model_validate_json(m["data"])) for m in messages] == [
+        ("test:a", event_1),
+        ("test:b", event_1),
+        ("test:b", event_2),
+    ]
+
+
+@pytest.mark.asyncio
+class TestPublishMembers:
+    async def test_members_channel(
+        self,
+        session: AsyncSession,
+        pubsub: PubSub,
+        organization: Organization,
+        user: User,
+        user_organization: UserOrganization,
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        await pubsub.subscribe(get_members_channel(organization.id), f"user:{user.id}")
+
+        await publish_members(
+            session,
+            "organization.updated",
+            {},
+            organization.id,
+            members_channel=True,
+        )
+
+        [message] = await get_messages(pubsub, 1)
+        assert message["channel"] == get_members_channel(organization.id)
+        assert pubsub.connection is not None
+        assert not await pubsub.connection.can_read_destructive()
+
+    async def test_user_channels(
+        self,
+        session: AsyncSession,
+        pubsub: PubSub,
+        organization: Organization,
+        user: User,
+        user_second: User,
+        user_organization: UserOrganization,
+        user_organization_second: UserOrganization,
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        await pubsub.subscribe(f"user:{user.id}", f"user:{user_second.id}")
+
+        await publish_members(
+            session,
+            "organization.updated",
+            {},
+            organization.id,
+        )
+
+        messages = await get_messages(pubsub, 2)
+        assert {message["channel"] for message in messages} == {
+            f"user:{user.id}",
+            f"user:{user_second.id}",
+        }
+        # Same event, serialized once
+        assert len({message["data"] for message in messages}) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_user_channels(
+    session: AsyncSession,
+    organization: Organization,
+    user: User,
+    user_organization: UserOrganization,
+) -> None:
+    # then
+    session.expunge_all()
+
+    channels = await get_user_channels(session, user.id)
+
+    assert channels == [f"user:{user.id}", get_members_channel(organization.id)]
@@ -3,8 +3,10 @@ import logging
 from tests.fixtures.auth import *  # noqa: F401, F403
 from tests.fixtures.base import *  # noqa: F401, F403
 from tests.fixtures.database import *  # noqa: F401, F403
+from tests.fixtures.email import *  # noqa: F401, F403
 from tests.fixtures.predictable_objects import *  # noqa: F401, F403
 from tests.fixtures.random_objects import *  # noqa: F401, F403
+from tests.fixtures.redis import *  # noqa: F401, F403
 from tests.fixtures.webhook import *  # noqa: F401, F403
 from tests.fixtures.worker import *  # noqa: F401, F403
 
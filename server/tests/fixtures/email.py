@@ -0,0 +1,45 @@
+from collections.abc import Sequence
+
+import pytest
+
+from polar.email.sender import Email, EmailSender
+
+
+class FakeEmailSender(EmailSender):
+    """Email sender keeping sent emails in memory, for assertions."""
+
+    def __init__(self) -> None:
+        self.sent: list[Email] = []
+
+    async def send_to_user(
+        self,
+        *,
+        to_email_addr: str,
+        subject: str,
+        html_content: str,
+        from_name: str = "Polar",
+        from_email_addr: str = "notifications@polar.sh",
+        email_headers: dict[str, str] = {},
+        reply_to_name: str | None = None,
+        reply_to_email_addr: str | None = None,
+    ) -> None:
+        self.sent.append(
+            Email(
+                to_email_addr=to_email_addr,
+                subject=subject,
+                html_content=html_content,
+                from_name=from_name,
+                from_email_addr=from_email_addr,
+                email_headers=email_headers,
+                reply_to_name=reply_to_name,
+                reply_to_email_addr=reply_to_email_addr,
+            )
+        )
+
+    async def send_many(self, emails: Sequence[Email]) -> None:
+        self.sent.extend(emails)
+
+
+@pytest.fixture
+def email_sender() -> FakeEmailSender:
+    return FakeEmailSender()
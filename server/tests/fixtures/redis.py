@@ -0,0 +1,18 @@
+from collections.abc import AsyncIterator
+from typing import cast
+
+import pytest_asyncio
+import redis.asyncio as _async_redis
+
+from polar.config import settings
+from polar.redis import Redis
+
+
+@pytest_asyncio.fixture
+async def redis() -> AsyncIterator[Redis]:
+    # Dedicated client, bound to the event loop of the test
+    redis = cast(
+        Redis, _async_redis.Redis.from_url(settings.redis_url, decode_responses=True)
+    )
+    yield redis
+    await redis.close()
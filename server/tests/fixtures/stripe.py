@@ -0,0 +1,12 @@
+from collections.abc import AsyncIterator, Iterable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+async def async_iter(items: Iterable[T]) -> AsyncIterator[T]:
+    """
+    Mock return value for the `StripeService.list_*` methods.
+    """
+    for item in items:
+        yield item
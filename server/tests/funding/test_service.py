@@ -8,7 +8,11 @@ from polar.funding.schemas import FundingResultType
 from polar.funding.service import ListFundingSortBy
 from polar.funding.service import funding as funding_service
 from polar.issue.service import issue as issue_service
-from polar.kit.pagination import PaginationParams
+from polar.kit.pagination import (
+    CursorPaginationCount,
+    CursorPaginationParams,
+    PaginationParams,
+)
 from polar.models import Issue, Organization, Pledge, User, UserOrganization
 from polar.models.pledge import PledgeState, PledgeType
 from polar.pledge.service import pledge as pledge_service
@@ -346,6 +350,59 @@ class TestListBy:
         assert results[0][0].id == issue.id
 
 
+@pytest.mark.asyncio
+class TestListByCursor:
+    @pytest.mark.parametrize(
+        "sorting",
+        [
+            [ListFundingSortBy.oldest],
+            [ListFundingSortBy.most_funded, ListFundingSortBy.newest],
+            [ListFundingSortBy.most_recently_funded],
+        ],
+    )
+    async def test_pages(
+        self,
+        sorting: list[ListFundingSortBy],
+        issues_pledges: IssuesPledgesFixture,
+        session: AsyncSession,
+    ) -> None:
+        # then
+        await run_calculate_sort_columns(session)
+        session.expunge_all()
+
+        expected_results, _ = await funding_service.list_by(
+            session, Anonymous(), sorting=sorting, pagination=PaginationParams(1, 10)
+        )
+
+        results, next_cursor, total_count = await funding_service.list_by_cursor(
+            session,
+            Anonymous(),
+            sorting=sorting,
+            pagination=CursorPaginationParams(None, 1, CursorPaginationCount.exact),
+        )
+        assert total_count == len(issues_pledges)
+
+        while next_cursor is not None:
+            page_results, next_cursor, _ = await funding_service.list_by_cursor(
+                session,
+                Anonymous(),
+                sorting=sorting,
+                pagination=CursorPaginationParams(next_cursor, 1),
+            )
+            results = [*results, *page_results]
+
+        assert [result[0].id for result in results] == [
+            result[0].id for result in expected_results
+        ]
+        for result in results:
+            issue, pledges = next(
+                (issue, pledges)
+                for issue, pledges in issues_pledges
+                if issue.id == result[0].id
+            )
+            await issue_row_assertions(session, result, issue, pledges)
+
+
 @pytest.mark.asyncio
 class TestGetByIssueId:
     async def test_not_existing_issue(self, session: AsyncSession) -> None:
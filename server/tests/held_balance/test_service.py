@@ -0,0 +1,175 @@
+from typing import Any
+
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy import Delete, delete, select
+
+from polar.held_balance.service import held_balance as held_balance_service
+from polar.models import (
+    HeldBalance,
+    Organization,
+    Subscription,
+    Transaction,
+    User,
+)
+from polar.models.transaction import (
+    PlatformFeeType,
+    ProcessorFeeType,
+    TransactionType,
+)
+from polar.postgres import AsyncSession
+from polar.transaction.service.account_balance import (
+    account_balance as account_balance_service,
+)
+from tests.fixtures.database import SaveFixture
+from tests.transaction.conftest import create_account, create_transaction
+
+
+@pytest.mark.asyncio
+class TestReleaseAccount:
+    async def test_no_held_balance(
+        self,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        user: User,
+    ) -> None:
+        account = await create_account(save_fixture, organization, user)
+
+        # then
+        session.expunge_all()
+
+        released = await held_balance_service.release_account(session, account)
+        assert released == 0
+
+    async def test_subscriptions(
+        self,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        user: User,
+        subscription: Subscription,
+    ) -> None:
+        account = await create_account(
+            save_fixture, organization, user, processor_fees_applicable=True
+        )
+        held_balances: list[HeldBalance] = []
+        for _ in range(3):
+            payment_transaction = await create_transaction(
+                save_fixture,
+                type=TransactionType.payment,
+                account_currency="usd",
+                subscription=subscription,
+            )
+            processor_fee_transaction = Transaction(
+                type=TransactionType.processor_fee,
+                processor_fee_type=ProcessorFeeType.payment,
+                currency="usd",
+                amount=-50,
+                account_currency="usd",
+                account_amount=-50,
+                tax_amount=0,
+                incurred_by_transaction=payment_transaction,
+            )
+            await save_fixture(processor_fee_transaction)
+            held_balance = HeldBalance(
+                amount=1000,
+                organization_id=organization.id,
+                payment_transaction_id=payment_transaction.id,
+                subscription_id=subscription.id,
+            )
+            await save_fixture(held_balance)
+            held_balances.append(held_balance)
+
+        # then
+        session.expunge_all()
+
+        released = await held_balance_service.release_account(session, account)
+        assert released == len(held_balances)
+
+        held_balances_result = await session.execute(
+            select(HeldBalance).where(
+                HeldBalance.id.in_([held_balance.id for held_balance in held_balances])
+            )
+        )
+        assert held_balances_result.scalars().all() == []
+
+        account_transactions_result = await session.execute(
+            select(Transaction).where(Transaction.account_id == account.id)
+        )
+        account_transactions = account_transactions_result.scalars().all()
+        balances = [t for t in account_transactions if t.platform_fee_type is None]
+        fees = [t for t in account_transactions if t.platform_fee_type is not None]
+
+        assert len(balances) == len(held_balances)
+        for balance in balances:
+            assert balance.amount == 1000
+            assert balance.subscription_id == subscription.id
+
+        assert {fee.platform_fee_type for fee in fees} == {
+            PlatformFeeType.platform,
+            PlatformFeeType.payment,
+            PlatformFeeType.subscription,
+        }
+        assert len(fees) == 3 * len(held_balances)
+        for fee in fees:
+            assert fee.amount < 0
+            assert fee.incurred_by_transaction_id in {b.id for b in balances}
+            if fee.platform_fee_type == PlatformFeeType.payment:
+                assert fee.amount == -50
+
+        account_balance = await account_balance_service.get_by_account_id(
+            session, account.id
+        )
+        assert account_balance is not None
+        assert account_balance.amount == sum(t.amount for t in account_transactions)
+
+    async def test_already_released(
+        self,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        user: User,
+        subscription: Subscription,
+        mocker: MockerFixture,
+    ) -> None:
+        account = await create_account(save_fixture, organization, user)
+        payment_transaction = await create_transaction(
+            save_fixture,
+            type=TransactionType.payment,
+            account_currency="usd",
+            subscription=subscription,
+        )
+        held_balance = HeldBalance(
+            amount=1000,
+            organization_id=organization.id,
+            payment_transaction_id=payment_transaction.id,
+            subscription_id=subscription.id,
+        )
+        await save_fixture(held_balance)
+
+        # then
+        session.expunge_all()
+
+        # Simulate a concurrent release deleting the held balance
+        # between the load and the deletion
+        execute = session.execute
+
+        async def execute_after_concurrent_release(*args: Any, **kwargs: Any) -> Any:
+            statement = args[0]
+            if isinstance(statement, Delete):
+                session.execute = execute  # type: ignore[method-assign]
+                await execute(
+                    delete(HeldBalance).where(HeldBalance.id == held_balance.id)
+                )
+            return await execute(*args, **kwargs)
+
+        mocker.patch.object(session, "execute", new=execute_after_concurrent_release)
+
+        released = await held_balance_service.release_account(session, account)
+        assert released == 0
+
+        account_transactions_result = await execute(
+            select(Transaction).where(Transaction.account_id == account.id)
+        )
+        assert account_transactions_result.scalars().all() == []
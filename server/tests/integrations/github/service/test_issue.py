@@ -1,8 +1,17 @@
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock
+
 import pytest
+from githubkit.exception import RequestFailed
+from githubkit.graphql import GraphQLError, GraphQLResponse
+from pytest_mock import MockerFixture
 
 from polar.integrations.github.client import get_client
 from polar.integrations.github.service.issue import github_issue
+from polar.models import Issue, Organization, Repository
 from polar.postgres import AsyncSession
+from tests.fixtures.database import SaveFixture
+from tests.fixtures.random_objects import create_issue
 
 
 @pytest.mark.asyncio
@@ -35,3 +44,143 @@ async def test_sync_external_org_with_repo_and_issue(
     )
 
     assert issue is not None
+
+
+def graphql_issue_node(issue: Issue, repository: Repository) -> dict[str, Any]:
+    actor = {
+        "databaseId": 1,
+        "login": "octocat",
+        "url": "https://github.com/octocat",
+        "avatarUrl": "https://avatars.githubusercontent.com/u/1",
+    }
+    return {
+        "databaseId": issue.external_id,
+        "number": issue.number,
+        "title": "updated title",
+        "body": "updated body",
+        "state": "CLOSED",
+        "stateReason": "NOT_PLANNED",
+        "authorAssociation": "OWNER",
+        "createdAt": "2024-01-01T00:00:00Z",
+        "updatedAt": "2024-01-02T00:00:00Z",
+        "closedAt": "2024-01-02T00:00:00Z",
+        "repository": {"databaseId": repository.external_id},
+        "author": actor,
+        "comments": {"totalCount": 3},
+        "labels": {"nodes": [{"name": "bug", "color": "d73a4a"}]},
+        "assignees": {"nodes": [actor]},
+        "milestone": None,
+        "reactions": {"totalCount": 3},
+        "reactionGroups": [
+            {"content": "THUMBS_UP", "reactors": {"totalCount": 2}},
+            {"content": "CONFUSED", "reactors": {"totalCount": 1}},
+        ],
+        "timelineItems": {"nodes": [{"actor": actor}]},
+    }
+
+
+@pytest.mark.asyncio
+class TestSyncIssuesBatch:
+    async def test_graphql_and_fallback(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        public_repository: Repository,
+    ) -> None:
+        fetched = await create_issue(save_fixture, organization, public_repository)
+        missing = await create_issue(save_fixture, organization, public_repository)
+
+        # then
+        session.expunge_all()
+
+        client = MagicMock()
+        client.arequest = AsyncMock(
+            return_value=MagicMock(
+                parsed_data=GraphQLResponse(
+                    data={
+                        "rateLimit": {"cost": 1, "remaining": 4999},
+                        "r0": {
+                            f"i{fetched.number}": graphql_issue_node(
+                                fetched, public_repository
+                            ),
+                            f"i{missing.number}": None,
+                        },
+                    },
+                    errors=[
+                        GraphQLError(
+                            type="NOT_FOUND",
+                            message="Could not resolve to an Issue",
+                            path=["r0", f"i{missing.number}"],
+                        )
+                    ],
+                )
+            )
+        )
+        mocker.patch(
+            "polar.integrations.github.service.issue.github.get_app_installation_client",
+            return_value=client,
+        )
+        sync_issue_mock = mocker.patch.object(github_issue, "sync_issue")
+
+        issues = await github_issue.list_by_ids(session, [fetched.id, missing.id])
+        await github_issue.sync_issues_batch(session, organization, issues)
+
+        client.arequest.assert_awaited_once()
+        sync_issue_mock.assert_awaited_once()
+        assert sync_issue_mock.call_args.args[3].id == missing.id
+
+        session.expunge_all()
+        updated = await github_issue.get(session, fetched.id)
+        assert updated is not None
+        assert updated.title == "updated title"
+        assert updated.state == Issue.State.CLOSED
+        assert updated.state_reason == "not_planned"
+        assert updated.labels == [{"name": "bug", "color": "d73a4a"}]
+        assert updated.closed_by == {
+            "id": 1,
+            "login": "octocat",
+            "html_url": "https://github.com/octocat",
+            "avatar_url": "https://avatars.githubusercontent.com/u/1",
+        }
+        assert updated.reactions == {
+            "total_count": 3,
+            "plus_one": 2,
+            "minus_one": 0,
+            "laugh": 0,
+            "hooray": 0,
+            "confused": 1,
+            "heart": 0,
+            "rocket": 0,
+            "eyes": 0,
+        }
+        assert updated.github_issue_fetched_at is not None
+
+    async def test_request_failed(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        public_repository: Repository,
+    ) -> None:
+        issue = await create_issue(save_fixture, organization, public_repository)
+
+        # then
+        session.expunge_all()
+
+        client = MagicMock()
+        client.arequest = AsyncMock(
+            side_effect=RequestFailed(MagicMock(status_code=502))
+        )
+        mocker.patch(
+            "polar.integrations.github.service.issue.github.get_app_installation_client",
+            return_value=client,
+        )
+        sync_issue_mock = mocker.patch.object(github_issue, "sync_issue")
+
+        issues = await github_issue.list_by_ids(session, [issue.id])
+        await github_issue.sync_issues_batch(session, organization, issues)
+
+        sync_issue_mock.assert_awaited_once()
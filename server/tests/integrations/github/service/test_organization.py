@@ -0,0 +1,159 @@
+import secrets
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.enums import Platforms
+from polar.integrations.github.service.organization import (
+    MEMBERS_PER_PAGE,
+    Member,
+    github_organization,
+)
+from polar.kit.utils import utc_now
+from polar.models import Organization, User, UserOrganization
+from polar.models.user import OAuthAccount
+from polar.postgres import AsyncSession, sql
+from tests.fixtures.database import SaveFixture
+from tests.fixtures.random_objects import create_user
+
+
+async def create_github_user(save_fixture: SaveFixture) -> tuple[User, int]:
+    user = await create_user(save_fixture)
+    github_id = secrets.randbelow(2**31)
+    await save_fixture(
+        OAuthAccount(
+            platform=Platforms.github,
+            access_token="xxyyzz",
+            account_id=str(github_id),
+            account_email=user.email,
+            user_id=user.id,
+        )
+    )
+    return user, github_id
+
+
+def get_member(github_id: int, is_admin: bool) -> Member:
+    return Member(
+        external_id=github_id,
+        username=f"user-{github_id}",
+        avatar_url="https://avatars.githubusercontent.com/u/47952?v=4",
+        is_admin=is_admin,
+    )
+
+
+@pytest.mark.asyncio
+class TestUpdateMembers:
+    async def test_diff(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+    ) -> None:
+        organization_installed_mock = mocker.patch(
+            "polar.integrations.github.service.organization.loops_service.organization_installed"
+        )
+        mocker.patch(
+            "polar.integrations.github.service.organization.subscription_service.update_organization_benefits_grants"
+        )
+
+        added, added_github_id = await create_github_user(save_fixture)
+        promoted, promoted_github_id = await create_github_user(save_fixture)
+        removed, _ = await create_github_user(save_fixture)
+        restored, restored_github_id = await create_github_user(save_fixture)
+        without_github = await create_user(save_fixture)
+
+        for user, deleted in [
+            (promoted, False),
+            (removed, False),
+            (restored, True),
+            (without_github, False),
+        ]:
+            await save_fixture(
+                UserOrganization(
+                    user_id=user.id,
+                    organization_id=organization.id,
+                    deleted_at=utc_now() if deleted else None,
+                )
+            )
+
+        # then
+        session.expunge_all()
+
+        await github_organization.update_members(
+            session,
+            organization,
+            [
+                get_member(added_github_id, is_admin=True),
+                get_member(promoted_github_id, is_admin=True),
+                get_member(restored_github_id, is_admin=False),
+                # Not a Polar user
+                get_member(secrets.randbelow(2**31), is_admin=False),
+            ],
+        )
+
+        res = await session.execute(
+            sql.select(
+                UserOrganization.user_id,
+                UserOrganization.is_admin,
+                UserOrganization.deleted_at.is_(None),
+            ).where(UserOrganization.organization_id == organization.id)
+        )
+        assert {user_id: (is_admin, active) for user_id, is_admin, active in res} == {
+            added.id: (True, True),
+            promoted.id: (True, True),
+            removed.id: (False, False),
+            restored.id: (False, True),
+            without_github.id: (False, True),
+        }
+
+        assert {
+            call.kwargs["user"].id
+            for call in organization_installed_mock.call_args_list
+        } == {added.id, restored.id}
+
+
+class FakeOrgsAPI:
+    def __init__(self, members: list[int], admins: list[int]) -> None:
+        self.members = {"all": members, "admin": admins}
+        self.pages: list[tuple[str, int]] = []
+
+    async def async_list_members(
+        self, org: str, *, page: int, per_page: int, role: str
+    ) -> Any:
+        self.pages.append((role, page))
+        members = self.members[role][(page - 1) * per_page : page * per_page]
+        return SimpleNamespace(
+            parsed_data=[
+                SimpleNamespace(id=id, login=f"user-{id}", avatar_url="")
+                for id in members
+            ]
+        )
+
+
+@pytest.mark.asyncio
+class TestFetchMembers:
+    async def test_pages(
+        self, mocker: MockerFixture, session: AsyncSession, organization: Organization
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        orgs = FakeOrgsAPI(
+            members=list(range(MEMBERS_PER_PAGE * 7 + 1)), admins=[1, 2, 3]
+        )
+        mocker.patch(
+            "polar.integrations.github.service.organization.github.get_app_installation_client",
+            return_value=SimpleNamespace(rest=SimpleNamespace(orgs=orgs)),
+        )
+
+        members = await github_organization.fetch_members(organization, concurrency=3)
+
+        assert len(members) == MEMBERS_PER_PAGE * 7 + 1
+        assert {m.external_id for m in members if m.is_admin} == {1, 2, 3}
+        assert sorted(page for role, page in orgs.pages if role == "all") == list(
+            range(1, 11)
+        )
+        assert [page for role, page in orgs.pages if role == "admin"] == [1]
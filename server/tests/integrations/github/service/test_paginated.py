@@ -0,0 +1,114 @@
+from collections.abc import AsyncIterator, Sequence
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+from polar.integrations.github.service.paginated import github_paginated_service
+from polar.kit.hook import Hook
+from polar.models import Organization, Repository
+from polar.postgres import AsyncSession
+from polar.repository.hooks import SyncCompletedHook, SyncedHook
+
+
+class FakeData:
+    def __init__(self, id: int) -> None:
+        self.id = id
+
+    def model_dump(self, **kwargs: Any) -> dict[str, Any]:
+        return {"id": self.id}
+
+
+async def paginate(count: int) -> AsyncIterator[FakeData]:
+    for i in range(count):
+        yield FakeData(i)
+
+
+class FakeStore:
+    def __init__(self, failing_ids: set[int] = set()) -> None:
+        self.failing_ids = failing_ids
+        self.batches: list[list[int]] = []
+
+    async def __call__(
+        self, session: AsyncSession, *, data: Sequence[FakeData], **kwargs: Any
+    ) -> list[MagicMock]:
+        self.batches.append([d.id for d in data])
+        return [
+            MagicMock(external_id=d.id) for d in data if d.id not in self.failing_ids
+        ]
+
+
+@pytest.mark.asyncio
+class TestStorePaginatedResource:
+    async def test_batches(
+        self,
+        session: AsyncSession,
+        organization: Organization,
+        public_repository: Repository,
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        store = FakeStore()
+        synced_hooks: list[SyncedHook] = []
+        completed_hooks: list[SyncCompletedHook] = []
+
+        on_sync_signal: Hook[SyncedHook] = Hook()
+        on_completed_signal: Hook[SyncCompletedHook] = Hook()
+
+        async def on_synced(hook: SyncedHook) -> None:
+            synced_hooks.append(hook)
+
+        async def on_completed(hook: SyncCompletedHook) -> None:
+            completed_hooks.append(hook)
+
+        on_sync_signal.add(on_synced)
+        on_completed_signal.add(on_completed)
+
+        synced, errors = await github_paginated_service.store_paginated_resource(
+            session,
+            paginator=paginate(8),  # type: ignore[arg-type]
+            store_resources_method=store,
+            organization=organization,
+            repository=public_repository,
+            resource_type="issue",
+            skip_condition=lambda data: data.id == 0,
+            on_sync_signal=on_sync_signal,
+            on_completed_signal=on_completed_signal,
+            batch_size=3,
+        )
+
+        assert (synced, errors) == (8, 0)
+        assert store.batches == [[1, 2, 3], [4, 5, 6], [7]]
+
+        assert [len(hook.records) for hook in synced_hooks] == [3, 3, 1]
+        assert [hook.synced for hook in synced_hooks] == [4, 7, 8]
+        assert all(hook.synced_per_second > 0 for hook in synced_hooks)
+
+        assert len(completed_hooks) == 1
+        assert completed_hooks[0].synced == 8
+        assert completed_hooks[0].synced_per_second > 0
+
+    async def test_errors(
+        self,
+        session: AsyncSession,
+        organization: Organization,
+        public_repository: Repository,
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        store = FakeStore(failing_ids={1, 4})
+
+        synced, errors = await github_paginated_service.store_paginated_resource(
+            session,
+            paginator=paginate(5),  # type: ignore[arg-type]
+            store_resources_method=store,
+            organization=organization,
+            repository=public_repository,
+            resource_type="issue",
+            batch_size=2,
+        )
+
+        assert (synced, errors) == (5, 2)
+        assert store.batches == [[0, 1], [2, 3], [4]]
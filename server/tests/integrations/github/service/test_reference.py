@@ -1,12 +1,18 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
 import pytest
 from pydantic import TypeAdapter
+from pytest_mock import MockerFixture
 
 import polar.integrations.github.client as github
 from polar.integrations.github import types
 from polar.integrations.github.service.reference import (
+    REFERENCES_PER_PAGE,
     TimelineEventType,
     github_reference,
 )
+from polar.kit.utils import utc_now
 from polar.models.issue import Issue
 from polar.models.issue_reference import ReferenceType
 from polar.models.organization import Organization
@@ -14,6 +20,7 @@ from polar.models.pull_request import PullRequest
 from polar.models.repository import Repository
 from polar.postgres import AsyncSession
 from tests.fixtures.database import SaveFixture
+from tests.fixtures.random_objects import create_issue
 from tests.fixtures.vcr import read_cassette
 
 
@@ -137,3 +144,123 @@ async def test_parse_issue_timeline_rclone(
 
     if len(parsed) < 4:
         return
+
+
+class FakeRepositoryEvents:
+    def __init__(self, pages: list[list[MagicMock]]) -> None:
+        self.pages = pages
+        self.requested_pages: list[int] = []
+
+    async def __call__(
+        self, *, owner: str, repo: str, per_page: int, page: int
+    ) -> MagicMock:
+        self.requested_pages.append(page)
+        events = self.pages[page - 1] if page <= len(self.pages) else []
+        return MagicMock(parsed_data=events)
+
+
+def referenced_event(
+    created_at: datetime, external_issue_id: int | None = None
+) -> MagicMock:
+    if external_issue_id is None:
+        return MagicMock(event="labeled", created_at=created_at)
+    return MagicMock(
+        event="referenced",
+        created_at=created_at,
+        issue=MagicMock(id=external_issue_id),
+    )
+
+
+@pytest.mark.asyncio
+class TestSyncRepoReferences:
+    async def test_pages(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        public_repository: Repository,
+    ) -> None:
+        issue_1 = await create_issue(save_fixture, organization, public_repository)
+        issue_2 = await create_issue(save_fixture, organization, public_repository)
+
+        # then
+        session.expunge_all()
+
+        now = utc_now()
+        full_page = [referenced_event(now) for _ in range(REFERENCES_PER_PAGE)]
+        events = FakeRepositoryEvents(
+            [
+                [referenced_event(now, issue_1.external_id), *full_page[1:]],
+                full_page,
+                [
+                    referenced_event(now, issue_1.external_id),
+                    referenced_event(now, issue_2.external_id),
+                    referenced_event(now, 404),
+                ],
+            ]
+        )
+        client = MagicMock()
+        client.rest.issues.async_list_events_for_repo = events
+        mocker.patch(
+            "polar.integrations.github.service.reference.github.get_app_installation_client",
+            return_value=client,
+        )
+        enqueue_job_mock = mocker.patch(
+            "polar.integrations.github.service.reference.enqueue_job"
+        )
+
+        await github_reference.sync_repo_references(
+            session, organization, public_repository, concurrency=5
+        )
+
+        assert events.requested_pages == [1, 2, 3, 4, 5, 6]
+        assert [call.args[1] for call in enqueue_job_mock.call_args_list] == [
+            issue_1.id,
+            issue_2.id,
+        ]
+
+    async def test_cutoff(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        public_repository: Repository,
+    ) -> None:
+        issue = await create_issue(save_fixture, organization, public_repository)
+        public_repository.issues_references_synced_at = utc_now() - timedelta(hours=1)
+        await save_fixture(public_repository)
+
+        # then
+        session.expunge_all()
+
+        now = utc_now()
+        events = FakeRepositoryEvents(
+            [
+                [
+                    referenced_event(now, issue.external_id),
+                    *(
+                        referenced_event(now - timedelta(days=1))
+                        for _ in range(REFERENCES_PER_PAGE - 1)
+                    ),
+                ],
+                [referenced_event(now - timedelta(days=1))] * REFERENCES_PER_PAGE,
+            ]
+        )
+        client = MagicMock()
+        client.rest.issues.async_list_events_for_repo = events
+        mocker.patch(
+            "polar.integrations.github.service.reference.github.get_app_installation_client",
+            return_value=client,
+        )
+        enqueue_job_mock = mocker.patch(
+            "polar.integrations.github.service.reference.enqueue_job"
+        )
+
+        repository = await session.get(Repository, public_repository.id)
+        assert repository is not None
+        await github_reference.sync_repo_references(session, organization, repository)
+
+        assert events.requested_pages == [1]
+        assert [call.args[1] for call in enqueue_job_mock.call_args_list] == [issue.id]
@@ -0,0 +1,201 @@
+import time
+from datetime import timedelta
+
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.integrations.github.rate_limit import (
+    RATE_LIMIT_RESERVE,
+    RateLimit,
+    RateLimitTracker,
+)
+from polar.integrations.github.service.issue import github_issue
+from polar.integrations.github.tasks.issue import ISSUE_SYNC_COST, schedule_crawl
+from polar.kit.utils import utc_now
+from polar.models import Organization, Repository
+from polar.postgres import AsyncSession
+from polar.redis import Redis
+from tests.fixtures.database import SaveFixture
+from tests.fixtures.random_objects import create_issue
+
+
+@pytest.mark.asyncio
+class TestScheduleCrawl:
+    async def test_priority_and_rate(
+        self,
+        mocker: MockerFixture,
+        redis: Redis,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        public_repository: Repository,
+    ) -> None:
+        stale = await create_issue(save_fixture, organization, public_repository)
+        stale.github_issue_fetched_at = utc_now() - timedelta(days=2)
+        await save_fixture(stale)
+
+        never_fetched = await create_issue(
+            save_fixture, organization, public_repository
+        )
+
+        pledged = await create_issue(save_fixture, organization, public_repository)
+        pledged.github_issue_fetched_at = utc_now() - timedelta(days=1)
+        pledged.pledged_amount_sum = 10_000
+        await save_fixture(pledged)
+
+        small_pledged = await create_issue(
+            save_fixture, organization, public_repository
+        )
+        small_pledged.github_issue_fetched_at = utc_now() - timedelta(days=2)
+        small_pledged.pledged_amount_sum = 1_000
+        await save_fixture(small_pledged)
+
+        fresh = await create_issue(save_fixture, organization, public_repository)
+        fresh.github_issue_fetched_at = utc_now()
+        await save_fixture(fresh)
+
+        # then
+        session.expunge_all()
+
+        tracker = RateLimitTracker(redis)
+        mocker.patch(
+            "polar.integrations.github.tasks.issue.rate_limit_tracker", tracker
+        )
+        enqueue_job_mock = mocker.patch(
+            "polar.integrations.github.tasks.issue.enqueue_job"
+        )
+        installation_id = organization.safe_installation_id
+        await redis.delete(tracker._get_bucket_key(installation_id))
+        # One request every 2 seconds
+        await tracker.set(
+            installation_id,
+            RateLimit(
+                limit=5000,
+                remaining=RATE_LIMIT_RESERVE + 1800,
+                used=0,
+                reset=int(time.time()) + 3600,
+            ),
+        )
+
+        await schedule_crawl(
+            session,
+            name="test",
+            job_name="github.issue.sync",
+            list_issues=github_issue.list_issues_to_crawl_issue,
+            cost=ISSUE_SYNC_COST,
+        )
+
+        assert [
+            (call.args[1], call.kwargs["_defer_by"])
+            for call in enqueue_job_mock.call_args_list
+        ] == [
+            (pledged.id, 0),
+            (small_pledged.id, 2),
+            (never_fetched.id, 4),
+            (stale.id, 6),
+        ]
+
+        await redis.delete(
+            tracker._get_bucket_key(installation_id),
+            tracker._get_quota_key(installation_id),
+        )
+
+    async def test_rate_limit_exhausted(
+        self,
+        mocker: MockerFixture,
+        redis: Redis,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        public_repository: Repository,
+    ) -> None:
+        await create_issue(save_fixture, organization, public_repository)
+
+        # then
+        session.expunge_all()
+
+        tracker = RateLimitTracker(redis)
+        mocker.patch(
+            "polar.integrations.github.tasks.issue.rate_limit_tracker", tracker
+        )
+        enqueue_job_mock = mocker.patch(
+            "polar.integrations.github.tasks.issue.enqueue_job"
+        )
+        installation_id = organization.safe_installation_id
+        await tracker.set(
+            installation_id,
+            RateLimit(
+                limit=5000,
+                remaining=RATE_LIMIT_RESERVE - 1,
+                used=0,
+                reset=int(time.time()) + 3600,
+            ),
+        )
+
+        await schedule_crawl(
+            session,
+            name="test",
+            job_name="github.issue.sync",
+            list_issues=github_issue.list_issues_to_crawl_issue,
+            cost=ISSUE_SYNC_COST,
+        )
+
+        enqueue_job_mock.assert_not_called()
+
+        await redis.delete(tracker._get_quota_key(installation_id))
+
+    async def test_batches(
+        self,
+        mocker: MockerFixture,
+        redis: Redis,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        public_repository: Repository,
+    ) -> None:
+        issues = [
+            await create_issue(save_fixture, organization, public_repository)
+            for _ in range(5)
+        ]
+
+        # then
+        session.expunge_all()
+
+        tracker = RateLimitTracker(redis)
+        mocker.patch(
+            "polar.integrations.github.tasks.issue.rate_limit_tracker", tracker
+        )
+        enqueue_job_mock = mocker.patch(
+            "polar.integrations.github.tasks.issue.enqueue_job"
+        )
+        installation_id = organization.safe_installation_id
+        await redis.delete(tracker._get_bucket_key(installation_id))
+        await tracker.set(
+            installation_id,
+            RateLimit(
+                limit=5000,
+                remaining=RATE_LIMIT_RESERVE + 1800,
+                used=0,
+                reset=int(time.time()) + 3600,
+            ),
+        )
+
+        await schedule_crawl(
+            session,
+            name="test",
+            job_name="github.issue.sync.batch",
+            list_issues=github_issue.list_issues_to_crawl_issue,
+            cost=ISSUE_SYNC_COST,
+            batch_size=2,
+        )
+
+        batches = [call.args[1] for call in enqueue_job_mock.call_args_list]
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert {issue_id for batch in batches for issue_id in batch} == {
+            issue.id for issue in issues
+        }
+
+        await redis.delete(
+            tracker._get_bucket_key(installation_id),
+            tracker._get_quota_key(installation_id),
+        )
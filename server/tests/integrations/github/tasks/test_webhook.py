@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 from typing import Any
 from unittest.mock import ANY, patch
 
@@ -10,6 +11,7 @@ from pytest_mock import MockerFixture
 from polar.enums import Platforms
 from polar.integrations.github import client as github
 from polar.integrations.github import service, types
+from polar.integrations.github.ingestion import WebhookIngestion
 from polar.integrations.github.tasks import webhook as webhook_tasks
 from polar.kit import utils
 from polar.kit.extensions.sqlalchemy import sql
@@ -17,6 +19,7 @@ from polar.models.organization import Organization
 from polar.models.repository import Repository
 from polar.organization.schemas import OrganizationCreate
 from polar.postgres import AsyncSession
+from polar.redis import Redis
 from polar.repository.schemas import RepositoryCreate
 from polar.worker import JobContext, PolarWorkerContext
 from tests.fixtures import random_objects
@@ -529,6 +532,62 @@ async def test_webhook_issues_labeled(
     assert issue.labels[0]["name"] == hook["issue"]["labels"][0]["name"]
 
 
+@pytest.mark.asyncio
+async def test_webhook_issues_labeled_unlabeled_coalesced(
+    job_context: JobContext,
+    session: AsyncSession,
+    mocker: MockerFixture,
+    redis: Redis,
+    github_webhook: TestWebhookFactory,
+) -> None:
+    webhook_ingestion = WebhookIngestion(redis)
+    mocker.patch(
+        "polar.integrations.github.tasks.webhook.webhook_ingestion", webhook_ingestion
+    )
+    update_issue_embed_mock = mocker.patch(
+        "polar.integrations.github.tasks.webhook.update_issue_embed"
+    )
+
+    await create_repositories(session, github_webhook)
+    hook = await create_issue(job_context, session, github_webhook)
+
+    # then
+    session.expunge_all()
+
+    issue_id = hook["issue"]["id"]
+
+    # Label added then removed within the same window
+    labeled = github_webhook.create("issues.labeled").json
+    unlabeled = {
+        **labeled,
+        "action": "unlabeled",
+        "issue": {**labeled["issue"], "labels": []},
+    }
+    key = "github.webhook.issues:coalesced_test"
+    for payload in [labeled, unlabeled]:
+        await webhook_ingestion.store_coalesced_payload(
+            key,
+            payload["action"],
+            json.dumps(payload).encode(),
+            payload["issue"]["updated_at"],
+        )
+
+    await webhook_tasks.coalesced(
+        job_context, "issues", key, polar_context=PolarWorkerContext()
+    )
+
+    issue = await service.github_issue.get_by_external_id(session, issue_id)
+    assert issue is not None
+    await session.refresh(issue)
+    assert issue.labels == []
+    assert issue.has_pledge_badge_label is False
+    assert issue.issue_modified_at is not None
+    assert issue.issue_modified_at.isoformat().startswith(
+        labeled["issue"]["updated_at"].removesuffix("Z")
+    )
+    update_issue_embed_mock.assert_not_called()
+
+
 @pytest.mark.asyncio
 async def test_webhook_pull_request_opened(
     job_context: JobContext,
@@ -0,0 +1,117 @@
+import asyncio
+import uuid
+from email.utils import formatdate
+
+import hishel
+import httpcore
+import httpx
+import pytest
+from pytest_mock import MockerFixture
+from redis.exceptions import ConnectionError
+
+from polar.integrations.github import client as github
+from polar.integrations.github.cache import (
+    NetworkTransport,
+    RedisHTTPCacheStorage,
+    get_http_cache_key_generator,
+    network_response_status,
+)
+from polar.redis import Redis
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    headers = {
+        "date": formatdate(usegmt=True),
+        "etag": '"etag"',
+        "cache-control": "private, max-age=0",
+    }
+    if request.headers.get("if-none-match") == '"etag"':
+        return httpx.Response(304, headers=headers)
+    return httpx.Response(200, json={"id": 42}, headers=headers)
+
+
+@pytest.mark.asyncio
+class TestHTTPCache:
+    async def test_revalidated(self, redis: Redis) -> None:
+        transport = hishel.AsyncCacheTransport(
+            NetworkTransport(httpx.MockTransport(handler)),
+            storage=RedisHTTPCacheStorage(client=redis, ttl=60),
+            controller=hishel.Controller(
+                key_generator=get_http_cache_key_generator(str(uuid.uuid4()))
+            ),
+        )
+        client = httpx.AsyncClient(transport=transport)
+
+        statuses: list[int | None] = []
+        for _ in range(2):
+            network_response_status.set(None)
+            response = await client.get(
+                "https://api.github.com/repos/polarsource/polar"
+            )
+            assert response.json() == {"id": 42}
+            statuses.append(network_response_status.get())
+
+        assert statuses == [200, 304]
+
+    async def test_storage_error(self, mocker: MockerFixture) -> None:
+        client = mocker.AsyncMock()
+        client.get.side_effect = ConnectionError()
+        storage = RedisHTTPCacheStorage(client=client)
+
+        assert await storage.retrieve("key") is None
+
+
+def test_key_generator() -> None:
+    def get_request(accept: str) -> httpcore.Request:
+        return httpcore.Request(
+            "GET",
+            "https://api.github.com/repos/polarsource/polar",
+            headers=[(b"Accept", accept.encode())],
+        )
+
+    key_generator = get_http_cache_key_generator("1")
+    key = key_generator(get_request("application/vnd.github+json"))
+
+    assert key.startswith("githubkit:http:1:")
+    assert key == key_generator(get_request("application/vnd.github+json"))
+    assert key != key_generator(get_request("application/vnd.github.raw+json"))
+    assert key != get_http_cache_key_generator("2")(
+        get_request("application/vnd.github+json")
+    )
+
+
+def test_get_app_installation_client_pooled() -> None:
+    client = github.get_app_installation_client(1)
+
+    assert github.get_app_installation_client(1) is client
+    assert github.get_app_installation_client(2) is not client
+    assert (
+        github.get_app_installation_client(1, permissions={"issues": "read"})
+        is not client
+    )
+
+
+@pytest.mark.asyncio
+async def test_retire_pooled_client() -> None:
+    client = github._create_app_installation_client(1)
+
+    async with client.get_async_client() as http_client:
+        client.retire_pooled_client()
+        async with client.get_async_client() as new_http_client:
+            assert new_http_client is not http_client
+        # Still in use
+        assert not http_client.is_closed
+    assert http_client.is_closed
+
+    client.retire_pooled_client()
+    await asyncio.gather(*github._aclose_tasks)
+    assert new_http_client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_not_pooled_client_closed() -> None:
+    client = github.get_app_installation_client(1, permissions={"issues": "read"})
+
+    async with client.get_async_client() as http_client:
+        assert not http_client.is_closed
+    assert http_client.is_closed
@@ -0,0 +1,209 @@
+import json
+import uuid
+from typing import Any
+
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.integrations.github.endpoints import enqueue
+from polar.integrations.github.ingestion import (
+    WEBHOOK_PAYLOAD_INLINE_MAX_SIZE,
+    WebhookIngestion,
+    webhook_payload,
+)
+from polar.redis import Redis
+
+
+@pytest.fixture
+def webhook_ingestion(mocker: MockerFixture, redis: Redis) -> WebhookIngestion:
+    ingestion = WebhookIngestion(redis, coalesce_window=2.0)
+    mocker.patch("polar.integrations.github.endpoints.webhook_ingestion", ingestion)
+    mocker.patch("polar.integrations.github.ingestion.webhook_ingestion", ingestion)
+    return ingestion
+
+
+def issue_payload(
+    updated_at: str, title: str = "Title", action: str = "edited"
+) -> dict[str, Any]:
+    return {
+        "action": action,
+        "issue": {"id": 42, "title": title, "updated_at": updated_at},
+    }
+
+
+@pytest.mark.asyncio
+class TestWebhookIngestion:
+    async def test_is_duplicate(self, webhook_ingestion: WebhookIngestion) -> None:
+        delivery_id = str(uuid.uuid4())
+        assert await webhook_ingestion.is_duplicate(delivery_id) is False
+        assert await webhook_ingestion.is_duplicate(delivery_id) is True
+
+    async def test_store_payload(self, webhook_ingestion: WebhookIngestion) -> None:
+        key = str(uuid.uuid4())
+        payload = issue_payload("2024-01-01T00:00:00Z")
+
+        await webhook_ingestion.store_payload(key, json.dumps(payload).encode())
+
+        assert await webhook_ingestion.load_payload(key) == payload
+        assert await webhook_ingestion.load_payload(str(uuid.uuid4())) is None
+
+    async def test_store_coalesced_payload_keeps_newest(
+        self, webhook_ingestion: WebhookIngestion
+    ) -> None:
+        key = str(uuid.uuid4())
+        newer = issue_payload("2024-01-01T00:00:02Z", "Newer")
+        older = issue_payload("2024-01-01T00:00:01Z", "Older")
+
+        assert await webhook_ingestion.store_coalesced_payload(
+            key, "edited", json.dumps(newer).encode(), "2024-01-01T00:00:02Z"
+        )
+        assert not await webhook_ingestion.store_coalesced_payload(
+            key, "edited", json.dumps(older).encode(), "2024-01-01T00:00:01Z"
+        )
+
+        assert await webhook_ingestion.load_coalesced_payloads(key) == [newer]
+        assert await webhook_ingestion.load_coalesced_payloads(str(uuid.uuid4())) == []
+
+    async def test_load_coalesced_payloads_ordered(
+        self, webhook_ingestion: WebhookIngestion
+    ) -> None:
+        key = str(uuid.uuid4())
+        labeled = issue_payload("2024-01-01T00:00:01Z", action="labeled")
+        unlabeled = issue_payload("2024-01-01T00:00:01Z", action="unlabeled")
+        edited = issue_payload("2024-01-01T00:00:00Z", action="edited")
+
+        # Same `updated_at`: ordered as received
+        for payload in [labeled, unlabeled, edited]:
+            await webhook_ingestion.store_coalesced_payload(
+                key,
+                payload["action"],
+                json.dumps(payload).encode(),
+                payload["issue"]["updated_at"],
+            )
+
+        assert await webhook_ingestion.load_coalesced_payloads(key) == [
+            edited,
+            labeled,
+            unlabeled,
+        ]
+
+    async def test_get_coalesced_job(self, webhook_ingestion: WebhookIngestion) -> None:
+        job_id, delay = webhook_ingestion.get_coalesced_job("task", 42, now=100.5)
+        assert job_id == "task:42:50"
+        assert delay == pytest.approx(1.5)
+
+        assert webhook_ingestion.get_coalesced_job("task", 42, now=101.9)[0] == job_id
+        assert webhook_ingestion.get_coalesced_job("task", 42, now=102.0)[0] != job_id
+
+    async def test_webhook_payload(self, webhook_ingestion: WebhookIngestion) -> None:
+        received: list[dict[str, Any]] = []
+
+        @webhook_payload
+        async def handler(
+            ctx: Any, scope: str, action: str, payload: dict[str, Any]
+        ) -> None:
+            received.append(payload)
+
+        payload = issue_payload("2024-01-01T00:00:00Z")
+        key = str(uuid.uuid4())
+        await webhook_ingestion.store_payload(key, json.dumps(payload).encode())
+
+        await handler({}, "issues", "edited", payload)
+        await handler({}, "issues", "edited", key)
+        await handler({}, "issues", "edited", str(uuid.uuid4()))
+
+        assert received == [payload, payload]
+
+
+@pytest.mark.asyncio
+class TestEnqueue:
+    async def test_duplicate_delivery(
+        self, mocker: MockerFixture, webhook_ingestion: WebhookIngestion
+    ) -> None:
+        enqueue_job_mock = mocker.patch(
+            "polar.integrations.github.endpoints.enqueue_job"
+        )
+        delivery_id = str(uuid.uuid4())
+        body = json.dumps({"action": "opened", "issue": {"id": 42}}).encode()
+
+        response = await enqueue("issues", delivery_id, body)
+        assert response.success
+        duplicate_response = await enqueue("issues", delivery_id, body)
+        assert duplicate_response.message == "Duplicate delivery"
+
+        enqueue_job_mock.assert_called_once_with(
+            "github.webhook.issues.opened",
+            "issues",
+            "opened",
+            {"action": "opened", "issue": {"id": 42}},
+        )
+
+    async def test_coalesced(
+        self, mocker: MockerFixture, webhook_ingestion: WebhookIngestion
+    ) -> None:
+        enqueue_job_mock = mocker.patch(
+            "polar.integrations.github.endpoints.enqueue_job"
+        )
+        mocker.patch("polar.integrations.github.ingestion.time.time", return_value=10)
+
+        newest = issue_payload("2024-01-01T00:00:02Z", "Newest")
+        for payload in [
+            issue_payload("2024-01-01T00:00:01Z", "First"),
+            newest,
+            issue_payload("2024-01-01T00:00:00Z", "Late"),
+        ]:
+            await enqueue("issues", str(uuid.uuid4()), json.dumps(payload).encode())
+
+        job_id = "github.webhook.issues:42:5"
+        job_ids = {call.kwargs["_job_id"] for call in enqueue_job_mock.call_args_list}
+        assert job_ids == {job_id}
+        assert enqueue_job_mock.call_args.args == (
+            "github.webhook.coalesced",
+            "issues",
+            job_id,
+        )
+        assert enqueue_job_mock.call_args.kwargs["_defer_by"] == pytest.approx(2)
+
+        assert await webhook_ingestion.load_coalesced_payloads(job_id) == [newest]
+
+    async def test_coalesced_actions(
+        self, mocker: MockerFixture, webhook_ingestion: WebhookIngestion
+    ) -> None:
+        enqueue_job_mock = mocker.patch(
+            "polar.integrations.github.endpoints.enqueue_job"
+        )
+        mocker.patch("polar.integrations.github.ingestion.time.time", return_value=10)
+
+        labeled = issue_payload("2024-01-01T00:00:01Z", action="labeled")
+        unlabeled = issue_payload("2024-01-01T00:00:01Z", action="unlabeled")
+        for payload in [labeled, unlabeled]:
+            await enqueue("issues", str(uuid.uuid4()), json.dumps(payload).encode())
+
+        # A single job for the resource, handling both events in order
+        job_id = "github.webhook.issues:42:5"
+        job_ids = {call.kwargs["_job_id"] for call in enqueue_job_mock.call_args_list}
+        assert job_ids == {job_id}
+        assert await webhook_ingestion.load_coalesced_payloads(job_id) == [
+            labeled,
+            unlabeled,
+        ]
+
+    async def test_large_payload(
+        self, mocker: MockerFixture, webhook_ingestion: WebhookIngestion
+    ) -> None:
+        enqueue_job_mock = mocker.patch(
+            "polar.integrations.github.endpoints.enqueue_job"
+        )
+        delivery_id = str(uuid.uuid4())
+        payload = {
+            "action": "opened",
+            "issue": {"id": 42, "body": "x" * WEBHOOK_PAYLOAD_INLINE_MAX_SIZE},
+        }
+
+        await enqueue("issues", delivery_id, json.dumps(payload).encode())
+
+        job_id = f"github.webhook.issues.opened:{delivery_id}"
+        enqueue_job_mock.assert_called_once_with(
+            "github.webhook.issues.opened", "issues", "opened", job_id, _job_id=job_id
+        )
+        assert await webhook_ingestion.load_payload(job_id) == payload
@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from polar.integrations.github.rate_limit import (
+    RATE_LIMIT_RESERVE,
+    RateLimit,
+    RateLimitTracker,
+)
+from polar.redis import Redis
+
+
+def get_rate_limit(remaining: int, reset_in: int = 3600) -> RateLimit:
+    return RateLimit(
+        limit=5000,
+        remaining=remaining,
+        used=5000 - remaining,
+        reset=int(time.time()) + reset_in,
+    )
+
+
+@pytest.mark.asyncio
+class TestRateLimitTracker:
+    async def test_record(self, redis: Redis) -> None:
+        tracker = RateLimitTracker(redis)
+        reset = int(time.time()) + 3600
+
+        await tracker.record(
+            1,
+            {
+                "x-ratelimit-limit": "5000",
+                "x-ratelimit-remaining": "4000",
+                "x-ratelimit-used": "1000",
+                "x-ratelimit-reset": str(reset),
+                "x-ratelimit-resource": "core",
+            },
+        )
+        # Other quotas and responses without headers are ignored
+        await tracker.record(
+            2,
+            {
+                "x-ratelimit-limit": "5000",
+                "x-ratelimit-remaining": "10",
+                "x-ratelimit-used": "4990",
+                "x-ratelimit-reset": str(reset),
+                "x-ratelimit-resource": "graphql",
+            },
+        )
+        await tracker.record(3, {})
+
+        assert await tracker.get_many([1, 2, 3]) == {
+            1: RateLimit(limit=5000, remaining=4000, used=1000, reset=reset),
+            2: None,
+            3: None,
+        }
+
+        await redis.delete(tracker._get_quota_key(1))
+
+    async def test_reserve(self, redis: Redis) -> None:
+        tracker = RateLimitTracker(redis)
+        installation_id = -1
+        await redis.delete(tracker._get_bucket_key(installation_id))
+
+        # 3600 requests available in one hour: one job per second
+        rate_limit = get_rate_limit(RATE_LIMIT_RESERVE + 3600)
+
+        delays = await tracker.reserve(
+            installation_id, rate_limit, count=5, cost=1, horizon=600
+        )
+        assert delays == [0, 1, 2, 3, 4]
+
+        # The budget is shared with the next reservations
+        delays = await tracker.reserve(
+            installation_id, rate_limit, count=3, cost=2, horizon=600
+        )
+        assert delays == [5, 7, 9]
+
+        # Capped by the horizon
+        delays = await tracker.reserve(
+            installation_id, rate_limit, count=1000, cost=1, horizon=600
+        )
+        assert len(delays) == pytest.approx(600 - 11, abs=1)
+        assert delays[-1] <= 600
+
+        await redis.delete(tracker._get_bucket_key(installation_id))
+
+    async def test_reserve_exhausted(self, redis: Redis) -> None:
+        tracker = RateLimitTracker(redis)
+
+        delays = await tracker.reserve(
+            -1, get_rate_limit(RATE_LIMIT_RESERVE), count=5, cost=1, horizon=600
+        )
+        assert delays == []
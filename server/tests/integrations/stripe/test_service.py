@@ -0,0 +1,90 @@
+import asyncio
+import time
+from typing import Any
+
+import pytest
+import stripe as stripe_lib
+from pytest_mock import MockerFixture
+
+from polar.integrations.stripe.service import (
+    stripe as stripe_service,
+)
+from polar.integrations.stripe.service import (
+    stripe_request_duration_seconds,
+)
+
+
+def _get_request_count(operation: str) -> float:
+    for metric in stripe_request_duration_seconds.collect():
+        for sample in metric.samples:
+            if (
+                sample.name == "stripe_request_duration_seconds_count"
+                and sample.labels.get("operation") == operation
+            ):
+                return sample.value
+    return 0
+
+
+@pytest.mark.asyncio
+async def test_does_not_block_event_loop(mocker: MockerFixture) -> None:
+    def slow_retrieve(id: str, **kwargs: Any) -> stripe_lib.Customer:
+        time.sleep(0.2)
+        return stripe_lib.Customer.construct_from({"id": id}, None)
+
+    mocker.patch.object(stripe_lib.Customer, "retrieve", side_effect=slow_retrieve)
+
+    ticks = 0
+
+    async def ticker() -> None:
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker_task = asyncio.create_task(ticker())
+    customers = await asyncio.gather(
+        *(stripe_service.get_customer(f"cus_{i}") for i in range(4))
+    )
+    ticker_task.cancel()
+
+    assert [customer.id for customer in customers] == [f"cus_{i}" for i in range(4)]
+    assert ticks > 5
+
+
+@pytest.mark.asyncio
+class TestStripeMock:
+    """
+    Run against the local stripe-mock server, see `POLAR_STRIPE_API_BASE`.
+    """
+
+    async def test_get_customer(self) -> None:
+        count = _get_request_count("Customer.retrieve")
+
+        customer = await stripe_service.get_customer("cus_123")
+
+        assert customer.object == "customer"
+        assert _get_request_count("Customer.retrieve") == count + 1
+
+    async def test_transfer_idempotency_key(self) -> None:
+        transfer = await stripe_service.transfer(
+            "acct_123",
+            1000,
+            metadata={"payout_transaction_id": "PAYOUT_TRANSACTION_ID"},
+            idempotency_key="payout-transfer-TEST",
+        )
+
+        assert transfer.object == "transfer"
+
+    async def test_list_balance_transactions(self) -> None:
+        balance_transactions = [
+            balance_transaction
+            async for balance_transaction in stripe_service.list_balance_transactions(
+                type="stripe_fee"
+            )
+        ]
+
+        assert len(balance_transactions) > 0
+        assert all(
+            balance_transaction.object == "balance_transaction"
+            for balance_transaction in balance_transactions
+        )
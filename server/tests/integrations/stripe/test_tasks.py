@@ -0,0 +1,280 @@
+from datetime import timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+import stripe as stripe_lib
+from arq import Retry
+from pytest_mock import MockerFixture
+
+from polar.integrations.stripe.tasks import (
+    MAX_RETRIES,
+    process_event,
+    requeue_stuck_events,
+)
+from polar.integrations.stripe.webhook_event import (
+    stripe_webhook_event as stripe_webhook_event_service,
+)
+from polar.postgres import AsyncSession
+from polar.transaction.service.payment import PledgeDoesNotExist
+from polar.worker import JobContext, PolarWorkerContext, WorkerSettings
+from tests.integrations.stripe.test_webhook_event import build_event
+
+
+@pytest.fixture
+def handler_mock(mocker: MockerFixture) -> AsyncMock:
+    handler = AsyncMock()
+    mocker.patch.dict(
+        "polar.integrations.stripe.tasks.WEBHOOK_HANDLERS",
+        {
+            "customer.subscription.updated": handler,
+            "charge.succeeded": handler,
+        },
+    )
+    return handler
+
+
+async def create_events(
+    session: AsyncSession, *events: tuple[str, str, int, str]
+) -> None:
+    for id, type, created, object_id in events:
+        await stripe_webhook_event_service.create(
+            session, build_event(id, type, created, {"id": object_id})
+        )
+
+
+def handled_ids(handler_mock: AsyncMock) -> list[str]:
+    events: list[stripe_lib.Event] = [call.args[2] for call in handler_mock.mock_calls]
+    return [event.id for event in events]
+
+
+@pytest.mark.asyncio
+class TestProcessEvent:
+    async def test_unknown(
+        self,
+        session: AsyncSession,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        handler_mock: AsyncMock,
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        await process_event(job_context, "evt_unknown", polar_worker_context)
+
+        handler_mock.assert_not_called()
+
+    async def test_idempotent(
+        self,
+        session: AsyncSession,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        handler_mock: AsyncMock,
+    ) -> None:
+        await create_events(session, ("evt_1", "charge.succeeded", 1000, "ch_1"))
+
+        # then
+        session.expunge_all()
+
+        await process_event(job_context, "evt_1", polar_worker_context)
+        await process_event(job_context, "evt_1", polar_worker_context)
+
+        assert handled_ids(handler_mock) == ["evt_1"]
+        webhook_event = await stripe_webhook_event_service.get_by_stripe_id(
+            session, "evt_1"
+        )
+        assert webhook_event is not None
+        await session.refresh(webhook_event)
+        assert webhook_event.processed_at is not None
+
+    async def test_older_events_first(
+        self,
+        session: AsyncSession,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        handler_mock: AsyncMock,
+    ) -> None:
+        await create_events(
+            session,
+            ("evt_3", "charge.succeeded", 1003, "ch_1"),
+            ("evt_2", "charge.succeeded", 1002, "ch_1"),
+            ("evt_1", "charge.succeeded", 1001, "ch_2"),
+        )
+
+        # then
+        session.expunge_all()
+
+        await process_event(job_context, "evt_3", polar_worker_context)
+        await process_event(job_context, "evt_2", polar_worker_context)
+
+        assert handled_ids(handler_mock) == ["evt_2", "evt_3"]
+
+    async def test_stale_snapshot(
+        self,
+        session: AsyncSession,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        handler_mock: AsyncMock,
+    ) -> None:
+        await create_events(
+            session, ("evt_2", "customer.subscription.updated", 1002, "sub_1")
+        )
+
+        # then
+        session.expunge_all()
+
+        await process_event(job_context, "evt_2", polar_worker_context)
+
+        # Received after the newer one was processed
+        await create_events(
+            session, ("evt_1", "customer.subscription.updated", 1001, "sub_1")
+        )
+        await process_event(job_context, "evt_1", polar_worker_context)
+
+        assert handled_ids(handler_mock) == ["evt_2"]
+        webhook_event = await stripe_webhook_event_service.get_by_stripe_id(
+            session, "evt_1"
+        )
+        assert webhook_event is not None
+        await session.refresh(webhook_event)
+        assert webhook_event.processed_at is not None
+
+    async def test_retry(
+        self,
+        session: AsyncSession,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        handler_mock: AsyncMock,
+    ) -> None:
+        handler_mock.side_effect = Retry(10)
+        await create_events(session, ("evt_1", "charge.succeeded", 1000, "ch_1"))
+
+        # then
+        session.expunge_all()
+
+        with pytest.raises(Retry):
+            await process_event(job_context, "evt_1", polar_worker_context)
+
+        assert handled_ids(handler_mock) == ["evt_1"]
+
+    async def test_failed_older_event_does_not_block(
+        self,
+        session: AsyncSession,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        handler_mock: AsyncMock,
+    ) -> None:
+        async def handler(
+            ctx: JobContext, session: AsyncSession, event: stripe_lib.Event
+        ) -> None:
+            if event.id == "evt_1":
+                raise ValueError()
+
+        handler_mock.side_effect = handler
+        await create_events(
+            session,
+            ("evt_1", "charge.succeeded", 1001, "ch_1"),
+            ("evt_2", "charge.succeeded", 1002, "ch_1"),
+        )
+
+        # then
+        session.expunge_all()
+
+        await process_event(job_context, "evt_2", polar_worker_context)
+
+        assert handled_ids(handler_mock) == ["evt_1", "evt_2"]
+        failed_event = await stripe_webhook_event_service.get_by_stripe_id(
+            session, "evt_1"
+        )
+        assert failed_event is not None
+        await session.refresh(failed_event)
+        assert failed_event.failed_at is not None
+        assert failed_event.error is not None
+
+    async def test_retries_exhausted(
+        self,
+        session: AsyncSession,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        mocker: MockerFixture,
+    ) -> None:
+        create_payment_mock = mocker.patch(
+            "polar.integrations.stripe.tasks.payment_transaction_service.create_payment",
+            side_effect=PledgeDoesNotExist("ch_1", "pi_1"),
+        )
+        await create_events(
+            session,
+            ("evt_1", "charge.succeeded", 1001, "ch_1"),
+            ("evt_2", "charge.succeeded", 1002, "ch_1"),
+        )
+
+        # then
+        session.expunge_all()
+
+        # The older event waits for its pledge, blocking the newer one
+        job_context["job_try"] = MAX_RETRIES
+        with pytest.raises(Retry):
+            await process_event(job_context, "evt_2", polar_worker_context)
+
+        # Last try: the older event fails and the newer one is processed
+        create_payment_mock.side_effect = [PledgeDoesNotExist("ch_1", "pi_1"), None]
+        job_context["job_try"] = MAX_RETRIES + 1
+        await process_event(job_context, "evt_2", polar_worker_context)
+
+        failed_event = await stripe_webhook_event_service.get_by_stripe_id(
+            session, "evt_1"
+        )
+        assert failed_event is not None
+        await session.refresh(failed_event)
+        assert failed_event.failed_at is not None
+        assert failed_event.processed_at is None
+
+        processed_event = await stripe_webhook_event_service.get_by_stripe_id(
+            session, "evt_2"
+        )
+        assert processed_event is not None
+        await session.refresh(processed_event)
+        assert processed_event.processed_at is not None
+        assert processed_event.failed_at is None
+
+
+def test_process_event_last_try_not_retried() -> None:
+    [process_event_function] = [
+        function
+        for function in WorkerSettings.functions
+        if function.name == "stripe.webhook.process_event"
+    ]
+    assert process_event_function.max_tries == MAX_RETRIES + 1
+
+
+@pytest.mark.asyncio
+async def test_requeue_stuck_events(
+    session: AsyncSession,
+    job_context: JobContext,
+    mocker: MockerFixture,
+) -> None:
+    mocker.patch(
+        "polar.integrations.stripe.tasks.STUCK_EVENT_DELAY", new=timedelta(minutes=-1)
+    )
+    enqueue_job_mock = mocker.patch(
+        "polar.integrations.stripe.webhook_event.enqueue_job"
+    )
+    await create_events(
+        session,
+        ("evt_1", "charge.succeeded", 1001, "ch_1"),
+        ("evt_2", "charge.succeeded", 1002, "ch_2"),
+    )
+
+    # then
+    session.expunge_all()
+
+    processed = await stripe_webhook_event_service.get_by_stripe_id(session, "evt_2")
+    assert processed is not None
+    await stripe_webhook_event_service.mark_processed(session, processed.id)
+
+    await requeue_stuck_events(job_context)
+
+    enqueue_job_mock.assert_called_once_with(
+        "stripe.webhook.process_event",
+        "evt_1",
+        _job_id="stripe.webhook.process_event:evt_1",
+    )
@@ -0,0 +1,190 @@
+from datetime import timedelta
+from typing import Any
+
+import pytest
+import stripe as stripe_lib
+from pytest_mock import MockerFixture
+
+from polar.integrations.stripe.webhook_event import (
+    stripe_webhook_event as stripe_webhook_event_service,
+)
+from polar.kit.utils import utc_now
+from polar.postgres import AsyncSession
+
+
+def build_event(
+    id: str, type: str, created: int, object: dict[str, Any]
+) -> stripe_lib.Event:
+    return stripe_lib.Event.construct_from(
+        {
+            "id": id,
+            "object": "event",
+            "type": type,
+            "created": created,
+            "account": None,
+            "data": {"object": object},
+        },
+        None,
+    )
+
+
+@pytest.mark.asyncio
+class TestCreate:
+    async def test_duplicate(self, session: AsyncSession) -> None:
+        event = build_event(
+            "evt_1", "customer.subscription.updated", 1000, {"id": "sub_1"}
+        )
+
+        assert await stripe_webhook_event_service.create(session, event) is True
+
+        # then
+        session.expunge_all()
+
+        assert await stripe_webhook_event_service.create(session, event) is False
+
+        webhook_event = await stripe_webhook_event_service.get_by_stripe_id(
+            session, "evt_1"
+        )
+        assert webhook_event is not None
+        assert webhook_event.object_id == "sub_1"
+        assert webhook_event.payload["data"]["object"]["id"] == "sub_1"
+
+    async def test_dispute_ordered_by_charge(self, session: AsyncSession) -> None:
+        event = build_event(
+            "evt_1",
+            "charge.dispute.created",
+            1000,
+            {"id": "dp_1", "charge": "ch_1"},
+        )
+        await stripe_webhook_event_service.create(session, event)
+
+        # then
+        session.expunge_all()
+
+        webhook_event = await stripe_webhook_event_service.get_by_stripe_id(
+            session, "evt_1"
+        )
+        assert webhook_event is not None
+        assert webhook_event.object_id == "ch_1"
+
+
+@pytest.mark.asyncio
+class TestListPendingIds:
+    async def test_ordered(self, session: AsyncSession) -> None:
+        for id, created in [("evt_2", 1002), ("evt_1", 1001), ("evt_3", 1003)]:
+            await stripe_webhook_event_service.create(
+                session,
+                build_event(
+                    id, "customer.subscription.updated", created, {"id": "sub_1"}
+                ),
+            )
+        await stripe_webhook_event_service.create(
+            session,
+            build_event(
+                "evt_4", "customer.subscription.updated", 1000, {"id": "sub_2"}
+            ),
+        )
+
+        # then
+        session.expunge_all()
+
+        webhook_event = await stripe_webhook_event_service.get_by_stripe_id(
+            session, "evt_2"
+        )
+        assert webhook_event is not None
+
+        pending_ids = await stripe_webhook_event_service.list_pending_ids(
+            session, webhook_event
+        )
+        pending = [
+            await stripe_webhook_event_service.get(session, id) for id in pending_ids
+        ]
+        assert [event.stripe_id for event in pending if event] == ["evt_1", "evt_2"]
+
+
+@pytest.mark.asyncio
+class TestListStuckStripeIds:
+    async def test_pending_only(self, session: AsyncSession) -> None:
+        for id, created in [("evt_2", 1002), ("evt_1", 1001), ("evt_3", 1003)]:
+            await stripe_webhook_event_service.create(
+                session, build_event(id, "charge.succeeded", created, {"id": id})
+            )
+
+        # then
+        session.expunge_all()
+
+        processed = await stripe_webhook_event_service.get_by_stripe_id(
+            session, "evt_3"
+        )
+        assert processed is not None
+        await stripe_webhook_event_service.mark_processed(session, processed.id)
+
+        assert (
+            await stripe_webhook_event_service.list_stuck_stripe_ids(
+                session, received_before=utc_now() - timedelta(minutes=1), limit=10
+            )
+            == []
+        )
+        assert await stripe_webhook_event_service.list_stuck_stripe_ids(
+            session, received_before=utc_now() + timedelta(minutes=1), limit=10
+        ) == ["evt_1", "evt_2"]
+
+
+@pytest.mark.asyncio
+class TestIsStale:
+    async def test_newer_processed(self, session: AsyncSession) -> None:
+        for id, created in [("evt_1", 1001), ("evt_2", 1002)]:
+            await stripe_webhook_event_service.create(
+                session,
+                build_event(
+                    id, "customer.subscription.updated", created, {"id": "sub_1"}
+                ),
+            )
+
+        # then
+        session.expunge_all()
+
+        older = await stripe_webhook_event_service.get_by_stripe_id(session, "evt_1")
+        newer = await stripe_webhook_event_service.get_by_stripe_id(session, "evt_2")
+        assert older is not None
+        assert newer is not None
+
+        assert await stripe_webhook_event_service.is_stale(session, older) is False
+
+        await stripe_webhook_event_service.mark_processed(session, newer.id)
+
+        assert await stripe_webhook_event_service.is_stale(session, older) is True
+        assert await stripe_webhook_event_service.is_stale(session, newer) is False
+
+
+@pytest.mark.asyncio
+class TestReplay:
+    async def test_failed(self, session: AsyncSession, mocker: MockerFixture) -> None:
+        enqueue_job_mock = mocker.patch(
+            "polar.integrations.stripe.webhook_event.enqueue_job"
+        )
+        await stripe_webhook_event_service.create(
+            session, build_event("evt_1", "charge.succeeded", 1000, {"id": "ch_1"})
+        )
+
+        # then
+        session.expunge_all()
+
+        webhook_event = await stripe_webhook_event_service.get_by_stripe_id(
+            session, "evt_1"
+        )
+        assert webhook_event is not None
+        await stripe_webhook_event_service.mark_failed(
+            session, webhook_event.id, "error"
+        )
+
+        await stripe_webhook_event_service.replay(session, webhook_event)
+
+        await session.refresh(webhook_event)
+        assert webhook_event.failed_at is None
+        assert webhook_event.error is None
+        enqueue_job_mock.assert_called_once_with(
+            "stripe.webhook.process_event",
+            "evt_1",
+            _job_id="stripe.webhook.process_event:evt_1",
+        )
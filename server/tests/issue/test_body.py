@@ -0,0 +1,87 @@
+import pytest
+from pytest_mock import MockerFixture
+
+from polar.integrations.github.badge import PLEDGE_BADGE_COMMENT_START
+from polar.issue.body import IssueBodyRenderer
+from polar.models.issue import Issue
+from polar.models.organization import Organization
+from polar.models.repository import Repository
+from polar.postgres import AsyncSession
+from polar.redis import Redis
+from tests.fixtures.database import SaveFixture
+from tests.fixtures.random_objects import create_issue
+
+
+@pytest.mark.asyncio
+class TestIssueBodyRenderer:
+    async def test_prerender(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        redis: Redis,
+        organization: Organization,
+        public_repository: Repository,
+    ) -> None:
+        issues: list[Issue] = []
+        for body in ["First", "Second", None]:
+            issue = await create_issue(save_fixture, organization, public_repository)
+            issue.body = body
+            await save_fixture(issue)
+            issues.append(issue)
+
+        # then
+        session.expunge_all()
+
+        renderer = IssueBodyRenderer(redis)
+        render_github_mock = mocker.patch.object(
+            renderer, "_render_github", side_effect=lambda body, *args: f"<p>{body}</p>"
+        )
+        items = [(issue, public_repository, organization) for issue in issues]
+
+        assert await renderer.prerender(items) == 2
+        assert render_github_mock.call_count == 2
+
+        # Already cached
+        assert await renderer.prerender(items) == 0
+        assert await renderer.render(issues[0], public_repository, organization) == (
+            "<p>First</p>"
+        )
+        assert await renderer.render(issues[2], public_repository, organization) == ""
+        assert render_github_mock.call_count == 2
+
+    async def test_render_cached_by_content(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        redis: Redis,
+        organization: Organization,
+        public_repository: Repository,
+    ) -> None:
+        issue = await create_issue(save_fixture, organization, public_repository)
+        issue.body = "Body"
+        await save_fixture(issue)
+
+        # then
+        session.expunge_all()
+
+        renderer = IssueBodyRenderer(redis)
+        render_github_mock = mocker.patch.object(
+            renderer, "_render_github", side_effect=lambda body, *args: f"<p>{body}</p>"
+        )
+
+        await renderer.render(issue, public_repository, organization)
+
+        # Updating the issue without changing its body, e.g. labelling it
+        issue.body = f"Body{PLEDGE_BADGE_COMMENT_START}badge"
+        assert await renderer.render(issue, public_repository, organization) == (
+            "<p>Body</p>"
+        )
+        assert render_github_mock.call_count == 1
+
+        issue.body = "Edited body"
+        assert await renderer.render(issue, public_repository, organization) == (
+            "<p>Edited body</p>"
+        )
+        assert render_github_mock.call_count == 2
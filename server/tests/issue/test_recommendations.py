@@ -0,0 +1,102 @@
+import uuid
+
+import pytest
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from polar.app import app
+from polar.config import settings
+from polar.issue.recommendations import RecommendationsCache, spread
+from polar.issue.schemas import Issue as IssueSchema
+from polar.issue.service import issue as issue_service
+from polar.kit.pagination import ListResource, Pagination
+from polar.models.issue import Issue
+from polar.models.user import User
+from polar.postgres import AsyncSession, get_db_sessionmaker
+from polar.redis import Redis
+
+
+def get_recommendations(issue: Issue) -> ListResource[IssueSchema]:
+    return ListResource(
+        items=[IssueSchema.from_db(issue)],
+        pagination=Pagination(total_count=1, max_page=1),
+    )
+
+
+def test_spread(mocker: MockerFixture) -> None:
+    def get_item(repository: str) -> IssueSchema:
+        item = mocker.MagicMock()
+        item.repository.name = repository
+        return item
+
+    items = [get_item(repository) for repository in ["a", "a", "a", "b", "c", "a"]]
+
+    assert [item.repository.name for item in spread(items)] == [
+        "a",
+        "b",
+        "c",
+        "a",
+        "a",
+        "a",
+    ]
+
+
+@pytest.mark.asyncio
+class TestRecommendationsCache:
+    async def test_get_set(
+        self, session: AsyncSession, redis: Redis, issue: Issue
+    ) -> None:
+        cache = RecommendationsCache(redis, ttl=60, refresh_after=10)
+        user_id = uuid.uuid4()
+
+        # then
+        session.expunge_all()
+
+        loaded = await issue_service.get_loaded(session, issue.id)
+        assert loaded is not None
+
+        assert await cache.get(user_id) == (None, True)
+
+        content = await cache.set(user_id, get_recommendations(loaded))
+        assert await cache.get(user_id) == (content, False)
+
+        await redis.expire(cache._get_key(user_id), 50)
+        assert await cache.get(user_id) == (content, True)
+
+
+@pytest.mark.asyncio
+@pytest.mark.http_auto_expunge
+class TestForYou:
+    async def test_cached(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        redis: Redis,
+        user: User,
+        issue: Issue,
+        auth_jwt: str,
+        client: AsyncClient,
+    ) -> None:
+        cache = RecommendationsCache(redis)
+        mocker.patch("polar.issue.endpoints.recommendations_cache", cache)
+        mocker.patch.dict(app.dependency_overrides, {get_db_sessionmaker: lambda: None})
+
+        loaded = await issue_service.get_loaded(session, issue.id)
+        assert loaded is not None
+        compute_recommendations_mock = mocker.patch(
+            "polar.issue.endpoints.compute_recommendations",
+            return_value=get_recommendations(loaded),
+        )
+
+        for _ in range(2):
+            response = await client.get(
+                "/api/v1/issues/for_you",
+                cookies={settings.AUTH_COOKIE_KEY: auth_jwt},
+            )
+
+            assert response.status_code == 200
+            json = response.json()
+            assert json["pagination"]["total_count"] == 1
+            assert json["items"][0]["id"] == str(issue.id)
+
+        compute_recommendations_mock.assert_called_once()
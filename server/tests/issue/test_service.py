@@ -442,3 +442,80 @@ async def test_transfer(
         assert updated_pledge.organization_id == organization.id
         assert updated_pledge.repository_id == new_repository.id
         assert updated_pledge.issue_id == new_issue.id
+
+
+@pytest.mark.asyncio
+async def test_mark_not_needs_confirmation_many(
+    session: AsyncSession,
+    save_fixture: SaveFixture,
+    organization: Organization,
+    public_repository: Repository,
+) -> None:
+    needs_confirmation = await random_objects.create_issue(
+        save_fixture, organization, public_repository
+    )
+    needs_confirmation.needs_confirmation_solved = True
+    await save_fixture(needs_confirmation)
+
+    confirmed_solved = await random_objects.create_issue(
+        save_fixture, organization, public_repository
+    )
+    confirmed_solved.needs_confirmation_solved = True
+    confirmed_solved.confirmed_solved_at = utc_now()
+    await save_fixture(confirmed_solved)
+
+    # then
+    session.expunge_all()
+
+    await issue_service.mark_not_needs_confirmation_many(
+        session, [needs_confirmation.id, confirmed_solved.id]
+    )
+
+    updated_needs_confirmation = await issue_service.get(session, needs_confirmation.id)
+    assert updated_needs_confirmation is not None
+    assert updated_needs_confirmation.needs_confirmation_solved is False
+
+    # Already marked as solved, left untouched
+    updated_confirmed_solved = await issue_service.get(session, confirmed_solved.id)
+    assert updated_confirmed_solved is not None
+    assert updated_confirmed_solved.needs_confirmation_solved is True
+
+
+@pytest.mark.asyncio
+async def test_mark_needs_confirmation_many(
+    session: AsyncSession,
+    save_fixture: SaveFixture,
+    organization: Organization,
+    public_repository: Repository,
+) -> None:
+    closed = await random_objects.create_issue(
+        save_fixture, organization, public_repository
+    )
+    closed.state = Issue.State.CLOSED
+    await save_fixture(closed)
+
+    open_issue = await random_objects.create_issue(
+        save_fixture, organization, public_repository
+    )
+
+    confirmed_solved = await random_objects.create_issue(
+        save_fixture, organization, public_repository
+    )
+    confirmed_solved.state = Issue.State.CLOSED
+    confirmed_solved.confirmed_solved_at = utc_now()
+    await save_fixture(confirmed_solved)
+
+    # then
+    session.expunge_all()
+
+    changed_issue_ids = await issue_service.mark_needs_confirmation_many(
+        session, [closed.id, open_issue.id, confirmed_solved.id]
+    )
+    assert changed_issue_ids == [closed.id]
+
+    updated_closed = await issue_service.get(session, closed.id)
+    assert updated_closed is not None
+    assert updated_closed.needs_confirmation_solved is True
+
+    # Already marked
+    assert await issue_service.mark_needs_confirmation_many(session, [closed.id]) == []
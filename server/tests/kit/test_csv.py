@@ -1,6 +1,6 @@
 import pytest
 
-from polar.kit.csv import get_emails_from_csv
+from polar.kit.csv import get_emails_from_csv, iter_emails_from_csv
 
 
 @pytest.mark.asyncio
@@ -47,3 +47,17 @@ async def test_get_emails_from_csv() -> None:
             "baz,bazexample.com",
         ]
     ) == {"foo@example.com", "bar@example.com"}
+
+
+def test_iter_emails_from_csv() -> None:
+    assert list(
+        iter_emails_from_csv(
+            [
+                "name,email",
+                "hello world,foo@example.com",
+                "bar,bar@example.com",
+                "FOO,FOO@example.com",
+                "baz,bazexample.com",
+            ]
+        )
+    ) == ["foo@example.com", "bar@example.com"]
@@ -0,0 +1,41 @@
+import pytest
+
+from polar.kit.hook import Hook, hook_duration_seconds
+
+
+@pytest.mark.asyncio
+async def test_call() -> None:
+    hook: Hook[int] = Hook()
+    received: list[int] = []
+
+    async def receiver(payload: int) -> None:
+        received.append(payload)
+
+    hook.add(receiver)
+
+    await hook.call(1)
+    await hook.call(2)
+
+    assert received == [1, 2]
+
+    with pytest.raises(Exception):
+        hook.add(receiver)
+
+
+@pytest.mark.asyncio
+async def test_call_timing() -> None:
+    hook: Hook[int] = Hook()
+
+    async def timed_receiver(payload: int) -> None:
+        pass
+
+    hook.add(timed_receiver)
+    await hook.call(1)
+
+    receiver = f"{timed_receiver.__module__}.{timed_receiver.__qualname__}"
+    assert any(
+        sample.labels.get("receiver") == receiver and sample.value == 1
+        for metric in hook_duration_seconds.collect()
+        for sample in metric.samples
+        if sample.name == "hook_duration_seconds_count"
+    )
@@ -0,0 +1,178 @@
+from collections.abc import Sequence
+from typing import Any
+
+import pytest
+from sqlalchemy import TIMESTAMP, column, select
+
+from polar.kit.db.postgres import AsyncSession
+from polar.kit.pagination import (
+    CursorPaginationCount,
+    CursorPaginationParams,
+    InvalidCursor,
+    SortKey,
+    decode_cursor,
+    encode_cursor,
+    paginate_cursor,
+)
+from polar.kit.utils import utc_now
+from tests.fixtures.database import SaveFixture, TestModel
+
+
+async def create_models(save_fixture: SaveFixture) -> list[TestModel]:
+    models = []
+    for i in range(20):
+        model = TestModel(
+            # Duplicates and NULLs, to check ties and NULLs ordering
+            int_column=i % 4 if i % 5 else None,
+            str_column=f"model_{i:02d}",
+        )
+        await save_fixture(model)
+        models.append(model)
+    return models
+
+
+async def paginate_all(
+    session: AsyncSession, sort_keys: Sequence[SortKey], limit: int
+) -> list[int]:
+    ids: list[int] = []
+    cursor: str | None = None
+    while True:
+        results, cursor, _ = await paginate_cursor(
+            session,
+            select(TestModel),
+            pagination=CursorPaginationParams(cursor, limit),
+            sort_keys=sort_keys,
+        )
+        assert len(results) <= limit
+        ids += [result.id for result in results]
+        if cursor is None:
+            return ids
+
+
+def test_cursor_round_trip() -> None:
+    now = utc_now()
+    values = [now, 1, "foo", None]
+    sort_keys = [
+        SortKey(column("created_at", TIMESTAMP(timezone=True))),
+        SortKey(TestModel.id),
+        SortKey(TestModel.str_column),
+        SortKey(TestModel.int_column),
+    ]
+    assert decode_cursor(encode_cursor(values), sort_keys) == values
+
+
+@pytest.mark.parametrize("cursor", ["not_a_cursor", encode_cursor([1, 2])])
+def test_invalid_cursor(cursor: str) -> None:
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, [SortKey(TestModel.id)])
+
+
+@pytest.mark.parametrize(
+    "sort_key,value",
+    [
+        (SortKey(TestModel.id), "1"),
+        (SortKey(TestModel.id), True),
+        (SortKey(TestModel.id), None),
+        (SortKey(TestModel.uuid), "not_a_uuid"),
+        (SortKey(TestModel.str_column), 1),
+        (SortKey(column("created_at", TIMESTAMP(timezone=True))), "2024-01-01"),
+    ],
+)
+def test_invalid_cursor_value(sort_key: SortKey, value: Any) -> None:
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor([value]), [sort_key])
+
+
+@pytest.mark.asyncio
+class TestPaginateCursor:
+    @pytest.mark.parametrize(
+        "int_desc,nulls_last,id_desc",
+        [
+            (False, None, False),
+            (True, None, False),
+            (False, False, True),
+            (True, True, True),
+        ],
+    )
+    async def test_traversal(
+        self,
+        int_desc: bool,
+        nulls_last: bool | None,
+        id_desc: bool,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+    ) -> None:
+        await create_models(save_fixture)
+        sort_keys = [
+            SortKey(TestModel.int_column, int_desc, nulls_last),
+            SortKey(TestModel.id, id_desc),
+        ]
+
+        # then
+        session.expunge_all()
+
+        expected_result = await session.execute(
+            select(TestModel.id).order_by(*(key.order_by_clause for key in sort_keys))
+        )
+        expected_ids = list(expected_result.scalars().all())
+
+        assert await paginate_all(session, sort_keys, 3) == expected_ids
+
+    async def test_row_comparison(
+        self, session: AsyncSession, save_fixture: SaveFixture
+    ) -> None:
+        models = await create_models(save_fixture)
+
+        # then
+        session.expunge_all()
+
+        ids = await paginate_all(session, [SortKey(TestModel.id, True)], 7)
+        assert ids == sorted((model.id for model in models), reverse=True)
+
+    @pytest.mark.parametrize(
+        "count", [CursorPaginationCount.exact, CursorPaginationCount.estimate]
+    )
+    async def test_count(
+        self,
+        count: CursorPaginationCount,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+    ) -> None:
+        await create_models(save_fixture)
+
+        # then
+        session.expunge_all()
+
+        results, next_cursor, total_count = await paginate_cursor(
+            session,
+            select(TestModel).where(TestModel.str_column.is_not(None)),
+            pagination=CursorPaginationParams(None, 5, count),
+            sort_keys=[SortKey(TestModel.id)],
+        )
+
+        assert len(results) == 5
+        assert next_cursor is not None
+        assert total_count is not None
+        if count == CursorPaginationCount.exact:
+            assert total_count == 20
+        else:
+            assert total_count >= 0
+
+    async def test_no_count(
+        self, session: AsyncSession, save_fixture: SaveFixture
+    ) -> None:
+        await create_models(save_fixture)
+
+        # then
+        session.expunge_all()
+
+        results, next_cursor, total_count = await paginate_cursor(
+            session,
+            select(TestModel),
+            pagination=CursorPaginationParams(None, 50),
+            sort_keys=[SortKey(TestModel.id)],
+        )
+
+        assert len(results) == 20
+        assert next_cursor is None
+        assert total_count is None
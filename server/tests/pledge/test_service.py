@@ -13,7 +13,7 @@ from pytest_mock import MockerFixture
 from polar.config import settings
 from polar.enums import AccountType, Platforms
 from polar.exceptions import NotPermitted
-from polar.issue.hooks import IssueHook, issue_upserted
+from polar.issue.hooks import IssuesHook, issues_upserted
 from polar.issue.schemas import ConfirmIssueSplit
 from polar.issue.service import issue as issue_service
 from polar.kit.utils import utc_now
@@ -1182,7 +1182,7 @@ async def test_pledge_states(
                 # this is not 100% realistic, but it's good enough
                 issue.state = Issue.State.CLOSED
                 await save_fixture(issue)
-                await issue_upserted.call(IssueHook(session, issue))
+                await issues_upserted.call(IssuesHook(session, [issue]))
 
             async def confirm_solved() -> None:
                 response = await client.post(
@@ -1252,7 +1252,7 @@ async def test_pledge_states(
                 # this is not 100% realistic, but it's good enough
                 issue.state = Issue.State.CLOSED
                 await save_fixture(issue)
-                await issue_upserted.call(IssueHook(session, issue))
+                await issues_upserted.call(IssuesHook(session, [issue]))
 
             assert notifications_sent == tc.expected_post_close_notifications
 
@@ -1,10 +1,16 @@
+import contextlib
+import csv
+import tracemalloc
 import uuid
+from collections.abc import AsyncIterator
 from datetime import UTC, date, datetime, timedelta
-from unittest.mock import MagicMock, call
+from typing import cast
+from unittest.mock import AsyncMock, MagicMock, call
 
 import pytest
 import stripe as stripe_lib
 from pytest_mock import MockerFixture
+from sqlalchemy import insert
 
 from polar.auth.dependencies import AuthMethod
 from polar.authz.service import Anonymous, Authz
@@ -12,7 +18,13 @@ from polar.config import settings
 from polar.exceptions import NotPermitted, ResourceNotFound
 from polar.held_balance.service import held_balance as held_balance_service
 from polar.integrations.stripe.service import StripeService
-from polar.kit.pagination import PaginationParams
+from polar.kit.db.postgres import async_sessionmaker
+from polar.kit.pagination import (
+    CursorPaginationCount,
+    CursorPaginationParams,
+    PaginationParams,
+)
+from polar.kit.utils import utc_now
 from polar.models import (
     Account,
     Organization,
@@ -153,6 +165,14 @@ def authz(session: AsyncSession) -> Authz:
     return Authz(session)
 
 
+def get_sessionmaker(session: AsyncSession) -> async_sessionmaker[AsyncSession]:
+    @contextlib.asynccontextmanager
+    async def sessionmaker() -> AsyncIterator[AsyncSession]:
+        yield session
+
+    return cast(async_sessionmaker[AsyncSession], sessionmaker)
+
+
 @pytest.mark.asyncio
 class TestCreateFreeSubscription:
     async def test_not_existing_subscription_tier(
@@ -388,6 +408,116 @@ class TestCreateArbitrarySubscription:
         )
 
 
+@pytest.mark.asyncio
+class TestImportSubscriptions:
+    async def test_valid(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        subscription_tier_organization_free: SubscriptionTier,
+        user: User,
+        user_second: User,
+    ) -> None:
+        mocker.patch("polar.subscription.service.subscription.IMPORT_CHUNK_SIZE", 2)
+        enqueue_job_mock = mocker.patch(
+            "polar.subscription.service.subscription.enqueue_job"
+        )
+        user_enqueue_job_mock = mocker.patch("polar.user.service.enqueue_job")
+        await create_active_subscription(
+            save_fixture,
+            subscription_tier=subscription_tier_organization_free,
+            user=user,
+            stripe_subscription_id=None,
+        )
+        on_progress = AsyncMock()
+
+        # then
+        session.expunge_all()
+
+        emails = [
+            user.email,
+            user_second.email.upper(),
+            "new_1@example.com",
+            "new_2@example.com",
+            "new_2@example.com",
+            f"{'a' * 60}@example.com",
+        ]
+        count = await subscription_service.import_subscriptions(
+            session,
+            emails=iter(emails),
+            subscription_tier=subscription_tier_organization_free,
+            on_progress=on_progress,
+        )
+
+        assert count == 3
+        assert on_progress.call_args_list == [call(2, 1), call(4, 3), call(6, 3)]
+
+        subscribed_users = await user_service.get_by_emails_or_signup(
+            session, emails[1:]
+        )
+        assert len(subscribed_users) == 3
+        for subscribed_user in subscribed_users:
+            subscriptions = await subscription_service.get_active_user_subscriptions(
+                session,
+                subscribed_user,
+                organization_id=subscription_tier_organization_free.organization_id,
+            )
+            assert len(subscriptions) == 1
+            enqueue_job_mock.assert_any_call(
+                "subscription.subscription.enqueue_benefits_grants",
+                subscriptions[0].id,
+            )
+            if subscribed_user.id != user_second.id:
+                user_enqueue_job_mock.assert_any_call(
+                    "user.on_after_signup", user_id=subscribed_user.id
+                )
+
+        # Importing again is a no-op
+        count = await subscription_service.import_subscriptions(
+            session,
+            emails=emails,
+            subscription_tier=subscription_tier_organization_free,
+        )
+        assert count == 0
+
+    async def test_conflicting_users(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        subscription_tier_organization_free: SubscriptionTier,
+    ) -> None:
+        mocker.patch("polar.subscription.service.subscription.enqueue_job")
+        mocker.patch("polar.user.service.enqueue_job")
+        # Changed their email: their username is still the old one
+        await save_fixture(
+            User(username="taken@example.com", email="changed@example.com")
+        )
+        await save_fixture(
+            User(
+                username="deleted",
+                email="deleted@example.com",
+                deleted_at=utc_now(),
+            )
+        )
+
+        # then
+        session.expunge_all()
+
+        count = await subscription_service.import_subscriptions(
+            session,
+            emails=["taken@example.com", "deleted@example.com", "new@example.com"],
+            subscription_tier=subscription_tier_organization_free,
+        )
+
+        assert count == 1
+        subscribed_users = await user_service.get_by_emails_or_signup(
+            session, ["new@example.com"]
+        )
+        assert len(subscribed_users) == 1
+
+
 @pytest.mark.asyncio
 class TestCreateSubscriptionFromStripe:
     async def test_not_existing_subscription_tier(self, session: AsyncSession) -> None:
@@ -1162,6 +1292,143 @@ class TestSearch:
         assert count == 1
 
 
+@pytest.mark.asyncio
+class TestSearchCursor:
+    async def test_pages(
+        self,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        user: User,
+        user_organization: UserOrganization,
+        subscription_tier_organization: SubscriptionTier,
+    ) -> None:
+        subscriptions = [
+            await create_active_subscription(
+                save_fixture,
+                subscription_tier=subscription_tier_organization,
+                user=await create_user(save_fixture),
+                # Same start date, to check ties are broken
+                started_at=datetime(2023, 1, 1),
+            )
+            for _ in range(5)
+        ]
+
+        # then
+        session.expunge_all()
+
+        results, next_cursor, total_count = await subscription_service.search_cursor(
+            session,
+            user,
+            organization=organization,
+            pagination=CursorPaginationParams(None, 2, CursorPaginationCount.exact),
+        )
+
+        assert total_count == 5
+        assert len(results) == 2
+
+        ids = [result.id for result in results]
+        while next_cursor is not None:
+            results, next_cursor, _ = await subscription_service.search_cursor(
+                session,
+                user,
+                organization=organization,
+                pagination=CursorPaginationParams(next_cursor, 2),
+            )
+            ids += [result.id for result in results]
+
+        assert ids == sorted((s.id for s in subscriptions), reverse=True)
+
+
+@pytest.mark.asyncio
+class TestGetExportCSV:
+    async def test_valid(
+        self,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        user: User,
+        user_organization: UserOrganization,
+        subscription_tier_organization: SubscriptionTier,
+    ) -> None:
+        subscription_tier_organization.name = "Gold, with perks"
+        await save_fixture(subscription_tier_organization)
+        subscriber = await create_user(save_fixture)
+        subscription = await create_active_subscription(
+            save_fixture,
+            subscription_tier=subscription_tier_organization,
+            user=subscriber,
+        )
+
+        # then
+        session.expunge_all()
+
+        lines = [
+            line
+            async for line in subscription_service.get_export_csv(
+                get_sessionmaker(session), user, organization=organization
+            )
+        ]
+
+        rows = list(csv.reader(lines))
+        assert rows == [
+            ["email", "name", "created_at", "active", "tier"],
+            [
+                subscriber.email,
+                subscriber.email,
+                subscription.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+                "true",
+                "Gold, with perks",
+            ],
+        ]
+
+    async def test_memory(
+        self,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        organization: Organization,
+        user: User,
+        user_organization: UserOrganization,
+        subscription_tier_organization: SubscriptionTier,
+    ) -> None:
+        subscribers = [await create_user(save_fixture) for _ in range(10)]
+        now = utc_now()
+        await session.execute(
+            insert(Subscription),
+            [
+                {
+                    "status": SubscriptionStatus.active,
+                    "current_period_start": now,
+                    "cancel_at_period_end": False,
+                    "started_at": now - timedelta(seconds=i),
+                    "price_amount": 1000,
+                    "price_currency": "usd",
+                    "user_id": subscribers[i % len(subscribers)].id,
+                    "subscription_tier_id": subscription_tier_organization.id,
+                }
+                for i in range(100_000)
+            ],
+        )
+
+        # then
+        session.expunge_all()
+
+        tracemalloc.start()
+        try:
+            count = 0
+            async for _ in subscription_service.get_export_csv(
+                get_sessionmaker(session), user, organization=organization
+            ):
+                count += 1
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert count == 100_000 + 1
+        # Loading everything at once takes several hundreds of MB
+        assert peak < 50 * 1024 * 1024
+
+
 @pytest.mark.asyncio
 class TestSearchSubscribed:
     async def test_valid(
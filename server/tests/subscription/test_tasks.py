@@ -8,6 +8,7 @@ from polar.models import (
     Subscription,
     SubscriptionBenefit,
     SubscriptionBenefitGrant,
+    SubscriptionsImport,
     SubscriptionTier,
     User,
 )
@@ -22,6 +23,7 @@ from polar.subscription.tasks import (  # type: ignore[attr-defined]
     SubscriptionBenefitDoesNotExist,
     SubscriptionBenefitGrantDoesNotExist,
     SubscriptionDoesNotExist,
+    SubscriptionsImportDoesNotExist,
     SubscriptionTierDoesNotExist,
     UserDoesNotExist,
     subscription_benefit_delete,
@@ -31,6 +33,7 @@ from polar.subscription.tasks import (  # type: ignore[attr-defined]
     subscription_benefit_revoke,
     subscription_benefit_update,
     subscription_enqueue_benefits_grants,
+    subscription_import,
     subscription_service,
     subscription_update_subscription_tier_benefits_grants,
 )
@@ -78,6 +81,66 @@ class TestSubscriptionEnqueueBenefitsGrants:
         enqueue_benefits_grants_mock.assert_called_once()
 
 
+@pytest.mark.asyncio
+class TestSubscriptionImport:
+    async def test_not_existing_subscriptions_import(
+        self,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        session: AsyncSession,
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        with pytest.raises(SubscriptionsImportDoesNotExist):
+            await subscription_import(job_context, uuid.uuid4(), polar_worker_context)
+
+    async def test_progress(
+        self,
+        mocker: MockerFixture,
+        job_context: JobContext,
+        polar_worker_context: PolarWorkerContext,
+        save_fixture: SaveFixture,
+        subscription_tier_organization_free: SubscriptionTier,
+        user: User,
+        session: AsyncSession,
+    ) -> None:
+        mocker.patch("polar.subscription.service.subscription.IMPORT_CHUNK_SIZE", 2)
+        eventstream_publish_mock = mocker.patch(
+            "polar.subscription.tasks.eventstream_publish"
+        )
+        subscriptions_import = SubscriptionsImport(
+            subscription_tier_id=subscription_tier_organization_free.id,
+            user_id=user.id,
+            file=b"email\nfoo@example.com\nbar@example.com\nbaz@example.com\n",
+        )
+        await save_fixture(subscriptions_import)
+
+        # then
+        session.expunge_all()
+
+        await subscription_import(
+            job_context, subscriptions_import.id, polar_worker_context
+        )
+
+        assert eventstream_publish_mock.call_count == 2
+        eventstream_publish_mock.assert_called_with(
+            "subscription.subscription.import.progress",
+            {
+                "subscriptions_import_id": subscriptions_import.id,
+                "subscription_tier_id": subscription_tier_organization_free.id,
+                "processed": 3,
+                "count": 3,
+            },
+            user_id=user.id,
+        )
+
+        assert (
+            await subscription_service.get_import(session, subscriptions_import.id)
+            is None
+        )
+
+
 @pytest.mark.asyncio
 class TestSubscriptionUpdateSubscriptionTierBenefitsGrants:
     async def test_not_existing_subscription_tier(
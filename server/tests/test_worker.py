@@ -0,0 +1,94 @@
+import uuid
+from collections.abc import AsyncIterator
+
+import pytest
+import pytest_asyncio
+from arq import ArqRedis
+from arq.connections import create_pool
+from arq.jobs import Job
+
+from polar.worker import (
+    WorkerSettings,
+    _jobs_to_enqueue,
+    enqueue_job,
+    enqueue_jobs_bulk,
+    flush_enqueued_jobs,
+)
+
+
+@pytest_asyncio.fixture
+async def arq_pool() -> AsyncIterator[ArqRedis]:
+    queue_name = f"polar:test:queue:{uuid.uuid4().hex}"
+    pool = await create_pool(
+        WorkerSettings.redis_settings, default_queue_name=queue_name
+    )
+    yield pool
+    await pool.delete(queue_name)
+    await pool.close(True)
+
+
+@pytest.mark.asyncio
+class TestEnqueueJobsBulk:
+    async def test_enqueue(self, arq_pool: ArqRedis) -> None:
+        prefix = uuid.uuid4().hex
+        enqueued_count = await enqueue_jobs_bulk(
+            arq_pool,
+            [
+                ("task.a", (1,), {"_job_id": f"{prefix}:1", "foo": "bar"}),
+                ("task.b", (), {"_job_id": f"{prefix}:2", "_defer_by": 60}),
+            ],
+        )
+        assert enqueued_count == 2
+
+        job_a = await Job(f"{prefix}:1", arq_pool).info()
+        assert job_a is not None
+        assert job_a.function == "task.a"
+        assert job_a.args == (1,)
+        assert job_a.kwargs == {"foo": "bar"}
+
+        job_b = await Job(f"{prefix}:2", arq_pool).info()
+        assert job_b is not None
+        assert job_b.function == "task.b"
+        score = await arq_pool.zscore(arq_pool.default_queue_name, f"{prefix}:2")
+        assert score is not None
+        assert int(score) - int(job_b.enqueue_time.timestamp() * 1000) == 60_000
+
+    async def test_existing_job_id(self, arq_pool: ArqRedis) -> None:
+        job_id = uuid.uuid4().hex
+        await arq_pool.enqueue_job("task.a", _job_id=job_id)
+
+        enqueued_count = await enqueue_jobs_bulk(
+            arq_pool,
+            [
+                ("task.a", (), {"_job_id": job_id}),
+                ("task.a", (), {"_job_id": f"{job_id}:other"}),
+                ("task.a", (), {"_job_id": f"{job_id}:other"}),
+            ],
+        )
+        assert enqueued_count == 1
+
+        queued_jobs = await arq_pool.queued_jobs(queue_name=arq_pool.default_queue_name)
+        assert len(queued_jobs) == 2
+
+    async def test_chunks(self, arq_pool: ArqRedis) -> None:
+        enqueued_count = await enqueue_jobs_bulk(
+            arq_pool, [("task.a", (i,), {}) for i in range(2500)]
+        )
+        assert enqueued_count == 2500
+        assert await arq_pool.zcard(arq_pool.default_queue_name) == 2500
+
+
+@pytest.mark.asyncio
+async def test_flush_enqueued_jobs(arq_pool: ArqRedis) -> None:
+    _jobs_to_enqueue.set([])
+    for i in range(10):
+        enqueue_job("task.a", i)
+
+    await flush_enqueued_jobs(arq_pool)
+
+    assert _jobs_to_enqueue.get() == []
+    queued_jobs = await arq_pool.queued_jobs(queue_name=arq_pool.default_queue_name)
+    assert sorted(job.args[0] for job in queued_jobs) == list(range(10))
+    for job in queued_jobs:
+        assert "polar_context" in job.kwargs
+        assert "request_correlation_id" in job.kwargs
@@ -0,0 +1,128 @@
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy import update
+
+from polar.models import Account, AccountBalance, Transaction
+from polar.models.transaction import TransactionType
+from polar.postgres import AsyncSession
+from polar.transaction.service.account_balance import (
+    account_balance as account_balance_service,
+)
+from tests.fixtures.database import SaveFixture
+from tests.transaction.conftest import create_transaction
+
+
+@pytest.mark.asyncio
+class TestGetByAccountId:
+    async def test_no_transaction(
+        self, session: AsyncSession, account: Account
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        account_balance = await account_balance_service.get_by_account_id(
+            session, account.id
+        )
+        assert account_balance is None
+
+    async def test_maintained_on_insert(
+        self,
+        session: AsyncSession,
+        account: Account,
+        account_transactions: list[Transaction],
+        all_transactions: list[Transaction],
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        account_balance = await account_balance_service.get_by_account_id(
+            session, account.id
+        )
+        assert account_balance is not None
+        assert account_balance.amount == sum(t.amount for t in account_transactions)
+        assert account_balance.account_amount == sum(
+            t.account_amount for t in account_transactions
+        )
+        assert account_balance.balance_amount == sum(
+            t.amount for t in account_transactions if t.type == TransactionType.balance
+        )
+        assert account_balance.payout_amount == sum(
+            t.amount for t in account_transactions if t.type == TransactionType.payout
+        )
+        assert account_balance.account_payout_amount == sum(
+            t.account_amount
+            for t in account_transactions
+            if t.type == TransactionType.payout
+        )
+
+    async def test_maintained_on_update(
+        self,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        account: Account,
+    ) -> None:
+        transaction = await create_transaction(
+            save_fixture, account=account, account_currency="usd", amount=1000
+        )
+
+        # then
+        session.expunge_all()
+
+        updated_transaction = await session.get(Transaction, transaction.id)
+        assert updated_transaction is not None
+        updated_transaction.amount = 600
+        updated_transaction.account_amount = 600
+        await session.flush()
+
+        account_balance = await account_balance_service.get_by_account_id(
+            session, account.id
+        )
+        assert account_balance is not None
+        assert account_balance.amount == 600
+        assert account_balance.account_amount == 600
+        assert account_balance.balance_amount == 600
+
+
+@pytest.mark.asyncio
+class TestReconcile:
+    async def test_consistent(
+        self,
+        session: AsyncSession,
+        account_transactions: list[Transaction],
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        fixed_account_ids = await account_balance_service.reconcile(session)
+        assert fixed_account_ids == []
+
+    async def test_drifted(
+        self,
+        mocker: MockerFixture,
+        session: AsyncSession,
+        account: Account,
+        account_transactions: list[Transaction],
+    ) -> None:
+        mocker.patch(
+            "polar.transaction.service.account_balance.RECONCILE_BATCH_SIZE", new=1
+        )
+        await session.execute(
+            update(AccountBalance)
+            .where(AccountBalance.account_id == account.id)
+            .values(amount=0, payout_amount=0)
+        )
+
+        # then
+        session.expunge_all()
+
+        fixed_account_ids = await account_balance_service.reconcile(session)
+        assert fixed_account_ids == [account.id]
+
+        account_balance = await account_balance_service.get_by_account_id(
+            session, account.id
+        )
+        assert account_balance is not None
+        assert account_balance.amount == sum(t.amount for t in account_transactions)
+        assert account_balance.payout_amount == sum(
+            t.amount for t in account_transactions if t.type == TransactionType.payout
+        )
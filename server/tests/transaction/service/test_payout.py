@@ -1,3 +1,4 @@
+import uuid
 from types import SimpleNamespace
 from unittest.mock import MagicMock
 
@@ -17,11 +18,14 @@ from polar.transaction.service.payout import (
     StripePayoutNotPaid,
     UnderReviewAccount,
     UnknownAccount,
+    UnpaidBalance,
+    _get_payout_id,
 )
 from polar.transaction.service.payout import (
     payout_transaction as payout_transaction_service,
 )
 from tests.fixtures.database import SaveFixture
+from tests.fixtures.stripe import async_iter
 
 
 @pytest.fixture(autouse=True)
@@ -75,6 +79,18 @@ async def create_balance_transaction(
     return transaction
 
 
+async def get_paid_transactions(
+    session: AsyncSession, payout: Transaction
+) -> list[Transaction]:
+    statement = (
+        select(Transaction)
+        .where(Transaction.payout_transaction_id == payout.id)
+        .order_by(Transaction.created_at)
+    )
+    result = await session.execute(statement)
+    return list(result.scalars().all())
+
+
 @pytest.mark.asyncio
 class TestCreatePayout:
     async def test_insufficient_balance(
@@ -154,12 +170,16 @@ class TestCreatePayout:
         )
         await save_fixture(account)
 
-        payment_transaction_1 = await create_payment_transaction(save_fixture)
+        payment_transaction_1 = await create_payment_transaction(
+            save_fixture, charge_id="STRIPE_CHARGE_ID_1"
+        )
         balance_transaction_1 = await create_balance_transaction(
             save_fixture, account=account, payment_transaction=payment_transaction_1
         )
 
-        payment_transaction_2 = await create_payment_transaction(save_fixture)
+        payment_transaction_2 = await create_payment_transaction(
+            save_fixture, charge_id="STRIPE_CHARGE_ID_2"
+        )
         balance_transaction_2 = await create_balance_transaction(
             save_fixture, account=account, payment_transaction=payment_transaction_2
         )
@@ -183,11 +203,10 @@ class TestCreatePayout:
         assert payout.account_currency == "usd"
         assert payout.account_amount < 0
 
-        assert len(payout.paid_transactions) == 2 + len(
-            payout.account_incurred_transactions
-        )
-        assert payout.paid_transactions[0].id == balance_transaction_1.id
-        assert payout.paid_transactions[1].id == balance_transaction_2.id
+        paid_transactions = await get_paid_transactions(session, payout)
+        assert len(paid_transactions) == 2 + len(payout.account_incurred_transactions)
+        assert paid_transactions[0].id == balance_transaction_1.id
+        assert paid_transactions[1].id == balance_transaction_2.id
 
         assert len(payout.incurred_transactions) > 0
         assert (
@@ -205,9 +224,73 @@ class TestCreatePayout:
             ]
             assert call[1]["transfer_group"] == str(payout.id)
             assert call[1]["metadata"]["payout_transaction_id"] == str(payout.id)
+            # Stable across re-runs: not derived from the payout ID
+            assert call[1]["idempotency_key"].startswith(
+                f"payout-transfer-{account.id}-"
+            )
+            assert str(payout.id) not in call[1]["idempotency_key"]
+        assert (
+            len({call[1]["idempotency_key"] for call in transfer_mock.call_args_list})
+            == 2
+        )
 
         stripe_service_mock.create_payout.assert_not_called()
 
+    async def test_stripe_same_charge(
+        self,
+        session: AsyncSession,
+        save_fixture: SaveFixture,
+        user: User,
+        stripe_service_mock: MagicMock,
+    ) -> None:
+        account = Account(
+            status=Account.Status.ACTIVE,
+            account_type=AccountType.stripe,
+            admin_id=user.id,
+            country="US",
+            currency="usd",
+            is_details_submitted=True,
+            is_charges_enabled=True,
+            is_payouts_enabled=True,
+            processor_fees_applicable=True,
+            stripe_id="STRIPE_ACCOUNT_ID",
+        )
+        await save_fixture(account)
+
+        payment_transaction = await create_payment_transaction(save_fixture)
+        balance_transactions = [
+            await create_balance_transaction(
+                save_fixture, account=account, payment_transaction=payment_transaction
+            )
+            for _ in range(3)
+        ]
+
+        stripe_service_mock.transfer.return_value = SimpleNamespace(
+            id="STRIPE_TRANSFER_ID", balance_transaction="STRIPE_BALANCE_TRANSACTION_ID"
+        )
+
+        # then
+        session.expunge_all()
+
+        payout = await payout_transaction_service.create_payout(
+            session, account=account
+        )
+
+        transfer_mock: MagicMock = stripe_service_mock.transfer
+        transfer_mock.assert_called_once()
+        assert transfer_mock.call_args[0][1] == -payout.amount
+        assert (
+            transfer_mock.call_args[1]["source_transaction"]
+            == payment_transaction.charge_id
+        )
+
+        paid_transactions = await get_paid_transactions(session, payout)
+        for balance_transaction in balance_transactions:
+            paid_transaction = next(
+                t for t in paid_transactions if t.id == balance_transaction.id
+            )
+            assert paid_transaction.transfer_id == "STRIPE_TRANSFER_ID"
+
     async def test_stripe_different_currencies(
         self,
         session: AsyncSession,
@@ -269,11 +352,10 @@ class TestCreatePayout:
         assert payout.account_currency == "eur"
         assert payout.account_amount < 0
 
-        assert len(payout.paid_transactions) == 2 + len(
-            payout.account_incurred_transactions
-        )
-        assert payout.paid_transactions[0].id == balance_transaction_1.id
-        assert payout.paid_transactions[1].id == balance_transaction_2.id
+        paid_transactions = await get_paid_transactions(session, payout)
+        assert len(paid_transactions) == 2 + len(payout.account_incurred_transactions)
+        assert paid_transactions[0].id == balance_transaction_1.id
+        assert paid_transactions[1].id == balance_transaction_2.id
 
         stripe_service_mock.create_payout.assert_not_called()
 
@@ -312,10 +394,9 @@ class TestCreatePayout:
         assert payout.account_currency == "usd"
         assert payout.account_amount == -balance_transaction.amount
 
-        assert len(payout.paid_transactions) == 1 + len(
-            payout.account_incurred_transactions
-        )
-        assert payout.paid_transactions[0].id == balance_transaction.id
+        paid_transactions = await get_paid_transactions(session, payout)
+        assert len(paid_transactions) == 1 + len(payout.account_incurred_transactions)
+        assert paid_transactions[0].id == balance_transaction.id
 
         assert len(payout.incurred_transactions) == 0
         assert len(payout.account_incurred_transactions) == 0
@@ -423,7 +504,7 @@ class TestCreatePayoutFromStripe:
             transactions.append(transaction)
             balance_transactions.append(balance_transaction)
 
-        stripe_service_mock.list_balance_transactions.return_value = (
+        stripe_service_mock.list_balance_transactions.return_value = async_iter(
             balance_transactions
         )
 
@@ -497,7 +578,7 @@ class TestCreatePayoutFromStripe:
             transactions.append(transaction)
             balance_transactions.append(balance_transaction)
 
-        stripe_service_mock.list_balance_transactions.return_value = (
+        stripe_service_mock.list_balance_transactions.return_value = async_iter(
             balance_transactions
         )
 
@@ -531,3 +612,22 @@ class TestCreatePayoutFromStripe:
         result = await session.execute(paid_transactions_statement)
         paid_transactions = result.scalars().all()
         assert len(paid_transactions) == len(transactions)
+
+
+class TestGetPayoutId:
+    def test_same_balances(self) -> None:
+        account = Account(id=uuid.uuid4())
+        balances = [
+            UnpaidBalance(uuid.uuid4(), None, f"STRIPE_CHARGE_ID_{i}", 1000)
+            for i in range(3)
+        ]
+
+        payout_id = _get_payout_id(account, balances)
+        assert _get_payout_id(account, list(reversed(balances))) == payout_id
+        assert _get_payout_id(account, balances[:2]) != payout_id
+
+    def test_no_charge(self) -> None:
+        account = Account(id=uuid.uuid4())
+        balances = [UnpaidBalance(uuid.uuid4(), None, None, 1000)]
+
+        assert _get_payout_id(account, balances) != _get_payout_id(account, balances)
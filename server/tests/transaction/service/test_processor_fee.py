@@ -14,6 +14,7 @@ from polar.transaction.service.processor_fee import (
     processor_fee_transaction as processor_fee_transaction_service,
 )
 from tests.fixtures.database import SaveFixture
+from tests.fixtures.stripe import async_iter
 
 
 @pytest.fixture(autouse=True)
@@ -441,7 +442,7 @@ class TestSyncStripeFees:
             ),
         ]
 
-        stripe_service_mock.list_balance_transactions.return_value = (
+        stripe_service_mock.list_balance_transactions.return_value = async_iter(
             balance_transactions
         )
 
@@ -19,6 +19,7 @@ from polar.transaction.service.refund import (
     refund_transaction as refund_transaction_service,
 )
 from tests.fixtures.database import SaveFixture
+from tests.fixtures.stripe import async_iter
 
 
 def build_stripe_balance_transaction(
@@ -134,11 +135,9 @@ class TestCreateRefunds:
             balance_transaction=balance_transaction.id,
         )
 
-        stripe_service_mock.list_refunds.return_value = [
-            new_refund,
-            handled_refund,
-            failed_refund,
-        ]
+        stripe_service_mock.list_refunds.return_value = async_iter(
+            [new_refund, handled_refund, failed_refund]
+        )
         stripe_service_mock.get_balance_transaction.return_value = balance_transaction
 
         account = Account(
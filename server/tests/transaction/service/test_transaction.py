@@ -4,7 +4,11 @@ import pytest
 
 from polar.authz.service import Authz
 from polar.exceptions import NotPermitted, ResourceNotFound
-from polar.kit.pagination import PaginationParams
+from polar.kit.pagination import (
+    CursorPaginationCount,
+    CursorPaginationParams,
+    PaginationParams,
+)
 from polar.models import Account, Organization, Transaction, User, UserOrganization
 from polar.models.transaction import TransactionType
 from polar.postgres import AsyncSession
@@ -169,6 +173,39 @@ class TestSearch:
             assert result.id in organization_transactions_id
 
 
+@pytest.mark.asyncio
+class TestSearchCursor:
+    async def test_pages(
+        self,
+        session: AsyncSession,
+        user: User,
+        user_organization: UserOrganization,
+        readable_user_transactions: list[Transaction],
+        all_transactions: list[Transaction],
+    ) -> None:
+        # then
+        session.expunge_all()
+
+        results, next_cursor, total_count = await transaction_service.search_cursor(
+            session,
+            user,
+            pagination=CursorPaginationParams(None, 2, CursorPaginationCount.exact),
+        )
+
+        assert total_count == len(readable_user_transactions)
+        assert len(results) == 2
+        assert next_cursor is not None
+
+        ids = [result.id for result in results]
+        while next_cursor is not None:
+            results, next_cursor, _ = await transaction_service.search_cursor(
+                session, user, pagination=CursorPaginationParams(next_cursor, 2)
+            )
+            ids += [result.id for result in results]
+
+        assert sorted(ids) == sorted(t.id for t in readable_user_transactions)
+
+
 @pytest.mark.asyncio
 class TestGetSummary:
     async def test_account_not_permitted(
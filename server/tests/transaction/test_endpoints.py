@@ -47,6 +47,55 @@ class TestSearchTransactions:
         assert json["pagination"]["total_count"] == len(readable_user_transactions)
 
 
+@pytest.mark.asyncio
+@pytest.mark.http_auto_expunge
+class TestSearchTransactionsCursor:
+    async def test_anonymous(self, client: AsyncClient) -> None:
+        response = await client.get("/api/v1/transactions/search/cursor")
+
+        assert response.status_code == 401
+
+    @pytest.mark.authenticated
+    async def test_invalid_cursor(self, client: AsyncClient) -> None:
+        response = await client.get(
+            "/api/v1/transactions/search/cursor", params={"cursor": "not_a_cursor"}
+        )
+
+        assert response.status_code == 400
+
+    @pytest.mark.authenticated
+    async def test_valid(
+        self,
+        client: AsyncClient,
+        account: Account,
+        user_organization: UserOrganization,
+        readable_user_transactions: list[Transaction],
+        all_transactions: list[Transaction],
+    ) -> None:
+        response = await client.get(
+            "/api/v1/transactions/search/cursor",
+            params={"limit": 2, "total_count": "exact"},
+        )
+
+        assert response.status_code == 200
+
+        json = response.json()
+        assert len(json["items"]) == 2
+        assert json["pagination"]["total_count"] == len(readable_user_transactions)
+
+        response = await client.get(
+            "/api/v1/transactions/search/cursor",
+            params={"cursor": json["pagination"]["next_cursor"], "limit": 100},
+        )
+
+        assert response.status_code == 200
+
+        json = response.json()
+        assert len(json["items"]) == len(readable_user_transactions) - 2
+        assert json["pagination"]["next_cursor"] is None
+        assert json["pagination"]["total_count"] is None
+
+
 @pytest.mark.asyncio
 @pytest.mark.http_auto_expunge
 class TestLookupTransaction: